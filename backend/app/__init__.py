@@ -8,11 +8,16 @@ from flask_mail import Mail
 from .config import config
 from flask_jwt_extended import JWTManager
 from app.error_handler.jwt_error_handler import setup_jwt_error_handlers
+from app.services.profiler import setup_profiler
+from app.services.query_stats import setup_query_stats
+from app.services.database import setup_database
+from app.services.replicas import RoutingSession, setup_replicas
+from app.models.types import codec_marker
 from flask_cors import CORS
 import os
 
 # Initialize Flask extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 bootstrap = Bootstrap()
 moment = Moment()
 migrate = Migrate()
@@ -49,6 +54,8 @@ def create_app(config_name):
     # Load the configuration object
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
+    # Fail now rather than on the first write of a compressed column
+    codec_marker(app.config['TEXT_COMPRESSION_CODEC'])
 
     # Initialize Flask extensions with the app instance
     bootstrap.init_app(app)
@@ -91,13 +98,14 @@ def create_app(config_name):
             The User object corresponding to the given user ID,
             or None if no user is found.
         """
-        return User.query.get(int(user_id))
+        user = User.query.get(int(user_id))
+        return user if user is not None and user.deleted_at is None else None
 
     # Register blueprints for different parts of the API
     from .api.v1 import (public, auth, content,
                          assessment, errors,
                          users as users_api,
-                         teacher, admin, student)
+                         teacher, admin, student, health)
 
     app.register_blueprint(public.bp, url_prefix='/api/v1/public')
     app.register_blueprint(auth.bp, url_prefix='/api/v1/auth')
@@ -108,8 +116,21 @@ def create_app(config_name):
     app.register_blueprint(admin.bp, url_prefix='/api/v1/portal')
     app.register_blueprint(teacher.bp, url_prefix='/api/v1/portal')
     app.register_blueprint(student.bp, url_prefix='/api/v1/portal')
+    app.register_blueprint(health.bp)
 
     # Setup custom JWT error handlers
     setup_jwt_error_handlers(jwt_manager)
 
+    # Apply statement timeouts to the database engines
+    setup_database(app, db)
+
+    # Send read-only requests to the read replicas, if any
+    setup_replicas(app, db)
+
+    # Attach the on-demand sampling profiler (idle until an admin enables it)
+    setup_profiler(app)
+
+    # Aggregate SQL fingerprint statistics per endpoint and role
+    setup_query_stats(app, db)
+
     return app
@@ -2,20 +2,31 @@
 Admin Blueprint Routes
 
 This module defines the Flask blueprint for handling routes related to the admin interface.
-It provides a simple route to welcome the admin user.
+It provides a route to welcome the admin user and routes to control the on-demand
+sampling profiler and retrieve the profiles it writes.
 
 Routes:
     - /admin (GET): Displays a welcome message to users with the admin role.
+    - /admin/profiler (GET): Shows the profiler status and sample rate.
+    - /admin/profiler (PUT): Changes the fraction of requests that are profiled.
+    - /admin/profiler/token (POST): Issues a signed token that forces profiling of a request.
+    - /admin/profiles (GET): Lists the collapsed-stack profiles, newest first.
+    - /admin/profiles/<name> (GET): Downloads a collapsed-stack profile.
+    - /admin/query-stats (GET): Reports aggregated SQL fingerprint statistics for this worker.
+    - /admin/query-stats (DELETE): Resets the SQL fingerprint statistics for this worker.
 
 Dependencies:
     - app: The Flask application instance.
     - Blueprint: Flask's blueprint class for grouping related routes.
     - role_required: Custom middleware to enforce role-based access control.
     - UserRole: Enum for user roles, used to enforce admin-only access.
+    - profiler: Service implementing the sampling profiler.
+    - query_stats: Service aggregating SQL statistics per endpoint and role.
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request, current_app, send_from_directory
 from ...middleware.role_based_middleware import role_required
 from ...models.user import UserRole
+from ...services import profiler, query_stats
 
 bp = Blueprint('admin', __name__)
 
@@ -32,3 +43,136 @@ def admin():
         JSON response containing a welcome message.
     """
     return jsonify({'message': 'Welcome, admin!'})
+
+
+@bp.route('/admin/profiler', methods=['GET'])
+@role_required(UserRole.ADMIN)
+def get_profiler():
+    """
+    Show the status of the sampling profiler.
+
+    Returns:
+        JSON response with whether the profiler is available, its sample rate,
+        sampling interval and the header used for signed profiling tokens.
+    """
+    config = current_app.config
+    return jsonify({
+        'available': bool(config['PROFILER_ENABLED']) and profiler.sampler.available(config['PROFILER_TIMER']),
+        'sample_rate': config['PROFILER_SAMPLE_RATE'],
+        'interval': config['PROFILER_INTERVAL'],
+        'timer': config['PROFILER_TIMER'],
+        'header': config['PROFILER_HEADER'],
+    }), 200
+
+
+@bp.route('/admin/profiler', methods=['PUT'])
+@role_required(UserRole.ADMIN)
+def update_profiler():
+    """
+    Change the fraction of requests that are profiled.
+
+    The new rate applies to the worker process serving this request. It expects
+    a JSON payload with a sample_rate between 0 and 1.
+
+    Returns:
+        JSON response with the new sample rate or an error message.
+    """
+    data = request.get_json() or {}
+    sample_rate = data.get('sample_rate')
+    if not isinstance(sample_rate, (int, float)) or not 0 <= sample_rate <= 1:
+        return jsonify({"error": "sample_rate must be a number between 0 and 1"}), 400
+    current_app.config['PROFILER_SAMPLE_RATE'] = float(sample_rate)
+    return jsonify({'sample_rate': current_app.config['PROFILER_SAMPLE_RATE']}), 200
+
+
+@bp.route('/admin/profiler/token', methods=['POST'])
+@role_required(UserRole.ADMIN)
+def create_profiler_token():
+    """
+    Issue a signed token that forces profiling of any request carrying it.
+
+    Returns:
+        JSON response with the header name, token and its lifetime in seconds,
+        or an error message if the application has no SECRET_KEY.
+    """
+    token = profiler.generate_profile_token(current_app)
+    if token is None:
+        return jsonify({"error": "SECRET_KEY is not configured"}), 503
+    return jsonify({
+        'header': current_app.config['PROFILER_HEADER'],
+        'token': token,
+        'expires_in': current_app.config['PROFILER_TOKEN_MAX_AGE'],
+    }), 201
+
+
+@bp.route('/admin/profiles', methods=['GET'])
+@role_required(UserRole.ADMIN)
+def get_profiles():
+    """
+    List the collapsed-stack profiles written by the profiler.
+
+    Returns:
+        JSON response with the profiles, newest first.
+    """
+    return jsonify(profiler.list_profiles(current_app)), 200
+
+
+@bp.route('/admin/profiles/<string:name>', methods=['GET'])
+@role_required(UserRole.ADMIN)
+def download_profile(name):
+    """
+    Download a collapsed-stack profile.
+
+    Args:
+        name (str): The file name of the profile.
+
+    Returns:
+        The profile as a text attachment or a 404 error if not found.
+    """
+    if name not in {profile['name'] for profile in profiler.list_profiles(current_app)}:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_from_directory(profiler.get_profile_dir(current_app), name,
+                               mimetype='text/plain', as_attachment=True)
+
+
+@bp.route('/admin/query-stats', methods=['GET'])
+@role_required(UserRole.ADMIN)
+def get_query_stats():
+    """
+    Report SQL fingerprint statistics aggregated by this worker process.
+
+    Query parameters:
+        sort (str): Column to sort by in descending order (default: total_ms).
+        limit (int): Maximum number of fingerprints to return (default: 50).
+
+    Returns:
+        JSON response with one entry per fingerprint, endpoint and role,
+        including count, rows returned and p50/p95/p99 latencies.
+    """
+    stats = current_app.extensions.get('query_stats')
+    if stats is None:
+        return jsonify({"error": "Query statistics are disabled"}), 404
+    sort = request.args.get('sort', 'total_ms')
+    if sort not in query_stats.SORT_KEYS:
+        return jsonify({"error": f"sort must be one of {', '.join(query_stats.SORT_KEYS)}"}), 400
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({
+        'since': stats.started_at,
+        'queries': query_stats.report(stats.snapshot(), sort=sort, limit=limit),
+    }), 200
+
+
+@bp.route('/admin/query-stats', methods=['DELETE'])
+@role_required(UserRole.ADMIN)
+def reset_query_stats():
+    """
+    Reset the SQL fingerprint statistics of this worker process.
+
+    Returns:
+        JSON response confirming the reset.
+    """
+    stats = current_app.extensions.get('query_stats')
+    if stats is None:
+        return jsonify({"error": "Query statistics are disabled"}), 404
+    stats.reset()
+    return jsonify({"message": "Query statistics reset"}), 200
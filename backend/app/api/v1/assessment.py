@@ -10,8 +10,10 @@ Routes:
     - /assessment (POST): Create a new assessment (Teacher only).
     - /assessment (GET): Retrieve all assessments (Teacher and Student).
     - /assessment/<int:assessment_id> (GET): Retrieve a specific assessment by ID (Teacher and Student).
+    - /assessment/batch (GET, POST): Retrieve several assessments by ID, keyed by ID (Teacher and Student).
     - /assessment/<int:assessment_id> (PUT): Update an existing assessment (Teacher only).
-    - /assessment/<int:assessment_id> (DELETE): Delete an assessment (Teacher only).
+    - /assessment/<int:assessment_id> (DELETE): Delete an assessment, leaving a tombstone for the changes feed (Teacher only).
+    - /assessment/<int:assessment_id>/position (PUT): Move an assessment within its lesson (Author only).
     - /assessment/user (GET): Retrieve all assessments created by the current user (Teacher and Student).
     - /assessment/user/<int:assessment_id> (GET): Retrieve a specific assessment created by the current user (Teacher and Student).
     - /assessment/lesson/<int:lesson_id> (GET): Retrieve all assessments for a specific lesson (Teacher and Student).
@@ -21,6 +23,10 @@ Routes:
     - /assessment/<int:assessment_id>/submit (POST): Submit an assessment (Student only).
     - /assessment/<int:assessment_id>/submissions (GET): Retrieve all submissions for a specific assessment (Teacher only).
     - /assessment/<int:assessment_id>/my-submission (GET): Retrieve the current user's submission for a specific assessment (Student only).
+    - /assessment/<int:assessment_id>/analytics (GET): Per-question item analytics and score distribution (Teacher and Admin).
+    - /assessment/<int:assessment_id>/submissions/<int:submission_id>/grade (PUT): Grade a submission manually (Teacher and Admin).
+    - /courses/<int:course_id>/gradebook (GET): The students × assessments score grid of a course, as JSON or CSV (Teacher and Admin).
+    - /submissions/export (GET): Stream submissions, scores and feedback as CSV or NDJSON (Teacher and Admin).
 
 Dependencies:
     - app: The Flask application instance.
@@ -28,17 +34,33 @@ Dependencies:
     - role_required: Custom middleware to enforce role-based access control.
     - jwt_required: JWT authentication decorator.
     - get_jwt_identity: Function to retrieve the identity of the currently authenticated user.
-    - User, Assessment, Submission: ORM models representing the user, assessment, and submission entities.
+    - User, Assessment, Submission, Course: ORM models representing the user, assessment, submission, and course entities.
     - db: SQLAlchemy database instance for interacting with the database.
+    - score_answers: Grades submitted answers into a score and per-question result codes.
+    - assessment_analytics: Computes and caches the item analytics of an assessment.
+    - course_gradebook, gradebook_csv: Read and render the gradebook maintained on every submission write.
+    - export_submissions, export_stream: Stream filtered submissions in an export format.
+    - requested_ids, get_many, batch_result: Read, load and key the ID sets of multi-get requests.
+    - move: Give a lesson or assessment a new position key with a single-row UPDATE.
+    - soft_delete: Mark a row and the rows it contains as deleted tombstones.
     - datetime: Python's datetime module for handling date and time operations.
     - json: Python's JSON module for parsing and generating JSON.
 """
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, Response, render_template, request, jsonify, stream_with_context
 from ...models.assessment import Assessment
 from ...middleware.role_based_middleware import role_required
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy.orm import joinedload
 from ...models.user import User
 from ...models.submission import Submission
+from ...models.content import Course
+from ...services.grading import CORRECT, INCORRECT, PENDING_REVIEW, UNKNOWN_TYPE, score_answers
+from ...services.gradebook import course_gradebook, gradebook_csv
+from ...services.export import EXPORT_FORMATS, export_stream, export_submissions, parse_timestamp
+from ...services.analytics import assessment_analytics
+from ...services.batch import batch_result, get_many, requested_ids
+from ...services.ordering import move
+from ...services.deletion import soft_delete
 from ... import db
 from datetime import datetime
 import json
@@ -72,7 +94,7 @@ def create_assessment():
     if 'type' not in data or data['type'] is None:
         return jsonify({"error": "type is required and cannot be null"}), 400
 
-    assessment = Assessment.query.filter_by(title=data["title"]).first()
+    assessment = Assessment.query.filter_by(title=data["title"]).execution_options(include_deleted=True).first()
     if assessment is not None:
         return jsonify({"message": "Assessment already found", "id": assessment.id}), 409  # Conflict
 
@@ -129,6 +151,28 @@ def get_assessment(assessment_id):
     assessment = db.session.get(Assessment, assessment_id)
     return jsonify(assessment.to_dict()), 200
 
+@bp.route('/assessment/batch', methods=['GET', 'POST'])
+@role_required(['teacher', 'student'])
+def get_assessments_batch():
+    """
+    Retrieve several assessments by their IDs.
+
+    The IDs are given as ``?ids=1,2,3`` or, with POST, as a JSON body
+    ``{"ids": [1, 2, 3]}``. The assessments are loaded with their author,
+    lesson and course in one query.
+
+    Returns:
+        JSON response with the assessments keyed by ID, None for the IDs that
+        do not exist, and the list of those IDs, or a 400 error for invalid IDs.
+    """
+    try:
+        ids = requested_ids(request)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    assessments = get_many(Assessment, ids, [joinedload(Assessment.author), joinedload(Assessment.lesson),
+                                             joinedload(Assessment.course)])
+    return jsonify(batch_result(ids, assessments, Assessment.to_dict)), 200
+
 @bp.route('/assessment/<int:assessment_id>', methods=['PUT'])
 @role_required('teacher')
 def update_assessment(assessment_id):
@@ -155,13 +199,48 @@ def update_assessment(assessment_id):
     db.session.commit()
     return jsonify(assessment.to_dict()), 200
 
+@bp.route('/assessment/<int:assessment_id>/position', methods=['PUT'])
+@role_required(['teacher'])
+def move_assessment(assessment_id):
+    """
+    Move an assessment within its lesson.
+
+    The JSON body gives the ID of the assessment to place it after as
+    ``after_id``, or null to place it first. Only the moved assessment's row
+    is updated.
+
+    Args:
+        assessment_id (int): The ID of the assessment to move.
+
+    Returns:
+        JSON response with the assessment's ID and new position, or an error message.
+    """
+    assessment = db.session.get(Assessment, assessment_id)
+    if assessment is None:
+        return jsonify({"error": "Assessment not found"}), 404
+    if assessment.author.username != get_jwt_identity():
+        return jsonify({"error": "You are not allowed to move this assessment"}), 403
+    data = request.get_json(silent=True) or {}
+    after_id = data.get('after_id')
+    if 'after_id' not in data or not (after_id is None or isinstance(after_id, int)):
+        return jsonify({"error": "after_id must be an assessment ID or null"}), 400
+    try:
+        position = move(Assessment, assessment, after_id)
+    except ValueError as error:
+        db.session.rollback()
+        return jsonify({"error": str(error)}), 400
+    db.session.commit()
+    return jsonify({"id": assessment_id, "position": position}), 200
+
 @bp.route('/assessment/<int:assessment_id>', methods=['DELETE'])
 @role_required('teacher')
 def delete_assessment(assessment_id):
     """
     Delete an assessment.
 
-    This route allows a teacher to delete an existing assessment from the database.
+    This route allows a teacher to delete an existing assessment. The
+    assessment is marked as deleted and hidden, and removed with its
+    submissions by `flask purge-deleted` after the retention period.
 
     Args:
         assessment_id (int): The ID of the assessment to delete.
@@ -169,8 +248,9 @@ def delete_assessment(assessment_id):
     Returns:
         JSON response indicating successful deletion or an error message.
     """
-    assessment = db.session.get(Assessment, assessment_id)
-    db.session.delete(assessment)
+    if db.session.get(Assessment, assessment_id) is None:
+        return jsonify({"error": "Assessment not found"}), 404
+    soft_delete(Assessment, assessment_id)
     db.session.commit()
     return jsonify({"message": "Assessment deleted successfully"}), 200
 
@@ -231,7 +311,7 @@ def get_lesson_assessments(lesson_id):
     Returns:
         JSON response with a list of assessments for the specified lesson.
     """
-    assessments = Assessment.query.filter_by(lesson_id=lesson_id).all()
+    assessments = Assessment.query.filter_by(lesson_id=lesson_id).order_by(Assessment.position, Assessment.id).all()
     return jsonify([assessment.to_dict() for assessment in assessments]), 200
 
 # Get all assessments for a specific course
@@ -297,52 +377,6 @@ def get_user_lesson_assessments(lesson_id):
     assessments = Assessment.query.filter_by(lesson_id=lesson_id, author_id=user.id).all()
     return jsonify([assessment.to_dict() for assessment in assessments]), 200
 
-def validate_and_score_answers(assessment, submitted_answers):
-    """
-    Validate and score submitted answers for an assessment.
-
-    This function compares the submitted answers with the correct answers for
-    multiple choice and true/false questions. Text answers are flagged for
-    manual review by the teacher.
-
-    Args:
-        assessment (Assessment): The assessment object containing the correct answers.
-        submitted_answers (list): A list of answers submitted by the student.
-
-    Returns:
-        tuple: A tuple containing the score, feedback, and a boolean indicating if
-               manual grading is needed.
-    """
-    questions = json.loads(assessment.questions)
-    score = 0
-    feedback = []
-    text_questions_needing_review = 0
-
-    if len(submitted_answers) != len(questions):
-        return 0, ["Number of submitted answers does not match number of questions"]
-
-    for index, (question, submitted_answer) in enumerate(zip(questions, submitted_answers)):
-        question_type = question.get('type')
-
-        if question_type in ['multiple_choice', 'true_false']:
-            correct_answer = question.get('correct_answer')
-            if submitted_answer == correct_answer:
-                score += 1
-                feedback.append(f"Question {index + 1}: Correct (+1)")
-            else:
-                score -= 1
-                feedback.append(f"Question {index + 1}: Incorrect (-1)")
-        elif question_type == 'text':
-            text_questions_needing_review += 1
-            feedback.append(f"Question {index + 1}: Text answer submitted; will be graded by the teacher.")
-        else:
-            feedback.append(f"Question {index + 1}: Unknown question type")
-
-    if text_questions_needing_review > 0:
-        feedback.append(f"{text_questions_needing_review} text question(s) need manual review.")
-
-    return score, feedback, text_questions_needing_review > 0
-
 @bp.route('/assessment/<int:assessment_id>/submit', methods=['POST'])
 @role_required('student')
 def submit_assessment(assessment_id):
@@ -378,13 +412,19 @@ def submit_assessment(assessment_id):
     if not submitted_answers or not isinstance(submitted_answers, list):
         return jsonify({"error": "Invalid answers format"}), 400
 
-    score, feedback, needs_manual_grading = validate_and_score_answers(assessment, submitted_answers)
+    questions = json.loads(assessment.questions)
+    if len(submitted_answers) != len(questions):
+        return jsonify({"error": "Number of submitted answers does not match number of questions"}), 400
+
+    score, results, needs_manual_grading = score_answers(questions, submitted_answers)
 
+    # Only the result codes are stored; feedback messages are rendered by to_dict
     submission = Submission(
         student_id=user.id,
         assessment_id=assessment_id,
         answers=json.dumps(submitted_answers),
-        feedback=json.dumps(feedback),
+        score=score,
+        results=results,
         submitted_at=datetime.utcnow()
     )
 
@@ -444,3 +484,146 @@ def get_user_submission(assessment_id):
     if not submission:
         return jsonify({"error": "No submission found"}), 404
     return jsonify({"submission": submission.to_dict()}), 200
+
+# Item analytics of an assessment
+@bp.route('/assessment/<int:assessment_id>/analytics', methods=['GET'])
+@role_required(['teacher', 'admin'])
+def get_assessment_analytics(assessment_id):
+    """
+    Retrieve the item analytics of an assessment.
+
+    For each question this reports the difficulty index (share of correct
+    answers), the discrimination index (difficulty among the top 27% of
+    submissions minus the bottom 27%) and, for questions with options, how
+    often each option was chosen. It also reports the score distribution.
+    The report is recomputed only after a submission changes.
+
+    Args:
+        assessment_id (int): The ID of the assessment.
+
+    Returns:
+        JSON response with the analytics report or an error message.
+    """
+    assessment = db.session.get(Assessment, assessment_id)
+    if assessment is None:
+        return jsonify({"error": "Assessment not found"}), 404
+    return jsonify({"assessment_id": assessment_id, **assessment_analytics(assessment)}), 200
+
+# Grade a submission manually
+@bp.route('/assessment/<int:assessment_id>/submissions/<int:submission_id>/grade', methods=['PUT'])
+@role_required(['teacher', 'admin'])
+def grade_submission(assessment_id, submission_id):
+    """
+    Grade a submission manually.
+
+    The request may carry the per-question result codes, with the text
+    answers pending review marked correct ('1') or incorrect ('0'), an
+    explicit score, and feedback for the student. Without a score, it is
+    recomputed from the result codes. The course gradebook is updated in the
+    same transaction.
+
+    Args:
+        assessment_id (int): The ID of the assessment.
+        submission_id (int): The ID of the submission.
+
+    Returns:
+        JSON response with the graded submission or an error message.
+    """
+    submission = db.session.get(Submission, submission_id)
+    if submission is None or submission.assessment_id != assessment_id:
+        return jsonify({"error": "Submission not found"}), 404
+
+    data = request.get_json() or {}
+    results, score, feedback = data.get('results'), data.get('score'), data.get('feedback')
+    if results is None and score is None and feedback is None:
+        return jsonify({"error": "Provide results, score or feedback"}), 400
+    if results is not None:
+        codes = (INCORRECT, CORRECT, PENDING_REVIEW, UNKNOWN_TYPE)
+        question_count = len(json.loads(submission.assessment.questions))
+        if not isinstance(results, str) or len(results) != question_count or any(code not in codes for code in results):
+            return jsonify({"error": f"results must be {question_count} codes among {', '.join(codes)}"}), 400
+        submission.results = results
+        if score is None:
+            score = results.count(CORRECT) - results.count(INCORRECT)
+    if score is not None:
+        if not isinstance(score, int) or isinstance(score, bool):
+            return jsonify({"error": "score must be an integer"}), 400
+        submission.score = score
+    if feedback is not None:
+        submission.feedback = json.dumps(feedback) if not isinstance(feedback, str) else feedback
+    db.session.commit()
+    return jsonify({"submission": submission.to_dict()}), 200
+
+# Course gradebook
+@bp.route('/courses/<int:course_id>/gradebook', methods=['GET'])
+@role_required(['teacher', 'admin'])
+def get_course_gradebook(course_id):
+    """
+    Retrieve the gradebook of a course.
+
+    The grid is read from the gradebook table, which is kept up to date when
+    submissions are made and graded, so thousands of students are served by
+    one query. Pass ?format=csv to download it as a spreadsheet.
+
+    Args:
+        course_id (int): The ID of the course.
+
+    Returns:
+        JSON response with the course's assessments and one row of scores per
+        student, a CSV attachment, or an error message.
+    """
+    if db.session.get(Course, course_id) is None:
+        return jsonify({"error": "Course not found"}), 404
+    assessments, students = course_gradebook(course_id)
+    if request.args.get('format') == 'csv':
+        return Response(gradebook_csv(assessments, students), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename=gradebook-course-{course_id}.csv'})
+    return jsonify({
+        "course_id": course_id,
+        "assessments": [{"id": assessment_id, "title": title} for assessment_id, title in assessments],
+        "students": students
+    }), 200
+
+# Stream an export of submissions
+@bp.route('/submissions/export', methods=['GET'])
+@role_required(['teacher', 'admin'])
+def export_submissions_route():
+    """
+    Export submissions with their scores and feedback.
+
+    The response is streamed from keyset pages of submissions, so exports of
+    large courses neither time out nor hold every submission in memory. Query
+    parameters:
+        format: 'csv' (default) or 'ndjson'.
+        course_id, lesson_id, assessment_id: Restrict the export.
+        since, until: ISO 8601 dates bounding the submission time.
+        gzip: '1' to compress the response.
+
+    Returns:
+        A streamed CSV or NDJSON attachment, or a JSON error message.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    filters = {}
+    for name in ('course_id', 'lesson_id', 'assessment_id'):
+        if name in request.args:
+            value = request.args.get(name, type=int)
+            if value is None:
+                return jsonify({"error": f"{name} must be an integer"}), 400
+            filters[name] = value
+    for name in ('since', 'until'):
+        if name in request.args:
+            value = parse_timestamp(request.args[name])
+            if value is None:
+                return jsonify({"error": f"{name} must be an ISO 8601 date"}), 400
+            filters[name] = value
+
+    compress = request.args.get('gzip') in ('1', 'true')
+    filename = f"submissions.{export_format}{'.gz' if compress else ''}"
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    headers = {'Content-Disposition': f'attachment; filename={filename}'}
+    if compress:
+        mimetype = 'application/gzip'
+    stream = export_stream(export_format, export_submissions(**filters), compress=compress)
+    return Response(stream_with_context(stream), mimetype=mimetype, headers=headers)
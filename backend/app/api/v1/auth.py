@@ -91,7 +91,7 @@ def login():
     """
     data = request.get_json()
     user = User.query.filter_by(username=data.get('username')).first()
-    if user and user.verify_password(data.get('password')):
+    if user and user.deleted_at is None and user.verify_password(data.get('password')):
         login_user(user)
         access_token = create_access_token(identity=user.username)
         return jsonify({"message": "Logged in successfully", "user": user.to_dict(), "access_token": access_token}), 200
@@ -13,24 +13,49 @@ Routes:
         Retrieves all available courses.
     /courses/<int:course_id> (GET):
         Retrieves details of a specific course by its ID.
+    /courses/batch (GET, POST):
+        Retrieves several courses by ID in one request, keyed by ID.
     /courses/<int:course_id> (PUT):
         Updates an existing course. Only the course's author can perform this action.
     /courses/<int:course_id> (DELETE):
-        Deletes a course. Only the course's author can perform this action.
+        Deletes a course with its lessons and assessments, leaving tombstones
+        for the changes feed. Only the course's author can perform this action.
+    /courses/<int:course_id>/clone (POST):
+        Copies a course with its lessons and assessments using set-based SQL.
+        Only the course's author or an administrator can perform this action.
 
     /lessons (POST):
         Creates a new lesson. Only accessible to users with the TEACHER role.
     /lessons (GET):
-        Retrieves all lessons, with optional pagination.
+        Retrieves all lessons, with optional pagination. Lessons are listed
+        with an excerpt and the body length instead of the body.
     /lessons/<int:lesson_id> (GET):
-        Retrieves details of a specific lesson by its ID.
+        Retrieves details of a specific lesson by its ID, including its body
+        or a byte or paragraph range of it.
+    /lessons/batch (GET, POST):
+        Retrieves several lessons by ID in one request, keyed by ID, with
+        excerpts instead of bodies.
     /lessons/<int:lesson_id> (PUT):
         Updates an existing lesson. Only the lesson's author can perform this action.
+    /lessons/<int:lesson_id> (PATCH):
+        Applies text patch operations to a lesson body at a known version.
+        Only the lesson's author can perform this action.
     /lessons/<int:lesson_id> (DELETE):
-        Deletes a lesson. Only the lesson's author can perform this action.
+        Deletes a lesson with its assessments, leaving tombstones for the
+        changes feed. Only the lesson's author can perform this action.
+    /lessons/<int:lesson_id>/position (PUT):
+        Moves a lesson within its course with a single-row update. Only the
+        lesson's author can perform this action.
+    /lessons/<int:lesson_id>/revisions (GET):
+        Lists the earlier versions of a lesson body.
+    /lessons/<int:lesson_id>/revisions/<int:version> (GET):
+        Retrieves the body of an earlier version of a lesson.
 
     /courses/<int:course_id>/lessons (GET):
         Retrieves all lessons associated with a specific course.
+    /courses/<int:course_id>/outline (GET):
+        Retrieves a course with its ordered lessons and their assessment
+        summaries, served from a cached document.
     /lessons/<int:lesson_id>/course (GET):
         Retrieves the course associated with a specific lesson.
     /lessons/<int:lesson_id>/author (GET):
@@ -41,6 +66,19 @@ Routes:
         Retrieves all lessons authored by a specific user.
     /courses/by-author/<string:author> (GET):
         Retrieves all courses authored by a specific user.
+    /search (GET):
+        Full-text search over course and lesson titles, descriptions and bodies,
+        ranked with BM25.
+    /verses (GET):
+        Retrieves the lessons and assessments referencing a range of Qur'an verses.
+    /suggest (GET):
+        Suggests course and lesson titles starting with a typed prefix.
+    /import (POST):
+        Imports courses, lessons and assessments from a streamed NDJSON body
+        and reports the lines that could not be imported.
+    /changes (GET):
+        Lists the courses, lessons and assessments created, updated or
+        deleted since a cursor, for clients syncing incrementally.
 
 Dependencies:
     Flask:
@@ -53,19 +91,71 @@ Dependencies:
         Course, Lesson
     app.middleware.role_based_middleware:
         role_required
+    app.services.search:
+        search, DOC_TYPES
+    app.services.verses:
+        extract_references, surah_number, verse_index, AYAH_COUNTS, SURAH_NAMES
+    app.services.suggest:
+        suggest_index
+    app.services.lessons:
+        parse_range, body_bytes, body_paragraphs, apply_patch, diff_delta,
+        record_revision, body_at_version
+    app.services.bulk_import:
+        import_content, IMPORT_BATCH_SIZE
+    app.services.batch:
+        requested_ids, get_many, batch_result
+    app.services.outlines:
+        course_outline
+    app.services.ordering:
+        move
+    app.services.cloning:
+        clone_course, CloneConflict, MAX_CLONE_TITLE_LENGTH
+    app.services.deletion:
+        soft_delete
+    app.services.changes:
+        changes_since, CursorExpired, DEFAULT_CHANGES_LIMIT, MAX_CHANGES_LIMIT
     app:
         db
 """
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User, UserRole
 from app.models.content import Course, Lesson
 from app.middleware.role_based_middleware import role_required
+from app.services.search import search as search_index, DOC_TYPES
+from app.services import verses as verse_service
+from app.services.suggest import suggest_index
+from app.services.bulk_import import import_content, IMPORT_BATCH_SIZE
+from app.services.batch import requested_ids, get_many, batch_result
+from app.services.outlines import course_outline
+from app.services.ordering import move
+from app.services.cloning import clone_course, CloneConflict, MAX_CLONE_TITLE_LENGTH
+from app.services.deletion import soft_delete
+from app.services.changes import changes_since, CursorExpired, DEFAULT_CHANGES_LIMIT, MAX_CHANGES_LIMIT
+from app.services.lessons import (parse_range, body_bytes, body_paragraphs, apply_patch, diff_delta,
+                                  record_revision, body_at_version)
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from app.models.assessment import Assessment
 from app import db
 
 bp = Blueprint('content', __name__)
 
+
+def _get_course(course_id):
+    # A course deleted earlier in this session is still in its identity map
+    course = db.session.get(Course, course_id)
+    return None if course is None or course.deleted_at is not None else course
+
+
+def _summary_options(author=None):
+    # Lesson.to_summary reads the author, the course and the assessment IDs; loading them with the
+    # lessons keeps a list at a fixed number of queries. `author` replaces the author's joinedload
+    # when the query already joins the users table
+    return [author or joinedload(Lesson.author), joinedload(Lesson.course),
+            selectinload(Lesson.assessments).load_only(Assessment.id)]
+
 # Course CRUD operations
 @bp.route('/courses', strict_slashes=False, methods=['POST'])
 @role_required(UserRole.TEACHER)
@@ -86,7 +176,7 @@ def create_course():
     if not title or not description:
         return jsonify({"error": "Missing required fields"}), 400
 
-    if Course.query.filter_by(title=title).first():
+    if Course.query.filter_by(title=title).execution_options(include_deleted=True).first():
         return jsonify({"error": "Course title already exists"}), 409
 
     course = Course(title=title, description=description, author_id=User.query.filter_by(username=get_jwt_identity()).first().id)
@@ -105,7 +195,7 @@ def get_courses():
     Returns:
         JSON response with a list of all courses.
     """
-    courses = Course.query.all()
+    courses = Course.query.filter(Course.deleted_at.is_(None)).all()
     return jsonify([course.to_dict() for course in courses]), 200
 
 @bp.route('/courses/<int:course_id>', strict_slashes=False, methods=['GET'])
@@ -121,11 +211,35 @@ def get_course(course_id):
     Returns:
         JSON response with the course's details or a 404 error if not found.
     """
-    course = db.session.get(Course, course_id)
+    course = _get_course(course_id)
     if course is None:
         return jsonify({"error": "Course not found"}), 404
     return jsonify(course.to_dict()), 200
 
+@bp.route('/courses/batch', strict_slashes=False, methods=['GET', 'POST'])
+def get_courses_batch():
+    """
+    Retrieve several courses by their IDs.
+
+    The IDs are given as ``?ids=1,2,3`` or, with POST, as a JSON body
+    ``{"ids": [1, 2, 3]}``. The courses, their authors and their lesson and
+    assessment IDs are loaded with a fixed number of queries whatever the
+    number of IDs.
+
+    Returns:
+        JSON response with the courses keyed by ID, None for the IDs that do
+        not exist, and the list of those IDs, or a 400 error for invalid IDs.
+    """
+    try:
+        ids = requested_ids(request)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    courses = get_many(Course, ids, [joinedload(Course.author),
+                                     selectinload(Course.lessons).load_only(Lesson.id),
+                                     selectinload(Course.assessments).load_only(Assessment.id)])
+    courses = {course_id: course for course_id, course in courses.items() if course.deleted_at is None}
+    return jsonify(batch_result(ids, courses, Course.to_dict)), 200
+
 @bp.route('/courses/<int:course_id>', strict_slashes=False, methods=['PUT'])
 @role_required(UserRole.TEACHER)
 def update_course(course_id):
@@ -141,7 +255,7 @@ def update_course(course_id):
     Returns:
         JSON response with the updated course's details or an error message.
     """
-    course = db.session.get(Course, course_id)
+    course = _get_course(course_id)
     if course is None:
         return jsonify({"error": "Course not found"}), 404
     data = request.get_json()
@@ -150,7 +264,8 @@ def update_course(course_id):
         return jsonify({"error": "You are not allowed to update this course"}), 403
 
     if data.get('title'):
-        if Course.query.filter_by(title=data.get('title')).first() and Course.query.filter_by(title=data.get('title')).first().id != course_id:
+        existing = Course.query.filter_by(title=data.get('title')).execution_options(include_deleted=True).first()
+        if existing and existing.id != course_id:
             return jsonify({"error": "Course title already exists"}), 409
         course.title = data.get('title')
 
@@ -168,7 +283,10 @@ def delete_course(course_id):
     Delete a course.
 
     This route allows the course's author (a user with the TEACHER role) to delete
-    the course. Once deleted, the course is removed from the database.
+    the course. The course, its lessons and its assessments are marked as
+    deleted with one UPDATE per table, without loading them, and hidden at
+    once; the tombstones let the changes feed report the deletion until
+    `flask purge-deleted` removes the rows after the retention period.
 
     Args:
         course_id (int): The ID of the course to delete.
@@ -176,15 +294,55 @@ def delete_course(course_id):
     Returns:
         JSON response indicating successful deletion or an error message.
     """
-    course = db.session.get(Course, course_id)
+    course = _get_course(course_id)
     if course is None:
         return jsonify({"error": "Course not found"}), 404
     if course.author.username != get_jwt_identity():
         return jsonify({"error": "You are not allowed to delete this course"}), 403
-    db.session.delete(course)
+    soft_delete(Course, course_id)
     db.session.commit()
     return jsonify({"message": "Course deleted successfully"}), 200
 
+@bp.route('/courses/<int:course_id>/clone', strict_slashes=False, methods=['POST'])
+@role_required([UserRole.TEACHER, UserRole.ADMIN])
+def clone_course_route(course_id):
+    """
+    Copy a course with all its lessons and assessments.
+
+    This route allows the course's author or an administrator to start a new
+    term from an existing course. The course, its lessons and its assessments
+    are copied with one INSERT ... SELECT per table in a single transaction,
+    and the requesting user becomes the author of the copies. An optional JSON
+    payload gives the new course title, of at most 100 characters; it
+    defaults to '<title> (copy)'. Copied lessons and assessments keep their
+    order, and their titles get the new course title as a suffix.
+
+    Args:
+        course_id (int): The ID of the course to copy.
+
+    Returns:
+        JSON response with the new course's details and the number of copied
+        lessons and assessments, or an error message.
+    """
+    course = _get_course(course_id)
+    if course is None:
+        return jsonify({"error": "Course not found"}), 404
+    user = User.query.filter_by(username=get_jwt_identity()).first()
+    if user.role != UserRole.ADMIN and course.author_id != user.id:
+        return jsonify({"error": "You are not allowed to clone this course"}), 403
+    title = (request.get_json(silent=True) or {}).get('title')
+    if title is not None and (not isinstance(title, str) or not title.strip()
+                              or len(title) > MAX_CLONE_TITLE_LENGTH):
+        return jsonify({"error": f"title must be a non-empty string of at most {MAX_CLONE_TITLE_LENGTH} "
+                                 "characters"}), 400
+    try:
+        clone = clone_course(course_id, user.id, title)
+    except CloneConflict as error:
+        return jsonify({"error": str(error)}), 409
+    db.session.commit()
+    copy = db.session.get(Course, clone['id'])
+    return jsonify({"course": copy.to_dict(), "lessons": clone['lessons'], "assessments": clone['assessments']}), 201
+
 # Lesson CRUD operations
 @bp.route('/lessons', strict_slashes=False, methods=['POST'])
 @role_required(UserRole.TEACHER)
@@ -206,10 +364,10 @@ def create_lesson():
     if not title or not body or not course_id:
         return jsonify({"error": "Missing required fields"}), 400
 
-    if not db.session.get(Course, course_id):
+    if not _get_course(course_id):
         return jsonify({"error": "Invalid course_id"}), 400
 
-    lesson = Lesson.query.filter_by(title=title).first()
+    lesson = Lesson.query.filter_by(title=title).execution_options(include_deleted=True).first()
     if lesson:
         return jsonify({"error": "Lesson title already exists"}), 409
 
@@ -233,15 +391,18 @@ def get_lessons():
     This route retrieves a list of all lessons, with optional pagination.
 
     Returns:
-        JSON response with a list of lessons, including pagination details.
+        JSON response with a list of lessons, with excerpts instead of bodies,
+        including pagination details.
     """
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
 
-    lessons_query = Lesson.query.order_by(Lesson.created_at.desc())
-    paginated_lessons = lessons_query.paginate(page=page, per_page=per_page, error_out=False)
+    lessons_query = Lesson.query.options(*_summary_options()).order_by(Lesson.created_at.desc())
+    paginated_lessons = lessons_query.paginate(page=page, per_page=per_page, error_out=False, count=False)
+    # The default count wraps the query in a subquery that would select every body
+    paginated_lessons.total = db.session.scalar(db.select(db.func.count(Lesson.id)))
 
-    lessons = [lesson.to_dict() for lesson in paginated_lessons.items]
+    lessons = [lesson.to_summary() for lesson in paginated_lessons.items]
     result = {
         'items': lessons,
         'total': paginated_lessons.total,
@@ -257,18 +418,73 @@ def get_lesson(lesson_id):
     """
     Retrieve a specific lesson by its ID.
 
-    This route retrieves the details of a lesson identified by its ID.
+    This route retrieves the details of a lesson identified by its ID. Very
+    long lessons can be read in parts by passing one of the optional range
+    parameters; the response then carries the selected part as its body and
+    the returned range.
 
     Args:
         lesson_id (int): The ID of the lesson.
 
+    Query parameters:
+        bytes (str): An inclusive range of UTF-8 bytes, such as '0-4095' or
+            '4096-'. The range is narrowed so it does not split a character;
+            continue from the returned end plus one.
+        paragraphs (str): An inclusive range of paragraphs, such as '0-9'.
+
     Returns:
         JSON response with the lesson's details or a 404 error if not found.
     """
-    lesson =db.session.get(Lesson, lesson_id)
+    byte_range = request.args.get('bytes')
+    paragraph_range = request.args.get('paragraphs')
+    if byte_range is not None and paragraph_range is not None:
+        return jsonify({"error": "Use either bytes or paragraphs"}), 400
+
+    lesson = db.session.get(Lesson, lesson_id)
     if lesson is None:
         return jsonify({"error": "Lesson not found"}), 404
-    return jsonify(lesson.to_dict()), 200
+    if byte_range is None and paragraph_range is None:
+        return jsonify(lesson.to_dict()), 200
+
+    bounds = parse_range(byte_range if byte_range is not None else paragraph_range)
+    if bounds is None:
+        return jsonify({"error": "Invalid range"}), 400
+    lesson_info = lesson.to_summary()
+    if byte_range is not None:
+        part = body_bytes(lesson, *bounds)
+        if part is None:
+            return jsonify({"error": "Range starts after the end of the lesson"}), 416
+        lesson_info['body'], start, end = part
+        lesson_info['range'] = {'unit': 'bytes', 'start': start, 'end': end}
+    else:
+        part = body_paragraphs(lesson.body, *bounds)
+        if part is None:
+            return jsonify({"error": "Range starts after the end of the lesson"}), 416
+        lesson_info['body'], start, end, total = part
+        lesson_info['range'] = {'unit': 'paragraphs', 'start': start, 'end': end, 'total': total}
+    return jsonify(lesson_info), 200
+
+@bp.route('/lessons/batch', strict_slashes=False, methods=['GET', 'POST'])
+@role_required([UserRole.TEACHER, UserRole.ADMIN])
+def get_lessons_batch():
+    """
+    Retrieve several lessons by their IDs.
+
+    The IDs are given as ``?ids=1,2,3`` or, with POST, as a JSON body
+    ``{"ids": [1, 2, 3]}``. Lessons are returned as summaries, with their
+    excerpt and body length instead of the body; the lessons, their authors,
+    courses and assessment IDs are loaded with a fixed number of queries.
+
+    Returns:
+        JSON response with the lessons keyed by ID, None for the IDs that do
+        not exist, and the list of those IDs, or a 400 error for invalid IDs.
+    """
+    try:
+        ids = requested_ids(request)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    lessons = get_many(Lesson, ids, _summary_options())
+    return jsonify(batch_result(ids, lessons, Lesson.to_summary)), 200
 
 @bp.route('/lessons/<int:lesson_id>', strict_slashes=False, methods=['PUT'])
 @role_required(UserRole.TEACHER)
@@ -296,16 +512,155 @@ def update_lesson(lesson_id):
     if data.get('title'):
         lesson.title = data.get('title')
     if data.get('body'):
+        record_revision(lesson, diff_delta(lesson.body, data.get('body')), lesson.author_id)
         lesson.body = data.get('body')
     if data.get('course_id'):
         if not Course.query.get(data.get('course_id')):
             return jsonify({"error": "Invalid course_id"}), 400
         lesson.course_id = data.get('course_id')
 
-    db.session.commit()
+    try:
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({"error": "Lesson was modified by another request"}), 409
 
     return jsonify(lesson.to_dict()), 200
 
+@bp.route('/lessons/<int:lesson_id>', strict_slashes=False, methods=['PATCH'])
+@role_required(UserRole.TEACHER)
+def patch_lesson(lesson_id):
+    """
+    Edit a lesson body with text patch operations.
+
+    This route lets an editor send only the changed text instead of the whole
+    body. It requires a JSON payload with the version the patch was made
+    against and a list of operations, each replacing the characters from
+    start up to end with text, with offsets into that version's body. The
+    replaced text is kept as a reverse delta in the lesson's revisions.
+
+    Payload:
+        version (int): The lesson version the operations apply to.
+        ops (list): {'start': int, 'end': int, 'text': str} operations; end
+            defaults to start (an insertion) and text to '' (a deletion).
+        title (str): A new title (optional).
+
+    Args:
+        lesson_id (int): The ID of the lesson to edit.
+
+    Returns:
+        JSON response with the lesson's new version, excerpt and body length,
+        or 409 with the current version if the lesson changed meanwhile.
+    """
+    lesson = db.session.get(Lesson, lesson_id)
+    if lesson is None:
+        return jsonify({"error": "Lesson not found"}), 404
+    if lesson.author.username != get_jwt_identity():
+        return jsonify({"error": "You are not allowed to update this lesson"}), 403
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data.get('version'), int) or 'ops' not in data:
+        return jsonify({"error": "Missing required fields"}), 400
+    if data['version'] != lesson.version:
+        return jsonify({"error": "Lesson version mismatch", "version": lesson.version}), 409
+
+    try:
+        body, delta = apply_patch(lesson.body, data['ops'])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not body.strip():
+        return jsonify({"error": "Lesson body cannot be empty"}), 400
+
+    record_revision(lesson, delta, lesson.author_id)
+    lesson.body = body
+    if data.get('title'):
+        lesson.title = data['title']
+    try:
+        db.session.commit()
+    except StaleDataError:
+        db.session.rollback()
+        return jsonify({"error": "Lesson version mismatch",
+                        "version": db.session.get(Lesson, lesson_id).version}), 409
+
+    return jsonify(lesson.to_summary()), 200
+
+@bp.route('/lessons/<int:lesson_id>/revisions', strict_slashes=False, methods=['GET'])
+@role_required([UserRole.TEACHER, UserRole.ADMIN])
+def get_lesson_revisions(lesson_id):
+    """
+    List the earlier versions of a lesson.
+
+    Args:
+        lesson_id (int): The ID of the lesson.
+
+    Returns:
+        JSON response with the current version and the stored revisions,
+        newest first.
+    """
+    lesson = db.session.get(Lesson, lesson_id)
+    if lesson is None:
+        return jsonify({"error": "Lesson not found"}), 404
+    return jsonify({'version': lesson.version,
+                    'revisions': [revision.to_dict() for revision in lesson.revisions]}), 200
+
+@bp.route('/lessons/<int:lesson_id>/revisions/<int:version>', strict_slashes=False, methods=['GET'])
+@role_required([UserRole.TEACHER, UserRole.ADMIN])
+def get_lesson_revision(lesson_id, version):
+    """
+    Retrieve the body of a lesson at an earlier version.
+
+    The body is rebuilt from the current one by applying the stored reverse
+    deltas, newest first.
+
+    Args:
+        lesson_id (int): The ID of the lesson.
+        version (int): The version to retrieve.
+
+    Returns:
+        JSON response with the version and its body.
+    """
+    lesson = db.session.get(Lesson, lesson_id)
+    if lesson is None:
+        return jsonify({"error": "Lesson not found"}), 404
+    body = body_at_version(lesson, version)
+    if body is None:
+        return jsonify({"error": "Version not found"}), 404
+    return jsonify({'id': lesson.id, 'version': version, 'body': body}), 200
+
+@bp.route('/lessons/<int:lesson_id>/position', strict_slashes=False, methods=['PUT'])
+@role_required(UserRole.TEACHER)
+def move_lesson(lesson_id):
+    """
+    Move a lesson within its course.
+
+    This route allows the lesson's author to reorder the lessons of a course.
+    The JSON body gives the ID of the lesson to place it after as
+    ``after_id``, or null to place it first. The lesson gets a position key
+    between its new neighbours, so only its own row is updated.
+
+    Args:
+        lesson_id (int): The ID of the lesson to move.
+
+    Returns:
+        JSON response with the lesson's ID and new position, or an error message.
+    """
+    lesson = db.session.get(Lesson, lesson_id)
+    if lesson is None:
+        return jsonify({"error": "Lesson not found"}), 404
+    if lesson.author.username != get_jwt_identity():
+        return jsonify({"error": "You are not allowed to move this lesson"}), 403
+    data = request.get_json(silent=True) or {}
+    after_id = data.get('after_id')
+    if 'after_id' not in data or not (after_id is None or isinstance(after_id, int)):
+        return jsonify({"error": "after_id must be a lesson ID or null"}), 400
+    try:
+        position = move(Lesson, lesson, after_id)
+    except ValueError as error:
+        db.session.rollback()
+        return jsonify({"error": str(error)}), 400
+    db.session.commit()
+    return jsonify({"id": lesson_id, "position": position}), 200
+
 @bp.route('/lessons/<int:lesson_id>', strict_slashes=False, methods=['DELETE'])
 @role_required(UserRole.TEACHER)
 def delete_lesson(lesson_id):
@@ -313,7 +668,8 @@ def delete_lesson(lesson_id):
     Delete a lesson.
 
     This route allows the lesson's author (a user with the TEACHER role) to delete
-    the lesson. Once deleted, the lesson is removed from the database.
+    the lesson. The lesson and its assessments are marked as deleted and
+    hidden, and removed by `flask purge-deleted` after the retention period.
 
     Args:
         lesson_id (int): The ID of the lesson to delete.
@@ -326,7 +682,7 @@ def delete_lesson(lesson_id):
         return jsonify({"error": "Lesson not found"}), 404
     if lesson.author.username != get_jwt_identity():
         return jsonify({"error": "You are not allowed to delete this lesson"}), 403
-    db.session.delete(lesson)
+    soft_delete(Lesson, lesson_id)
     db.session.commit()
     return jsonify({"message": "Lesson deleted successfully"}), 200
 
@@ -343,10 +699,37 @@ def get_lessons_by_course(course_id):
         course_id (int): The ID of the course.
 
     Returns:
-        JSON response with a list of lessons for the specified course.
+        JSON response with a list of lessons for the specified course, with
+        excerpts instead of bodies.
+    """
+    lessons = Lesson.query.filter_by(course_id=course_id).options(*_summary_options()) \
+        .order_by(Lesson.position, Lesson.id).all()
+    return jsonify([lesson.to_summary() for lesson in lessons]), 200
+
+# Get the outline of a course
+@bp.route('/courses/<int:course_id>/outline', strict_slashes=False, methods=['GET'])
+@role_required([UserRole.TEACHER, UserRole.ADMIN, UserRole.STUDENT])
+def get_course_outline(course_id):
+    """
+    Retrieve the outline of a course.
+
+    This route returns a course with its author, its lessons in order (title,
+    excerpt and body length) and the summaries of each lesson's assessments
+    (title, type and number of questions). The outline is built with three
+    queries and cached as a JSON document until the course, one of its
+    lessons or one of its assessments changes; cached outlines are served
+    with one query, without serializing them again.
+
+    Args:
+        course_id (int): The ID of the course.
+
+    Returns:
+        JSON response with the course outline or a 404 error if not found.
     """
-    lessons = Lesson.query.filter_by(course_id=course_id).all()
-    return jsonify([lesson.to_dict() for lesson in lessons]), 200
+    document = course_outline(course_id)
+    if document is None:
+        return jsonify({"error": "Course not found"}), 404
+    return current_app.response_class(document, mimetype='application/json'), 200
 
 # Get course by lesson
 @bp.route('/lessons/<int:lesson_id>/course', strict_slashes=False, methods=['GET'])
@@ -404,7 +787,7 @@ def get_author_by_course(course_id):
     Returns:
         JSON response with the author's details.
     """
-    course = db.session.get(Course, course_id)
+    course = _get_course(course_id)
     if course is None:
         return jsonify({"error": "Course not found"}), 404
     return jsonify(course.author.to_dict()), 200
@@ -423,10 +806,12 @@ def get_lessons_by_author(author):
         author (str): The username of the author.
 
     Returns:
-        JSON response with a list of lessons authored by the specified user.
+        JSON response with a list of lessons authored by the specified user,
+        with excerpts instead of bodies.
     """
-    lessons = Lesson.query.join(User).filter(User.username == author).all()
-    return jsonify([lesson.to_dict() for lesson in lessons]), 200
+    lessons = Lesson.query.join(User).filter(User.username == author) \
+        .options(*_summary_options(author=contains_eager(Lesson.author))).all()
+    return jsonify([lesson.to_summary() for lesson in lessons]), 200
 
 # Get courses by author
 @bp.route('/courses/by-author/<string:author>', strict_slashes=False, methods=['GET'])
@@ -444,5 +829,206 @@ def get_courses_by_author(author):
     Returns:
         JSON response with a list of courses authored by the specified user.
     """
-    courses = Course.query.join(User).filter(User.username == author).all()
+    courses = Course.query.join(User).filter(User.username == author, Course.deleted_at.is_(None)).all()
     return jsonify([course.to_dict() for course in courses]), 200
+
+# Full-text search
+@bp.route('/search', strict_slashes=False, methods=['GET'])
+@role_required([UserRole.TEACHER, UserRole.ADMIN, UserRole.STUDENT])
+def search():
+    """
+    Search courses and lessons.
+
+    This route ranks courses and lessons against a query with BM25 using the
+    inverted index, without scanning lesson bodies. Arabic text is matched
+    regardless of tashkeel, alef/ya/ta marbuta variants and common affixes.
+
+    Query parameters:
+        q (str): The search query.
+        type (str): Restrict results to 'course' or 'lesson' (optional).
+        limit (int): Maximum number of results, at most 100 (default: 20).
+
+    Returns:
+        JSON response with the matching courses and lessons, best first.
+    """
+    query = request.args.get('q', '').strip()
+    doc_type = request.args.get('type')
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
+    if not query:
+        return jsonify({"error": "Missing search query"}), 400
+    if doc_type and doc_type not in DOC_TYPES:
+        return jsonify({"error": f"type must be one of {', '.join(DOC_TYPES)}"}), 400
+
+    matches = search_index(query, doc_type=doc_type, limit=limit)
+    course_ids = [doc_id for kind, doc_id, _ in matches if kind == 'course']
+    lesson_ids = [doc_id for kind, doc_id, _ in matches if kind == 'lesson']
+    rows = {}
+    if course_ids:
+        for row in db.session.execute(db.select(Course.id, Course.title).where(Course.id.in_(course_ids))):
+            rows[('course', row.id)] = {'title': row.title}
+    if lesson_ids:
+        for row in db.session.execute(db.select(Lesson.id, Lesson.title, Lesson.course_id)
+                                      .where(Lesson.id.in_(lesson_ids))):
+            rows[('lesson', row.id)] = {'title': row.title, 'course_id': row.course_id}
+
+    results = [{'type': kind, 'id': doc_id, 'score': round(score, 4), **rows[(kind, doc_id)]}
+               for kind, doc_id, score in matches if (kind, doc_id) in rows]
+    return jsonify({'query': query, 'results': results}), 200
+
+
+# Verse references
+@bp.route('/verses', strict_slashes=False, methods=['GET'])
+@role_required([UserRole.TEACHER, UserRole.ADMIN, UserRole.STUDENT])
+def get_verse_references():
+    """
+    Find the lessons and assessments covering a range of Qur'an verses.
+
+    This route answers range-overlap queries from the per-surah interval
+    index of the verse references extracted from lesson and assessment
+    texts, without scanning their bodies.
+
+    Query parameters:
+        ref (str): A reference such as '2:255', '2:255-257', 'Al-Baqarah 255'
+            or 'البقرة ٢٥٥'; a bare surah name or number covers the whole surah.
+        surah (str): The surah number or name, when ref is not given.
+        from (int): The first ayah (default: 1).
+        to (int): The last ayah (default: the end of the surah, or from).
+        type (str): Restrict results to 'lesson' or 'assessment' (optional).
+
+    Returns:
+        JSON response with the referencing lessons and assessments, ordered by
+        the first and last referenced ayah.
+    """
+    ref = request.args.get('ref', '').strip()
+    doc_type = request.args.get('type')
+    if doc_type and doc_type not in verse_service.DOC_TYPES:
+        return jsonify({"error": f"type must be one of {', '.join(verse_service.DOC_TYPES)}"}), 400
+
+    if ref:
+        references = verse_service.extract_references(ref, require_context=False)
+        if references:
+            surah, start, end = references[0]
+        else:
+            surah = verse_service.surah_number(ref)
+            start, end = 1, verse_service.AYAH_COUNTS[surah - 1] if surah else 0
+    else:
+        surah = verse_service.surah_number(request.args.get('surah', ''))
+        start = request.args.get('from', 1, type=int)
+        end = request.args.get('to', type=int)
+        if surah and end is None:
+            end = start if 'from' in request.args else verse_service.AYAH_COUNTS[surah - 1]
+    if not surah:
+        return jsonify({"error": "Missing or unknown verse reference"}), 400
+    if not 1 <= start <= end:
+        return jsonify({"error": "Invalid ayah range"}), 400
+
+    matches = [(ayah_start, ayah_end, kind, doc_id) for ayah_start, ayah_end, (kind, doc_id)
+               in verse_service.verse_index().overlapping(surah, start, end)
+               if not doc_type or kind == doc_type]
+    details = {}
+    for kind, model in (('lesson', Lesson), ('assessment', Assessment)):
+        ids = {doc_id for _, _, match_kind, doc_id in matches if match_kind == kind}
+        if ids:
+            for row in db.session.execute(db.select(model.id, model.title, model.course_id)
+                                          .where(model.id.in_(ids))):
+                details[(kind, row.id)] = {'title': row.title, 'course_id': row.course_id}
+
+    results = [{'type': kind, 'id': doc_id, 'ayah_start': ayah_start, 'ayah_end': ayah_end,
+                **details[(kind, doc_id)]}
+               for ayah_start, ayah_end, kind, doc_id in matches if (kind, doc_id) in details]
+    return jsonify({'surah': surah, 'name': verse_service.SURAH_NAMES[surah - 1],
+                    'from': start, 'to': end, 'results': results}), 200
+
+
+# Typeahead
+@bp.route('/suggest', strict_slashes=False, methods=['GET'])
+@role_required([UserRole.TEACHER, UserRole.ADMIN, UserRole.STUDENT])
+def suggest():
+    """
+    Suggest course and lesson titles for autocomplete.
+
+    This route looks the typed prefix up in the worker's in-memory title
+    index instead of running a LIKE query. Matching ignores case, tashkeel
+    and punctuation, and also matches the start of later words in a title.
+
+    Query parameters:
+        q (str): The typed prefix.
+        type (str): Restrict suggestions to 'course' or 'lesson' (optional).
+        limit (int): Maximum number of suggestions, at most 50 (default: 10).
+
+    Returns:
+        JSON response with the suggested titles.
+    """
+    query = request.args.get('q', '')
+    doc_type = request.args.get('type')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+
+    if not query.strip():
+        return jsonify({"error": "Missing prefix"}), 400
+    if doc_type and doc_type not in DOC_TYPES:
+        return jsonify({"error": f"type must be one of {', '.join(DOC_TYPES)}"}), 400
+
+    suggestions = [{'type': kind, 'id': doc_id, 'title': title}
+                   for kind, doc_id, title in suggest_index().suggest(query, limit=limit, doc_type=doc_type)]
+    return jsonify({'query': query, 'suggestions': suggestions}), 200
+
+
+@bp.route('/import', strict_slashes=False, methods=['POST'])
+@role_required([UserRole.TEACHER, UserRole.ADMIN])
+def import_ndjson():
+    """
+    Import courses, lessons and assessments from NDJSON.
+
+    The request body is read line by line as it is streamed in. Each line is
+    a JSON object with a kind ('course', 'lesson' or 'assessment'), an
+    optional ref, and the fields of that kind; lessons name their course
+    with course (a ref) or course_id, and assessments their lesson with
+    lesson or lesson_id. Lines are validated and inserted in batches, each
+    batch in its own transaction, and the current user is the author.
+
+    Query parameters:
+        batch_size (int): Lines per transaction, at most 5000 (default: 500).
+
+    Returns:
+        JSON response with the number of lines read, the number of imported
+        rows per kind, and an error for every line that was not imported.
+    """
+    batch_size = min(max(request.args.get('batch_size', IMPORT_BATCH_SIZE, type=int), 1), 5000)
+    author = User.query.filter_by(username=get_jwt_identity()).first()
+    report = import_content(request.stream, author.id, batch_size=batch_size)
+    return jsonify(report), 200
+
+@bp.route('/changes', strict_slashes=False, methods=['GET'])
+@role_required([UserRole.TEACHER, UserRole.ADMIN, UserRole.STUDENT])
+def get_changes():
+    """
+    List the courses, lessons and assessments changed since the client's last sync.
+
+    Offline clients keep the cursor of their last response and send it back
+    to receive only the rows created or updated since, and the IDs of the
+    rows deleted since, instead of downloading the whole catalog again.
+    Without a cursor the feed starts from the beginning. Changes of the last
+    CHANGES_SAFETY_WINDOW_SECONDS are sent again by the next sync, so that
+    transactions committing late are not missed; clients apply them by ID.
+    Lessons are sent with excerpts; their bodies can be fetched with
+    /lessons/batch.
+
+    Query parameters:
+        since (str): The cursor returned by the previous response.
+        limit (int): The most changes returned, at most 1000 (default: 500).
+
+    Returns:
+        JSON response with the changed courses, lessons and assessments, the
+        IDs of the deleted ones under "deleted", the next cursor and whether
+        more changes are waiting ("has_more"); a 400 error for a malformed
+        cursor, or a 410 error for a cursor older than the tombstone retention
+        period, after which the client must sync again without a cursor.
+    """
+    limit = min(max(request.args.get('limit', DEFAULT_CHANGES_LIMIT, type=int), 1), MAX_CHANGES_LIMIT)
+    try:
+        return jsonify(changes_since(request.args.get('since'), limit=limit)), 200
+    except CursorExpired as error:
+        return jsonify({"error": str(error)}), 410
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
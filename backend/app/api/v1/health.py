@@ -0,0 +1,101 @@
+"""
+Health Blueprint Routes
+
+This module defines the Flask blueprint for the health checks used by the load
+balancer and orchestrator. Liveness only tells whether the process serves
+requests; readiness also checks the primary database and its connection pool
+so that traffic can be shed from a worker before its pool saturates. Read
+replica pools are reported but do not affect readiness, since reads fall back
+to the primary.
+
+Routes:
+    - /healthz (GET): Liveness check with the connection pool statistics.
+    - /readyz (GET): Readiness check; 503 when the primary database is
+      unreachable or its connection pool is close to saturation.
+
+Dependencies:
+    - app: The Flask application instance.
+    - Blueprint: Flask's blueprint class for grouping related routes.
+    - db: The SQLAlchemy database instance.
+    - database: Service providing connection pool statistics.
+"""
+from flask import Blueprint, jsonify, current_app, g
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from ... import db
+from ...services.database import pool_status
+from ...services.replicas import REPLICA_BIND_PREFIX
+
+bp = Blueprint('health', __name__)
+
+
+def _replica_pools(window):
+    # Pool statistics of the read replicas, keyed by bind name
+    return {key: pool_status(engine, window)
+            for key, engine in sorted(db.engines.items(), key=lambda item: str(item[0]))
+            if isinstance(key, str) and key.startswith(REPLICA_BIND_PREFIX)}
+
+
+@bp.route('/healthz', methods=['GET'])
+def healthz():
+    """
+    Liveness check.
+
+    Does not touch the database, so a slow or unavailable database does not
+    get the worker restarted.
+
+    Returns:
+        JSON response with status 'ok' and the connection pool statistics of
+        the primary and of each read replica.
+    """
+    window = current_app.config['READINESS_WINDOW']
+    return jsonify({
+        'status': 'ok',
+        'pool': pool_status(db.engine, window),
+        'replicas': _replica_pools(window),
+    }), 200
+
+
+@bp.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness check.
+
+    The worker is not ready when the primary database does not answer a
+    trivial query, when the share of the primary pool's capacity checked out
+    reaches READINESS_MAX_POOL_UTILIZATION, or when the p95 checkout wait over
+    the last READINESS_WINDOW seconds exceeds READINESS_MAX_WAIT_MS. The
+    query is pinned to the primary with g.read_primary, since the session
+    would otherwise route it to a replica. Read replicas are not checked,
+    only their pool statistics are reported.
+
+    Returns:
+        JSON response with status 'ready' (200) or 'unavailable' (503), the
+        failed checks and the connection pool statistics of the primary and
+        of each read replica.
+    """
+    config = current_app.config
+    pool = pool_status(db.engine, config['READINESS_WINDOW'])
+    failures = []
+
+    g.read_primary = True
+    try:
+        db.session.execute(text('SELECT 1'))
+    except SQLAlchemyError:
+        failures.append('database unreachable')
+    finally:
+        db.session.rollback()
+
+    utilization = pool.get('utilization')
+    if utilization is not None and utilization >= config['READINESS_MAX_POOL_UTILIZATION']:
+        failures.append('connection pool saturated')
+    wait = pool.get('recent_p95_wait_ms')
+    if wait is not None and wait > config['READINESS_MAX_WAIT_MS']:
+        failures.append('connection pool wait too long')
+
+    return jsonify({
+        'status': 'unavailable' if failures else 'ready',
+        'failures': failures,
+        'pool': pool,
+        'replicas': _replica_pools(config['READINESS_WINDOW']),
+    }), 503 if failures else 200
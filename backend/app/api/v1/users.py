@@ -1,7 +1,16 @@
+import csv
+import io
 from flask import Blueprint, jsonify, request
+from sqlalchemy.orm import selectinload, undefer
 from ...models.user import User, UserRole
+from ...models.content import Course, Lesson
+from ...models.assessment import Assessment
+from ...models.submission import Submission
 from ... import db
 from ...middleware.role_based_middleware import role_required
+from ...services.provisioning import PROVISION_BATCH_SIZE, provision_users, shared_hash_pool
+from ...services.batch import batch_result, get_many, requested_ids
+from ...services.deletion import soft_delete_user
 from validator_collection import checkers
 
 bp = Blueprint('users', __name__)
@@ -40,6 +49,46 @@ def create_user():
     return jsonify({"message": "User created successfully", "user": user.to_dict()}), 201
 
 
+@bp.route('/users/provision', strict_slashes=False, methods=['POST'])
+@role_required(UserRole.ADMIN)
+def provision():
+    """
+    Create users in bulk from a CSV file.
+
+    The request body is a CSV file with a header row naming the columns
+    username and email, and optionally password, role, firstName, lastName,
+    age and country. The body is read as a stream and handled in batches,
+    each committed in one transaction together with the welcome emails of
+    its users, which are queued in the email outbox for `flask send-outbox`.
+    Passwords are hashed on the worker's shared, bounded pool
+    (PROVISION_HTTP_HASH_WORKERS); large files are better provisioned with
+    `flask provision-users`, which hashes across every CPU. Invalid rows and rows colliding with existing users are reported and
+    skipped.
+
+    Query Parameters:
+    -----------------
+    batch_size : int
+        The number of rows per transaction (default: 500).
+
+    Returns:
+    --------
+    Response object (JSON):
+        - 200: The provisioning report: rows read, users created, emails
+          queued, the errors per row, and the passwords generated for rows
+          without one.
+        - 400: If the batch size is not a positive integer or the header
+          lacks the username or email column.
+    """
+    batch_size = request.args.get('batch_size', PROVISION_BATCH_SIZE, type=int)
+    if batch_size is None or batch_size < 1:
+        return jsonify({"error": "batch_size must be a positive integer"}), 400
+    reader = csv.DictReader(io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline=''))
+    if not {'username', 'email'} <= set(reader.fieldnames or ()):
+        return jsonify({"error": "The CSV header must name the username and email columns"}), 400
+    report = provision_users(reader, batch_size=batch_size, workers=1, pool=shared_hash_pool())
+    return jsonify(report), 200
+
+
 @bp.route('/users/', strict_slashes=False, methods=['GET'])
 @role_required(UserRole.ADMIN)
 def get_users():
@@ -53,7 +102,7 @@ def get_users():
     Response object (JSON):
         - 200: List of all users.
     """
-    users = User.query.all()
+    users = User.query.filter(User.deleted_at.is_(None)).all()
     return jsonify([user.to_dict() for user in users]), 200
 
 
@@ -77,11 +126,44 @@ def get_user(user_id):
         - 404: If the user with the given ID is not found.
     """
     user = db.session.get(User, user_id)
-    if user is None:
+    if user is None or user.deleted_at is not None:
         return jsonify({"error": "User not found"}), 404
     return jsonify(user.to_dict()), 200
 
 
+@bp.route('/users/batch', strict_slashes=False, methods=['GET', 'POST'])
+@role_required(UserRole.ADMIN)
+def get_users_batch():
+    """
+    Retrieve several users by their IDs.
+
+    The IDs are given as ``?ids=1,2,3`` or, with POST, as a JSON body
+    ``{"ids": [1, 2, 3]}``. The users and the courses, lessons, assessments
+    and submissions included in their details are loaded with a fixed number
+    of queries whatever the number of IDs.
+
+    Returns:
+    --------
+    Response object (JSON):
+        - 200: The users keyed by ID, None for the IDs that do not exist,
+          and the list of those IDs.
+        - 400: If the IDs are missing or invalid.
+    """
+    try:
+        ids = requested_ids(request)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+    users = get_many(User, ids, [
+        selectinload(User.course).options(selectinload(Course.lessons), selectinload(Course.assessments)),
+        selectinload(User.lessons).options(undefer(Lesson.body), selectinload(Lesson.course),
+                                           selectinload(Lesson.assessments)),
+        selectinload(User.assessments).options(selectinload(Assessment.lesson), selectinload(Assessment.course)),
+        selectinload(User.submissions).selectinload(Submission.assessment),
+    ])
+    users = {user_id: user for user_id, user in users.items() if user.deleted_at is None}
+    return jsonify(batch_result(ids, users, User.to_dict)), 200
+
+
 @bp.route('/users/<string:username>', strict_slashes=False, methods=['GET'])
 @role_required(UserRole.ADMIN)
 def get_user_by_username(username):
@@ -101,7 +183,7 @@ def get_user_by_username(username):
         - 200: User data for the provided username.
         - 404: If the user with the given username is not found.
     """
-    user = User.query.filter_by(username=username).first()
+    user = User.query.filter_by(username=username, deleted_at=None).first()
     if user is None:
         return jsonify({"error": "User not found"}), 404
     return jsonify(user.to_dict()), 200
@@ -131,7 +213,7 @@ def get_user_by_role(role):
     if role not in userRole:
         return jsonify({"error": "Invalid role"}), 400
 
-    users = User.query.filter_by(role=role).all()
+    users = User.query.filter_by(role=role, deleted_at=None).all()
     return jsonify([user.to_dict() for user in users]), 200
 
 
@@ -158,7 +240,7 @@ def update_user(user_id):
         - 404: If the user with the given ID is not found.
     """
     user = db.session.get(User, user_id)
-    if user is None:
+    if user is None or user.deleted_at is not None:
         return jsonify({"error": "User not found"}), 404
     data = request.get_json()
     userRole = [UserRole.STUDENT, UserRole.TEACHER, UserRole.ADMIN]
@@ -184,7 +266,11 @@ def delete_user(user_id):
     """
     Delete a user by ID.
 
-    This route deletes a user based on the provided user ID.
+    This route marks the user with the provided ID as deleted and returns at
+    once: the user can no longer sign in and leaves the user lists. The user,
+    with the courses, lessons and assessments they wrote and their
+    submissions, is removed later by `flask purge-deleted`, once the
+    tombstone retention period is over.
 
     Parameters:
     -----------
@@ -198,8 +284,8 @@ def delete_user(user_id):
         - 404: If the user with the given ID is not found.
     """
     user = db.session.get(User, user_id)
-    if user is None:
+    if user is None or user.deleted_at is not None:
         return jsonify({"error": "User not found"}), 404
-    db.session.delete(user)
+    soft_delete_user(user_id)
     db.session.commit()
     return jsonify({"message": "User deleted successfully"}), 200
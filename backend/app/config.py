@@ -1,8 +1,50 @@
 #!/usr/bin/env python3
 
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
+from sqlalchemy.pool import StaticPool
+from .services.database import MeteredQueuePool
+from .services.replicas import replica_binds
+
+
+def engine_options(pool_size, max_overflow, pool_recycle=280, pool_timeout=10, connect_timeout=10):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for a MySQL connection pool.
+
+    Each value can be overridden with the matching DB_POOL_SIZE,
+    DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_TIMEOUT or DB_CONNECT_TIMEOUT
+    environment variable. Connections are checked with a ping before use and
+    recycled before MySQL's wait_timeout closes them.
+
+    Parameters:
+    -----------
+    pool_size : int
+        The number of connections kept open.
+    max_overflow : int
+        The number of extra connections opened under load.
+    pool_recycle : int
+        Seconds after which a connection is replaced (default: 280).
+    pool_timeout : int
+        Seconds a request waits for a free connection before failing (default: 10).
+    connect_timeout : int
+        Seconds allowed to open a new connection (default: 10).
+
+    Returns:
+    --------
+    dict:
+        The engine options.
+    """
+    return {
+        'poolclass': MeteredQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', pool_size)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', max_overflow)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', pool_recycle)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', pool_timeout)),
+        'pool_pre_ping': True,
+        'connect_args': {'connection_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', connect_timeout))},
+    }
 
 class Config:
     """
@@ -31,6 +73,45 @@ class Config:
         The name of the production database (default: 'Prod_QADB').
     SQLALCHEMY_TRACK_MODIFICATIONS : bool
         Tracks modifications of objects and emits signals (default: False).
+    SQLALCHEMY_ENGINE_OPTIONS : dict
+        Connection pool settings, see engine_options (default: 5 connections
+        plus 5 overflow).
+    DB_STATEMENT_TIMEOUT_MS : int
+        Default MySQL max_execution_time for SELECT statements in milliseconds;
+        0 disables it (default: 30000).
+    EXPORT_STATEMENT_TIMEOUT_MS : int
+        Timeout of each page query of a submissions export in milliseconds,
+        used instead of DB_STATEMENT_TIMEOUT_MS (default: 60000).
+    READINESS_MAX_POOL_UTILIZATION : float
+        Fraction of pool capacity in use above which /readyz reports not ready
+        (default: 0.9).
+    READINESS_MAX_WAIT_MS : float
+        p95 pool checkout wait over the last READINESS_WINDOW seconds above
+        which /readyz reports not ready (default: 250).
+    READINESS_WINDOW : int
+        Seconds of recent checkouts considered by /readyz (default: 60).
+    SQLALCHEMY_REPLICA_URIS : list of str
+        Read replicas serving GET requests, from the comma-separated
+        DB_REPLICA_URIS variable (default: none).
+    REPLICA_MAX_LAG_SECONDS : float
+        Replicas lagging further behind the primary are not used (default: 2).
+    REPLICA_STICKY_SECONDS : float
+        How long a user's reads stay on the primary after they write
+        (default: 5).
+    REPLICA_LAG_CHECK_INTERVAL : float
+        Seconds between two replication lag measurements (default: 1).
+    VERSE_INDEX_TTL : float
+        Seconds a worker keeps a surah's in-memory verse-reference interval
+        tree before reloading it, so writes made by other workers become
+        visible (default: 60).
+    SUGGEST_REFRESH_SECONDS : float
+        Age after which a worker rebuilds its in-memory title index for
+        /content/suggest, picking up titles written by other workers
+        (default: 300).
+    TEXT_COMPRESSION_CODEC : str
+        Codec of the compressed text columns: 'zlib', or 'zstd', which needs
+        the zstandard package; rows written with either stay readable
+        (default: 'zlib').
     SECRET_KEY : str
         The secret key for securing sessions and cookies.
     MAIL_SERVER : str
@@ -51,6 +132,50 @@ class Config:
         The secret key used for encoding JWT tokens.
     JWT_ACCESS_TOKEN_EXPIRES : timedelta
         The expiration time for JWT access tokens (default: 1 day).
+    PASSWORD_HASH_METHOD : str
+        The werkzeug method used to hash new passwords (default: 'scrypt').
+    PROVISION_HASH_WORKERS : int
+        Processes hashing passwords during bulk user provisioning; 0 uses
+        one per CPU (default: 0).
+    PROVISION_HTTP_HASH_WORKERS : int
+        Processes of the pool each worker shares between POST
+        /users/provision requests; 1 hashes in the request's process
+        (default: 2).
+    TOMBSTONE_RETENTION_DAYS : int
+        Days deleted courses, lessons and assessments are kept as tombstones
+        for the changes feed before `flask purge-deleted` removes them; older
+        feed cursors must resync (default: 30).
+    CHANGES_SAFETY_WINDOW_SECONDS : float
+        How far behind now a caught-up changes feed cursor is set, so that
+        changes of transactions committing after a sync are read by the
+        next one; it should exceed the longest write transaction
+        (default: 60).
+    PROFILER_ENABLED : bool
+        Installs the on-demand sampling profiler hook (default: False).
+    PROFILER_SAMPLE_RATE : float
+        Fraction of requests to profile; admins can change it at runtime
+        (default: 0.0).
+    PROFILER_INTERVAL : float
+        Seconds between two stack samples (default: 0.005).
+    PROFILER_TIMER : str
+        'cpu' samples on process CPU time, 'wall' on real time (default: 'cpu').
+    PROFILER_HEADER : str
+        Header carrying a signed token that forces profiling of a request
+        (default: 'X-Profile-Token').
+    PROFILER_TOKEN_MAX_AGE : int
+        Lifetime of profiling tokens in seconds (default: 3600).
+    PROFILER_DIR : str
+        Directory for collapsed-stack files (default: '<instance>/profiles').
+    PROFILER_MAX_FILES : int
+        Number of profiles kept before the oldest are discarded (default: 200).
+    QUERY_STATS_ENABLED : bool
+        Aggregates per-endpoint SQL fingerprint statistics (default: True).
+    QUERY_STATS_SAMPLE_SIZE : int
+        Latency samples kept per fingerprint for percentiles (default: 1000).
+    QUERY_STATS_FLUSH_INTERVAL : int
+        Seconds between snapshots written for `flask query-stats` (default: 60).
+    QUERY_STATS_DIR : str
+        Directory for per-worker snapshots (default: '<instance>/query_stats').
     """
 
     load_dotenv()
@@ -62,6 +187,19 @@ class Config:
     TEST_DB_NAME = os.getenv('TEST_DB_NAME', 'Test_QADB')
     PROD_DB_NAME = os.getenv('PROD_DB_NAME', 'Prod_QADB')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(pool_size=5, max_overflow=5)
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '30000'))
+    EXPORT_STATEMENT_TIMEOUT_MS = int(os.getenv('EXPORT_STATEMENT_TIMEOUT_MS', '60000'))
+    READINESS_MAX_POOL_UTILIZATION = float(os.getenv('READINESS_MAX_POOL_UTILIZATION', '0.9'))
+    READINESS_MAX_WAIT_MS = float(os.getenv('READINESS_MAX_WAIT_MS', '250'))
+    READINESS_WINDOW = 60
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in os.getenv('DB_REPLICA_URIS', '').split(',') if uri]
+    REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', '2'))
+    REPLICA_STICKY_SECONDS = float(os.getenv('REPLICA_STICKY_SECONDS', '5'))
+    REPLICA_LAG_CHECK_INTERVAL = 1.0
+    VERSE_INDEX_TTL = float(os.getenv('VERSE_INDEX_TTL', '60'))
+    SUGGEST_REFRESH_SECONDS = float(os.getenv('SUGGEST_REFRESH_SECONDS', '300'))
+    TEXT_COMPRESSION_CODEC = os.getenv('TEXT_COMPRESSION_CODEC', 'zlib')
     SECRET_KEY = os.getenv('SECRET_KEY')
     MAIL_SERVER = 'smtp.googlemail.com'
     MAIL_PORT = 587
@@ -72,21 +210,38 @@ class Config:
     MAIL_SENDER = os.environ.get('MAIL_SENDER', 'Qur\'an Academy Admin <youssefessam5623@gmail.com>')
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=1)
+    PASSWORD_HASH_METHOD = 'scrypt'
+    PROVISION_HASH_WORKERS = int(os.getenv('PROVISION_HASH_WORKERS', '0'))
+    PROVISION_HTTP_HASH_WORKERS = int(os.getenv('PROVISION_HTTP_HASH_WORKERS', '2'))
+    TOMBSTONE_RETENTION_DAYS = int(os.getenv('TOMBSTONE_RETENTION_DAYS', '30'))
+    CHANGES_SAFETY_WINDOW_SECONDS = float(os.getenv('CHANGES_SAFETY_WINDOW_SECONDS', '60'))
+    PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'false').lower() == 'true'
+    PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', '0'))
+    PROFILER_INTERVAL = float(os.getenv('PROFILER_INTERVAL', '0.005'))
+    PROFILER_TIMER = os.getenv('PROFILER_TIMER', 'cpu')
+    PROFILER_HEADER = 'X-Profile-Token'
+    PROFILER_TOKEN_MAX_AGE = 3600
+    PROFILER_DIR = os.getenv('PROFILER_DIR')
+    PROFILER_MAX_FILES = 200
+    QUERY_STATS_ENABLED = os.getenv('QUERY_STATS_ENABLED', 'true').lower() == 'true'
+    QUERY_STATS_SAMPLE_SIZE = 1000
+    QUERY_STATS_FLUSH_INTERVAL = int(os.getenv('QUERY_STATS_FLUSH_INTERVAL', '60'))
+    QUERY_STATS_DIR = os.getenv('QUERY_STATS_DIR')
 
     @staticmethod  # type: ignore
     def init_app(app):
         """
         Initialize the application with the provided configuration.
 
-        This method is a placeholder for any initialization steps required
-        for the app when a specific configuration is applied.
+        This method runs before the extensions are initialized. It registers
+        the read replicas as SQLAlchemy binds.
 
         Parameters:
         -----------
         app : Flask app instance
             The Flask application instance to be initialized.
         """
-        pass
+        app.config['SQLALCHEMY_BINDS'] = {**app.config.get('SQLALCHEMY_BINDS', {}), **replica_binds(app)}
 
 
 class DevelopmentConfig(Config):
@@ -125,11 +280,65 @@ class TestConfig(Config):
         Enables or disables testing mode (default: True).
     SQLALCHEMY_DATABASE_URI : str
         The database URI for the testing environment.
+    QUERY_STATS_FLUSH_INTERVAL : int
+        Disables writing query statistics snapshots during tests (default: 0).
+    SQLALCHEMY_ENGINE_OPTIONS : dict
+        A small pool with a short checkout timeout (default: 2 connections
+        plus 2 overflow).
+    PROVISION_HASH_WORKERS : int
+        Hashes provisioned passwords in the test process (default: 1).
+    PROVISION_HTTP_HASH_WORKERS : int
+        Hashes passwords of provisioning requests in the test process
+        (default: 1).
+    PROFILER_ENABLED : bool
+        Installs the profiler hook so that its tests can run (default: True).
     """
     TESTING = True
+    QUERY_STATS_FLUSH_INTERVAL = 0
+    PROVISION_HASH_WORKERS = 1
+    PROVISION_HTTP_HASH_WORKERS = 1
+    PROFILER_ENABLED = True
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(pool_size=2, max_overflow=2, pool_timeout=5)
     SQLALCHEMY_DATABASE_URI = f'mysql+mysqlconnector://{Config.DB_USERNAME}:{Config.DB_PASSWORD}@{Config.DB_HOST}:{Config.DB_PORT}/{Config.TEST_DB_NAME}'
 
 
+_XDIST_WORKER = os.getenv('PYTEST_XDIST_WORKER')
+
+
+class SQLiteTestConfig(TestConfig):
+    """
+    Testing configuration backed by SQLite.
+
+    This class inherits from TestConfig and replaces the MySQL test database
+    with SQLite so that the suite runs without a database server. A single
+    process uses an in-memory database; each pytest-xdist worker (identified
+    by PYTEST_XDIST_WORKER) gets its own database file in the temporary
+    directory so that parallel workers never share data.
+
+    Attributes:
+    -----------
+    SQLALCHEMY_DATABASE_URI : str
+        An in-memory database, or a per-worker database file under parallel runs.
+    SQLALCHEMY_ENGINE_OPTIONS : dict
+        Keeps the in-memory database on one shared connection.
+    SECRET_KEY : str
+        Falls back to a fixed test value when SECRET_KEY is not set.
+    JWT_SECRET_KEY : str
+        Falls back to a fixed test value when JWT_SECRET_KEY is not set.
+    PASSWORD_HASH_METHOD : str
+        A single-round hash, since password strength is irrelevant in tests.
+    """
+    if _XDIST_WORKER:
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tempfile.gettempdir(), f'qa_test_{_XDIST_WORKER}.db')}"
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+    else:
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': StaticPool, 'connect_args': {'check_same_thread': False}}
+    SECRET_KEY = Config.SECRET_KEY or 'test-secret-key'
+    JWT_SECRET_KEY = Config.JWT_SECRET_KEY or 'test-jwt-secret-key-with-32-bytes!'
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1'
+
+
 class ProductionConfig(Config):
     """
     Production configuration class.
@@ -144,14 +353,22 @@ class ProductionConfig(Config):
         The database URI for the production environment.
     JWT_ACCESS_TOKEN_EXPIRES : timedelta
         The expiration time for JWT access tokens in production (default: 7 days).
+    SQLALCHEMY_ENGINE_OPTIONS : dict
+        A larger pool for production workers (default: 20 connections plus
+        10 overflow).
+    DB_STATEMENT_TIMEOUT_MS : int
+        Default timeout for SELECT statements in milliseconds (default: 10000).
     """
     SQLALCHEMY_DATABASE_URI = f'mysql+mysqlconnector://{Config.DB_USERNAME}:{Config.DB_PASSWORD}@{Config.DB_HOST}:{Config.DB_PORT}/{Config.PROD_DB_NAME}'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=7)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(pool_size=20, max_overflow=10)
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '10000'))
 
 
 config = {
     'development': DevelopmentConfig,
     'testing': TestConfig,
+    'testing-sqlite': SQLiteTestConfig,
     'production': ProductionConfig,
     'default': DevelopmentConfig
 }
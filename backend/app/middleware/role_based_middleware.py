@@ -1,6 +1,6 @@
 from functools import wraps
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
-from flask import jsonify
+from flask import jsonify, g
 from ..models.user import User
 
 def role_required(required_roles, *args):
@@ -20,9 +20,10 @@ def role_required(required_roles, *args):
             current_user = get_jwt_identity()  # Get the identity from the JWT
             user = User.query.filter_by(username=current_user).first()  # Fetch user from the database
 
-            if user is None:
+            if user is None or user.deleted_at is not None:
                 return jsonify({"error": "User not found"}), 404
 
+            g.current_user_role = user.role  # Used to attribute query statistics
             if user.role not in required_roles:
                 return jsonify({"error": "Access denied"}), 403
 
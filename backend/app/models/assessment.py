@@ -1,6 +1,7 @@
 from .. import db
 from datetime import datetime
 import json
+from .types import CompressedText
 
 
 class Assessment(db.Model):
@@ -12,11 +13,16 @@ class Assessment(db.Model):
         author_id (int): The ID of the user who created the assessment.
         lesson_id (int): The ID of the lesson to which the assessment belongs.
         course_id (int): The ID of the course to which the lesson belongs.
-        questions (str): The assessment's questions stored as a JSON string.
+        position (str): The assessment's place in its lesson, as a key compared
+            as a string (see app.services.ordering).
+        questions (str): The assessment's questions stored as a compressed JSON string.
         type (str): The type of assessment.
         answers (str): The assessment's answers stored as a JSON string.
         created_at (datetime): The time when the assessment was created.
-        updated_at (datetime): The last time the assessment's information was updated.
+        updated_at (datetime): The last time the assessment's information was
+            updated, set on creation too; the changes feed follows it.
+        deleted_at (datetime): The time the assessment was deleted, or None;
+            see Course.deleted_at.
 
     Relationships:
         course: Relationship to the Course model.
@@ -30,11 +36,15 @@ class Assessment(db.Model):
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
-    questions = db.Column(db.Text, nullable=False)
+    position = db.Column(db.String(64))
+    questions = db.Column(CompressedText, nullable=False)
     type = db.Column(db.String(64), nullable=False)
     answers = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DATETIME, default=datetime.utcnow)
-    updated_at = db.Column(db.DATETIME, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DATETIME, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    deleted_at = db.Column(db.DATETIME, index=True)
+
+    __table_args__ = (db.Index('ix_assessments_lesson_position', 'lesson_id', 'position'),)
 
     # Relationships
     course = db.relationship('Course', back_populates='assessments')
@@ -56,6 +66,7 @@ class Assessment(db.Model):
             'author_id': self.author_id,
             'lesson_id': self.lesson_id,
             'course_id': self.course_id,
+            'position': self.position,
             'questions': json.loads(self.questions),
             'answers': json.loads(self.answers),
             'created_at': self.created_at,
@@ -1,5 +1,18 @@
 from .. import db
 from datetime import datetime
+from sqlalchemy.orm import validates
+from .types import CompressedText
+
+EXCERPT_LENGTH = 200
+
+
+def make_excerpt(body):
+    """Return the start of a lesson body, cut at a word boundary, for list responses."""
+    text = ' '.join((body or '').split())
+    if len(text) <= EXCERPT_LENGTH:
+        return text
+    cut = text.rfind(' ', 0, EXCERPT_LENGTH)
+    return text[:cut if cut > 0 else EXCERPT_LENGTH].rstrip(' .,;:،') + '…'
 
 class Course(db.Model):
     """Model representing a course in the system.
@@ -7,10 +20,18 @@ class Course(db.Model):
     Attributes:
         id (int): The course's ID.
         title (str): The course's title (unique).
-        description (str): The course's description.
+        description (str): The course's description, stored compressed.
         author_id (int): The ID of the user who created the course.
         created_at (datetime): The time when the course was created.
-        updated_at (datetime): The last time the course's information was updated.
+        updated_at (datetime): The last time the course's information was
+            updated, set on creation too; the changes feed follows it.
+        deleted_at (datetime): The time the course was deleted, or None.
+            Deleted courses are kept as hidden tombstones for the changes
+            feed and removed later by `flask purge-deleted` (see
+            app.services.deletion).
+        outline_version (int): Counts the writes to the course, its lessons
+            and its assessments; a cached outline is only served while it
+            was built at the current version (see app.services.outlines).
 
     Relationships:
         author: Relationship to the User model.
@@ -21,14 +42,17 @@ class Course(db.Model):
     __tablename__ = 'courses'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), unique=True, nullable=False)
-    description = db.Column(db.Text, nullable=False)
+    description = db.Column(CompressedText, nullable=False)
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DATETIME, default=datetime.utcnow)
-    updated_at = db.Column(db.DATETIME, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DATETIME, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    deleted_at = db.Column(db.DATETIME, index=True)
+    outline_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Relationships
     author = db.relationship('User', back_populates='course')
-    lessons = db.relationship('Lesson', back_populates='course', cascade='all, delete-orphan')
+    lessons = db.relationship('Lesson', back_populates='course', cascade='all, delete-orphan',
+                              order_by='(Lesson.position, Lesson.id)')
     assessments = db.relationship('Assessment', back_populates='course', cascade='all, delete-orphan')
 
     def to_dict(self):
@@ -63,31 +87,60 @@ class Lesson(db.Model):
     Attributes:
         id (int): The lesson's ID.
         title (str): The lesson's title (unique).
-        body (str): The content of the lesson.
+        body (str): The content of the lesson, stored compressed and loaded
+            only when accessed.
+        excerpt (str): The start of the body, kept in sync when the body is set.
+        body_length (int): The size of the body in UTF-8 bytes.
+        version (int): Incremented on every update; updates made against an
+            older version fail instead of overwriting newer changes.
         author_id (int): The ID of the user who created the lesson.
         course_id (int): The ID of the course to which the lesson belongs.
+        position (str): The lesson's place in its course, as a key compared as
+            a string (see app.services.ordering).
         created_at (datetime): The time when the lesson was created.
-        updated_at (datetime): The last time the lesson's information was updated.
+        updated_at (datetime): The last time the lesson's information was
+            updated, set on creation too; the changes feed follows it.
+        deleted_at (datetime): The time the lesson was deleted, or None; see
+            Course.deleted_at.
 
     Relationships:
         course: Relationship to the Course model.
         author: Relationship to the User model.
         assessments: Relationship to the Assessment model.
+        revisions: Relationship to the LessonRevision model.
     """
 
     __tablename__ = 'lessons'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False, unique=True)
-    body = db.Column(db.Text, nullable=False)
+    body = db.deferred(db.Column(CompressedText, nullable=False))
+    excerpt = db.Column(db.String(255))
+    body_length = db.Column(db.Integer)
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     course_id = db.Column(db.Integer, db.ForeignKey('courses.id'), nullable=False)
+    position = db.Column(db.String(64))
     created_at = db.Column(db.DATETIME, default=datetime.utcnow)
-    updated_at = db.Column(db.DATETIME, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DATETIME, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    deleted_at = db.Column(db.DATETIME, index=True)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __table_args__ = (db.Index('ix_lessons_course_position', 'course_id', 'position'),)
+    __mapper_args__ = {'version_id_col': version}
 
     # Relationships
     course = db.relationship('Course', back_populates='lessons')
     author = db.relationship('User', back_populates='lessons')
-    assessments = db.relationship('Assessment', back_populates='lesson', cascade='all, delete-orphan')
+    assessments = db.relationship('Assessment', back_populates='lesson', cascade='all, delete-orphan',
+                                  order_by='(Assessment.position, Assessment.id)')
+    revisions = db.relationship('LessonRevision', back_populates='lesson', cascade='all, delete-orphan',
+                                passive_deletes=True, order_by='LessonRevision.version.desc()')
+
+    @validates('body')
+    def validate_body(self, key, body):
+        """Refresh the stored excerpt and length whenever the body changes."""
+        self.excerpt = make_excerpt(body)
+        self.body_length = len(body.encode('utf-8')) if body else 0
+        return body
 
     def to_dict(self):
         """Convert the Lesson object to a dictionary.
@@ -95,12 +148,28 @@ class Lesson(db.Model):
         Returns:
             dict: A dictionary representation of the lesson.
         """
+        lessons_info = self.to_summary()
+        lessons_info['body'] = self.body
+        return lessons_info
+
+    def to_summary(self):
+        """Convert the Lesson object to a dictionary without its body.
+
+        Used by list responses; the deferred body column is not loaded.
+
+        Returns:
+            dict: A dictionary representation of the lesson with its excerpt
+            and body length instead of the body.
+        """
         lessons_info = {
             'id': self.id,
             'title': self.title,
-            'body': self.body,
+            'excerpt': self.excerpt,
+            'body_length': self.body_length,
+            'version': self.version,
             'author_id': self.author_id,
             'course_id': self.course_id,
+            'position': self.position,
             'created_at': self.created_at,
             'updated_at': self.updated_at,
             'author': self.author.username,
@@ -113,3 +182,55 @@ class Lesson(db.Model):
         """Return a string representation of the Lesson object."""
         return (f'lesson {self.title} has id {self.id}, '
                 f'author {self.author_id} and course {self.course_id}')
+
+
+class LessonRevision(db.Model):
+    """Model representing an earlier version of a lesson body as a reverse delta.
+
+    Applying the delta to the body of the next newer version restores the
+    body of this version, so only the changed text is stored.
+
+    Attributes:
+        id (int): The revision's ID.
+        lesson_id (int): The ID of the lesson.
+        version (int): The lesson version this revision restores.
+        delta (str): JSON list of [start, end, text] operations that turn the
+            next newer body into this version's body.
+        author_id (int): The ID of the user whose edit replaced this version.
+        created_at (datetime): The time when this version was replaced.
+
+    Relationships:
+        lesson: Relationship to the Lesson model.
+        author: Relationship to the User model.
+    """
+
+    __tablename__ = 'lesson_revisions'
+    __table_args__ = (db.UniqueConstraint('lesson_id', 'version', name='uq_lesson_revisions_version'),)
+    id = db.Column(db.Integer, primary_key=True)
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id', ondelete='CASCADE'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    delta = db.Column(db.Text, nullable=False)
+    author_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    created_at = db.Column(db.DATETIME, default=datetime.utcnow)
+
+    # Relationships
+    lesson = db.relationship('Lesson', back_populates='revisions')
+    author = db.relationship('User')
+
+    def to_dict(self):
+        """Convert the LessonRevision object to a dictionary.
+
+        Returns:
+            dict: A dictionary representation of the revision, without the
+            reconstructed body.
+        """
+        return {
+            'version': self.version,
+            'author': self.author.username if self.author else None,
+            'created_at': self.created_at,
+            'delta_size': len(self.delta),
+        }
+
+    def __repr__(self):
+        """Return a string representation of the LessonRevision object."""
+        return f'revision {self.version} of lesson {self.lesson_id}'
@@ -0,0 +1,34 @@
+from .. import db
+
+
+class GradebookEntry(db.Model):
+    """Model representing one cell of a course gradebook: a student's result on an assessment.
+
+    The table is a materialized copy of the submission scores, maintained
+    when submissions are written (see app.services.gradebook), so a course's
+    students × assessments grid is read from one primary-key range.
+
+    Attributes:
+        course_id (int): The ID of the course of the assessment.
+        student_id (int): The ID of the student.
+        assessment_id (int): The ID of the assessment.
+        submission_id (int): The ID of the graded submission.
+        score (int): The submission's score.
+        pending (bool): Whether text answers still wait for manual grading.
+        updated_at (datetime): The last time the entry was written.
+    """
+
+    __tablename__ = 'gradebook_entries'
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    assessment_id = db.Column(db.Integer, db.ForeignKey('assessments.id', ondelete='CASCADE'),
+                              primary_key=True, index=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submissions.id', ondelete='CASCADE'),
+                              nullable=False, unique=True)
+    score = db.Column(db.Integer)
+    pending = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        """Return a string representation of the GradebookEntry object."""
+        return f'gradebook entry of student {self.student_id} for assessment {self.assessment_id}: {self.score}'
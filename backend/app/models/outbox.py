@@ -0,0 +1,36 @@
+from datetime import datetime
+from .. import db
+
+
+class OutboxEmail(db.Model):
+    """Model representing an email queued for delivery.
+
+    Emails are written in the same transaction as the change they announce
+    and sent later in batches (see app.services.outbox), so a rolled-back
+    change never sends an email and a mail server outage loses none.
+
+    Attributes:
+        id (int): The email's ID.
+        recipient (str): The recipient's email address.
+        subject (str): The subject line.
+        body (str): The plain-text body.
+        created_at (datetime): The time when the email was queued.
+        sent_at (datetime): The time when the email was sent, or None while pending.
+        attempts (int): The number of failed delivery attempts.
+        last_error (str): The error of the last failed attempt.
+    """
+
+    __tablename__ = 'email_outbox'
+    __table_args__ = (db.Index('ix_email_outbox_pending', 'sent_at', 'id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(100), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(255))
+
+    def __repr__(self):
+        """Return a string representation of the OutboxEmail object."""
+        return f'email {self.id} to {self.recipient}: {self.subject}'
@@ -0,0 +1,29 @@
+from .. import db
+
+
+class CourseOutline(db.Model):
+    """Model representing the cached outline document of a course.
+
+    The document is the JSON response of the course outline, built from the
+    course, its lessons and their assessments on first read and deleted
+    whenever one of them is written (see app.services.outlines), so a course
+    page is served from one primary-key lookup. The document is only served
+    while its version matches the course's outline_version, so an outline
+    built while a write was committing is never served after it.
+
+    Attributes:
+        course_id (int): The ID of the outlined course.
+        document (str): The outline, serialized as JSON.
+        version (int): The course's outline_version the document was built at.
+        built_at (datetime): The time when the document was built.
+    """
+
+    __tablename__ = 'course_outlines'
+    course_id = db.Column(db.Integer, db.ForeignKey('courses.id', ondelete='CASCADE'), primary_key=True)
+    document = db.Column(db.Text, nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    built_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        """Return a string representation of the CourseOutline object."""
+        return f'outline of course {self.course_id} built at {self.built_at}'
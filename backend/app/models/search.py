@@ -0,0 +1,58 @@
+from .. import db
+
+
+class SearchDocument(db.Model):
+    """Model representing a course or lesson in the full-text search index.
+
+    Attributes:
+        id (int): The document's ID.
+        doc_type (str): The kind of indexed row, 'course' or 'lesson'.
+        doc_id (int): The ID of the indexed course or lesson.
+        length (int): The number of indexed terms, weighted as in the postings.
+
+    Relationships:
+        postings: Relationship to the SearchPosting model.
+    """
+
+    __tablename__ = 'search_documents'
+    __table_args__ = (db.UniqueConstraint('doc_type', 'doc_id', name='uq_search_documents_doc'),)
+    id = db.Column(db.Integer, primary_key=True)
+    doc_type = db.Column(db.String(16), nullable=False)
+    doc_id = db.Column(db.Integer, nullable=False)
+    length = db.Column(db.Integer, nullable=False)
+
+    # Relationships
+    postings = db.relationship('SearchPosting', back_populates='document',
+                               cascade='all, delete-orphan', passive_deletes=True)
+
+    def __repr__(self):
+        """Return a string representation of the SearchDocument object."""
+        return f'search document {self.doc_type} {self.doc_id} with {self.length} terms'
+
+
+class SearchPosting(db.Model):
+    """Model representing the occurrences of a term in a search document.
+
+    Attributes:
+        term (str): The normalized, stemmed term, compared byte for byte on
+            MySQL: its default accent-insensitive collation would make
+            'café' and 'cafe' or 'straße' and 'strasse' one key.
+        document_id (int): The ID of the search document containing the term.
+        tf (int): The weighted number of occurrences of the term in the document.
+
+    Relationships:
+        document: Relationship to the SearchDocument model.
+    """
+
+    __tablename__ = 'search_postings'
+    term = db.Column(db.String(64).with_variant(db.String(64, collation='utf8mb4_bin'), 'mysql'), primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('search_documents.id', ondelete='CASCADE'),
+                            primary_key=True, index=True)
+    tf = db.Column(db.Integer, nullable=False)
+
+    # Relationships
+    document = db.relationship('SearchDocument', back_populates='postings')
+
+    def __repr__(self):
+        """Return a string representation of the SearchPosting object."""
+        return f'posting {self.term} in document {self.document_id} ({self.tf})'
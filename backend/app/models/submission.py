@@ -1,5 +1,7 @@
 from .. import db
 from datetime import datetime
+import json
+from .types import CompressedText
 
 class Submission(db.Model):
     """
@@ -11,8 +13,12 @@ class Submission(db.Model):
         id (int): Primary key.
         student_id (int): Foreign key referencing the user (student) who made the submission.
         assessment_id (int): Foreign key referencing the assessment.
-        answers (str): The student's answers in JSON format or as text.
-        feedback (str): Feedback provided by the teacher (optional).
+        answers (str): The student's answers in JSON format or as text, stored compressed.
+        score (int): The automatically graded score.
+        results (str): One result code per question (see app.services.grading),
+            from which the feedback messages are rendered. Unbounded, since
+            assessments have no maximum question count.
+        feedback (str): Feedback provided by the teacher (optional), stored compressed.
         submitted_at (datetime): The time when the submission was made.
         updated_at (datetime): The last time the submission's information was updated.
 
@@ -25,8 +31,10 @@ class Submission(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     assessment_id = db.Column(db.Integer, db.ForeignKey('assessments.id'), nullable=False)
-    answers = db.Column(db.Text, nullable=False)
-    feedback = db.Column(db.Text)
+    answers = db.Column(CompressedText, nullable=False)
+    score = db.Column(db.Integer)
+    results = db.Column(db.Text)
+    feedback = db.Column(CompressedText)
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
 
@@ -37,17 +45,27 @@ class Submission(db.Model):
     def to_dict(self):
         """Convert the Submission object to a dictionary.
 
+        The feedback is the teacher's feedback when there is one, and otherwise
+        the messages rendered from the stored result codes.
+
         Returns:
             dict: A dictionary representation of the submission.
         """
+        from ..services.grading import render_feedback
+
+        feedback = self.feedback
+        if feedback is None and self.results is not None:
+            feedback = json.dumps(render_feedback(self.results))
         submission_info = {
             'id': self.id,
             'student_id': self.student_id,
             'student': self.student.username,  # Assuming User model has a username field
             'assessment_id': self.assessment_id,
-            'assessment_title': self.assessment.title,
+            'assessment_title': self.assessment.title if self.assessment else None,  # None once deleted
             'answers': self.answers,
-            'feedback': self.feedback,
+            'score': self.score,
+            'results': self.results,
+            'feedback': feedback,
             'submitted_at': self.submitted_at,
             'updated_at': self.updated_at
         }
@@ -0,0 +1,147 @@
+import zlib
+from flask import current_app, has_app_context
+from sqlalchemy import LargeBinary
+from sqlalchemy.dialects import mysql
+from sqlalchemy.types import TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd is optional
+    zstandard = None
+
+# Format markers stored as the first byte of every value
+RAW = b'\x00'
+ZLIB = b'\x01'
+ZSTD = b'\x02'
+# Codecs by the name used in TEXT_COMPRESSION_CODEC
+CODECS = {'zlib': ZLIB, 'zstd': ZSTD}
+
+COMPRESS_MIN_BYTES = 256
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+
+def codec_marker(name):
+    """
+    Return the format marker of a codec.
+
+    Parameters:
+    -----------
+    name : str
+        'zlib' or 'zstd'.
+
+    Returns:
+    --------
+    bytes:
+        ZLIB or ZSTD.
+
+    Raises:
+    -------
+    ValueError:
+        If the codec is unknown, or is zstd while the zstandard package is
+        not installed.
+    """
+    if name not in CODECS:
+        raise ValueError(f"Unknown compression codec {name!r}; use {' or '.join(CODECS)}")
+    if CODECS[name] == ZSTD and zstandard is None:
+        raise ValueError('The zstd codec needs the zstandard package')
+    return CODECS[name]
+
+
+def default_codec():
+    """Return the marker of the TEXT_COMPRESSION_CODEC codec, zlib outside an application context."""
+    return codec_marker(current_app.config['TEXT_COMPRESSION_CODEC']) if has_app_context() else ZLIB
+
+
+def compress_text(value, codec=None, min_bytes=COMPRESS_MIN_BYTES):
+    """
+    Encode a string for storage, compressing it when that saves space.
+
+    Parameters:
+    -----------
+    value : str
+        The text to store.
+    codec : bytes or None
+        ZLIB or ZSTD; defaults to default_codec().
+    min_bytes : int
+        Values shorter than this many UTF-8 bytes are stored raw
+        (default: COMPRESS_MIN_BYTES).
+
+    Returns:
+    --------
+    bytes:
+        A format marker followed by the raw or compressed UTF-8 text.
+    """
+    data = value.encode('utf-8')
+    if len(data) >= min_bytes:
+        codec = codec or default_codec()
+        if codec == ZSTD and zstandard is not None:
+            compressed = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+        else:
+            codec, compressed = ZLIB, zlib.compress(data, ZLIB_LEVEL)
+        if len(compressed) < len(data):
+            return codec + compressed
+    return RAW + data
+
+
+def decompress_text(value):
+    """
+    Decode a value written by compress_text.
+
+    Values without a known marker are legacy uncompressed text, written
+    before the column was converted, and are returned as they are.
+
+    Parameters:
+    -----------
+    value : bytes or str
+        The stored value.
+
+    Returns:
+    --------
+    str:
+        The text.
+    """
+    if isinstance(value, str):
+        return value
+    value = bytes(value)
+    marker, data = value[:1], value[1:]
+    if marker == RAW:
+        return data.decode('utf-8')
+    if marker == ZLIB:
+        return zlib.decompress(data).decode('utf-8')
+    if marker == ZSTD:
+        if zstandard is None:
+            raise RuntimeError('zstandard is required to read zstd-compressed values')
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return value.decode('utf-8')
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text column stored as a compressed binary value.
+
+    Values of at least COMPRESS_MIN_BYTES are compressed with the codec set
+    by TEXT_COMPRESSION_CODEC, zlib unless configured; shorter values,
+    and values that do not shrink, are stored raw. A one-byte marker records
+    the format, so rows written with either codec, and legacy uncompressed
+    rows, can always be read. Python code sees plain strings. Comparisons in
+    SQL only work for equality, and byte offsets refer to the stored form.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'mysql':
+            return dialect.type_descriptor(mysql.MEDIUMBLOB())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return compress_text(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decompress_text(value)
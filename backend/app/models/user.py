@@ -1,3 +1,4 @@
+from flask import current_app, has_app_context
 from flask_login import UserMixin
 from werkzeug.security import check_password_hash, generate_password_hash
 from datetime import datetime
@@ -24,6 +25,11 @@ class User(UserMixin, db.Model):
         password_hash (str): The hashed password of the user.
         created_at (datetime): The time when the user was created.
         updated_at (datetime): The last time the user's information was updated.
+        deleted_at (datetime): The time the user was deleted, or None. Deleted
+            users can no longer sign in and are left out of user lists; `flask
+            purge-deleted` removes them with their content and submissions
+            once the tombstone retention period is over (see
+            app.services.deletion).
 
     Relationships:
         course: Relationship to the Course model.
@@ -44,6 +50,7 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    deleted_at = db.Column(db.DateTime, index=True)
 
     # Relationships
     course = db.relationship('Course', back_populates='author', cascade='all, delete-orphan')
@@ -58,8 +65,9 @@ class User(UserMixin, db.Model):
 
     @password.setter
     def password(self, password):
-        """Hash the password and set it to the password_hash field."""
-        self.password_hash = generate_password_hash(password)
+        """Hash the password with PASSWORD_HASH_METHOD and set it to the password_hash field."""
+        method = current_app.config['PASSWORD_HASH_METHOD'] if has_app_context() else 'scrypt'
+        self.password_hash = generate_password_hash(password, method=method)
 
     def verify_password(self, password):
         """Check if the provided password matches the stored hash.
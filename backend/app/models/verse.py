@@ -0,0 +1,30 @@
+from .. import db
+
+
+class VerseReference(db.Model):
+    """Model representing a range of Qur'an verses referenced by a lesson or assessment.
+
+    Attributes:
+        id (int): The reference's ID.
+        surah (int): The surah number, from 1 to 114.
+        ayah_start (int): The first referenced ayah.
+        ayah_end (int): The last referenced ayah (inclusive).
+        doc_type (str): The kind of referencing row, 'lesson' or 'assessment'.
+        doc_id (int): The ID of the referencing lesson or assessment.
+    """
+
+    __tablename__ = 'verse_references'
+    __table_args__ = (
+        db.Index('ix_verse_references_range', 'surah', 'ayah_start', 'ayah_end'),
+        db.Index('ix_verse_references_doc', 'doc_type', 'doc_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    surah = db.Column(db.SmallInteger, nullable=False)
+    ayah_start = db.Column(db.SmallInteger, nullable=False)
+    ayah_end = db.Column(db.SmallInteger, nullable=False)
+    doc_type = db.Column(db.String(16), nullable=False)
+    doc_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        """Return a string representation of the VerseReference object."""
+        return f'{self.doc_type} {self.doc_id} references {self.surah}:{self.ayah_start}-{self.ayah_end}'
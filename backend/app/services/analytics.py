@@ -0,0 +1,158 @@
+import json
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, select
+from .. import db
+from ..models.submission import Submission
+from .grading import AUTO_GRADED_TYPES, CORRECT, INCORRECT, UNKNOWN_TYPE, score_answers
+
+# Share of the ranked submissions forming the upper and lower groups of the discrimination index
+DISCRIMINATION_GROUP = 0.27
+_OTHER = 'other'
+
+
+def _result_matrix(rows, questions):
+    # Result codes (one row per submission) and scores; rows stored before the codes existed are scored again
+    width = len(questions)
+    lines, scores = [], []
+    for row in rows:
+        score, results = row.score, row.results
+        if results is None:
+            rescored, results, _ = score_answers(questions, _answers(row.answers))
+            score = rescored if score is None else score
+        lines.append(results[:width].ljust(width, UNKNOWN_TYPE))
+        scores.append(score or 0)
+    codes = np.frombuffer(''.join(lines).encode('ascii'), dtype=np.uint8).reshape(len(lines), width)
+    return codes - ord('0'), np.array(scores, dtype=np.int64)
+
+
+def _answers(stored):
+    try:
+        answers = json.loads(stored)
+    except (TypeError, ValueError):
+        return []
+    return answers if isinstance(answers, list) else []
+
+
+def _proportions(correct, graded):
+    # Per-column share of correct answers among the graded ones, NaN where nothing was graded
+    counts = graded.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, correct.sum(axis=0) / counts, np.nan)
+
+
+def _rounded(value):
+    return None if np.isnan(value) else round(float(value), 4)
+
+
+def _distractors(question, answers):
+    # Count how often each option was chosen; answers matching no option are counted as 'other'
+    options = question['options']
+    lookup = {}
+    for index, option in enumerate(options):
+        lookup.setdefault(json.dumps(option), index)
+    chosen = np.fromiter((lookup.get(json.dumps(answer), len(options)) for answer in answers),
+                         dtype=np.int64, count=len(answers))
+    counts = np.bincount(chosen, minlength=len(options) + 1)
+    frequencies = [{'option': option, 'count': int(counts[index]), 'correct': option == question.get('correct_answer')}
+                   for index, option in enumerate(options)]
+    frequencies.append({'option': _OTHER, 'count': int(counts[-1]), 'correct': False})
+    return frequencies
+
+
+def item_analysis(questions, rows):
+    """
+    Compute per-question item statistics and the score distribution of an assessment.
+
+    The difficulty index of a question is the share of its graded answers
+    that are correct. The discrimination index is the difficulty among the
+    top DISCRIMINATION_GROUP of submissions ranked by score minus that among
+    the bottom group. Both are None for questions that are not auto-graded.
+
+    Parameters:
+    -----------
+    questions : list of dict
+        The assessment's questions.
+    rows : list
+        The submissions, with answers, score and results attributes.
+
+    Returns:
+    --------
+    dict:
+        The number of submissions, score summary and histogram, and one
+        entry per question.
+    """
+    count = len(rows)
+    auto_graded = sum(question.get('type') in AUTO_GRADED_TYPES for question in questions)
+    report = {'submissions': count, 'questions': [], 'scores': {
+        'mean': None, 'median': None, 'std': None,
+        'histogram': [{'score': score, 'count': 0} for score in range(-auto_graded, auto_graded + 1)],
+    }}
+    if not questions:
+        return report
+
+    codes, scores = _result_matrix(rows, questions)
+    correct = codes == int(CORRECT)
+    graded = correct | (codes == int(INCORRECT))
+
+    difficulty = _proportions(correct, graded)
+    discrimination = np.full(len(questions), np.nan)
+    group = int(round(count * DISCRIMINATION_GROUP))
+    if group:
+        ranked = np.argsort(scores, kind='stable')
+        lower, upper = ranked[:group], ranked[-group:]
+        discrimination = _proportions(correct[upper], graded[upper]) - _proportions(correct[lower], graded[lower])
+
+    answers = [_answers(row.answers) for row in rows]
+    for index, question in enumerate(questions):
+        item = {'question': index + 1, 'type': question.get('type'),
+                'answered': int(graded[:, index].sum()),
+                'difficulty': _rounded(difficulty[index]),
+                'discrimination': _rounded(discrimination[index])}
+        if question.get('type') in AUTO_GRADED_TYPES and question.get('options'):
+            item['distractors'] = _distractors(
+                question, [submitted[index] if index < len(submitted) else None for submitted in answers])
+        report['questions'].append(item)
+
+    if count:
+        histogram = np.bincount(np.clip(scores, -auto_graded, auto_graded) + auto_graded,
+                                minlength=2 * auto_graded + 1)
+        report['scores'].update(
+            mean=round(float(scores.mean()), 4), median=float(np.median(scores)), std=round(float(scores.std()), 4),
+            histogram=[{'score': score - auto_graded, 'count': int(total)} for score, total in enumerate(histogram)])
+    return report
+
+
+def assessment_analytics(assessment):
+    """
+    Return the item analytics of an assessment, computed once per change.
+
+    Reports are cached per worker together with a signature of the
+    assessment's submissions (their count, highest ID and last update) and of
+    the assessment itself. A cheap aggregate query checks the signature, so
+    a new or regraded submission, from any worker, recomputes the report.
+
+    Parameters:
+    -----------
+    assessment : Assessment
+        The assessment.
+
+    Returns:
+    --------
+    dict:
+        The report of item_analysis.
+    """
+    signature = tuple(db.session.execute(
+        select(func.count(Submission.id), func.max(Submission.id), func.max(Submission.updated_at))
+        .where(Submission.assessment_id == assessment.id)).one()) + (assessment.updated_at,)
+    cache = current_app.extensions.setdefault('item_analytics', {})
+    cached = cache.get(assessment.id)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    rows = db.session.execute(
+        select(Submission.answers, Submission.score, Submission.results)
+        .where(Submission.assessment_id == assessment.id).order_by(Submission.id)).all()
+    report = item_analysis(json.loads(assessment.questions), rows)
+    cache[assessment.id] = (signature, report)
+    return report
@@ -25,6 +25,26 @@ def send_async_email(app, message):
         mail.send(message)
 
 
+def account_created_email(username, email):
+    """
+    Build the email confirming the creation of an account.
+
+    Parameters:
+    -----------
+    username : str
+        The new user's username.
+    email : str
+        The new user's email address.
+
+    Returns:
+    --------
+    dict:
+        The recipient, subject and body of the email.
+    """
+    return {'recipient': email, 'subject': "Account Created",
+            'body': f"Dear {username}, your account has been successfully created."}
+
+
 def send_account_created_email(user):
     """
     Send a confirmation email to the user after account creation.
@@ -43,10 +63,8 @@ def send_account_created_email(user):
     --------
     None
     """
-    subject = "Account Created"
-    body = f"Dear {user.username}, your account has been successfully created."
-    recipients = [user.email]
+    email = account_created_email(user.username, user.email)
     sender = current_app.config['MAIL_SENDER']
-    message = Message(subject=subject, body=body, recipients=recipients, sender=sender)
+    message = Message(subject=email['subject'], body=email['body'], recipients=[email['recipient']], sender=sender)
     thread = Thread(target=send_async_email, args=(current_app._get_current_object(), message))
     thread.start()
@@ -0,0 +1,95 @@
+from sqlalchemy import select
+from .. import db
+
+# The most IDs a single multi-get request may ask for
+MAX_BATCH_IDS = 100
+
+
+def requested_ids(request):
+    """
+    Read the IDs of a multi-get request.
+
+    GET requests give the IDs as a comma-separated ``ids`` query parameter
+    (``?ids=1,2,3``); POST requests as an ``ids`` list in the JSON body, for
+    ID sets too long for a URL. Repeated IDs are kept once.
+
+    Parameters:
+    -----------
+    request : Request
+        The Flask request.
+
+    Returns:
+    --------
+    list of int:
+        The requested IDs, in request order.
+
+    Raises:
+    -------
+    ValueError:
+        If the IDs are missing, not integers, or more than MAX_BATCH_IDS.
+    """
+    if request.method == 'POST':
+        ids = (request.get_json(silent=True) or {}).get('ids')
+        if not isinstance(ids, list) or not all(isinstance(value, int) and not isinstance(value, bool)
+                                                for value in ids):
+            raise ValueError('ids must be a list of integers')
+    else:
+        try:
+            ids = [int(value) for value in request.args.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            raise ValueError('ids must be comma-separated integers') from None
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValueError('ids is required')
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f'at most {MAX_BATCH_IDS} ids can be requested at once')
+    return ids
+
+
+def get_many(model, ids, options=()):
+    """
+    Load the rows of a model with the given IDs in one query.
+
+    Parameters:
+    -----------
+    model : db.Model
+        The model to load.
+    ids : list of int
+        The IDs to load.
+    options : sequence
+        Loader options, such as selectinload or joinedload, applied to the
+        query so serializing the rows issues no further per-row queries.
+
+    Returns:
+    --------
+    dict:
+        The loaded rows by ID; missing IDs are absent.
+    """
+    rows = db.session.execute(select(model).where(model.id.in_(ids)).options(*options)).unique().scalars()
+    return {row.id: row for row in rows}
+
+
+def batch_result(ids, rows, serialize):
+    """
+    Serialize the rows of a multi-get request, keyed by ID.
+
+    Parameters:
+    -----------
+    ids : list of int
+        The requested IDs.
+    rows : dict
+        The found rows by ID, from get_many.
+    serialize : callable
+        Turns one row into a dictionary.
+
+    Returns:
+    --------
+    dict:
+        ``items`` maps every requested ID (as a string, since JSON keys are
+        strings) to its serialized row, or to None when it does not exist;
+        ``missing`` lists the IDs that were not found.
+    """
+    return {
+        'items': {str(id_): serialize(rows[id_]) if id_ in rows else None for id_ in ids},
+        'missing': [id_ for id_ in ids if id_ not in rows],
+    }
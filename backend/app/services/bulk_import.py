@@ -0,0 +1,283 @@
+import json
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from .. import db
+from ..models.assessment import Assessment
+from ..models.content import Course, Lesson, make_excerpt
+from . import search as search_service
+from . import verses as verse_service
+from .ordering import append_positions
+from .outlines import invalidate_outlines
+
+IMPORT_KINDS = ('course', 'lesson', 'assessment')
+IMPORT_MODELS = {'course': Course, 'lesson': Lesson, 'assessment': Assessment}
+# Lines validated and inserted per transaction
+IMPORT_BATCH_SIZE = 500
+MAX_TITLE_LENGTH = 255
+# The field naming the parent record, by reference or by the ID of an existing row
+PARENTS = {'lesson': ('course', 'course_id'), 'assessment': ('lesson', 'lesson_id')}
+
+
+class InvalidRecord(ValueError):
+    """A line of an import file that cannot be imported."""
+
+
+def _text(record, name):
+    value = record.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise InvalidRecord(f'{name} must be a non-empty string')
+    return value
+
+
+def _validate(record):
+    # Check the fields of one parsed line and return its kind
+    if not isinstance(record, dict):
+        raise InvalidRecord('each line must be a JSON object')
+    kind = record.get('kind')
+    if kind not in IMPORT_KINDS:
+        raise InvalidRecord(f"kind must be one of {', '.join(IMPORT_KINDS)}")
+    if len(_text(record, 'title')) > MAX_TITLE_LENGTH:
+        raise InvalidRecord(f'title must be at most {MAX_TITLE_LENGTH} characters')
+    ref = record.get('ref')
+    if ref is not None and not isinstance(ref, str):
+        raise InvalidRecord('ref must be a string')
+    if kind == 'course':
+        _text(record, 'description')
+    elif kind == 'lesson':
+        _text(record, 'body')
+    else:
+        _text(record, 'type')
+        if not isinstance(record.get('questions'), list):
+            raise InvalidRecord('questions must be a list')
+        if not isinstance(record.get('answers', []), list):
+            raise InvalidRecord('answers must be a list')
+    if kind in PARENTS:
+        ref_field, id_field = PARENTS[kind]
+        if isinstance(record.get(ref_field), str) == isinstance(record.get(id_field), int):
+            raise InvalidRecord(f'give either {ref_field} (a ref) or {id_field} (an ID)')
+    return kind
+
+
+class _Importer:
+    """Import state carried across batches: resolved references and titles seen in the file."""
+
+    def __init__(self, author_id, report):
+        self.author_id = author_id
+        self.report = report
+        self.refs = {kind: {} for kind in IMPORT_KINDS}
+        self.titles = {kind: set() for kind in IMPORT_KINDS}
+        self.positions = {kind: {} for kind in PARENTS}
+
+    def fail(self, line, message):
+        self.report['errors'].append({'line': line, 'error': message})
+
+    def import_batch(self, batch):
+        first_error = len(self.report['errors'])
+        records = {kind: [] for kind in IMPORT_KINDS}
+        for line, text in batch:
+            try:
+                record = json.loads(text)
+                kind = _validate(record)
+            except ValueError as error:
+                self.fail(line, str(error) if isinstance(error, InvalidRecord) else f'invalid JSON: {error}')
+                continue
+            ref = record.get('ref')
+            if ref is not None and ref in self.refs[kind]:
+                self.fail(line, f'duplicate {kind} ref {ref!r}')
+                continue
+            if record['title'] in self.titles[kind]:
+                self.fail(line, f'duplicate {kind} title {record["title"]!r} in the file')
+                continue
+            self.titles[kind].add(record['title'])
+            if ref is not None:
+                self.refs[kind][ref] = None  # Reserved until the row is inserted
+            records[kind].append((line, record))
+
+        added = {}
+        try:
+            for kind in IMPORT_KINDS:
+                added[kind] = self._insert(kind, self._existing_titles(kind, records[kind]))
+            self._index(added)
+            db.session.commit()
+        except SQLAlchemyError as error:
+            db.session.rollback()
+            reported = {entry['line'] for entry in self.report['errors'][first_error:]}
+            for kind in IMPORT_KINDS:
+                for line, record in records[kind]:
+                    if line not in reported:
+                        self._drop(kind, line, record, f'batch failed: {error.__class__.__name__}')
+            return
+        for kind, rows in added.items():
+            self.report['imported'][kind] += len(rows)
+
+    def _existing_titles(self, kind, records):
+        # One query per kind and batch finds the titles already in the database
+        model = IMPORT_MODELS[kind]
+        titles = [record['title'] for _, record in records]
+        existing = set(db.session.execute(select(model.title).where(model.title.in_(titles))
+                                          .execution_options(include_deleted=True)).scalars()) if titles else set()
+        kept = []
+        for line, record in records:
+            if record['title'] in existing:
+                self._drop(kind, line, record, f'{kind} title {record["title"]!r} already exists')
+            else:
+                kept.append((line, record))
+        return kept
+
+    def _drop(self, kind, line, record, message):
+        if record.get('ref') is not None:
+            self.refs[kind].pop(record['ref'], None)
+        self.fail(line, message)
+
+    def _parents(self, kind, records):
+        # Map each record to its parent's (lesson or course) ID and course ID, or report it
+        parent_kind, id_field = PARENTS[kind]
+        model = IMPORT_MODELS[parent_kind]
+        ids = {record[id_field] for _, record in records if isinstance(record.get(id_field), int)}
+        known = {}
+        if ids:
+            course_column = model.id if parent_kind == 'course' else model.course_id
+            known = dict(db.session.execute(select(model.id, course_column).where(model.id.in_(ids))).all())
+        resolved = []
+        for line, record in records:
+            if isinstance(record.get(parent_kind), str):
+                parent = self.refs[parent_kind].get(record[parent_kind])
+                if parent is None:
+                    self._drop(kind, line, record, f'unknown {parent_kind} ref {record[parent_kind]!r}')
+                    continue
+            else:
+                parent_id = record[id_field]
+                if parent_id not in known:
+                    self._drop(kind, line, record, f'{parent_kind} {parent_id} does not exist')
+                    continue
+                parent = (parent_id, known[parent_id])
+            resolved.append((line, record, parent))
+        return resolved
+
+    def _insert(self, kind, records):
+        if kind in PARENTS:
+            resolved = self._parents(kind, records)
+        else:
+            resolved = [(line, record, None) for line, record in records]
+        if not resolved:
+            return []
+        rows = [self._row(kind, record, parent) for _, record, parent in resolved]
+        model = IMPORT_MODELS[kind]
+        if kind in PARENTS:
+            # Imported lessons and assessments go after the existing ones, in file order
+            append_positions(db.session.connection(), model, rows, self.positions[kind])
+        db.session.execute(insert(model.__table__), rows)
+
+        # Titles are unique, so they identify the inserted rows on every database
+        titles = [row['title'] for row in rows]
+        ids = dict(db.session.execute(select(model.title, model.id).where(model.title.in_(titles))).all())
+        added = []
+        for (_, record, _), row in zip(resolved, rows):
+            row['id'] = ids[row['title']]
+            if record.get('ref') is not None:
+                course_id = row['id'] if kind == 'course' else row['course_id']
+                self.refs[kind][record['ref']] = (row['id'], course_id)
+            added.append(row)
+        return added
+
+    def _row(self, kind, record, parent):
+        row = {'title': record['title'], 'author_id': self.author_id}
+        if kind == 'course':
+            row['description'] = record['description']
+        elif kind == 'lesson':
+            body = record['body']
+            row.update(body=body, course_id=parent[0], excerpt=make_excerpt(body),
+                       body_length=len(body.encode('utf-8')))
+        else:
+            row.update(lesson_id=parent[0], course_id=parent[1], type=record['type'],
+                       questions=json.dumps(record['questions']), answers=json.dumps(record.get('answers', [])))
+        return row
+
+    def _index(self, added):
+        index_inserted(added)
+
+
+def index_inserted(added):
+    """
+    Index rows written with Core INSERTs, in the current transaction.
+
+    Core INSERTs skip the mapper events, so the search index, the suggestion
+    index, the verse references and the course outlines are updated here.
+
+    Parameters:
+    -----------
+    added : dict
+        The inserted rows by kind ('course', 'lesson' or 'assessment'), as
+        dicts with the ID, the indexed fields and, for lessons and
+        assessments, the course ID.
+    """
+    connection = db.session.connection()
+    for doc_type, fields in search_service.INDEXED_FIELDS.values():
+        rows = added.get(doc_type, [])
+        search_service.index_new_documents(connection, doc_type, [
+            (row['id'], [(row[name], weight) for name, weight in fields]) for row in rows])
+        db.session.info.setdefault('suggest_pending', []).extend(
+            ('add', doc_type, row['id'], row['title']) for row in rows)
+    for doc_type, fields in verse_service.REFERENCING_FIELDS.values():
+        rows = added.get(doc_type, [])
+        verse_service.add_references(connection, doc_type, [
+            (row['id'], [row[name] for name in fields]) for row in rows])
+        if rows:
+            db.session.info['verse_index_stale'] = True
+    invalidate_outlines(connection, [row['course_id'] for kind in ('lesson', 'assessment')
+                                     for row in added.get(kind, [])])
+
+
+def import_content(lines, author_id, batch_size=IMPORT_BATCH_SIZE, log=None):
+    """
+    Import courses, lessons and assessments from NDJSON lines.
+
+    Each line is a JSON object with a ``kind`` ('course', 'lesson' or
+    'assessment'), the fields of that kind, and optionally a ``ref`` naming
+    it within the file. Lessons give their course as ``course`` (a ref) or
+    ``course_id``; assessments give their lesson as ``lesson`` or
+    ``lesson_id`` and take the lesson's course. A parent must appear before
+    or in the same batch as its children.
+
+    Lines are read as they arrive and handled in batches: a batch is
+    validated with one title query per kind, written with multi-row INSERTs
+    and indexed for search, then committed. Invalid lines are reported and
+    skipped without affecting the rest of their batch.
+
+    Parameters:
+    -----------
+    lines : iterable of str or bytes
+        The NDJSON lines.
+    author_id : int
+        The ID of the user recorded as the author of the imported content.
+    batch_size : int
+        The number of lines per transaction (default: IMPORT_BATCH_SIZE).
+    log : callable or None
+        Called with progress messages.
+
+    Returns:
+    --------
+    dict:
+        The number of lines read, the number of imported rows per kind, and
+        the errors as {'line', 'error'} dicts with 1-based line numbers.
+    """
+    log = log or (lambda message: None)
+    report = {'lines': 0, 'imported': {kind: 0 for kind in IMPORT_KINDS}, 'errors': []}
+    importer = _Importer(author_id, report)
+    batch = []
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        report['lines'] = number
+        if not line.strip():
+            continue
+        batch.append((number, line))
+        if len(batch) >= batch_size:
+            importer.import_batch(batch)
+            batch = []
+            log(f"lines: {number}, imported: {report['imported']}, errors: {len(report['errors'])}")
+    if batch:
+        importer.import_batch(batch)
+    report['errors'].sort(key=lambda error: error['line'])
+    log(f"lines: {report['lines']}, imported: {report['imported']}, errors: {len(report['errors'])}")
+    return report
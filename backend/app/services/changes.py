@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import joinedload, selectinload
+from .. import db
+from ..models.assessment import Assessment
+from ..models.content import Course, Lesson
+from .batch import get_many
+
+# Page sizes of the changes feed
+DEFAULT_CHANGES_LIMIT = 500
+MAX_CHANGES_LIMIT = 1000
+# The change time in cursors, to the microsecond
+_CURSOR_TIME = '%Y%m%d%H%M%S%f'
+
+# The feed's kinds, in the order rows changed at the same time are listed: model and serializer
+FEED_KINDS = {
+    'course': (Course, Course.to_dict),
+    'lesson': (Lesson, Lesson.to_summary),
+    'assessment': (Assessment, Assessment.to_dict),
+}
+_KIND_ORDER = {kind: order for order, kind in enumerate(FEED_KINDS)}
+
+
+def _loader_options(kind):
+    # Loaded with the changed rows, so serializing them issues no further queries
+    if kind == 'course':
+        return (joinedload(Course.author), selectinload(Course.lessons).load_only(Lesson.id),
+                selectinload(Course.assessments).load_only(Assessment.id))
+    if kind == 'assessment':
+        return joinedload(Assessment.author), joinedload(Assessment.lesson), joinedload(Assessment.course)
+    return (joinedload(Lesson.author), joinedload(Lesson.course),
+            selectinload(Lesson.assessments).load_only(Assessment.id))
+
+
+class CursorExpired(ValueError):
+    """A changes cursor older than the tombstone retention period."""
+
+
+def encode_cursor(changed_at, kind, row_id):
+    """Return the opaque cursor pointing after a change of the feed."""
+    return f'{changed_at.strftime(_CURSOR_TIME)}.{kind}.{row_id}'
+
+
+def decode_cursor(cursor):
+    """
+    Read a cursor written by encode_cursor.
+
+    Returns:
+    --------
+    tuple:
+        The change time, kind and row ID the cursor points after.
+
+    Raises:
+    -------
+    ValueError:
+        If the cursor is malformed.
+    """
+    try:
+        changed_at, kind, row_id = cursor.split('.')
+        position = datetime.strptime(changed_at, _CURSOR_TIME), kind, int(row_id)
+    except ValueError:
+        raise ValueError('Invalid cursor') from None
+    if kind not in FEED_KINDS:
+        raise ValueError('Invalid cursor')
+    return position
+
+
+def _after(model, kind, position):
+    # Rows after the cursor in (updated_at, kind, id) order
+    changed_at, cursor_kind, row_id = position
+    if _KIND_ORDER[kind] < _KIND_ORDER[cursor_kind]:
+        return model.updated_at > changed_at
+    if kind == cursor_kind:
+        return or_(model.updated_at > changed_at, and_(model.updated_at == changed_at, model.id > row_id))
+    return model.updated_at >= changed_at
+
+
+def changes_since(cursor=None, limit=DEFAULT_CHANGES_LIMIT):
+    """
+    List the courses, lessons and assessments created, updated or deleted after a cursor.
+
+    Changes are ordered by their indexed ``updated_at``, then kind and ID,
+    and each page is read with one keyset query per kind on that order,
+    however long the catalog. Changed rows are then loaded with one query
+    per kind; deleted rows are reported by ID from their tombstones.
+
+    ``updated_at`` is set when a transaction flushes, not when it commits,
+    so a transaction committing after a sync can carry changes older than
+    that sync's last row. Once the feed is caught up (no 'has_more'), the
+    cursor is therefore moved back to CHANGES_SAFETY_WINDOW_SECONDS before
+    now, and the next sync reads that window again: changes may be sent
+    more than once, and clients apply them by ID. Cursors between pages
+    stay exact.
+
+    Parameters:
+    -----------
+    cursor : str or None
+        The cursor returned by the previous page or sync; None starts from
+        the beginning.
+    limit : int
+        The most changes returned.
+
+    Returns:
+    --------
+    dict:
+        The changed rows by kind ('courses', 'lessons', 'assessments'), the
+        IDs of the deleted rows by kind under 'deleted', the cursor to send
+        next time and whether more changes are waiting ('has_more').
+
+    Raises:
+    -------
+    CursorExpired:
+        If the cursor is older than the tombstone retention period, so
+        deletions may have been purged; the client must sync again from
+        the beginning.
+    ValueError:
+        If the cursor is malformed.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    retention = timedelta(days=current_app.config['TOMBSTONE_RETENTION_DAYS'])
+    if position is not None and position[0] < datetime.utcnow() - retention:
+        raise CursorExpired('The cursor has expired; sync again without one')
+
+    entries = []
+    for kind, (model, _) in FEED_KINDS.items():
+        query = select(model.updated_at, model.id, model.deleted_at).where(model.updated_at.isnot(None))
+        if position is not None:
+            query = query.where(_after(model, kind, position))
+        query = query.order_by(model.updated_at, model.id).limit(limit + 1).execution_options(include_deleted=True)
+        entries.extend((changed_at, _KIND_ORDER[kind], row_id, kind, deleted_at is not None)
+                       for changed_at, row_id, deleted_at in db.session.execute(query))
+    entries.sort()
+    page = entries[:limit]
+
+    result = {'deleted': {}, 'has_more': len(entries) > limit, 'cursor': cursor}
+    for kind, (model, serialize) in FEED_KINDS.items():
+        changed = [entry[2] for entry in page if entry[3] == kind and not entry[4]]
+        rows = get_many(model, changed, _loader_options(kind)) if changed else {}
+        result[f'{kind}s'] = [serialize(rows[row_id]) for row_id in changed if row_id in rows]
+        result['deleted'][f'{kind}s'] = [entry[2] for entry in page if entry[3] == kind and entry[4]]
+    last = (page[-1][0], page[-1][3], page[-1][2]) if page else position
+    if last is not None:
+        changed_at, kind, row_id = last
+        settled = datetime.utcnow() - timedelta(seconds=current_app.config['CHANGES_SAFETY_WINDOW_SECONDS'])
+        if not result['has_more'] and changed_at > settled:
+            # Read again next time: changes flushed since may not be committed yet
+            changed_at, kind, row_id = settled, next(iter(FEED_KINDS)), 0
+        result['cursor'] = encode_cursor(changed_at, kind, row_id)
+    return result
+
+
+def backfill_updated_at(log=None):
+    """
+    Set ``updated_at`` to the creation time of rows never updated.
+
+    Rows created before ``updated_at`` was set on creation would otherwise
+    be missing from the changes feed. One UPDATE per table.
+
+    Parameters:
+    -----------
+    log : callable or None
+        Called with progress messages.
+
+    Returns:
+    --------
+    int:
+        The number of updated rows.
+    """
+    log = log or (lambda message: None)
+    updated = 0
+    for kind, (model, _) in FEED_KINDS.items():
+        table = model.__table__
+        count = db.session.execute(update(table).where(table.c.updated_at.is_(None))
+                                   .values(updated_at=table.c.created_at)).rowcount
+        db.session.commit()
+        log(f'{kind}s: {count} rows updated')
+        updated += count
+    return updated
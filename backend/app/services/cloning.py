@@ -0,0 +1,138 @@
+from datetime import datetime
+from sqlalchemy import and_, func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+from .. import db
+from ..models.assessment import Assessment
+from ..models.content import Course, Lesson
+from .bulk_import import MAX_TITLE_LENGTH, index_inserted
+
+# The longest title of a cloned course; the ' (<title>)' suffix of the copied lessons and assessments
+# then leaves at least 152 characters of their own titles
+MAX_CLONE_TITLE_LENGTH = 100
+
+
+class CloneConflict(ValueError):
+    """A clone whose course, lesson or assessment titles collide with existing ones."""
+
+
+def copy_title(title):
+    """
+    Return the first free course title of the form '<title> (copy)', '<title> (copy 2)', ...
+
+    Parameters:
+    -----------
+    title : str
+        The title of the cloned course.
+
+    Returns:
+    --------
+    str:
+        A course title not used yet, of at most MAX_CLONE_TITLE_LENGTH
+        characters.
+    """
+    base = f'{title[:MAX_CLONE_TITLE_LENGTH - len(" (copy 999)")].rstrip()} (copy'
+    # Deleted courses keep their titles until purged
+    taken = set(db.session.execute(select(Course.title).where(Course.title.like(f'{base}%'))
+                                   .execution_options(include_deleted=True)).scalars())
+    number = 1
+    while True:
+        candidate = f'{base})' if number == 1 else f'{base} {number})'
+        if candidate not in taken:
+            return candidate
+        number += 1
+
+
+def _renamed(column, suffix):
+    # The title of a cloned lesson or assessment: the original, cut to leave room for the suffix
+    return func.substr(column, 1, MAX_TITLE_LENGTH - len(suffix)) + suffix
+
+
+def clone_course(course_id, author_id, title=None):
+    """
+    Copy a course with all its lessons and assessments.
+
+    The copy is written with three INSERT ... SELECT statements, one per
+    table, so the rows, including the compressed bodies and questions, are
+    copied by the database without being loaded. Lessons and assessments keep
+    their order; their titles get the new course title as a suffix, since
+    titles are unique. The copies are then indexed for search. The caller
+    commits.
+
+    Parameters:
+    -----------
+    course_id : int
+        The ID of the course to copy.
+    author_id : int
+        The ID of the user recorded as the author of the copies.
+    title : str or None
+        The title of the new course, of at most MAX_CLONE_TITLE_LENGTH
+        characters; defaults to '<title> (copy)'.
+
+    Returns:
+    --------
+    dict or None:
+        The ID of the new course and the number of copied lessons and
+        assessments, or None if the course does not exist.
+
+    Raises:
+    -------
+    CloneConflict:
+        If the new course title, or a title derived from it, is already used.
+    ValueError:
+        If the new course title is longer than MAX_CLONE_TITLE_LENGTH.
+    """
+    if title is not None and len(title) > MAX_CLONE_TITLE_LENGTH:
+        raise ValueError(f'title must be at most {MAX_CLONE_TITLE_LENGTH} characters')
+    source_title = db.session.scalar(select(Course.title).where(Course.id == course_id))
+    if source_title is None:
+        return None
+    title = title or copy_title(source_title)
+    if db.session.scalar(select(Course.id).where(Course.title == title)
+                         .execution_options(include_deleted=True)) is not None:
+        raise CloneConflict(f'Course title {title!r} already exists')
+
+    courses, lessons, assessments = Course.__table__, Lesson.__table__, Assessment.__table__
+    now = datetime.utcnow()
+    suffix = f' ({title})'
+    connection = db.session.connection()
+    try:
+        connection.execute(insert(courses).from_select(
+            ['title', 'description', 'author_id', 'created_at', 'updated_at'],
+            select(literal(title), courses.c.description, literal(author_id), literal(now), literal(now))
+            .where(courses.c.id == course_id)))
+        clone_id = connection.scalar(select(courses.c.id).where(courses.c.title == title))
+
+        copied_lessons = connection.execute(insert(lessons).from_select(
+            ['title', 'body', 'excerpt', 'body_length', 'author_id', 'course_id', 'position', 'created_at',
+             'updated_at', 'version'],
+            select(_renamed(lessons.c.title, suffix), lessons.c.body, lessons.c.excerpt, lessons.c.body_length,
+                   literal(author_id), literal(clone_id), lessons.c.position, literal(now), literal(now), literal(1))
+            .where(lessons.c.course_id == course_id, lessons.c.deleted_at.is_(None)))).rowcount
+
+        # Each assessment follows its lesson: the copy is found by its derived title
+        source, copy = lessons.alias('source_lessons'), lessons.alias('copied_lessons')
+        copied_assessments = connection.execute(insert(assessments).from_select(
+            ['title', 'author_id', 'lesson_id', 'course_id', 'questions', 'type', 'answers', 'position', 'created_at',
+             'updated_at'],
+            select(_renamed(assessments.c.title, suffix), literal(author_id), copy.c.id, literal(clone_id),
+                   assessments.c.questions, assessments.c.type, assessments.c.answers, assessments.c.position,
+                   literal(now), literal(now))
+            .select_from(assessments
+                         .join(source, source.c.id == assessments.c.lesson_id)
+                         .join(copy, and_(copy.c.course_id == clone_id,
+                                          copy.c.title == _renamed(source.c.title, suffix))))
+            .where(source.c.course_id == course_id, assessments.c.deleted_at.is_(None)))).rowcount
+    except IntegrityError:
+        db.session.rollback()
+        raise CloneConflict(f'Titles ending with {suffix!r} already exist') from None
+
+    index_inserted({
+        'course': [row._asdict() for row in connection.execute(
+            select(Course.id, Course.title, Course.description).where(Course.id == clone_id))],
+        'lesson': [row._asdict() for row in connection.execute(
+            select(Lesson.id, Lesson.title, Lesson.body, Lesson.course_id).where(Lesson.course_id == clone_id))],
+        'assessment': [row._asdict() for row in connection.execute(
+            select(Assessment.id, Assessment.title, Assessment.questions, Assessment.course_id)
+            .where(Assessment.course_id == clone_id))],
+    })
+    return {'id': clone_id, 'lessons': copied_lessons, 'assessments': copied_assessments}
@@ -0,0 +1,79 @@
+from sqlalchemy import LargeBinary, bindparam, select, type_coerce, update
+from .. import db
+from ..models.assessment import Assessment
+from ..models.content import Course, Lesson
+from ..models.submission import Submission
+from ..models.types import CODECS, codec_marker, compress_text, decompress_text
+
+# Columns stored with the CompressedText type
+COMPRESSED_COLUMNS = (
+    (Lesson, 'body'),
+    (Course, 'description'),
+    (Assessment, 'questions'),
+    (Submission, 'answers'),
+    (Submission, 'feedback'),
+)
+
+
+def recompress(batch_size=500, codec=None, columns=COMPRESSED_COLUMNS, log=None):
+    """
+    Rewrite stored values of the compressed columns in the current format.
+
+    Legacy uncompressed rows, rows written with another codec and rows that
+    crossed the size threshold are rewritten; rows already in the target
+    format are left alone, so the migration can be interrupted and resumed.
+    Rows are read in primary-key order and each batch is its own transaction,
+    which keeps locks short while the application keeps serving traffic.
+
+    Parameters:
+    -----------
+    batch_size : int
+        The number of rows read per transaction (default: 500).
+    codec : str or None
+        'zlib' or 'zstd'; defaults to the TEXT_COMPRESSION_CODEC setting.
+    columns : iterable of (model, str)
+        The columns to migrate (default: COMPRESSED_COLUMNS).
+    log : callable or None
+        Called with progress messages.
+
+    Returns:
+    --------
+    dict:
+        Per '<table>.<column>': the number of rows, of rewritten rows, and the
+        total text and stored sizes in bytes.
+    """
+    log = log or (lambda message: None)
+    marker = codec_marker(codec) if codec else None
+    report = {}
+    for model, name in columns:
+        table = model.__table__
+        column = table.c[name]
+        stats = {'rows': 0, 'rewritten': 0, 'text_bytes': 0, 'stored_bytes': 0}
+        statement = (update(table).where(table.c.id == bindparam('row_id'))
+                     .values({name: bindparam('stored', type_=LargeBinary)}))
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(table.c.id, type_coerce(column, LargeBinary))
+                .where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)).all()
+            if not rows:
+                break
+            changed = []
+            for row_id, stored in rows:
+                if stored is None:
+                    continue
+                text = decompress_text(stored)
+                encoded = compress_text(text, codec=marker)
+                stats['text_bytes'] += len(text.encode('utf-8'))
+                stats['stored_bytes'] += len(encoded)
+                if isinstance(stored, str) or bytes(stored) != encoded:
+                    changed.append({'row_id': row_id, 'stored': encoded})
+            if changed:
+                db.session.execute(statement, changed)
+            db.session.commit()
+            stats['rows'] += len(rows)
+            stats['rewritten'] += len(changed)
+            last_id = rows[-1][0]
+            log(f'{table.name}.{name}: {stats["rows"]} rows, {stats["rewritten"]} rewritten')
+        report[f'{table.name}.{name}'] = stats
+    return report
@@ -0,0 +1,190 @@
+import re
+import threading
+import time
+from collections import deque
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from .metrics import summarize
+
+_SELECT = re.compile(r'^(\s*SELECT)\b', re.I)
+
+
+class PoolStats:
+    """
+    Checkout statistics of a connection pool.
+
+    Keeps totals since start-up and the wait times of recent checkouts, from
+    which readiness checks compute percentiles over a sliding time window.
+    """
+
+    def __init__(self, window_size=1000):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def record(self, wait, timed_out=False):
+        """Record one checkout attempt that waited ``wait`` seconds."""
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.recent.append((time.monotonic(), wait))
+
+    def snapshot(self, window=60):
+        """
+        Return the statistics, with wait-time percentiles over the last ``window`` seconds.
+
+        Returns:
+        --------
+        dict:
+            Checkout and timeout counts, mean and max wait since start-up and
+            p50/p95/p99 wait of recent checkouts, in milliseconds.
+        """
+        since = time.monotonic() - window
+        with self._lock:
+            recent = [wait for at, wait in self.recent if at >= since]
+            totals = {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'mean_wait_ms': round(self.total_wait * 1000 / self.checkouts, 3) if self.checkouts else None,
+                'max_wait_ms': round(self.max_wait * 1000, 3),
+            }
+        summary = summarize(recent)
+        totals['recent_checkouts'] = summary['count']
+        for name in ('p50', 'p95', 'p99'):
+            totals[f'recent_{name}_wait_ms'] = round(summary[name] * 1000, 3) if summary[name] is not None else None
+        return totals
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that measures how long each checkout waits for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        self._waiting = threading.local()
+
+    def _do_get(self):
+        # QueuePool retries by calling _do_get recursively; only time the outer call
+        if getattr(self._waiting, 'active', False):
+            return super()._do_get()
+        self._waiting.active = True
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        finally:
+            self._waiting.active = False
+        self.stats.record(time.perf_counter() - started)
+        return connection
+
+
+def pool_status(engine, window=60):
+    """
+    Describe the state of an engine's connection pool.
+
+    Parameters:
+    -----------
+    engine : Engine
+        The SQLAlchemy engine.
+    window : int
+        The number of seconds of recent checkouts used for wait percentiles.
+
+    Returns:
+    --------
+    dict:
+        The pool class and, for queue pools, its size, checked-out and
+        overflow connections, utilization and checkout wait statistics.
+    """
+    pool = engine.pool
+    status = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        status.update({
+            'size': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'utilization': round(pool.checkedout() / capacity, 3) if capacity else None,
+        })
+    if isinstance(pool, MeteredQueuePool):
+        status.update(pool.stats.snapshot(window))
+    return status
+
+
+def add_statement_timeout(statement, timeout_ms):
+    """
+    Add a MySQL MAX_EXECUTION_TIME optimizer hint to a SELECT statement.
+
+    Parameters:
+    -----------
+    statement : str
+        The SQL statement.
+    timeout_ms : int
+        The timeout in milliseconds.
+
+    Returns:
+    --------
+    str:
+        The statement with the hint, or unchanged if it is not a SELECT.
+    """
+    return _SELECT.sub(rf'\1 /*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */', statement, count=1)
+
+
+def setup_statement_timeouts(engine, default_ms):
+    """
+    Enforce statement timeouts on a MySQL engine.
+
+    Every connection gets the session-wide ``max_execution_time`` of
+    ``default_ms``; individual queries can use another limit with the
+    ``statement_timeout_ms`` execution option, for example
+    ``db.session.execute(query, execution_options={'statement_timeout_ms': 500})``.
+    MySQL only applies these limits to read-only SELECT statements.
+
+    Parameters:
+    -----------
+    engine : Engine
+        The SQLAlchemy engine.
+    default_ms : int
+        The default timeout in milliseconds; 0 disables it.
+    """
+    if engine.dialect.name != 'mysql':
+        return
+
+    if default_ms:
+        @event.listens_for(engine, 'connect')
+        def set_session_timeout(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f'SET SESSION max_execution_time = {int(default_ms)}')
+            cursor.close()
+
+    @event.listens_for(engine, 'before_cursor_execute', retval=True)
+    def apply_query_timeout(conn, cursor, statement, parameters, context, executemany):
+        timeout_ms = context.execution_options.get('statement_timeout_ms') if context else None
+        if timeout_ms:
+            statement = add_statement_timeout(statement, timeout_ms)
+        return statement, parameters
+
+
+def setup_database(app, db):
+    """
+    Apply the configured statement timeouts to the application's engines.
+
+    Parameters:
+    -----------
+    app : Flask
+        The Flask application instance.
+    db : SQLAlchemy
+        The Flask-SQLAlchemy extension bound to the application.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            setup_statement_timeouts(engine, app.config.get('DB_STATEMENT_TIMEOUT_MS', 0))
@@ -0,0 +1,349 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, event, or_, select, update
+from sqlalchemy.orm import with_loader_criteria
+from .. import db
+from ..models.assessment import Assessment
+from ..models.content import Course, Lesson, LessonRevision
+from ..models.gradebook import GradebookEntry
+from ..models.submission import Submission
+from ..models.user import User
+from . import search as search_service
+from . import verses as verse_service
+from .outlines import invalidate_outlines
+from .replicas import RoutingSession
+
+# The most rows deleted per statement and transaction by the purge functions
+DELETE_BATCH_SIZE = 500
+# Models deleted as tombstones (see soft_delete), by kind
+TOMBSTONED_MODELS = {Course: 'course', Lesson: 'lesson', Assessment: 'assessment'}
+# The rows deleted together with a tombstoned row, as (model, column referencing it)
+_CONTAINED = {
+    Course: ((Lesson, Lesson.course_id), (Assessment, Assessment.course_id)),
+    Lesson: ((Assessment, Assessment.lesson_id),),
+    Assessment: (),
+}
+_LIVE_ROWS = tuple(with_loader_criteria(model, model.deleted_at.is_(None), include_aliases=True)
+                   for model in TOMBSTONED_MODELS)
+
+
+def _forget_titles(doc_type, doc_ids):
+    # Core DELETEs skip the suggestion index listeners; it is updated after the commit
+    db.session.info.setdefault('suggest_pending', []).extend(
+        ('remove', doc_type, doc_id, None) for doc_id in doc_ids)
+
+
+def delete_assessments(connection, assessment_ids):
+    """
+    Delete assessments with their submissions and gradebook entries, with set-based DELETEs.
+
+    Parameters:
+    -----------
+    connection : Connection
+        The connection of the writing transaction.
+    assessment_ids : list of int
+        The IDs of the assessments.
+    """
+    if not assessment_ids:
+        return
+    course_ids = connection.execute(
+        select(Assessment.course_id).where(Assessment.id.in_(assessment_ids)).distinct()).scalars().all()
+    connection.execute(delete(GradebookEntry).where(GradebookEntry.assessment_id.in_(assessment_ids)))
+    connection.execute(delete(Submission).where(Submission.assessment_id.in_(assessment_ids)))
+    verse_service.remove_references(connection, 'assessment', assessment_ids)
+    connection.execute(delete(Assessment).where(Assessment.id.in_(assessment_ids)))
+    db.session.info['verse_index_stale'] = True
+    invalidate_outlines(connection, course_ids)
+
+
+def delete_lessons(connection, lesson_ids):
+    """
+    Delete lessons with their assessments and revisions, with set-based DELETEs.
+
+    Parameters:
+    -----------
+    connection : Connection
+        The connection of the writing transaction.
+    lesson_ids : list of int
+        The IDs of the lessons.
+    """
+    if not lesson_ids:
+        return
+    course_ids = connection.execute(
+        select(Lesson.course_id).where(Lesson.id.in_(lesson_ids)).distinct()).scalars().all()
+    delete_assessments(connection, connection.execute(
+        select(Assessment.id).where(Assessment.lesson_id.in_(lesson_ids))).scalars().all())
+    connection.execute(delete(LessonRevision).where(LessonRevision.lesson_id.in_(lesson_ids)))
+    search_service.remove_documents(connection, 'lesson', lesson_ids)
+    verse_service.remove_references(connection, 'lesson', lesson_ids)
+    connection.execute(delete(Lesson).where(Lesson.id.in_(lesson_ids)))
+    _forget_titles('lesson', lesson_ids)
+    db.session.info['verse_index_stale'] = True
+    invalidate_outlines(connection, course_ids)
+
+
+def delete_courses(connection, course_ids):
+    """
+    Delete courses whose lessons and assessments are already deleted.
+
+    Parameters:
+    -----------
+    connection : Connection
+        The connection of the writing transaction.
+    course_ids : list of int
+        The IDs of the courses.
+    """
+    if not course_ids:
+        return
+    connection.execute(delete(GradebookEntry).where(GradebookEntry.course_id.in_(course_ids)))
+    search_service.remove_documents(connection, 'course', course_ids)
+    invalidate_outlines(connection, course_ids)
+    connection.execute(delete(Course).where(Course.id.in_(course_ids)))
+    _forget_titles('course', course_ids)
+
+
+def _purge(query, remove, batch_size):
+    # Deletes the rows selected by `query` in batches, one transaction each; the query is run again
+    # after every batch, so an interrupted purge resumes where it stopped
+    deleted = 0
+    while True:
+        ids = db.session.execute(query.limit(batch_size).execution_options(include_deleted=True)).scalars().all()
+        if not ids:
+            return deleted
+        remove(db.session.connection(), ids)
+        db.session.commit()
+        deleted += len(ids)
+
+
+def purge_course(course_id, batch_size=DELETE_BATCH_SIZE):
+    """
+    Delete a course with all its lessons and assessments, without loading them.
+
+    The rows are deleted with set-based DELETE statements, in batches of
+    ``batch_size`` rows committed one at a time, so deleting a large course
+    neither loads it into the session nor holds locks on all its rows in
+    one long transaction. The search, suggestion and verse indexes, the
+    gradebook and the cached outline are cleaned up along the way.
+
+    Parameters:
+    -----------
+    course_id : int
+        The ID of the course.
+    batch_size : int
+        The most rows deleted per transaction (default: DELETE_BATCH_SIZE).
+
+    Returns:
+    --------
+    dict:
+        The number of deleted assessments, lessons and courses.
+    """
+    return {
+        'assessments': _purge(select(Assessment.id).where(Assessment.course_id == course_id),
+                              delete_assessments, batch_size),
+        'lessons': _purge(select(Lesson.id).where(Lesson.course_id == course_id), delete_lessons, batch_size),
+        'courses': _purge(select(Course.id).where(Course.id == course_id), delete_courses, batch_size),
+    }
+
+
+def _delete_submissions(connection, submission_ids):
+    connection.execute(delete(GradebookEntry).where(GradebookEntry.submission_id.in_(submission_ids)))
+    connection.execute(delete(Submission).where(Submission.id.in_(submission_ids)))
+
+
+def purge_user(user_id, batch_size=DELETE_BATCH_SIZE):
+    """
+    Delete a user with their courses, lessons, assessments and submissions.
+
+    Each authored course is purged with purge_course; the lessons and
+    assessments the user wrote in other authors' courses and the user's own
+    submissions follow in batches, then the user. Lesson revisions the user
+    wrote are kept, without their author. Called by purge_deleted once the
+    tombstones left by soft_delete_user have outlived the retention period,
+    so that synced clients have learnt of the deletion; whatever content is
+    left is removed with the user.
+
+    Parameters:
+    -----------
+    user_id : int
+        The ID of the user.
+    batch_size : int
+        The most rows deleted per transaction (default: DELETE_BATCH_SIZE).
+
+    Returns:
+    --------
+    dict:
+        The number of deleted courses, lessons, assessments and submissions.
+    """
+    result = {'courses': 0, 'lessons': 0, 'assessments': 0}
+    courses = select(Course.id).where(Course.author_id == user_id).execution_options(include_deleted=True)
+    for course_id in db.session.execute(courses).scalars().all():
+        for kind, count in purge_course(course_id, batch_size).items():
+            result[kind] += count
+    result['lessons'] += _purge(select(Lesson.id).where(Lesson.author_id == user_id), delete_lessons, batch_size)
+    result['assessments'] += _purge(select(Assessment.id).where(Assessment.author_id == user_id),
+                                    delete_assessments, batch_size)
+    result['submissions'] = _purge(select(Submission.id).where(Submission.student_id == user_id),
+                                   _delete_submissions, batch_size)
+    connection = db.session.connection()
+    connection.execute(update(LessonRevision).where(LessonRevision.author_id == user_id).values(author_id=None))
+    connection.execute(delete(GradebookEntry).where(GradebookEntry.student_id == user_id))
+    connection.execute(delete(User).where(User.id == user_id))
+    db.session.commit()
+    return result
+
+
+def soft_delete_user(user_id):
+    """
+    Mark a user as deleted, with the courses, lessons and assessments they wrote.
+
+    Deleted users can no longer sign in and are left out of user lists.
+    Their courses with everything they contain, and the lessons and
+    assessments they wrote in other authors' courses, become tombstones as
+    with soft_delete, so the changes feed reports them to synced clients.
+    purge_deleted removes the tombstones and then the user with purge_user
+    once the retention period is over, so deleting a user with a large
+    history does not run in the request. Each table is marked with one
+    UPDATE. The caller commits.
+
+    Parameters:
+    -----------
+    user_id : int
+        The ID of the user.
+
+    Returns:
+    --------
+    dict:
+        The IDs of the rows marked as deleted, by kind ('course', 'lesson'
+        or 'assessment').
+    """
+    connection = db.session.connection()
+    now = datetime.utcnow()
+    connection.execute(update(User).where(User.id == user_id, User.deleted_at.is_(None))
+                       .values(deleted_at=now, updated_at=now))
+    authored_courses = select(Course.id).where(Course.author_id == user_id)
+    authored_lessons = select(Lesson.id).where(Lesson.author_id == user_id)
+    deleted = {
+        'course': _tombstone(connection, Course, Course.author_id == user_id, now),
+        'lesson': _tombstone(connection, Lesson, or_(Lesson.author_id == user_id,
+                                                     Lesson.course_id.in_(authored_courses)), now),
+        'assessment': _tombstone(connection, Assessment, or_(Assessment.author_id == user_id,
+                                                             Assessment.course_id.in_(authored_courses),
+                                                             Assessment.lesson_id.in_(authored_lessons)), now),
+    }
+    course_ids = set(deleted['course'])
+    for model, kind in ((Lesson, 'lesson'), (Assessment, 'assessment')):
+        if deleted[kind]:
+            course_ids.update(connection.execute(
+                select(model.course_id).where(model.id.in_(deleted[kind])).distinct()).scalars())
+    _unindex(connection, deleted, course_ids)
+    return deleted
+
+
+def _tombstone(connection, model, condition, now):
+    # Marks the live rows matching `condition` as deleted and returns their IDs
+    ids = connection.execute(select(model.id).where(condition, model.deleted_at.is_(None))).scalars().all()
+    if ids:
+        connection.execute(update(model).where(model.id.in_(ids)).values(deleted_at=now, updated_at=now))
+    return ids
+
+
+def soft_delete(model, row_id):
+    """
+    Mark a course, lesson or assessment and the rows it contains as deleted.
+
+    The rows stay as tombstones, hidden from ORM queries, so the changes
+    feed can report the deletion; purge_deleted removes them once the
+    retention period is over. They leave the search, suggestion and verse
+    indexes and the outline cache at once. Each table is marked with one
+    UPDATE, whatever the number of rows. The caller commits.
+
+    Parameters:
+    -----------
+    model : Course, Lesson or Assessment
+        The model of the deleted row.
+    row_id : int
+        The ID of the deleted row.
+
+    Returns:
+    --------
+    dict:
+        The IDs of the rows marked as deleted, by kind ('course', 'lesson'
+        or 'assessment').
+    """
+    connection = db.session.connection()
+    now = datetime.utcnow()
+    course_ids = [row_id] if model is Course else connection.execute(
+        select(model.course_id).where(model.id == row_id)).scalars().all()
+    deleted = {TOMBSTONED_MODELS[model]: _tombstone(connection, model, model.id == row_id, now)}
+    for child, column in _CONTAINED[model]:
+        deleted[TOMBSTONED_MODELS[child]] = _tombstone(connection, child, column == row_id, now)
+    _unindex(connection, deleted, course_ids)
+    return deleted
+
+
+def _unindex(connection, deleted, course_ids):
+    # Takes tombstoned rows, by kind, out of the search, suggestion and verse indexes and the outline cache
+    for doc_type in search_service.DOC_TYPES:
+        if deleted.get(doc_type):
+            search_service.remove_documents(connection, doc_type, deleted[doc_type])
+            _forget_titles(doc_type, deleted[doc_type])
+    for doc_type, _ in verse_service.REFERENCING_FIELDS.values():
+        if deleted.get(doc_type):
+            verse_service.remove_references(connection, doc_type, deleted[doc_type])
+            db.session.info['verse_index_stale'] = True
+    invalidate_outlines(connection, course_ids)
+
+
+def purge_deleted(retention=None, batch_size=DELETE_BATCH_SIZE, log=None):
+    """
+    Delete the tombstones and deleted users older than the retention period.
+
+    Courses are removed with purge_course, then the assessments and lessons
+    deleted on their own, in batches, and finally the users with purge_user.
+
+    Parameters:
+    -----------
+    retention : timedelta or None
+        How long tombstones are kept (default: TOMBSTONE_RETENTION_DAYS).
+    batch_size : int
+        The most rows deleted per transaction (default: DELETE_BATCH_SIZE).
+    log : callable or None
+        Called with progress messages.
+
+    Returns:
+    --------
+    dict:
+        The number of purged courses, lessons, assessments and users.
+    """
+    log = log or (lambda message: None)
+    if retention is None:
+        retention = timedelta(days=current_app.config['TOMBSTONE_RETENTION_DAYS'])
+    cutoff = datetime.utcnow() - retention
+    result = {'courses': 0, 'lessons': 0, 'assessments': 0}
+    course_ids = db.session.execute(
+        select(Course.id).where(Course.deleted_at < cutoff).execution_options(include_deleted=True)).scalars().all()
+    for course_id in course_ids:
+        for kind, count in purge_course(course_id, batch_size).items():
+            result[kind] += count
+    log(f'courses: {result["courses"]} purged')
+    result['assessments'] += _purge(select(Assessment.id).where(Assessment.deleted_at < cutoff),
+                                    delete_assessments, batch_size)
+    log(f'assessments: {result["assessments"]} purged')
+    result['lessons'] += _purge(select(Lesson.id).where(Lesson.deleted_at < cutoff), delete_lessons, batch_size)
+    log(f'lessons: {result["lessons"]} purged')
+    result['users'] = 0
+    for user_id in db.session.execute(select(User.id).where(User.deleted_at < cutoff)).scalars().all():
+        for kind, count in purge_user(user_id, batch_size).items():
+            if kind in result:
+                result[kind] += count
+        result['users'] += 1
+    log(f'users: {result["users"]} purged')
+    return result
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _hide_deleted(state):
+    # Tombstones stay in the tables until purged; ORM queries and relationship loads skip them
+    # unless run with the include_deleted execution option
+    if state.is_select and not state.is_column_load and not state.execution_options.get('include_deleted', False):
+        state.statement = state.statement.options(*_LIVE_ROWS)
@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select
+from .. import db
+from ..models.assessment import Assessment
+from ..models.submission import Submission
+from ..models.user import User
+from .grading import render_feedback
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_FIELDS = ('submission_id', 'student_id', 'student', 'course_id', 'lesson_id', 'assessment_id',
+                 'assessment_title', 'submitted_at', 'score', 'results', 'feedback', 'answers')
+# Rows fetched per keyset page
+EXPORT_BATCH_SIZE = 1000
+GZIP_LEVEL = 6
+
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 date or date and time from a filter, or return None if malformed."""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def export_submissions(course_id=None, lesson_id=None, assessment_id=None, since=None, until=None,
+                       batch_size=EXPORT_BATCH_SIZE):
+    """
+    Stream submissions with their scores and feedback.
+
+    The rows are read in keyset pages of ``batch_size`` submissions, by
+    ascending ID, so memory use does not grow with the number of exported
+    submissions even with drivers that buffer whole results, such as
+    mysql-connector. Each page is a short query of its own, run with
+    EXPORT_STATEMENT_TIMEOUT_MS instead of the session's statement timeout,
+    so a long export is not cut short by it.
+
+    Parameters:
+    -----------
+    course_id, lesson_id, assessment_id : int or None
+        Only export submissions of this course, lesson or assessment.
+    since, until : datetime or None
+        Only export submissions made at or after ``since`` and before ``until``.
+    batch_size : int
+        The number of rows fetched per page (default: EXPORT_BATCH_SIZE).
+
+    Yields:
+    -------
+    dict:
+        One submission, with the keys of EXPORT_FIELDS. The feedback is the
+        teacher's, or the messages rendered from the result codes.
+    """
+    statement = (select(Submission.id, Submission.student_id, User.username, Assessment.course_id,
+                        Assessment.lesson_id, Submission.assessment_id, Assessment.title, Submission.submitted_at,
+                        Submission.score, Submission.results, Submission.feedback, Submission.answers)
+                 .join(Assessment, Assessment.id == Submission.assessment_id)
+                 .join(User, User.id == Submission.student_id)
+                 .order_by(Submission.id)
+                 .limit(batch_size))
+    if course_id is not None:
+        statement = statement.where(Assessment.course_id == course_id)
+    if lesson_id is not None:
+        statement = statement.where(Assessment.lesson_id == lesson_id)
+    if assessment_id is not None:
+        statement = statement.where(Submission.assessment_id == assessment_id)
+    if since is not None:
+        statement = statement.where(Submission.submitted_at >= since)
+    if until is not None:
+        statement = statement.where(Submission.submitted_at < until)
+
+    options = {'statement_timeout_ms': current_app.config['EXPORT_STATEMENT_TIMEOUT_MS']}
+    last_id = None
+    while True:
+        page = statement if last_id is None else statement.where(Submission.id > last_id)
+        rows = db.session.execute(page, execution_options=options).all()
+        for row in rows:
+            record = dict(zip(EXPORT_FIELDS, row))
+            if record['feedback'] is None and record['results'] is not None:
+                record['feedback'] = json.dumps(render_feedback(record['results']))
+            if record['submitted_at'] is not None:
+                record['submitted_at'] = record['submitted_at'].isoformat()
+            yield record
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1][0]
+
+
+def csv_chunks(records):
+    """Render records as CSV, yielding the header and then one line per record."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    for record in records:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(record)
+        yield buffer.getvalue()
+
+
+def ndjson_chunks(records):
+    """Render records as newline-delimited JSON, one line per record."""
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def gzip_chunks(chunks, level=GZIP_LEVEL):
+    """Compress a stream of text chunks into a gzip stream without buffering it."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(export_format, records, compress=False):
+    """
+    Render exported records in a format, optionally gzip-compressed.
+
+    Parameters:
+    -----------
+    export_format : str
+        'csv' or 'ndjson'.
+    records : iterable of dict
+        The records from export_submissions.
+    compress : bool
+        Whether to gzip the output.
+
+    Returns:
+    --------
+    iterator:
+        Text chunks, or bytes when compressed.
+    """
+    chunks = csv_chunks(records) if export_format == 'csv' else ndjson_chunks(records)
+    return gzip_chunks(chunks) if compress else chunks
@@ -0,0 +1,161 @@
+import csv
+import io
+from datetime import datetime
+from sqlalchemy import delete, event, insert, inspect, literal, select, update
+from .. import db
+from ..models.assessment import Assessment
+from ..models.gradebook import GradebookEntry
+from ..models.submission import Submission
+from ..models.user import User
+from .grading import PENDING_REVIEW
+
+# Submission attributes copied into the gradebook
+GRADED_FIELDS = ('student_id', 'assessment_id', 'score', 'results')
+_ENTRY_COLUMNS = ('course_id', 'student_id', 'assessment_id', 'submission_id', 'score', 'pending', 'updated_at')
+
+
+def _pending(results):
+    return results is not None and PENDING_REVIEW in results
+
+
+def write_entry(connection, submission):
+    """
+    Write the gradebook entry of a submission, replacing any previous one.
+
+    The course is read from the assessment inside the INSERT ... SELECT, so
+    the entry is written with one statement in the submission's transaction.
+
+    Parameters:
+    -----------
+    connection : Connection
+        The connection of the flushing session.
+    submission : Submission
+        The inserted or updated submission.
+    """
+    entries, assessments = GradebookEntry.__table__, Assessment.__table__
+    connection.execute(delete(entries).where(entries.c.submission_id == submission.id))
+    connection.execute(insert(entries).from_select(_ENTRY_COLUMNS, select(
+        assessments.c.course_id, literal(submission.student_id), literal(submission.assessment_id),
+        literal(submission.id), literal(submission.score, type_=entries.c.score.type),
+        literal(_pending(submission.results)), literal(datetime.utcnow()),
+    ).where(assessments.c.id == submission.assessment_id)))
+
+
+def _gradebook_after_insert(mapper, connection, target):
+    write_entry(connection, target)
+
+
+def _gradebook_after_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in GRADED_FIELDS):
+        write_entry(connection, target)
+
+
+def _gradebook_after_delete(mapper, connection, target):
+    entries = GradebookEntry.__table__
+    connection.execute(delete(entries).where(entries.c.submission_id == target.id))
+
+
+event.listen(Submission, 'after_insert', _gradebook_after_insert)
+event.listen(Submission, 'after_update', _gradebook_after_update)
+event.listen(Submission, 'after_delete', _gradebook_after_delete)
+
+
+@event.listens_for(Assessment, 'after_update')
+def _assessment_moved(mapper, connection, target):
+    if inspect(target).attrs.course_id.history.has_changes():
+        entries = GradebookEntry.__table__
+        connection.execute(update(entries).where(entries.c.assessment_id == target.id)
+                           .values(course_id=target.course_id))
+
+
+@event.listens_for(Assessment, 'after_delete')
+def _assessment_deleted(mapper, connection, target):
+    entries = GradebookEntry.__table__
+    connection.execute(delete(entries).where(entries.c.assessment_id == target.id))
+
+
+def rebuild_gradebook(log=None):
+    """
+    Rebuild every gradebook entry from the submissions.
+
+    Used after writes that bypass the ORM, such as bulk loads. The entries
+    are recomputed with one INSERT ... SELECT.
+
+    Parameters:
+    -----------
+    log : callable or None
+        Called with progress messages.
+
+    Returns:
+    --------
+    int:
+        The number of gradebook entries.
+    """
+    log = log or (lambda message: None)
+    entries, submissions, assessments = GradebookEntry.__table__, Submission.__table__, Assessment.__table__
+    db.session.execute(delete(entries))
+    pending = submissions.c.results.is_not(None) & submissions.c.results.contains(PENDING_REVIEW)
+    db.session.execute(insert(entries).from_select(_ENTRY_COLUMNS, select(
+        assessments.c.course_id, submissions.c.student_id, submissions.c.assessment_id, submissions.c.id,
+        submissions.c.score, pending, literal(datetime.utcnow()),
+    ).join(assessments, assessments.c.id == submissions.c.assessment_id)))
+    db.session.commit()
+    count = db.session.execute(select(db.func.count()).select_from(entries)).scalar()
+    log(f'gradebook entries: {count}')
+    return count
+
+
+def course_gradebook(course_id):
+    """
+    Read the students × assessments score grid of a course.
+
+    Parameters:
+    -----------
+    course_id : int
+        The ID of the course.
+
+    Returns:
+    --------
+    tuple:
+        The course's assessments as (id, title) rows, in ID order, and one
+        dict per student who submitted any of them, by username, with the
+        score of every assessment (None when not submitted), the IDs of the
+        assessments pending manual grading and the total score.
+    """
+    assessments = db.session.execute(
+        select(Assessment.id, Assessment.title).where(Assessment.course_id == course_id)
+        .order_by(Assessment.id)).all()
+    columns = {assessment_id: position for position, (assessment_id, _) in enumerate(assessments)}
+    rows = db.session.execute(
+        select(GradebookEntry.student_id, User.username, GradebookEntry.assessment_id,
+               GradebookEntry.score, GradebookEntry.pending)
+        .join(User, User.id == GradebookEntry.student_id)
+        .where(GradebookEntry.course_id == course_id)
+        .order_by(User.username, GradebookEntry.student_id))
+
+    students, current = [], None
+    for student_id, username, assessment_id, score, pending in rows:
+        if current is None or current['id'] != student_id:
+            current = {'id': student_id, 'username': username, 'scores': [None] * len(assessments),
+                       'pending': [], 'total': 0}
+            students.append(current)
+        position = columns.get(assessment_id)
+        if position is None:
+            continue
+        current['scores'][position] = score
+        current['total'] += score or 0
+        if pending:
+            current['pending'].append(assessment_id)
+    return assessments, students
+
+
+def gradebook_csv(assessments, students):
+    """Render a course gradebook as CSV, one row per student and one column per assessment."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['student_id', 'username'] + [title for _, title in assessments] + ['total'])
+    for student in students:
+        writer.writerow([student['id'], student['username']]
+                        + ['' if score is None else score for score in student['scores']] + [student['total']])
+    return output.getvalue()
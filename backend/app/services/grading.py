@@ -0,0 +1,160 @@
+import json
+import re
+from sqlalchemy import bindparam, select, update
+from .. import db
+from ..models.submission import Submission
+
+# One result code per question, stored as one character each in Submission.results
+INCORRECT = '0'
+CORRECT = '1'
+PENDING_REVIEW = '2'
+UNKNOWN_TYPE = '3'
+AUTO_GRADED_TYPES = ('multiple_choice', 'true_false')
+
+_MESSAGES = {
+    CORRECT: 'Question {number}: Correct (+1)',
+    INCORRECT: 'Question {number}: Incorrect (-1)',
+    PENDING_REVIEW: 'Question {number}: Text answer submitted; will be graded by the teacher.',
+    UNKNOWN_TYPE: 'Question {number}: Unknown question type',
+}
+_LEGACY_MESSAGE = re.compile(r'^Question (\d+): (Correct|Incorrect|Text answer|Unknown)')
+_LEGACY_CODES = {'Correct': CORRECT, 'Incorrect': INCORRECT, 'Text answer': PENDING_REVIEW, 'Unknown': UNKNOWN_TYPE}
+
+
+def score_answers(questions, submitted_answers):
+    """
+    Score submitted answers against an assessment's questions.
+
+    Multiple choice and true/false answers score +1 when correct and -1
+    otherwise. Text answers are left for the teacher to grade.
+
+    Parameters:
+    -----------
+    questions : list of dict
+        The assessment's questions.
+    submitted_answers : list
+        The student's answers, one per question.
+
+    Returns:
+    --------
+    tuple:
+        The score, the result codes as a string with one character per
+        question, and whether some answers need manual grading.
+    """
+    score = 0
+    codes = []
+    for question, submitted_answer in zip(questions, submitted_answers):
+        question_type = question.get('type')
+        if question_type in AUTO_GRADED_TYPES:
+            if submitted_answer == question.get('correct_answer'):
+                score += 1
+                codes.append(CORRECT)
+            else:
+                score -= 1
+                codes.append(INCORRECT)
+        elif question_type == 'text':
+            codes.append(PENDING_REVIEW)
+        else:
+            codes.append(UNKNOWN_TYPE)
+    results = ''.join(codes)
+    return score, results, PENDING_REVIEW in results
+
+
+def render_feedback(results):
+    """
+    Render the per-question feedback messages of a submission.
+
+    Parameters:
+    -----------
+    results : str
+        The result codes stored with the submission.
+
+    Returns:
+    --------
+    list of str:
+        One message per question, followed by a summary of the answers that
+        need manual review, if any.
+    """
+    feedback = [_MESSAGES.get(code, _MESSAGES[UNKNOWN_TYPE]).format(number=number)
+                for number, code in enumerate(results, 1)]
+    pending = results.count(PENDING_REVIEW)
+    if pending:
+        feedback.append(f'{pending} text question(s) need manual review.')
+    return feedback
+
+
+def parse_legacy_feedback(feedback):
+    """
+    Recover the result codes and score from feedback stored as messages.
+
+    Parameters:
+    -----------
+    feedback : str
+        A JSON list of messages written by earlier versions.
+
+    Returns:
+    --------
+    tuple or None:
+        (score, results), or None if the feedback is not in that format.
+    """
+    try:
+        messages = json.loads(feedback)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(messages, list):
+        return None
+    codes = {}
+    for message in messages:
+        match = _LEGACY_MESSAGE.match(message) if isinstance(message, str) else None
+        if match:
+            codes[int(match.group(1))] = _LEGACY_CODES[match.group(2)]
+    if not codes or sorted(codes) != list(range(1, len(codes) + 1)):
+        return None
+    results = ''.join(codes[number] for number in sorted(codes))
+    return results.count(CORRECT) - results.count(INCORRECT), results
+
+
+def compact_feedback(batch_size=1000, log=None):
+    """
+    Convert submissions with message feedback to result codes and a score.
+
+    Rows are migrated in primary-key batches, one transaction per batch.
+    Feedback that is not in the generated format, such as a teacher's
+    comment, is kept.
+
+    Parameters:
+    -----------
+    batch_size : int
+        The number of submissions read per transaction (default: 1000).
+    log : callable or None
+        Called with progress messages.
+
+    Returns:
+    --------
+    int:
+        The number of converted submissions.
+    """
+    log = log or (lambda message: None)
+    table = Submission.__table__
+    statement = (update(table).where(table.c.id == bindparam('submission_id'))
+                 .values(score=bindparam('new_score'), results=bindparam('new_results'), feedback=None))
+    converted, last_id = 0, 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, table.c.feedback)
+            .where(table.c.id > last_id, table.c.results.is_(None), table.c.feedback.is_not(None))
+            .order_by(table.c.id).limit(batch_size)).all()
+        if not rows:
+            break
+        changes = []
+        for row in rows:
+            parsed = parse_legacy_feedback(row.feedback)
+            if parsed:
+                changes.append({'submission_id': row.id, 'new_score': parsed[0], 'new_results': parsed[1]})
+        if changes:
+            db.session.execute(statement, changes)
+        db.session.commit()
+        converted += len(changes)
+        last_id = rows[-1].id
+        log(f'submissions converted: {converted}')
+    return converted
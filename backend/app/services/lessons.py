@@ -0,0 +1,299 @@
+import json
+import re
+from sqlalchemy import bindparam, select, update
+from .. import db
+from ..models.content import Lesson, LessonRevision, make_excerpt
+from .outlines import invalidate_outlines
+
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_RANGE = re.compile(r'^(\d+)-(\d*)$')
+
+
+def parse_range(value):
+    """
+    Parse an inclusive ``start-end`` range such as '0-1023' or '4-'.
+
+    Parameters:
+    -----------
+    value : str
+        The range from the query string.
+
+    Returns:
+    --------
+    tuple or None:
+        (start, end) with end None when open, or None if malformed.
+    """
+    match = _RANGE.match(value.strip())
+    if not match:
+        return None
+    start, end = int(match.group(1)), int(match.group(2)) if match.group(2) else None
+    if end is not None and end < start:
+        return None
+    return start, end
+
+
+def _utf8_boundaries(chunk, at_start, at_end):
+    # Drop the bytes of characters cut by the range, so the chunk decodes cleanly
+    head = 0
+    if not at_start:
+        while head < len(chunk) and chunk[head] & 0xC0 == 0x80:
+            head += 1
+    tail = len(chunk)
+    if not at_end:
+        lead = tail - 1
+        while lead > head and chunk[lead] & 0xC0 == 0x80 and tail - lead < 4:
+            lead -= 1
+        if lead >= head and chunk[lead] >= 0xC0:
+            width = 2 if chunk[lead] < 0xE0 else 3 if chunk[lead] < 0xF0 else 4
+            if lead + width > tail:
+                tail = lead
+    return head, tail
+
+
+def body_bytes(lesson, start, end=None):
+    """
+    Read a byte range of a lesson body.
+
+    The body is stored compressed, so the range is cut from the decoded
+    UTF-8 body, then narrowed so it does not split a character; only the
+    range is sent to the client. Clients reading a long body in chunks
+    continue from the returned end plus one.
+
+    Parameters:
+    -----------
+    lesson : Lesson
+        The lesson.
+    start : int
+        The first byte (0-based).
+    end : int or None
+        The last byte (inclusive), or None for the end of the body.
+
+    Returns:
+    --------
+    tuple or None:
+        (text, start, end) of the returned range, or None if start is past
+        the end of the body.
+    """
+    encoded = lesson.body.encode('utf-8')
+    length = len(encoded)
+    if start >= length:
+        return None
+    end = length - 1 if end is None else min(end, length - 1)
+    chunk = encoded[start:end + 1]
+    head, tail = _utf8_boundaries(chunk, start == 0, end == length - 1)
+    return chunk[head:tail].decode('utf-8'), start + head, start + tail - 1
+
+
+def body_paragraphs(body, start, end=None):
+    """
+    Select a range of the blank-line separated paragraphs of a lesson body.
+
+    Parameters:
+    -----------
+    body : str
+        The lesson body.
+    start : int
+        The first paragraph (0-based).
+    end : int or None
+        The last paragraph (inclusive), or None for the last paragraph.
+
+    Returns:
+    --------
+    tuple or None:
+        (text, start, end, total) of the returned paragraphs, or None if
+        start is past the last paragraph.
+    """
+    paragraphs = [paragraph.strip() for paragraph in _PARAGRAPH_BREAK.split(body.strip())]
+    if start >= len(paragraphs):
+        return None
+    end = len(paragraphs) - 1 if end is None else min(end, len(paragraphs) - 1)
+    return '\n\n'.join(paragraphs[start:end + 1]), start, end, len(paragraphs)
+
+
+def backfill_excerpts(batch_size=500, log=None):
+    """
+    Fill in the excerpt and body length of lessons written before they existed.
+
+    Parameters:
+    -----------
+    batch_size : int
+        The number of lessons updated per transaction (default: 500).
+    log : callable or None
+        Called with progress messages.
+
+    Returns:
+    --------
+    int:
+        The number of updated lessons.
+    """
+    log = log or (lambda message: None)
+    updated, last_id = 0, 0
+    while True:
+        rows = db.session.execute(
+            select(Lesson.id, Lesson.course_id, Lesson.body)
+            .where(Lesson.id > last_id, (Lesson.excerpt.is_(None)) | (Lesson.body_length.is_(None)))
+            .order_by(Lesson.id).limit(batch_size)).all()
+        if not rows:
+            break
+        # A Core UPDATE leaves the version alone: the body itself does not change
+        lessons = Lesson.__table__
+        db.session.execute(
+            update(lessons).where(lessons.c.id == bindparam('lesson_id'))
+            .values(excerpt=bindparam('excerpt'), body_length=bindparam('body_length')),
+            [{'lesson_id': row.id, 'excerpt': make_excerpt(row.body), 'body_length': len(row.body.encode('utf-8'))}
+             for row in rows])
+        invalidate_outlines(db.session.connection(), [row.course_id for row in rows])
+        db.session.commit()
+        updated += len(rows)
+        last_id = rows[-1].id
+        log(f'lessons updated: {updated}')
+    return updated
+
+
+def _operations(operations, length):
+    # Validate patch operations and return them as sorted (start, end, text) tuples
+    if not isinstance(operations, list) or not operations:
+        raise ValueError('ops must be a non-empty list')
+    parsed = []
+    for operation in operations:
+        if not isinstance(operation, dict) or not isinstance(operation.get('start'), int):
+            raise ValueError('each op needs an integer start')
+        start = operation['start']
+        end = operation.get('end', start)
+        text = operation.get('text', '')
+        if not isinstance(end, int) or not isinstance(text, str):
+            raise ValueError('op end must be an integer and text a string')
+        if not 0 <= start <= end <= length:
+            raise ValueError(f'op range {start}-{end} is outside the body')
+        parsed.append((start, end, text))
+    parsed.sort(key=lambda operation: operation[0])
+    for previous, current in zip(parsed, parsed[1:]):
+        if current[0] < previous[1]:
+            raise ValueError('ops must not overlap')
+    return parsed
+
+
+def apply_patch(body, operations):
+    """
+    Apply text patch operations to a lesson body.
+
+    Each operation replaces ``body[start:end]`` with ``text``: an insertion
+    has ``end`` equal to ``start`` (or omits it) and a deletion omits
+    ``text``. Offsets are character offsets into the body the patch was made
+    against, so operations do not shift each other; they must not overlap.
+
+    Parameters:
+    -----------
+    body : str
+        The current body.
+    operations : list of dict
+        The {'start', 'end', 'text'} operations.
+
+    Returns:
+    --------
+    tuple:
+        The new body, and the reverse delta as [start, end, text] lists that
+        turn the new body back into ``body``.
+
+    Raises:
+    -------
+    ValueError:
+        If the operations are malformed, out of range or overlapping.
+    """
+    pieces, reverse, position, shift = [], [], 0, 0
+    for start, end, text in _operations(operations, len(body)):
+        pieces.append(body[position:start])
+        pieces.append(text)
+        reverse.append([start + shift, start + shift + len(text), body[start:end]])
+        shift += len(text) - (end - start)
+        position = end
+    pieces.append(body[position:])
+    return ''.join(pieces), reverse
+
+
+def diff_delta(old, new):
+    """
+    Return the reverse delta that turns ``new`` back into ``old``.
+
+    Only the span between the common prefix and suffix is stored, which is
+    what a full-body update of a long lesson usually changes.
+
+    Parameters:
+    -----------
+    old : str
+        The previous body.
+    new : str
+        The new body.
+
+    Returns:
+    --------
+    list:
+        [start, end, text] operations on ``new``; empty if nothing changed.
+    """
+    if old == new:
+        return []
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    return [[prefix, len(new) - suffix, old[prefix:len(old) - suffix]]]
+
+
+def apply_delta(body, delta):
+    """Apply [start, end, text] operations whose offsets refer to ``body``."""
+    for start, end, text in sorted(delta, key=lambda operation: operation[0], reverse=True):
+        body = body[:start] + text + body[end:]
+    return body
+
+
+def record_revision(lesson, delta, author_id):
+    """
+    Keep the body being replaced as a reverse delta, before the change is flushed.
+
+    Parameters:
+    -----------
+    lesson : Lesson
+        The lesson, still at the version being replaced.
+    delta : list
+        The reverse delta from apply_patch or diff_delta.
+    author_id : int
+        The ID of the user making the change.
+    """
+    if delta:
+        db.session.add(LessonRevision(lesson_id=lesson.id, version=lesson.version, author_id=author_id,
+                                      delta=json.dumps(delta, ensure_ascii=False)))
+
+
+def body_at_version(lesson, version):
+    """
+    Reconstruct the body of an earlier version of a lesson.
+
+    The reverse deltas of every newer revision are applied to the current
+    body, newest first. Versions that only changed other fields have no
+    revision and share the body of the next version.
+
+    Parameters:
+    -----------
+    lesson : Lesson
+        The lesson.
+    version : int
+        The version to reconstruct.
+
+    Returns:
+    --------
+    str or None:
+        The body at that version, or None if the version does not exist.
+    """
+    if not 1 <= version <= lesson.version:
+        return None
+    body = lesson.body
+    deltas = db.session.execute(
+        select(LessonRevision.delta)
+        .where(LessonRevision.lesson_id == lesson.id, LessonRevision.version >= version)
+        .order_by(LessonRevision.version.desc())).scalars()
+    for delta in deltas:
+        body = apply_delta(body, json.loads(delta))
+    return body
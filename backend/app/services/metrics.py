@@ -0,0 +1,75 @@
+import math
+import random
+
+
+def percentile(sorted_values, q):
+    """
+    Return the q-th percentile of already sorted values (nearest rank).
+
+    Parameters:
+    -----------
+    sorted_values : list
+        The values, sorted in ascending order.
+    q : float
+        The percentile to compute, between 0 and 100.
+
+    Returns:
+    --------
+    float or None:
+        The percentile, or None when there are no values.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(values, points=(50, 95, 99)):
+    """
+    Summarize a list of measurements with their count, mean, max and percentiles.
+
+    Parameters:
+    -----------
+    values : list
+        The measurements to summarize.
+    points : tuple
+        The percentiles to report (default: p50, p95 and p99).
+
+    Returns:
+    --------
+    dict:
+        A dictionary with 'count', 'mean', 'max' and one 'p<N>' key per point.
+    """
+    ordered = sorted(values)
+    summary = {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered) if ordered else None,
+        'max': ordered[-1] if ordered else None,
+    }
+    for point in points:
+        summary[f'p{point}'] = percentile(ordered, point)
+    return summary
+
+
+class Reservoir:
+    """
+    Fixed-size uniform sample of a stream of measurements.
+
+    Keeps memory bounded for long-running processes while still allowing
+    percentiles to be estimated over everything that was observed.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.seen = 0
+        self.values = []
+
+    def add(self, value):
+        """Offer a measurement to the reservoir."""
+        self.seen += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            index = random.randrange(self.seen)
+            if index < self.size:
+                self.values[index] = value
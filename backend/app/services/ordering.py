@@ -0,0 +1,321 @@
+from sqlalchemy import bindparam, case, event, func, inspect, select, update
+from sqlalchemy.orm import object_session
+from .. import db
+from ..models.assessment import Assessment
+from ..models.content import Lesson
+from .outlines import invalidate_outlines
+from .replicas import RoutingSession
+
+# Position keys are strings over these digits, compared as plain strings. Lowercase only, so that
+# case-insensitive collations order them like binary ones; a key never ends with '0', so there is
+# always room between two keys.
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+# The length of the position columns; a group is rebalanced before a key outgrows it
+POSITION_LENGTH = 64
+# `flask positions-rebalance` rebalances groups with keys longer than this
+REBALANCE_LENGTH = 16
+# The column grouping the ordered rows of each model
+GROUP_COLUMNS = {Lesson: Lesson.course_id, Assessment: Assessment.lesson_id}
+
+
+def _digit(key, index, default):
+    return DIGITS.index(key[index]) if key is not None and index < len(key) else default
+
+
+def _midpoint(before, after):
+    # The shortest key halfway between two keys; None stands for the ends of the range
+    result = []
+    index = 0
+    while True:
+        low = _digit(before, index, 0)
+        high = _digit(after, index, len(DIGITS))
+        if high - low > 1:
+            result.append(DIGITS[(low + high) // 2])
+            return ''.join(result)
+        result.append(DIGITS[low])
+        if high - low == 1:
+            # The prefix is now below `after`, whatever follows
+            after = None
+        index += 1
+
+
+def _increment(key):
+    # The next key at the same length, or one digit longer when every digit is the last one
+    for index in range(len(key) - 1, -1, -1):
+        if key[index] != DIGITS[-1]:
+            return key[:index] + DIGITS[DIGITS.index(key[index]) + 1]
+    return key + DIGITS[len(DIGITS) // 2]
+
+
+def rank_between(before=None, after=None):
+    """
+    Return a position key sorting strictly between two keys.
+
+    Appending (no ``after``) increments the last key, so a course can grow
+    by many lessons before its keys lengthen; other cases take the midpoint.
+
+    Parameters:
+    -----------
+    before : str or None
+        The key to sort after, or None for the start of the list.
+    after : str or None
+        The key to sort before, or None for the end of the list.
+
+    Returns:
+    --------
+    str:
+        The new key.
+
+    Raises:
+    -------
+    ValueError:
+        If ``before`` does not sort before ``after``.
+    """
+    if before is not None and after is not None and not before < after:
+        raise ValueError(f'{before!r} does not sort before {after!r}')
+    if before is not None and after is None:
+        return _increment(before)
+    return _midpoint(before, after)
+
+
+def ranks_between(before, after, count):
+    """
+    Return evenly spread position keys between two keys.
+
+    The keys are chosen by bisection, so their length grows with the
+    logarithm of ``count``.
+
+    Parameters:
+    -----------
+    before, after : str or None
+        The keys bounding the new keys, None standing for the ends of the list.
+    count : int
+        The number of keys.
+
+    Returns:
+    --------
+    list of str:
+        The new keys, in ascending order.
+    """
+    if count <= 0:
+        return []
+    middle = _midpoint(before, after)
+    left = (count - 1) // 2
+    return ranks_between(before, middle, left) + [middle] + ranks_between(middle, after, count - 1 - left)
+
+
+def last_positions(connection, model, group_ids):
+    """
+    Return the last position key of each group, with one query.
+
+    Parameters:
+    -----------
+    connection : Connection
+        The connection to read with.
+    model : Lesson or Assessment
+        The ordered model.
+    group_ids : iterable of int
+        The course IDs of lessons, or the lesson IDs of assessments.
+
+    Returns:
+    --------
+    dict:
+        The last key by group ID; groups without positioned rows are absent.
+    """
+    group = GROUP_COLUMNS[model]
+    group_ids = set(group_ids)
+    if not group_ids:
+        return {}
+    return dict(connection.execute(
+        select(group, func.max(model.position)).where(group.in_(group_ids)).group_by(group)).all())
+
+
+def append_positions(connection, model, rows, last=None):
+    """
+    Give rows about to be inserted with Core positions after their group's last row.
+
+    Parameters:
+    -----------
+    connection : Connection
+        The connection to read the current last keys with.
+    model : Lesson or Assessment
+        The ordered model.
+    rows : list of dict
+        The rows, in their intended order; each gets a 'position' key.
+    last : dict or None
+        The last key by group ID, kept up to date across calls so later
+        batches append after earlier ones without reading them back.
+    """
+    last = {} if last is None else last
+    group_key = GROUP_COLUMNS[model].key
+    by_group = {}
+    for row in rows:
+        by_group.setdefault(row[group_key], []).append(row)
+    last.update(last_positions(connection, model, [group_id for group_id in by_group if group_id not in last]))
+    for group_id, group_rows in by_group.items():
+        for row, key in zip(group_rows, ranks_between(last.get(group_id), None, len(group_rows))):
+            row['position'] = key
+        last[group_id] = group_rows[-1]['position']
+
+
+def rebalance_group(connection, model, group_id):
+    """
+    Rewrite the position keys of one group as short, evenly spread keys.
+
+    The current order is kept; rows without a position (written before
+    positions existed) come first, in creation order.
+
+    Parameters:
+    -----------
+    connection : Connection
+        The connection of the writing transaction.
+    model : Lesson or Assessment
+        The ordered model.
+    group_id : int
+        The course ID of lessons, or the lesson ID of assessments.
+
+    Returns:
+    --------
+    int:
+        The number of rewritten rows.
+    """
+    group = GROUP_COLUMNS[model]
+    ids = connection.execute(
+        select(model.id).where(group == group_id)
+        .order_by(case((model.position.is_(None), 0), else_=1), model.position, model.created_at, model.id)
+    ).scalars().all()
+    if not ids:
+        return 0
+    # A Core UPDATE leaves the lesson version alone: positions are not part of the body
+    table = model.__table__
+    connection.execute(
+        update(table).where(table.c.id == bindparam('row_id')).values(position=bindparam('key')),
+        [{'row_id': row_id, 'key': key} for row_id, key in zip(ids, ranks_between(None, None, len(ids)))])
+    course_ids = [group_id] if model is Lesson else connection.execute(
+        select(Lesson.course_id).where(Lesson.id == group_id)).scalars().all()
+    invalidate_outlines(connection, course_ids)
+    return len(ids)
+
+
+def move(model, row, after_id):
+    """
+    Move a lesson within its course, or an assessment within its lesson.
+
+    The row gets a key between its new neighbours, so a move is one
+    single-row UPDATE however long the list; the group is rebalanced first
+    when it has rows without positions or the new key would be too long.
+    The caller commits.
+
+    Parameters:
+    -----------
+    model : Lesson or Assessment
+        The ordered model.
+    row : Lesson or Assessment
+        The row to move.
+    after_id : int or None
+        The ID of the row to place it after, or None to place it first.
+
+    Returns:
+    --------
+    str:
+        The row's new position key.
+
+    Raises:
+    -------
+    ValueError:
+        If ``after_id`` is the row itself or a row of another group.
+    """
+    group = GROUP_COLUMNS[model]
+    group_id = getattr(row, group.key)
+    if after_id == row.id:
+        raise ValueError('A row cannot be placed after itself')
+    connection = db.session.connection()
+    for attempt in range(2):
+        before = None
+        if after_id is not None:
+            neighbour = connection.execute(select(group, model.position).where(model.id == after_id)).one_or_none()
+            if neighbour is None or neighbour[0] != group_id:
+                raise ValueError(f'{after_id} is not in the same list')
+            before = neighbour[1]
+        following = select(model.position).where(group == group_id, model.id != row.id, model.position.isnot(None))
+        if before is not None:
+            following = following.where(model.position > before)
+        after = connection.scalar(following.order_by(model.position).limit(1))
+        unpositioned = (after_id is not None and before is None) or row.position is None
+        key = None if unpositioned else rank_between(before, after)
+        if key is not None and len(key) <= POSITION_LENGTH:
+            break
+        rebalance_group(connection, model, group_id)
+        db.session.expire(row, ['position'])
+    table = model.__table__
+    connection.execute(update(table).where(table.c.id == row.id).values(position=key))
+    invalidate_outlines(connection, [row.course_id])
+    db.session.expire(row, ['position', 'updated_at'])
+    return key
+
+
+def rebalance_positions(max_length=REBALANCE_LENGTH, log=None):
+    """
+    Rebalance the groups with keys longer than ``max_length`` or missing keys.
+
+    Repeated moves into the same gap lengthen keys; this job, run
+    periodically, rewrites those groups with short keys, one transaction per
+    group. It also assigns positions to rows written before they existed.
+
+    Parameters:
+    -----------
+    max_length : int
+        The longest key left alone (default: REBALANCE_LENGTH).
+    log : callable or None
+        Called with progress messages.
+
+    Returns:
+    --------
+    int:
+        The number of rebalanced groups.
+    """
+    log = log or (lambda message: None)
+    rebalanced = 0
+    for model, group in GROUP_COLUMNS.items():
+        group_ids = db.session.execute(
+            select(group).where(model.position.is_(None) | (func.length(model.position) > max_length))
+            .distinct()).scalars().all()
+        for group_id in group_ids:
+            rebalance_group(db.session.connection(), model, group_id)
+            db.session.commit()
+            rebalanced += 1
+        log(f'{model.__tablename__}: {len(group_ids)} groups rebalanced')
+    return rebalanced
+
+
+def _assign_position(mapper, connection, target):
+    # New rows go last in their group; the keys given during this flush are remembered, since
+    # rows flushed together are inserted after all of them are assigned
+    if target.position is not None:
+        return
+    model = type(target)
+    group_id = getattr(target, GROUP_COLUMNS[model].key)
+    assigned = object_session(target).info.setdefault('positions_assigned', {})
+    if (model, group_id) not in assigned:
+        assigned[(model, group_id)] = last_positions(connection, model, [group_id]).get(group_id)
+    target.position = rank_between(assigned[(model, group_id)], None)
+    assigned[(model, group_id)] = target.position
+
+
+def _reposition_moved(mapper, connection, target):
+    # A lesson moved to another course, or an assessment to another lesson, goes last there
+    model = type(target)
+    group = GROUP_COLUMNS[model]
+    if inspect(target).attrs[group.key].history.has_changes():
+        group_id = getattr(target, group.key)
+        target.position = rank_between(last_positions(connection, model, [group_id]).get(group_id), None)
+
+
+for _model in GROUP_COLUMNS:
+    event.listen(_model, 'before_insert', _assign_position)
+    event.listen(_model, 'before_update', _reposition_moved)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _forget_assigned_positions(session, flush_context):
+    session.info.pop('positions_assigned', None)
@@ -0,0 +1,84 @@
+from datetime import datetime
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import insert, select
+from .. import db, mail
+from ..models.outbox import OutboxEmail
+
+# Failed deliveries of an email are retried until this many attempts
+MAX_ATTEMPTS = 5
+
+
+def queue_emails(emails):
+    """
+    Queue emails for delivery in the current transaction.
+
+    Parameters:
+    -----------
+    emails : iterable of dict
+        The emails, with recipient, subject and body keys.
+
+    Returns:
+    --------
+    int:
+        The number of queued emails.
+    """
+    now = datetime.utcnow()
+    rows = [{'recipient': email['recipient'], 'subject': email['subject'], 'body': email['body'],
+             'created_at': now, 'attempts': 0} for email in emails]
+    if rows:
+        db.session.execute(insert(OutboxEmail), rows)
+    return len(rows)
+
+
+def send_outbox(batch_size=100, max_attempts=MAX_ATTEMPTS, log=None):
+    """
+    Send the pending emails of the outbox.
+
+    Emails are read in batches and sent over one connection to the mail
+    server per batch, from the calling thread. Rows are locked with SKIP
+    LOCKED where the database supports it, so several senders can run at
+    once. A failed email is retried by later runs until ``max_attempts``.
+
+    Parameters:
+    -----------
+    batch_size : int
+        The number of emails sent per connection and transaction (default: 100).
+    max_attempts : int
+        The number of attempts after which an email is given up (default: MAX_ATTEMPTS).
+    log : callable or None
+        Called with progress messages.
+
+    Returns:
+    --------
+    dict:
+        The number of sent and failed emails.
+    """
+    log = log or (lambda message: None)
+    sender = current_app.config['MAIL_SENDER']
+    stats = {'sent': 0, 'failed': 0}
+    last_id = 0
+    while True:
+        emails = db.session.execute(
+            select(OutboxEmail)
+            .where(OutboxEmail.sent_at.is_(None), OutboxEmail.attempts < max_attempts, OutboxEmail.id > last_id)
+            .order_by(OutboxEmail.id).limit(batch_size)
+            .with_for_update(skip_locked=True)).scalars().all()
+        if not emails:
+            break
+        with mail.connect() as connection:
+            for email in emails:
+                try:
+                    connection.send(Message(subject=email.subject, body=email.body,
+                                            recipients=[email.recipient], sender=sender))
+                except Exception as error:  # Any delivery error is recorded and retried later
+                    email.attempts += 1
+                    email.last_error = str(error)[:255]
+                    stats['failed'] += 1
+                else:
+                    email.sent_at = datetime.utcnow()
+                    stats['sent'] += 1
+        db.session.commit()
+        last_id = emails[-1].id
+        log(f"emails sent: {stats['sent']}, failed: {stats['failed']}")
+    return stats
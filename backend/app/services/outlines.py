@@ -0,0 +1,159 @@
+import json
+from datetime import datetime
+from flask import current_app, g, has_request_context
+from sqlalchemy import delete, event, insert, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from .. import db
+from ..models.assessment import Assessment
+from ..models.content import Course, Lesson
+from ..models.outline import CourseOutline
+from ..models.user import User
+
+
+def build_outline(course_id):
+    """
+    Build the outline of a course with three queries.
+
+    Parameters:
+    -----------
+    course_id : int
+        The ID of the course.
+
+    Returns:
+    --------
+    dict or None:
+        The course with its author, its lessons in order with their excerpts,
+        and the summaries of each lesson's assessments; None if the course
+        does not exist or is soft-deleted.
+    """
+    course = db.session.execute(
+        select(Course.id, Course.title, Course.description, Course.created_at, Course.updated_at,
+               User.id.label('author_id'), User.username)
+        .join(User, User.id == Course.author_id)
+        .where(Course.id == course_id, Course.deleted_at.is_(None))).one_or_none()
+    if course is None:
+        return None
+    lessons = db.session.execute(
+        select(Lesson.id, Lesson.title, Lesson.excerpt, Lesson.body_length)
+        .where(Lesson.course_id == course_id)
+        .order_by(Lesson.position, Lesson.id)).all()
+    assessments = db.session.execute(
+        select(Assessment.id, Assessment.lesson_id, Assessment.title, Assessment.type, Assessment.questions)
+        .where(Assessment.course_id == course_id)
+        .order_by(Assessment.position, Assessment.id)).all()
+
+    by_lesson = {}
+    for assessment in assessments:
+        by_lesson.setdefault(assessment.lesson_id, []).append({
+            'id': assessment.id,
+            'title': assessment.title,
+            'type': assessment.type,
+            'question_count': len(json.loads(assessment.questions)),
+        })
+    return {
+        'id': course.id,
+        'title': course.title,
+        'description': course.description,
+        'created_at': course.created_at,
+        'updated_at': course.updated_at,
+        'author': {'id': course.author_id, 'username': course.username},
+        'lessons': [{
+            'id': lesson.id,
+            'title': lesson.title,
+            'excerpt': lesson.excerpt,
+            'body_length': lesson.body_length,
+            'assessments': by_lesson.get(lesson.id, []),
+        } for lesson in lessons],
+    }
+
+
+def course_outline(course_id):
+    """
+    Return the outline document of a course, building and caching it if needed.
+
+    A cached outline is read with one query, joined to the course to check
+    that it was built at the course's current outline_version; otherwise it
+    is built with build_outline and stored for later reads. Outlines are
+    built on the primary, never from a lagging replica, and stored with the
+    version read in the same transaction as the outline, so an outline
+    raced by a concurrent write is replaced on the next read instead of
+    being served. Writes to the course, its lessons or its assessments bump
+    the version and delete the cached document.
+
+    Parameters:
+    -----------
+    course_id : int
+        The ID of the course.
+
+    Returns:
+    --------
+    str or None:
+        The outline serialized as JSON, or None if the course does not exist.
+    """
+    cached = db.session.execute(
+        select(CourseOutline.document, CourseOutline.version, Course.outline_version)
+        .join(Course, Course.id == CourseOutline.course_id)
+        .where(CourseOutline.course_id == course_id)).one_or_none()
+    if cached is not None and cached.version == cached.outline_version:
+        return cached.document
+    if has_request_context():
+        g.read_primary = True
+    version = db.session.scalar(select(Course.outline_version).where(Course.id == course_id))
+    outline = build_outline(course_id) if version is not None else None
+    if outline is None:
+        return None
+    document = current_app.json.dumps(outline)
+    try:
+        db.session.execute(delete(CourseOutline).where(CourseOutline.course_id == course_id,
+                                                       CourseOutline.version < version))
+        db.session.execute(insert(CourseOutline).values(
+            course_id=course_id, document=document, version=version, built_at=datetime.utcnow()))
+        db.session.commit()
+    except IntegrityError:
+        # Another request cached the outline first
+        db.session.rollback()
+    return document
+
+
+def invalidate_outlines(connection, course_ids):
+    """
+    Bump the outline versions of courses and delete their cached outlines.
+
+    Called by the mapper events below, and by writers using Core statements
+    that bypass them. The version is bumped in the writing transaction, so
+    an outline built before the write commits no longer matches it;
+    ``updated_at`` is left as it is, so the course does not show in the
+    changes feed for a change of its children.
+
+    Parameters:
+    -----------
+    connection : Connection
+        The connection of the writing transaction.
+    course_ids : iterable of int
+        The IDs of the changed courses.
+    """
+    course_ids = {course_id for course_id in course_ids if course_id is not None}
+    if course_ids:
+        connection.execute(update(Course.__table__).where(Course.__table__.c.id.in_(course_ids)).values(
+            outline_version=Course.__table__.c.outline_version + 1, updated_at=Course.__table__.c.updated_at))
+        connection.execute(delete(CourseOutline).where(CourseOutline.course_id.in_(course_ids)))
+
+
+def _outlined_courses(target):
+    # The courses whose outline shows the target, before and after a move between courses
+    if isinstance(target, Course):
+        return [target.id]
+    history = inspect(target).attrs.course_id.history
+    return [target.course_id, *history.deleted]
+
+
+def _outline_changed(mapper, connection, target):
+    invalidate_outlines(connection, _outlined_courses(target))
+
+
+event.listen(Course, 'after_update', _outline_changed)
+event.listen(Course, 'after_delete', _outline_changed)
+for _model in (Lesson, Assessment):
+    event.listen(_model, 'after_insert', _outline_changed)
+    event.listen(_model, 'after_update', _outline_changed)
+    event.listen(_model, 'after_delete', _outline_changed)
@@ -0,0 +1,289 @@
+import os
+import random
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from flask import g, request
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+
+PROFILE_EXTENSION = '.folded'
+TOKEN_SALT = 'request-profiler'
+
+TIMERS = {
+    'cpu': ('ITIMER_PROF', 'SIGPROF'),
+    'wall': ('ITIMER_REAL', 'SIGALRM'),
+}
+
+
+def collapse_stack(frame):
+    """
+    Render a frame and its callers as one line of a collapsed stack file.
+
+    Frames are ordered from the outermost caller to the innermost frame and
+    separated by semicolons, which is the format flamegraph tools expect.
+
+    Parameters:
+    -----------
+    frame : frame
+        The innermost frame of the stack to collapse.
+
+    Returns:
+    --------
+    str:
+        The collapsed stack, e.g. ``run (app.py:10);handler (views.py:42)``.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        filename = code.co_filename.replace(';', ':')
+        names.append(f'{code.co_name} ({filename}:{code.co_firstlineno})')
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+class StackSampler:
+    """
+    Signal-based stack sampler shared by every application in the process.
+
+    A single interval timer fires a signal while at least one thread is being
+    profiled. The handler records the current stack of every profiled thread,
+    so concurrent requests in a threaded server are sampled independently.
+    Signal handlers can only be installed from the main thread; when that is
+    not possible the sampler stays unavailable and requests run unprofiled.
+
+    The per-thread counters are shared by request threads and the handler,
+    so they are only touched under a lock. The handler runs on the main
+    thread between two bytecodes, possibly while that thread holds the lock,
+    so it never waits for it and drops the sample instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._timer = None
+        self._installed = {}
+
+    def install(self, timer):
+        """
+        Install the signal handler for the given timer kind.
+
+        Parameters:
+        -----------
+        timer : str
+            Either 'cpu' (process CPU time) or 'wall' (real time).
+
+        Returns:
+        --------
+        bool:
+            True if the sampler can be used with this timer.
+        """
+        if timer in self._installed:
+            return self._installed[timer]
+        signame = TIMERS[timer][1]
+        available = (hasattr(signal, 'setitimer') and
+                     threading.current_thread() is threading.main_thread())
+        if available:
+            signal.signal(getattr(signal, signame), self._handle)
+        self._installed[timer] = available
+        return available
+
+    def available(self, timer):
+        """Return True if the handler for ``timer`` has been installed."""
+        return self._installed.get(timer, False)
+
+    def start(self, thread_id, interval, timer):
+        """
+        Begin sampling a thread, arming the interval timer if needed.
+
+        Parameters:
+        -----------
+        thread_id : int
+            The identifier of the thread to sample.
+        interval : float
+            The sampling interval in seconds.
+        timer : str
+            The timer kind passed to :meth:`install`.
+        """
+        with self._lock:
+            self._samples[thread_id] = Counter()
+            if self._timer is None:
+                self._timer = timer
+                signal.setitimer(getattr(signal, TIMERS[timer][0]), interval, interval)
+
+    def stop(self, thread_id):
+        """
+        Stop sampling a thread, disarming the timer when no thread is left.
+
+        Parameters:
+        -----------
+        thread_id : int
+            The identifier of the thread to stop sampling.
+
+        Returns:
+        --------
+        Counter:
+            The number of samples recorded for each collapsed stack.
+        """
+        with self._lock:
+            samples = self._samples.pop(thread_id, Counter())
+            if not self._samples and self._timer is not None:
+                signal.setitimer(getattr(signal, TIMERS[self._timer][0]), 0, 0)
+                self._timer = None
+        return samples
+
+    def _handle(self, signum, frame):
+        """Record one sample for each thread currently being profiled."""
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            frames = sys._current_frames()
+            main_thread_id = threading.main_thread().ident
+            for thread_id, samples in self._samples.items():
+                # The handler runs on the main thread, so its own interrupted
+                # frame is the one passed in rather than the handler's frame.
+                target = frame if thread_id == main_thread_id else frames.get(thread_id)
+                if target is not None:
+                    samples[collapse_stack(target)] += 1
+        finally:
+            self._lock.release()
+
+
+sampler = StackSampler()
+
+
+def _serializer(app):
+    secret = app.config.get('SECRET_KEY')
+    if not secret:
+        return None
+    return URLSafeTimedSerializer(secret, salt=TOKEN_SALT)
+
+
+def generate_profile_token(app):
+    """
+    Create a signed token that marks requests for profiling.
+
+    Parameters:
+    -----------
+    app : Flask
+        The application whose SECRET_KEY signs the token.
+
+    Returns:
+    --------
+    str or None:
+        The token, or None if the application has no SECRET_KEY.
+    """
+    serializer = _serializer(app)
+    if serializer is None:
+        return None
+    return serializer.dumps({'profile': True})
+
+
+def has_valid_profile_token(app, token):
+    """Return True if ``token`` was signed by this app and has not expired."""
+    serializer = _serializer(app)
+    if serializer is None or not token:
+        return False
+    try:
+        serializer.loads(token, max_age=app.config['PROFILER_TOKEN_MAX_AGE'])
+    except BadSignature:
+        return False
+    return True
+
+
+def get_profile_dir(app):
+    """Return the directory where collapsed-stack files are written."""
+    return os.path.abspath(app.config.get('PROFILER_DIR') or os.path.join(app.instance_path, 'profiles'))
+
+
+def list_profiles(app):
+    """
+    List the profiles written by the application, newest first.
+
+    Parameters:
+    -----------
+    app : Flask
+        The application whose profile directory is listed.
+
+    Returns:
+    --------
+    list of dict:
+        One entry per profile with its name, endpoint, size and creation time.
+    """
+    directory = get_profile_dir(app)
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if not name.endswith(PROFILE_EXTENSION):
+            continue
+        stat = os.stat(os.path.join(directory, name))
+        profiles.append({
+            'name': name,
+            'endpoint': name.split('__')[1] if name.count('__') >= 2 else None,
+            'size': stat.st_size,
+            'created_at': stat.st_mtime,
+        })
+    profiles.sort(key=lambda profile: profile['created_at'], reverse=True)
+    return profiles
+
+
+def _write_profile(app, endpoint, samples):
+    directory = get_profile_dir(app)
+    os.makedirs(directory, exist_ok=True)
+    name = f'{time.strftime("%Y%m%dT%H%M%S")}__{endpoint}__{uuid.uuid4().hex[:8]}{PROFILE_EXTENSION}'
+    with open(os.path.join(directory, name), 'w') as profile:
+        for stack, count in samples.most_common():
+            profile.write(f'{stack} {count}\n')
+
+    # Keep the directory bounded by discarding the oldest profiles
+    for stale in list_profiles(app)[app.config['PROFILER_MAX_FILES']:]:
+        os.remove(os.path.join(directory, stale['name']))
+    return name
+
+
+def should_profile(app):
+    """Decide whether the current request should be sampled."""
+    if has_valid_profile_token(app, request.headers.get(app.config['PROFILER_HEADER'])):
+        return True
+    rate = app.config['PROFILER_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+
+def setup_profiler(app):
+    """
+    Attach the on-demand sampling profiler to the application.
+
+    Requests are profiled when they carry a valid signed token in the
+    PROFILER_HEADER header, or at random with probability
+    PROFILER_SAMPLE_RATE, which admins can change at runtime. Each profiled
+    request produces one collapsed-stack file in the profile directory.
+
+    Parameters:
+    -----------
+    app : Flask
+        The Flask application instance.
+    """
+    if not app.config.get('PROFILER_ENABLED'):
+        return
+    sampler.install(app.config['PROFILER_TIMER'])
+
+    @app.before_request
+    def start_profiling():
+        timer = app.config['PROFILER_TIMER']
+        if not sampler.available(timer) or not should_profile(app):
+            return
+        g.profiler_thread_id = threading.get_ident()
+        sampler.start(g.profiler_thread_id, app.config['PROFILER_INTERVAL'], timer)
+
+    @app.teardown_request
+    def stop_profiling(exc):
+        thread_id = g.pop('profiler_thread_id', None)
+        if thread_id is None:
+            return
+        samples = sampler.stop(thread_id)
+        if samples:
+            _write_profile(app, request.endpoint or 'unknown', samples)
@@ -0,0 +1,224 @@
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from flask import current_app
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from validator_collection import checkers
+from werkzeug.security import generate_password_hash
+from .. import db
+from ..models.user import User, UserRole
+from .auth_service import account_created_email
+from .outbox import queue_emails
+
+# Rows checked, hashed and inserted per transaction
+PROVISION_BATCH_SIZE = 500
+ROLES = (UserRole.STUDENT, UserRole.TEACHER, UserRole.ADMIN)
+# Optional CSV columns copied to the user, with their maximum length
+PROFILE_FIELDS = {'firstName': 64, 'lastName': 64, 'country': 64}
+GENERATED_PASSWORD_BYTES = 12
+_pool_lock = threading.Lock()
+
+
+def _validate(row):
+    # Return the users-table values of one CSV row and its plaintext password, or raise ValueError
+    username = (row.get('username') or '').strip()
+    email = (row.get('email') or '').strip()
+    if not username or len(username) > 64:
+        raise ValueError('username must have 1 to 64 characters')
+    if len(email) > 100 or not checkers.is_email(email):
+        raise ValueError('email is not a valid address')
+    role = (row.get('role') or '').strip() or UserRole.STUDENT
+    if role not in ROLES:
+        raise ValueError(f"role must be one of {', '.join(ROLES)}")
+    values = {'username': username, 'email': email, 'role': role}
+    for name, length in PROFILE_FIELDS.items():
+        value = (row.get(name) or '').strip()
+        if len(value) > length:
+            raise ValueError(f'{name} must have at most {length} characters')
+        values[name] = value or None
+    age = (row.get('age') or '').strip()
+    if age and not age.isdigit():
+        raise ValueError('age must be a whole number')
+    values['age'] = int(age) if age else None
+    return values, row.get('password') or None
+
+
+def hash_passwords(passwords, method, pool=None):
+    """
+    Hash passwords, in parallel when given a process pool.
+
+    Parameters:
+    -----------
+    passwords : list of str
+        The plaintext passwords.
+    method : str
+        The werkzeug hash method.
+    pool : Executor or None
+        The pool to hash with; hashes in this process when None.
+
+    Returns:
+    --------
+    list of str:
+        The hashes, in the order of ``passwords``.
+    """
+    hasher = partial(generate_password_hash, method=method)
+    if pool is None:
+        return [hasher(password) for password in passwords]
+    workers = getattr(pool, '_max_workers', 1)
+    return list(pool.map(hasher, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def shared_hash_pool():
+    """
+    Return the application's hashing pool shared by provisioning requests.
+
+    The pool is started on first use with PROVISION_HTTP_HASH_WORKERS
+    processes and kept for the life of the worker, so concurrent requests
+    queue on the same bounded set of processes instead of each forking its
+    own.
+
+    Returns:
+    --------
+    ProcessPoolExecutor or None:
+        The pool, or None when PROVISION_HTTP_HASH_WORKERS is 1 or less and
+        passwords are hashed in the request's process.
+    """
+    workers = current_app.config['PROVISION_HTTP_HASH_WORKERS']
+    if workers <= 1:
+        return None
+    with _pool_lock:
+        pool = current_app.extensions.get('provision_hash_pool')
+        if pool is None:
+            pool = current_app.extensions['provision_hash_pool'] = ProcessPoolExecutor(workers)
+    return pool
+
+
+class _Provisioner:
+    """Provisioning state carried across batches: the usernames and emails seen in the file."""
+
+    def __init__(self, report, method, pool):
+        self.report = report
+        self.method = method
+        self.pool = pool
+        self.usernames = set()
+        self.emails = set()
+
+    def fail(self, number, message):
+        self.report['errors'].append({'row': number, 'error': message})
+
+    def provision_batch(self, batch):
+        candidates = []
+        for number, row in batch:
+            try:
+                values, password = _validate(row)
+            except ValueError as error:
+                self.fail(number, str(error))
+                continue
+            username, email = values['username'].lower(), values['email'].lower()
+            if username in self.usernames or email in self.emails:
+                self.fail(number, 'username or email repeated in the file')
+                continue
+            self.usernames.add(username)
+            self.emails.add(email)
+            candidates.append((number, values, password))
+        if not candidates:
+            return
+
+        # One set-based query finds every collision with existing users
+        taken = db.session.execute(select(User.username, User.email).where(or_(
+            User.username.in_([values['username'] for _, values, _ in candidates]),
+            User.email.in_([values['email'] for _, values, _ in candidates])))).all()
+        taken_usernames = {username.lower() for username, _ in taken if username}
+        taken_emails = {email.lower() for _, email in taken if email}
+        users, generated = [], []
+        for number, values, password in candidates:
+            if values['username'].lower() in taken_usernames:
+                self.fail(number, f"username {values['username']!r} already exists")
+            elif values['email'].lower() in taken_emails:
+                self.fail(number, f"email {values['email']!r} already exists")
+            else:
+                if password is None:
+                    password = secrets.token_urlsafe(GENERATED_PASSWORD_BYTES)
+                    generated.append({'username': values['username'], 'password': password})
+                users.append((number, values, password))
+        if not users:
+            return
+
+        hashes = hash_passwords([password for _, _, password in users], self.method, self.pool)
+        rows = [dict(values, password_hash=password_hash) for (_, values, _), password_hash in zip(users, hashes)]
+        try:
+            db.session.execute(insert(User), rows)
+            queued = queue_emails(account_created_email(row['username'], row['email']) for row in rows)
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent insert took one of the names; nothing of this batch was written
+            db.session.rollback()
+            for number, values, _ in users:
+                self.fail(number, 'batch failed: username or email taken concurrently')
+            return
+        self.report['created'] += len(rows)
+        self.report['emails_queued'] += queued
+        self.report['generated_passwords'].extend(generated)
+
+
+def provision_users(rows, batch_size=PROVISION_BATCH_SIZE, workers=None, pool=None, log=None):
+    """
+    Create users in bulk from CSV rows and queue their welcome emails.
+
+    Rows are handled in batches, each in one transaction: rows are
+    validated, collisions with existing usernames and emails are found with
+    one query, passwords are hashed across a process pool, and the users
+    and their welcome emails are written with multi-row INSERTs. Rows
+    without a password get a generated one, returned in the report.
+
+    Parameters:
+    -----------
+    rows : iterable of dict
+        The CSV rows, with username and email, and optionally password,
+        role, firstName, lastName, age and country.
+    batch_size : int
+        The number of rows per transaction (default: PROVISION_BATCH_SIZE).
+    workers : int or None
+        The number of hashing processes started for this call; 1 hashes in
+        this process. Defaults to PROVISION_HASH_WORKERS, or the number of
+        CPUs when that is 0. Ignored when ``pool`` is given.
+    pool : Executor or None
+        A pool to hash with, such as shared_hash_pool(); it is left running.
+    log : callable or None
+        Called with progress messages.
+
+    Returns:
+    --------
+    dict:
+        The number of rows read, of created users and of queued emails, the
+        errors as {'row', 'error'} dicts with 1-based row numbers, and the
+        generated passwords as {'username', 'password'} dicts.
+    """
+    log = log or (lambda message: None)
+    if workers is None:
+        workers = current_app.config['PROVISION_HASH_WORKERS'] or os.cpu_count() or 1
+    report = {'rows': 0, 'created': 0, 'emails_queued': 0, 'errors': [], 'generated_passwords': []}
+    method = current_app.config['PASSWORD_HASH_METHOD']
+    if pool is not None:
+        hashing = nullcontext(pool)
+    else:
+        hashing = ProcessPoolExecutor(workers) if workers > 1 else nullcontext()
+    with hashing as pool:
+        provisioner = _Provisioner(report, method, pool)
+        batch = []
+        for number, row in enumerate(rows, 1):
+            report['rows'] = number
+            batch.append((number, row))
+            if len(batch) >= batch_size:
+                provisioner.provision_batch(batch)
+                batch = []
+                log(f"rows: {number}, created: {report['created']}, errors: {len(report['errors'])}")
+        if batch:
+            provisioner.provision_batch(batch)
+    report['errors'].sort(key=lambda error: error['row'])
+    log(f"rows: {report['rows']}, created: {report['created']}, errors: {len(report['errors'])}")
+    return report
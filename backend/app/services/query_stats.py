@@ -0,0 +1,307 @@
+import json
+import os
+import re
+import threading
+import time
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from .metrics import Reservoir, summarize
+from .replicas import RoutingSession
+
+_COMMENTS = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'%\(\w+\)s|%s|:\w+|\?')
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_ROWS = re.compile(r'(\(\?\+\))(?:\s*,\s*\(\?\+\))+')
+_SPACES = re.compile(r'\s+')
+
+SORT_KEYS = ('total_ms', 'count', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'rows')
+
+
+def fingerprint(statement):
+    """
+    Normalize a SQL statement so that queries differing only in values match.
+
+    Comments are removed, literals and bound parameters become '?', lists of
+    values (IN lists and multi-row VALUES) collapse to '(?+)', and whitespace
+    and case are normalized.
+
+    Parameters:
+    -----------
+    statement : str
+        The SQL statement as sent to the driver.
+
+    Returns:
+    --------
+    str:
+        The statement fingerprint.
+    """
+    text = _COMMENTS.sub(' ', statement)
+    text = _STRINGS.sub('?', text)
+    text = _PLACEHOLDERS.sub('?', text)
+    text = _NUMBERS.sub('?', text)
+    text = _LISTS.sub('(?+)', text)
+    text = _ROWS.sub(r'\1', text)
+    return _SPACES.sub(' ', text).strip().lower()
+
+
+class QueryStats:
+    """
+    Aggregated statistics for SQL fingerprints, per endpoint and role.
+
+    Each group keeps its call count, rows fetched or written, total time and
+    a bounded reservoir of durations from which latency percentiles are
+    computed. Updates are thread-safe so the registry can be shared by every
+    request thread of a worker process.
+    """
+
+    def __init__(self, sample_size=1000):
+        self.sample_size = sample_size
+        self._groups = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.started_at = time.time()
+        self.flushed_at = time.time()
+
+    def record(self, statement, endpoint, role, duration, rows):
+        """
+        Record one execution of a statement.
+
+        Parameters:
+        -----------
+        statement : str
+            The SQL statement as sent to the driver.
+        endpoint : str or None
+            The Flask endpoint that issued the statement.
+        role : str or None
+            The role of the user making the request, if known.
+        duration : float
+            The execution time in seconds.
+        rows : int
+            The number of rows written; fetched rows are added by add_rows.
+        """
+        key = (fingerprint(statement), endpoint, role)
+        self._local.last_key = key
+        with self._lock:
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = {'count': 0, 'rows': 0, 'total': 0.0,
+                                             'samples': Reservoir(self.sample_size)}
+            group['count'] += 1
+            group['rows'] += rows
+            group['total'] += duration
+            group['samples'].add(duration)
+
+    def last_key(self):
+        """Return the group of the last statement recorded by this thread, or None."""
+        return getattr(self._local, 'last_key', None)
+
+    def add_rows(self, key, rows):
+        """
+        Add the rows fetched from a statement's result to its group.
+
+        Parameters:
+        -----------
+        key : tuple
+            The group, as returned by last_key right after the statement ran.
+        rows : int
+            The number of fetched rows.
+        """
+        with self._lock:
+            group = self._groups.get(key)
+            if group is not None:
+                group['rows'] += rows
+
+    def reset(self):
+        """Discard every recorded statistic."""
+        with self._lock:
+            self._groups.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        """Return the raw statistics, including latency samples, as a list of dicts."""
+        with self._lock:
+            return [{
+                'fingerprint': key[0],
+                'endpoint': key[1],
+                'role': key[2],
+                'count': group['count'],
+                'rows': group['rows'],
+                'total': group['total'],
+                'samples': list(group['samples'].values),
+            } for key, group in self._groups.items()]
+
+    def flush(self, directory):
+        """
+        Write this process's snapshot to ``directory`` for the CLI to read.
+
+        Parameters:
+        -----------
+        directory : str
+            The directory holding one snapshot file per worker process.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'query_stats-{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as snapshot:
+            json.dump({'started_at': self.started_at, 'groups': self.snapshot()}, snapshot)
+        os.replace(f'{path}.tmp', path)
+        self.flushed_at = time.time()
+
+
+def report(groups, sort='total_ms', limit=None):
+    """
+    Turn raw snapshot groups into report rows with latency percentiles.
+
+    Groups with the same fingerprint, endpoint and role (for example from
+    several worker processes) are merged first.
+
+    Parameters:
+    -----------
+    groups : list of dict
+        Raw groups as returned by :meth:`QueryStats.snapshot`.
+    sort : str
+        The report column to sort by, in descending order (default: 'total_ms').
+    limit : int or None
+        The maximum number of rows to return.
+
+    Returns:
+    --------
+    list of dict:
+        One row per group with count, rows, total/mean/max time and p50/p95/p99
+        in milliseconds.
+    """
+    merged = {}
+    for group in groups:
+        key = (group['fingerprint'], group['endpoint'], group['role'])
+        entry = merged.setdefault(key, {'count': 0, 'rows': 0, 'total': 0.0, 'samples': []})
+        entry['count'] += group['count']
+        entry['rows'] += group['rows']
+        entry['total'] += group['total']
+        entry['samples'].extend(group['samples'])
+
+    rows = []
+    for (statement, endpoint, role), entry in merged.items():
+        summary = summarize(entry['samples'])
+        row = {
+            'fingerprint': statement,
+            'endpoint': endpoint,
+            'role': role,
+            'count': entry['count'],
+            'rows': entry['rows'],
+            'total_ms': round(entry['total'] * 1000, 3),
+            'mean_ms': round(entry['total'] * 1000 / entry['count'], 3),
+        }
+        for name in ('p50', 'p95', 'p99', 'max'):
+            row[f'{name}_ms'] = round(summary[name] * 1000, 3) if summary[name] is not None else None
+        rows.append(row)
+
+    rows.sort(key=lambda row: row[sort] or 0, reverse=True)
+    return rows[:limit] if limit else rows
+
+
+def load_snapshots(directory):
+    """
+    Read every worker snapshot written to ``directory``.
+
+    Parameters:
+    -----------
+    directory : str
+        The snapshot directory.
+
+    Returns:
+    --------
+    list of dict:
+        The raw groups from all snapshot files.
+    """
+    if not os.path.isdir(directory):
+        return []
+    groups = []
+    for name in sorted(os.listdir(directory)):
+        if name.startswith('query_stats-') and name.endswith('.json'):
+            with open(os.path.join(directory, name)) as snapshot:
+                groups.extend(json.load(snapshot)['groups'])
+    return groups
+
+
+def get_stats_dir(app):
+    """Return the directory where worker snapshots are written."""
+    return os.path.abspath(app.config.get('QUERY_STATS_DIR') or os.path.join(app.instance_path, 'query_stats'))
+
+
+def instrument_engine(engine, stats):
+    """
+    Time every statement executed on ``engine`` and record it in ``stats``.
+
+    Parameters:
+    -----------
+    engine : Engine
+        The SQLAlchemy engine to instrument.
+    stats : QueryStats
+        The registry receiving the measurements.
+    """
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_stats_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['query_stats_start'].pop()
+        if has_request_context():
+            endpoint = request.endpoint
+            role = g.get('current_user_role')
+        else:
+            endpoint, role = None, None
+        # The DBAPI rowcount is only reliable for writes; reads are counted by _count_fetched_rows
+        written = context is not None and context.is_crud and cursor.rowcount and cursor.rowcount > 0
+        stats.record(statement, endpoint, role, duration, cursor.rowcount if written else 0)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _count_fetched_rows(state):
+    # Buffers the result of a session query to count its rows for the statement that produced it.
+    # Streamed results are left alone and not counted, nor are statements run on a bare Connection.
+    stats = current_app.extensions.get('query_stats') if has_app_context() else None
+    options = state.execution_options
+    if stats is None or not state.is_select or options.get('yield_per') or options.get('stream_results'):
+        return None
+    result = state.invoke_statement()
+    key = stats.last_key()
+    frozen = result.freeze()
+    if key is not None:
+        stats.add_rows(key, len(frozen.data))
+    return frozen()
+
+
+def setup_query_stats(app, db):
+    """
+    Instrument the application's engines to aggregate per-endpoint query statistics.
+
+    The rows of a group are those written by its statements, as reported by
+    the driver, and those fetched by its session queries, counted as the
+    results are read; SELECTs run on a bare Connection count no rows.
+    Statistics are kept in memory per worker process, exposed through the admin
+    API, and periodically written to QUERY_STATS_DIR so the ``flask query-stats``
+    command can merge the numbers of every worker.
+
+    Parameters:
+    -----------
+    app : Flask
+        The Flask application instance.
+    db : SQLAlchemy
+        The Flask-SQLAlchemy extension bound to the application.
+    """
+    if not app.config.get('QUERY_STATS_ENABLED'):
+        return
+    stats = QueryStats(app.config['QUERY_STATS_SAMPLE_SIZE'])
+    app.extensions['query_stats'] = stats
+
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine, stats)
+
+    @app.teardown_request
+    def flush_query_stats(exc):
+        interval = app.config['QUERY_STATS_FLUSH_INTERVAL']
+        if interval and time.time() - stats.flushed_at >= interval:
+            stats.flush(get_stats_dir(app))
@@ -0,0 +1,205 @@
+import itertools
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+
+REPLICA_BIND_PREFIX = 'replica_'
+READ_METHODS = ('GET', 'HEAD')
+
+
+def replica_binds(app):
+    """
+    Build SQLAlchemy binds for the read replicas in SQLALCHEMY_REPLICA_URIS.
+
+    Replicas are named ``replica_<n>`` and share the primary's engine options.
+
+    Parameters:
+    -----------
+    app : Flask
+        The Flask application instance, before the database is initialized.
+
+    Returns:
+    --------
+    dict:
+        The SQLALCHEMY_BINDS entries for the replicas.
+    """
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    return {f'{REPLICA_BIND_PREFIX}{index}': {**options, 'url': uri}
+            for index, uri in enumerate(app.config.get('SQLALCHEMY_REPLICA_URIS') or [])}
+
+
+def replication_lag(engine):
+    """
+    Return how many seconds a replica is behind its primary.
+
+    Parameters:
+    -----------
+    engine : Engine
+        The replica engine.
+
+    Returns:
+    --------
+    float or None:
+        The lag in seconds, 0 for databases without replication status, or
+        None if the replica is unreachable or replication is stopped.
+    """
+    if engine.dialect.name != 'mysql':
+        return 0.0
+    try:
+        with engine.connect() as connection:
+            try:
+                row = connection.execute(text('SHOW REPLICA STATUS')).mappings().first()
+            except SQLAlchemyError:
+                row = connection.execute(text('SHOW SLAVE STATUS')).mappings().first()
+    except SQLAlchemyError:
+        return None
+    if row is None:
+        return 0.0
+    lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+    return float(lag) if lag is not None else None
+
+
+class ReplicaRouter:
+    """
+    Chooses the engine that serves read-only queries.
+
+    Replicas are used in turn, skipping those whose replication lag exceeds
+    ``max_lag`` seconds; lag is measured at most every ``lag_interval``
+    seconds per replica. Users who wrote recently are pinned to the primary
+    for ``sticky_seconds`` so they read their own writes. The stickiness
+    window is kept in memory, per worker process.
+    """
+
+    def __init__(self, replicas, max_lag=2.0, sticky_seconds=5.0, lag_interval=1.0, lag_probe=replication_lag):
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.lag_interval = lag_interval
+        self.lag_probe = lag_probe
+        self._lags = {}
+        self._sticky = {}
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+
+    def lag(self, engine):
+        """Return the cached replication lag of a replica engine, refreshing it when stale."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._lags.get(engine)
+        if cached is None or now - cached[0] >= self.lag_interval:
+            cached = (now, self.lag_probe(engine))
+            with self._lock:
+                self._lags[engine] = cached
+        return cached[1]
+
+    def choose(self):
+        """Return the next replica within the lag tolerance, or None to use the primary."""
+        for _ in range(len(self.replicas)):
+            engine = self.replicas[next(self._turn) % len(self.replicas)]
+            lag = self.lag(engine)
+            if lag is not None and lag <= self.max_lag:
+                return engine
+        return None
+
+    def record_write(self, identity):
+        """Pin ``identity`` to the primary for the stickiness window."""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._sticky) > 10000:
+                self._sticky = {key: until for key, until in self._sticky.items() if until > now}
+            self._sticky[identity] = now + self.sticky_seconds
+
+    def is_sticky(self, identity):
+        """Return whether ``identity`` wrote within the stickiness window."""
+        with self._lock:
+            return self._sticky.get(identity, 0) > time.monotonic()
+
+
+def _current_identity():
+    # Public routes do not verify tokens, but a user's own token still identifies them
+    if 'replica_identity' not in g:
+        try:
+            verify_jwt_in_request(optional=True)
+            g.replica_identity = get_jwt_identity()
+        except (JWTExtendedException, PyJWTError):
+            g.replica_identity = None
+    return g.replica_identity
+
+
+class RoutingSession(Session):
+    """
+    Session that sends the queries of read-only requests to read replicas.
+
+    A query goes to a replica only when the request is a GET or HEAD, the
+    session has not written anything, the user has not written within the
+    stickiness window, and a replica is within the lag tolerance. The
+    replica is chosen once per request and kept in ``g.replica``, so all
+    reads of a request see the same replica. Everything else, including all
+    writes, uses the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            replica = self._replica_bind(clause)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_bind(self, clause):
+        router = current_app.extensions.get('replicas')
+        if router is None or not router.replicas or self.info.get('wrote'):
+            return None
+        if self._flushing or getattr(clause, 'is_dml', False) or getattr(clause, '_for_update_arg', None):
+            _record_write(self)
+            return None
+        if not has_request_context() or request.method not in READ_METHODS or g.get('read_primary'):
+            return None
+        identity = _current_identity()
+        if identity is not None and router.is_sticky(identity):
+            return None
+        if 'replica' not in g:
+            g.replica = router.choose()
+        return g.replica
+
+
+def _record_write(session):
+    session.info['wrote'] = True
+    router = current_app.extensions.get('replicas')
+    if router is not None and has_request_context():
+        identity = _current_identity()
+        if identity is not None:
+            router.record_write(identity)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _after_flush(session, flush_context):
+    _record_write(session)
+
+
+def setup_replicas(app, db):
+    """
+    Route read-only requests to the replicas configured in SQLALCHEMY_REPLICA_URIS.
+
+    Parameters:
+    -----------
+    app : Flask
+        The Flask application instance.
+    db : SQLAlchemy
+        The Flask-SQLAlchemy extension bound to the application.
+    """
+    with app.app_context():
+        replicas = [engine for key, engine in sorted(db.engines.items(), key=lambda item: str(item[0]))
+                    if isinstance(key, str) and key.startswith(REPLICA_BIND_PREFIX)]
+    if replicas:
+        app.extensions['replicas'] = ReplicaRouter(
+            replicas,
+            max_lag=app.config['REPLICA_MAX_LAG_SECONDS'],
+            sticky_seconds=app.config['REPLICA_STICKY_SECONDS'],
+            lag_interval=app.config['REPLICA_LAG_CHECK_INTERVAL'],
+        )
@@ -0,0 +1,311 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from sqlalchemy import delete, event, func, insert, inspect, select
+from .. import db
+from ..models.content import Course, Lesson
+from ..models.search import SearchDocument, SearchPosting
+
+# Harakat, Quranic annotation marks, superscript alef and tatweel
+_TASHKEEL = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_ARABIC_FOLD = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا', 'ى': 'ي', 'ة': 'ه', 'ؤ': 'و', 'ئ': 'ي'})
+_TOKENS = re.compile(r'\w+')
+_ARABIC = re.compile('[\u0621-\u064a]')
+ARABIC_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+ARABIC_SUFFIXES = ('ها', 'ان', 'ات', 'ون', 'ين', 'يه', 'ه', 'ي')
+MAX_TERM_LENGTH = 64
+
+TITLE_WEIGHT = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Indexed models: document type and (attribute, weight) pairs
+INDEXED_FIELDS = {
+    Course: ('course', (('title', TITLE_WEIGHT), ('description', 1))),
+    Lesson: ('lesson', (('title', TITLE_WEIGHT), ('body', 1))),
+}
+DOC_TYPES = tuple(doc_type for doc_type, _ in INDEXED_FIELDS.values())
+
+
+def normalize(text):
+    """
+    Normalize text for matching: lowercase, strip tashkeel and fold Arabic letter variants.
+
+    Alef with hamza or madda becomes bare alef, alef maqsura becomes ya,
+    ta marbuta becomes ha, and hamza on waw or ya becomes the bare letter.
+
+    Parameters:
+    -----------
+    text : str
+        The text to normalize.
+
+    Returns:
+    --------
+    str:
+        The normalized text.
+    """
+    return _TASHKEEL.sub('', text.lower()).translate(_ARABIC_FOLD)
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    """
+    Reduce a normalized word to its stem with a light stemmer.
+
+    Arabic words lose a leading conjunction waw, the definite article and
+    attached prepositions, then at most one common plural, dual or pronoun
+    suffix, trying two-letter suffixes first. Latin words lose plural and
+    simple verb endings.
+
+    Parameters:
+    -----------
+    word : str
+        A normalized word.
+
+    Returns:
+    --------
+    str:
+        The stem.
+    """
+    if _ARABIC.search(word):
+        if word.startswith('و') and len(word) > 3:
+            word = word[1:]
+        for prefix in ARABIC_PREFIXES:
+            if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+                word = word[len(prefix):]
+                break
+        for suffix in ARABIC_SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 2:
+                word = word[:-len(suffix)]
+                break
+        return word
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith('ing') and len(word) > 5:
+        return word[:-3]
+    if word.endswith('ed') and len(word) > 4:
+        return word[:-2]
+    if word.endswith('s') and not word.endswith('ss') and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """
+    Split text into normalized, stemmed search terms.
+
+    Parameters:
+    -----------
+    text : str or None
+        The text to tokenize.
+
+    Returns:
+    --------
+    list of str:
+        The terms, in order of appearance.
+    """
+    if not text:
+        return []
+    return [stem(word)[:MAX_TERM_LENGTH] for word in _TOKENS.findall(normalize(text))]
+
+
+def document_terms(fields):
+    """Count the weighted terms of ``(text, weight)`` pairs."""
+    counts = Counter()
+    for text, weight in fields:
+        for term in tokenize(text):
+            counts[term] += weight
+    return counts
+
+
+def remove_document(connection, doc_type, doc_id):
+    """Delete a course or lesson from the index using ``connection``."""
+    remove_documents(connection, doc_type, [doc_id])
+
+
+def remove_documents(connection, doc_type, doc_ids):
+    """Delete courses or lessons from the index with two set-based DELETEs."""
+    documents = select(SearchDocument.id).where(SearchDocument.doc_type == doc_type,
+                                                SearchDocument.doc_id.in_(doc_ids))
+    connection.execute(delete(SearchPosting).where(SearchPosting.document_id.in_(documents)))
+    connection.execute(delete(SearchDocument).where(SearchDocument.doc_type == doc_type,
+                                                    SearchDocument.doc_id.in_(doc_ids)))
+
+
+def index_document(connection, doc_type, doc_id, fields):
+    """
+    Replace the index entries of a course or lesson.
+
+    Parameters:
+    -----------
+    connection : Connection
+        The connection to write with, so the index changes in the same
+        transaction as the content.
+    doc_type : str
+        'course' or 'lesson'.
+    doc_id : int
+        The ID of the course or lesson.
+    fields : iterable of (str, int)
+        The texts to index and their weights.
+    """
+    remove_document(connection, doc_type, doc_id)
+    counts = document_terms(fields)
+    if not counts:
+        return
+    result = connection.execute(insert(SearchDocument).values(
+        doc_type=doc_type, doc_id=doc_id, length=sum(counts.values())))
+    document_id = result.inserted_primary_key[0]
+    connection.execute(insert(SearchPosting), [
+        {'term': term, 'document_id': document_id, 'tf': tf} for term, tf in counts.items()])
+
+
+def index_new_documents(connection, doc_type, documents):
+    """
+    Index courses or lessons that are not in the index yet, with set-based writes.
+
+    Bulk imports use this instead of index_document: the documents and
+    postings of a whole batch are written with two multi-row INSERTs.
+
+    Parameters:
+    -----------
+    connection : Connection
+        The connection to write with.
+    doc_type : str
+        'course' or 'lesson'.
+    documents : iterable of (int, iterable of (str, int))
+        The IDs of the rows with their texts and weights.
+    """
+    counts = {doc_id: document_terms(fields) for doc_id, fields in documents}
+    counts = {doc_id: terms for doc_id, terms in counts.items() if terms}
+    if not counts:
+        return
+    connection.execute(insert(SearchDocument), [
+        {'doc_type': doc_type, 'doc_id': doc_id, 'length': sum(terms.values())} for doc_id, terms in counts.items()])
+    document_ids = dict(connection.execute(
+        select(SearchDocument.doc_id, SearchDocument.id)
+        .where(SearchDocument.doc_type == doc_type, SearchDocument.doc_id.in_(list(counts)))).all())
+    connection.execute(insert(SearchPosting), [
+        {'term': term, 'document_id': document_ids[doc_id], 'tf': tf}
+        for doc_id, terms in counts.items() for term, tf in terms.items()])
+
+
+def _indexed_fields(target):
+    doc_type, fields = INDEXED_FIELDS[type(target)]
+    return doc_type, [(getattr(target, name), weight) for name, weight in fields]
+
+
+def _index_after_insert(mapper, connection, target):
+    doc_type, fields = _indexed_fields(target)
+    index_document(connection, doc_type, target.id, fields)
+
+
+def _index_after_update(mapper, connection, target):
+    state = inspect(target)
+    _, fields = INDEXED_FIELDS[type(target)]
+    if any(state.attrs[name].history.has_changes() for name, _ in fields):
+        doc_type, fields = _indexed_fields(target)
+        index_document(connection, doc_type, target.id, fields)
+
+
+def _index_after_delete(mapper, connection, target):
+    remove_document(connection, INDEXED_FIELDS[type(target)][0], target.id)
+
+
+for _model in INDEXED_FIELDS:
+    event.listen(_model, 'after_insert', _index_after_insert)
+    event.listen(_model, 'after_update', _index_after_update)
+    event.listen(_model, 'after_delete', _index_after_delete)
+
+
+def search(query, doc_type=None, limit=20):
+    """
+    Rank courses and lessons against a query with BM25.
+
+    Only the postings of the query terms are read; titles weigh
+    TITLE_WEIGHT times more than descriptions and bodies.
+
+    Parameters:
+    -----------
+    query : str
+        The search query.
+    doc_type : str or None
+        Restrict results to 'course' or 'lesson'.
+    limit : int
+        The maximum number of results (default: 20).
+
+    Returns:
+    --------
+    list of tuple:
+        (doc_type, doc_id, score) for the best matches, best first.
+    """
+    terms = set(tokenize(query))
+    if not terms:
+        return []
+
+    documents = select(func.count(SearchDocument.id), func.avg(SearchDocument.length))
+    postings = (select(SearchPosting.term, SearchPosting.tf, SearchDocument.doc_type,
+                       SearchDocument.doc_id, SearchDocument.length)
+                .join(SearchDocument, SearchDocument.id == SearchPosting.document_id)
+                .where(SearchPosting.term.in_(terms)))
+    if doc_type:
+        documents = documents.where(SearchDocument.doc_type == doc_type)
+        postings = postings.where(SearchDocument.doc_type == doc_type)
+
+    count, average_length = db.session.execute(documents).one()
+    if not count:
+        return []
+    rows = db.session.execute(postings).all()
+
+    frequencies = Counter(row.term for row in rows)
+    idf = {term: math.log(1 + (count - df + 0.5) / (df + 0.5)) for term, df in frequencies.items()}
+    scores = defaultdict(float)
+    for row in rows:
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * row.length / float(average_length))
+        scores[(row.doc_type, row.doc_id)] += idf[row.term] * row.tf * (BM25_K1 + 1) / (row.tf + norm)
+
+    best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+    return [(kind, doc_id, score) for (kind, doc_id), score in best]
+
+
+def rebuild_index(batch_size=500, log=None):
+    """
+    Rebuild the search index from every course and lesson.
+
+    Used to backfill content written without the ORM, such as bulk imports.
+
+    Parameters:
+    -----------
+    batch_size : int
+        The number of rows read and indexed per transaction (default: 500).
+    log : callable or None
+        Called with progress messages.
+
+    Returns:
+    --------
+    int:
+        The number of indexed courses and lessons.
+    """
+    log = log or (lambda message: None)
+    db.session.execute(delete(SearchPosting))
+    db.session.execute(delete(SearchDocument))
+    db.session.commit()
+
+    indexed = 0
+    for model, (doc_type, fields) in INDEXED_FIELDS.items():
+        columns = [model.id] + [getattr(model, name) for name, _ in fields]
+        last_id = 0
+        while True:
+            rows = db.session.execute(select(*columns).where(model.id > last_id)
+                                      .order_by(model.id).limit(batch_size)).all()
+            if not rows:
+                break
+            connection = db.session.connection()
+            for row in rows:
+                index_document(connection, doc_type, row[0], zip(row[1:], (weight for _, weight in fields)))
+            db.session.commit()
+            indexed += len(rows)
+            last_id = rows[-1][0]
+            log(f'indexed: {indexed}')
+    return indexed
@@ -0,0 +1,251 @@
+import json
+import random
+import time
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+from sqlalchemy import insert, select
+from werkzeug.security import generate_password_hash
+from .. import db
+from ..models.user import User, UserRole
+from ..models.content import Course, Lesson, make_excerpt
+from ..models.assessment import Assessment
+from ..models.submission import Submission
+from .grading import score_answers
+from .verses import AYAH_COUNTS
+
+SEED_PASSWORD = 'password'
+
+WORDS = ('quran', 'surah', 'ayah', 'tajweed', 'recitation', 'makharij', 'madd', 'ghunnah',
+         'idgham', 'ikhfa', 'iqlab', 'qalqalah', 'waqf', 'tafsir', 'hifz', 'revision',
+         'memorization', 'meaning', 'letter', 'vowel', 'sukoon', 'shaddah', 'tanween',
+         'الله', 'الرحمن', 'الرحيم', 'الحمد', 'العالمين', 'الصراط', 'المستقيم', 'كتاب', 'آية')
+
+
+def zipf_weights(count, exponent):
+    """
+    Return cumulative Zipf weights for ``count`` items.
+
+    The first items are the most popular, which reproduces the long-tail
+    activity of real users, courses and assessments.
+
+    Parameters:
+    -----------
+    count : int
+        The number of items.
+    exponent : float
+        The skew of the distribution; 0 is uniform.
+
+    Returns:
+    --------
+    list of float:
+        Cumulative weights suitable for ``random.choices(cum_weights=...)``.
+    """
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def _skewed_index(rng, cum_weights):
+    return bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+def _paragraphs(rng, mean_words):
+    count = max(20, int(rng.lognormvariate(0, 0.6) * mean_words))
+    words = [rng.choice(WORDS) for _ in range(count)]
+    return '\n\n'.join(' '.join(words[i:i + 60]) for i in range(0, count, 60))
+
+
+def _citation(rng):
+    # A verse reference such as lessons cite, so the verse index has ranges to serve
+    surah = rng.randint(1, len(AYAH_COUNTS))
+    ayah = rng.randint(1, AYAH_COUNTS[surah - 1])
+    return f'See Quran {surah}:{ayah}.'
+
+
+def _questions(rng):
+    questions = []
+    for index in range(rng.randint(3, 10)):
+        kind = rng.choices(('multiple_choice', 'true_false', 'text'), weights=(6, 3, 1))[0]
+        question = {'question': f'Question {index + 1}: {rng.choice(WORDS)}?', 'type': kind}
+        if kind == 'multiple_choice':
+            question['options'] = ['A', 'B', 'C', 'D']
+            question['correct_answer'] = rng.choice(question['options'])
+        elif kind == 'true_false':
+            question['options'] = ['true', 'false']
+            question['correct_answer'] = rng.choice(question['options'])
+        questions.append(question)
+    return questions
+
+
+def _answer(rng, question, skill):
+    if question['type'] == 'text':
+        return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 30)))
+    if rng.random() < skill:
+        return question['correct_answer']
+    return rng.choice(question['options'])
+
+
+class _Inserter:
+    """Buffer rows for a table and write them with multi-row INSERTs."""
+
+    def __init__(self, table, batch_size):
+        self.table = table
+        self.batch_size = batch_size
+        self.rows = []
+        self.count = 0
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            db.session.execute(insert(self.table), self.rows)
+            db.session.commit()
+            self.count += len(self.rows)
+            self.rows = []
+
+
+def seed_database(students=1000, teachers=20, admins=2, courses=50, lessons=500,
+                  assessments=1000, submissions=10000, skew=0.9, batch_size=5000,
+                  seed=42, tag=None, log=None):
+    """
+    Populate the database with a synthetic, skewed dataset using bulk inserts.
+
+    Authorship and activity follow Zipf distributions: a few teachers own
+    most courses, a few courses hold most lessons, and a few students and
+    assessments account for most submissions. Every student submits an
+    assessment at most once, as the API enforces. Every lesson body cites a
+    Qur'an verse. All users share the password SEED_PASSWORD.
+
+    Parameters:
+    -----------
+    students, teachers, admins : int
+        The number of users to create for each role.
+    courses, lessons, assessments, submissions : int
+        The number of content rows and submissions to create.
+    skew : float
+        The Zipf exponent used for every popularity distribution (default: 0.9).
+    batch_size : int
+        The number of rows per multi-row INSERT and transaction (default: 5000).
+    seed : int
+        The random seed, so that identical arguments produce identical data.
+    tag : str or None
+        A prefix that keeps usernames and titles unique when seeding a database
+        that already contains seeded rows. Defaults to a time-based value.
+    log : callable or None
+        Called with progress messages.
+
+    Returns:
+    --------
+    dict:
+        The number of rows inserted per table and the tag that was used.
+    """
+    rng = random.Random(seed)
+    tag = tag or format(int(time.time()), 'x')
+    log = log or (lambda message: None)
+    now = datetime.utcnow()
+
+    def created(days=365):
+        return now - timedelta(seconds=rng.randrange(days * 86400))
+
+    # Users
+    password_hash = generate_password_hash(SEED_PASSWORD)
+    users = _Inserter(User.__table__, batch_size)
+    for role, count in ((UserRole.STUDENT, students), (UserRole.TEACHER, teachers), (UserRole.ADMIN, admins)):
+        for index in range(count):
+            username = f'seed{tag}_{role}_{index}'
+            users.add({'username': username, 'email': f'{username}@example.com', 'role': role,
+                       'firstName': role.title(), 'lastName': str(index), 'age': rng.randint(7, 70),
+                       'country': rng.choice(('Egypt', 'Saudi Arabia', 'Indonesia', 'Pakistan', 'UK')),
+                       'password_hash': password_hash, 'created_at': created()})
+    users.flush()
+    ids = {UserRole.STUDENT: [], UserRole.TEACHER: [], UserRole.ADMIN: []}
+    for user_id, role in db.session.execute(
+            select(User.id, User.role).where(User.username.like(f'seed{tag}\\_%', escape='\\')).order_by(User.id)):
+        ids[role].append(user_id)
+    log(f'users: {users.count}')
+    if not ids[UserRole.TEACHER] or courses == 0:
+        return {'tag': tag, 'users': users.count, 'courses': 0, 'lessons': 0,
+                'assessments': 0, 'submissions': 0}
+
+    # Courses, owned mostly by a few prolific teachers
+    teacher_weights = zipf_weights(len(ids[UserRole.TEACHER]), skew)
+    course_rows = _Inserter(Course.__table__, batch_size)
+    for index in range(courses):
+        course_rows.add({'title': f'Course {tag}-{index}', 'description': _paragraphs(rng, 40),
+                         'author_id': ids[UserRole.TEACHER][_skewed_index(rng, teacher_weights)],
+                         'created_at': created()})
+    course_rows.flush()
+    course_list = db.session.execute(
+        select(Course.id, Course.author_id).where(Course.title.like(f'Course {tag}-%')).order_by(Course.id)).all()
+    log(f'courses: {course_rows.count}')
+
+    # Lessons, concentrated in popular courses
+    course_weights = zipf_weights(len(course_list), skew)
+    lesson_rows = _Inserter(Lesson.__table__, batch_size)
+    for index in range(lessons):
+        course_id, author_id = course_list[_skewed_index(rng, course_weights)]
+        body = f'{_paragraphs(rng, 300)}\n\n{_citation(rng)}'
+        lesson_rows.add({'title': f'Lesson {tag}-{index}', 'body': body, 'excerpt': make_excerpt(body),
+                         'body_length': len(body.encode('utf-8')), 'author_id': author_id,
+                         'course_id': course_id, 'created_at': created()})
+    lesson_rows.flush()
+    lesson_list = db.session.execute(
+        select(Lesson.id, Lesson.course_id, Lesson.author_id)
+        .where(Lesson.title.like(f'Lesson {tag}-%')).order_by(Lesson.id)).all()
+    log(f'lessons: {lesson_rows.count}')
+    if not lesson_list:
+        return {'tag': tag, 'users': users.count, 'courses': course_rows.count, 'lessons': 0,
+                'assessments': 0, 'submissions': 0}
+
+    # Assessments, spread over lessons
+    assessment_rows = _Inserter(Assessment.__table__, batch_size)
+    questions_by_title = {}
+    for index in range(assessments):
+        lesson_id, course_id, author_id = lesson_list[rng.randrange(len(lesson_list))]
+        questions = _questions(rng)
+        title = f'Assessment {tag}-{index}'
+        questions_by_title[title] = questions
+        assessment_rows.add({'title': title, 'author_id': author_id, 'lesson_id': lesson_id,
+                             'course_id': course_id, 'type': rng.choice(('quiz', 'exam', 'homework')),
+                             'questions': json.dumps(questions),
+                             'answers': json.dumps([question.get('correct_answer', '') for question in questions]),
+                             'created_at': created()})
+    assessment_rows.flush()
+    assessment_list = [(assessment_id, questions_by_title[title]) for assessment_id, title in db.session.execute(
+        select(Assessment.id, Assessment.title).where(Assessment.title.like(f'Assessment {tag}-%')).order_by(Assessment.id))]
+    log(f'assessments: {assessment_rows.count}')
+
+    # Submissions, unique per (student, assessment) with skewed activity
+    student_ids = ids[UserRole.STUDENT]
+    submissions = min(submissions, len(student_ids) * len(assessment_list))
+    student_weights = zipf_weights(len(student_ids), skew)
+    assessment_weights = zipf_weights(len(assessment_list), skew)
+    skills = [rng.betavariate(5, 2) for _ in student_ids]
+    submission_rows = _Inserter(Submission.__table__, batch_size)
+    seen = set()
+    attempts = 0
+    while len(seen) < submissions:
+        attempts += 1
+        # Fall back to uniform picks once the popular pairs are exhausted
+        uniform = attempts > submissions * 4
+        student = rng.randrange(len(student_ids)) if uniform else _skewed_index(rng, student_weights)
+        position = rng.randrange(len(assessment_list)) if uniform else _skewed_index(rng, assessment_weights)
+        pair = student * len(assessment_list) + position
+        if pair in seen:
+            continue
+        seen.add(pair)
+        assessment_id, questions = assessment_list[position]
+        answers = [_answer(rng, question, skills[student]) for question in questions]
+        score, results, _ = score_answers(questions, answers)
+        submission_rows.add({'student_id': student_ids[student], 'assessment_id': assessment_id,
+                             'answers': json.dumps(answers), 'score': score, 'results': results,
+                             'submitted_at': created(180)})
+        if len(seen) % (batch_size * 10) == 0:
+            log(f'submissions: {len(seen)}')
+    submission_rows.flush()
+    log(f'submissions: {submission_rows.count}')
+
+    return {'tag': tag, 'users': users.count, 'courses': course_rows.count, 'lessons': lesson_rows.count,
+            'assessments': assessment_rows.count, 'submissions': submission_rows.count}
@@ -0,0 +1,257 @@
+import bisect
+import re
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import object_session
+from .. import db
+from ..models.content import Course, Lesson
+from .replicas import RoutingSession
+from .search import normalize
+
+# Models whose titles are suggested, with their document type
+SUGGESTED_MODELS = {Course: 'course', Lesson: 'lesson'}
+DOC_TYPES = tuple(SUGGESTED_MODELS.values())
+MAX_KEY_LENGTH = 48
+MIN_WORD_LENGTH = 2
+_SEPARATORS = re.compile(r'[\W_]+')
+# Serializes swapping in a rebuilt index with applying commits, so none is lost in between
+_swap_lock = threading.Lock()
+
+
+def suggestion_key(text):
+    """Normalize a title or typed prefix for prefix matching."""
+    return _SEPARATORS.sub(' ', normalize(text)).strip()[:MAX_KEY_LENGTH]
+
+
+def _word_keys(key):
+    # Every later word of a title starts a key, so "kursi" suggests "Ayat al-Kursi"
+    return [key[match.start():] for match in re.finditer(r'(?<= )\w', key)
+            if len(key) - match.start() >= MIN_WORD_LENGTH]
+
+
+class SortedKeys:
+    """Parallel sorted arrays of keys and values supporting prefix range scans."""
+
+    def __init__(self, items=()):
+        items = sorted(items)
+        self.keys = [key for key, _ in items]
+        self.values = [value for _, value in items]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, value):
+        index = bisect.bisect_right(self.keys, key)
+        self.keys.insert(index, key)
+        self.values.insert(index, value)
+
+    def remove(self, key, value):
+        index = bisect.bisect_left(self.keys, key)
+        while index < len(self.keys) and self.keys[index] == key:
+            if self.values[index] == value:
+                del self.keys[index]
+                del self.values[index]
+                return
+            index += 1
+
+    def prefixed(self, prefix, limit):
+        """Return up to ``limit`` (key, value) pairs whose key starts with ``prefix``, in key order."""
+        index = bisect.bisect_left(self.keys, prefix)
+        found = []
+        while index < len(self.keys) and len(found) < limit and self.keys[index].startswith(prefix):
+            found.append((self.keys[index], self.values[index]))
+            index += 1
+        return found
+
+
+class SuggestIndex:
+    """
+    In-memory prefix index over course and lesson titles.
+
+    Titles are normalized like search terms and kept in sorted arrays, one
+    for whole titles and one for the later words of each title, per
+    document type. A lookup is a binary search followed by a scan of at
+    most ``limit`` entries. Keys are truncated to MAX_KEY_LENGTH characters,
+    so memory grows linearly with the number of titles and their words.
+    """
+
+    def __init__(self, rows=()):
+        titles = {doc_type: [] for doc_type in DOC_TYPES}
+        words = {doc_type: [] for doc_type in DOC_TYPES}
+        self._indexed = {}
+        for doc_type, doc_id, title in rows:
+            key = suggestion_key(title)
+            self._indexed[(doc_type, doc_id)] = title
+            titles[doc_type].append((key, doc_id))
+            words[doc_type].extend((word, doc_id) for word in _word_keys(key))
+        self._titles = {doc_type: SortedKeys(items) for doc_type, items in titles.items()}
+        self._words = {doc_type: SortedKeys(items) for doc_type, items in words.items()}
+        self._lock = threading.Lock()
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._indexed)
+
+    def add(self, doc_type, doc_id, title):
+        """Index a title, replacing the previous title of the same course or lesson."""
+        with self._lock:
+            self._remove((doc_type, doc_id))
+            key = suggestion_key(title)
+            self._indexed[(doc_type, doc_id)] = title
+            self._titles[doc_type].add(key, doc_id)
+            for word in _word_keys(key):
+                self._words[doc_type].add(word, doc_id)
+
+    def remove(self, doc_type, doc_id):
+        """Remove the title of a course or lesson."""
+        with self._lock:
+            self._remove((doc_type, doc_id))
+
+    def _remove(self, document):
+        title = self._indexed.pop(document, None)
+        if title is not None:
+            doc_type, doc_id = document
+            key = suggestion_key(title)
+            self._titles[doc_type].remove(key, doc_id)
+            for word in _word_keys(key):
+                self._words[doc_type].remove(word, doc_id)
+
+    def suggest(self, prefix, limit=10, doc_type=None):
+        """
+        Suggest titles starting with a typed prefix.
+
+        Parameters:
+        -----------
+        prefix : str
+            The typed text.
+        limit : int
+            The maximum number of suggestions (default: 10).
+        doc_type : str or None
+            Restrict suggestions to 'course' or 'lesson'.
+
+        Returns:
+        --------
+        list of tuple:
+            (doc_type, doc_id, title) for titles starting with the prefix,
+            followed by titles with a later word starting with it, each
+            group in alphabetical order.
+        """
+        prefix = suggestion_key(prefix)
+        if not prefix:
+            return []
+        doc_types = [doc_type] if doc_type else DOC_TYPES
+        found, seen = [], set()
+        with self._lock:
+            for arrays in (self._titles, self._words):
+                matches = sorted((key, kind, doc_id) for kind in doc_types
+                                 for key, doc_id in arrays[kind].prefixed(prefix, limit))
+                for _, kind, doc_id in matches:
+                    if len(found) < limit and (kind, doc_id) not in seen:
+                        seen.add((kind, doc_id))
+                        found.append((kind, doc_id, self._indexed[(kind, doc_id)]))
+                if len(found) >= limit:
+                    break
+        return found
+
+
+def build_suggest_index():
+    """Build a SuggestIndex from every course and lesson title."""
+    rows = []
+    for model, doc_type in SUGGESTED_MODELS.items():
+        rows.extend((doc_type, doc_id, title) for doc_id, title in db.session.execute(select(model.id, model.title)))
+    return SuggestIndex(rows)
+
+
+def suggest_index():
+    """
+    Return the worker's title index, building it on first use.
+
+    Commits in this worker update the index in place. The index is rebuilt
+    once it is older than SUGGEST_REFRESH_SECONDS, which picks up the writes
+    of other workers. Only one request rebuilds it at a time, while the
+    others keep using the previous index; the commits applied meanwhile are
+    replayed on the new index before it replaces the old one.
+
+    Returns:
+    --------
+    SuggestIndex:
+        The title index.
+    """
+    extensions = current_app.extensions
+    index = extensions.get('suggest')
+    if index is not None and time.monotonic() - index.built_at < current_app.config['SUGGEST_REFRESH_SECONDS']:
+        return index
+    rebuild = extensions.setdefault('suggest_rebuild', threading.Lock())
+    # Only the first build is waited for
+    if not rebuild.acquire(blocking=index is None):
+        return index
+    try:
+        current = extensions.get('suggest')
+        if current is not index:
+            return current
+        extensions['suggest_journal'] = []
+        fresh = build_suggest_index()
+        with _swap_lock:
+            for operation in extensions.pop('suggest_journal'):
+                _apply(fresh, *operation)
+            extensions['suggest'] = fresh
+        return fresh
+    finally:
+        extensions.pop('suggest_journal', None)
+        rebuild.release()
+
+
+def _record(target, operation):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('suggest_pending', []).append(
+            (operation, SUGGESTED_MODELS[type(target)], target.id, target.title))
+
+
+def _suggest_after_insert(mapper, connection, target):
+    _record(target, 'add')
+
+
+def _suggest_after_update(mapper, connection, target):
+    if inspect(target).attrs.title.history.has_changes():
+        _record(target, 'add')
+
+
+def _suggest_after_delete(mapper, connection, target):
+    _record(target, 'remove')
+
+
+for _model in SUGGESTED_MODELS:
+    event.listen(_model, 'after_insert', _suggest_after_insert)
+    event.listen(_model, 'after_update', _suggest_after_update)
+    event.listen(_model, 'after_delete', _suggest_after_delete)
+
+
+def _apply(index, operation, doc_type, doc_id, title):
+    if operation == 'add':
+        index.add(doc_type, doc_id, title)
+    else:
+        index.remove(doc_type, doc_id)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _apply_after_commit(session):
+    pending = session.info.pop('suggest_pending', None)
+    if not pending or not has_app_context():
+        return
+    with _swap_lock:
+        index = current_app.extensions.get('suggest')
+        journal = current_app.extensions.get('suggest_journal')
+        if journal is not None:
+            # A rebuild is reading the titles; it may have missed these changes
+            journal.extend(pending)
+        if index is not None:
+            for operation in pending:
+                _apply(index, *operation)
+
+
+@event.listens_for(RoutingSession, 'after_soft_rollback')
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop('suggest_pending', None)
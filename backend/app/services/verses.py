@@ -0,0 +1,501 @@
+import re
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.orm import object_session
+from .. import db
+from ..models.assessment import Assessment
+from ..models.content import Lesson
+from ..models.verse import VerseReference
+from .replicas import RoutingSession
+from .search import normalize
+
+AYAH_COUNTS = (
+    7, 286, 200, 176, 120, 165, 206, 75, 129, 109, 123, 111, 43, 52, 99, 128, 111, 110, 98, 135,
+    112, 78, 118, 64, 77, 227, 93, 88, 69, 60, 34, 30, 73, 54, 45, 83, 182, 88, 75, 85,
+    54, 53, 89, 59, 37, 35, 38, 29, 18, 45, 60, 49, 62, 55, 78, 96, 29, 22, 24, 13,
+    14, 11, 11, 18, 12, 12, 30, 52, 52, 44, 28, 28, 20, 56, 40, 31, 50, 40, 46, 42,
+    29, 19, 36, 25, 22, 17, 19, 26, 30, 20, 15, 21, 11, 8, 8, 19, 5, 8, 8, 11,
+    11, 8, 3, 9, 5, 4, 7, 3, 6, 3, 5, 4, 5, 6,
+)
+SURAH_NAMES = (
+    'Al-Fatihah', 'Al-Baqarah', 'Al-Imran', 'An-Nisa', "Al-Ma'idah", "Al-An'am", "Al-A'raf", 'Al-Anfal',
+    'At-Tawbah', 'Yunus', 'Hud', 'Yusuf', "Ar-Ra'd", 'Ibrahim', 'Al-Hijr', 'An-Nahl', 'Al-Isra', 'Al-Kahf',
+    'Maryam', 'Ta-Ha', 'Al-Anbiya', 'Al-Hajj', "Al-Mu'minun", 'An-Nur', 'Al-Furqan', "Ash-Shu'ara",
+    'An-Naml', 'Al-Qasas', 'Al-Ankabut', 'Ar-Rum', 'Luqman', 'As-Sajdah', 'Al-Ahzab', 'Saba', 'Fatir',
+    'Ya-Sin', 'As-Saffat', 'Sad', 'Az-Zumar', 'Ghafir', 'Fussilat', 'Ash-Shura', 'Az-Zukhruf',
+    'Ad-Dukhan', 'Al-Jathiyah', 'Al-Ahqaf', 'Muhammad', 'Al-Fath', 'Al-Hujurat', 'Qaf', 'Adh-Dhariyat',
+    'At-Tur', 'An-Najm', 'Al-Qamar', 'Ar-Rahman', "Al-Waqi'ah", 'Al-Hadid', 'Al-Mujadilah', 'Al-Hashr',
+    'Al-Mumtahanah', 'As-Saff', "Al-Jumu'ah", 'Al-Munafiqun', 'At-Taghabun', 'At-Talaq', 'At-Tahrim',
+    'Al-Mulk', 'Al-Qalam', 'Al-Haqqah', "Al-Ma'arij", 'Nuh', 'Al-Jinn', 'Al-Muzzammil', 'Al-Muddaththir',
+    'Al-Qiyamah', 'Al-Insan', 'Al-Mursalat', 'An-Naba', "An-Nazi'at", 'Abasa', 'At-Takwir', 'Al-Infitar',
+    'Al-Mutaffifin', 'Al-Inshiqaq', 'Al-Buruj', 'At-Tariq', "Al-A'la", 'Al-Ghashiyah', 'Al-Fajr',
+    'Al-Balad', 'Ash-Shams', 'Al-Layl', 'Ad-Duha', 'Ash-Sharh', 'At-Tin', 'Al-Alaq', 'Al-Qadr',
+    'Al-Bayyinah', 'Az-Zalzalah', 'Al-Adiyat', "Al-Qari'ah", 'At-Takathur', 'Al-Asr', 'Al-Humazah',
+    'Al-Fil', 'Quraysh', "Al-Ma'un", 'Al-Kawthar', 'Al-Kafirun', 'An-Nasr', 'Al-Masad', 'Al-Ikhlas',
+    'Al-Falaq', 'An-Nas',
+)
+SURAH_NAMES_AR = (
+    'الفاتحة', 'البقرة', 'آل عمران', 'النساء', 'المائدة', 'الأنعام', 'الأعراف', 'الأنفال', 'التوبة', 'يونس',
+    'هود', 'يوسف', 'الرعد', 'إبراهيم', 'الحجر', 'النحل', 'الإسراء', 'الكهف', 'مريم', 'طه', 'الأنبياء',
+    'الحج', 'المؤمنون', 'النور', 'الفرقان', 'الشعراء', 'النمل', 'القصص', 'العنكبوت', 'الروم', 'لقمان',
+    'السجدة', 'الأحزاب', 'سبأ', 'فاطر', 'يس', 'الصافات', 'ص', 'الزمر', 'غافر', 'فصلت', 'الشورى',
+    'الزخرف', 'الدخان', 'الجاثية', 'الأحقاف', 'محمد', 'الفتح', 'الحجرات', 'ق', 'الذاريات', 'الطور',
+    'النجم', 'القمر', 'الرحمن', 'الواقعة', 'الحديد', 'المجادلة', 'الحشر', 'الممتحنة', 'الصف', 'الجمعة',
+    'المنافقون', 'التغابن', 'الطلاق', 'التحريم', 'الملك', 'القلم', 'الحاقة', 'المعارج', 'نوح', 'الجن',
+    'المزمل', 'المدثر', 'القيامة', 'الإنسان', 'المرسلات', 'النبأ', 'النازعات', 'عبس', 'التكوير',
+    'الانفطار', 'المطففين', 'الانشقاق', 'البروج', 'الطارق', 'الأعلى', 'الغاشية', 'الفجر', 'البلد',
+    'الشمس', 'الليل', 'الضحى', 'الشرح', 'التين', 'العلق', 'القدر', 'البينة', 'الزلزلة', 'العاديات',
+    'القارعة', 'التكاثر', 'العصر', 'الهمزة', 'الفيل', 'قريش', 'الماعون', 'الكوثر', 'الكافرون', 'النصر',
+    'المسد', 'الإخلاص', 'الفلق', 'الناس',
+)
+
+# Models whose text is scanned for references: document type and attributes
+REFERENCING_FIELDS = {
+    Lesson: ('lesson', ('title', 'body')),
+    Assessment: ('assessment', ('title', 'questions')),
+}
+DOC_TYPES = tuple(doc_type for doc_type, _ in REFERENCING_FIELDS.values())
+
+
+def _transliteration_keys(name):
+    # "Al-Baqarah" is also written "al baqarah", "Baqara" and "Al-Baqara"
+    article, _, body = name.partition('-') if re.match(r"A[a-z]{1,2}-", name) else ('', '', name)
+    body = re.sub(r"[-'\s]", '', body.lower())
+    bodies = (body, body[:-1]) if body.endswith('ah') else (body,)
+    return [prefix + body for body in bodies for prefix in ('', article.lower())]
+
+
+_RANGE = r'(?P<start>\d{1,3})(?:\s*[-–]\s*(?P<end>\d{1,3}))?(?![\d:])'
+_NUMERIC_REFERENCE = re.compile(
+    r'(?<![\w:.])(?P<surah>\d{1,3})\s*:\s*(?P<start>\d{1,3})'
+    r'(?:\s*[-–]\s*(?:(?P<end_surah>\d{1,3})\s*:\s*)?(?P<end>\d{1,3}))?(?![\w:])')
+# The ayahs following a surah name
+_AYAHS = re.compile(rf'\s*[:،,]?\s*(?:(?:ayahs?|ayat|verses?|v\.|الايه|الايات|ايه|ايات)\s*)?{_RANGE}(?!\w)')
+_WORD = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*")
+_PREFIXES = ('surah', 'surat', 'sura', 'سوره')
+# A bare "10:30" is as likely a time or a ratio as a verse: numeric references need one of these words
+# shortly before them in the same sentence, or to follow a surah name or another reference in a list
+_NUMERIC_CONTEXT = re.compile(
+    r"(?<!\w)(?:qur'?an|koran|q\.?|surah|surat|sura|ayahs?|ayat|verses?|القران|قران|سوره|الايه|الايات|ايه|ايات)"
+    r"(?!\w)[^\n.!?]{0,32}$")
+_CONTEXT_WINDOW = 48
+_LIST_GAP = re.compile(r'[\s,;&()\[\]]*(?:(?:and|or|و)[\s(\[]*)?')
+# Name spellings without separators, by surah; names are looked up word by word
+_NAME_KEYS = {}
+for _number, _name in enumerate(SURAH_NAMES, 1):
+    for _key in _transliteration_keys(_name):
+        _NAME_KEYS.setdefault(_key, _number)
+for _number, _name in enumerate(SURAH_NAMES_AR, 1):
+    _NAME_KEYS.setdefault(normalize(_name).replace(' ', ''), _number)
+_MAX_NAME_WORDS = 3
+# The words a name can start with, so most words are passed over with one set lookup
+_NAME_STARTS = {key[:length] for key in _NAME_KEYS for length in range(1, len(key) + 1)}
+_NAME_STARTS.update({f'و{start}' for start in _NAME_STARTS})
+# Texts longer than this are only scanned up to it when they are written
+MAX_SCANNED_CHARS = 100_000
+_SURAH_NAMES = {normalize(re.sub(r"[-'\s]", '', name)): number for number, name in enumerate(SURAH_NAMES, 1)}
+_SURAH_NAMES.update({normalize(name).replace(' ', ''): number for number, name in enumerate(SURAH_NAMES_AR, 1)})
+
+
+def surah_number(value):
+    """
+    Resolve a surah number or name.
+
+    Parameters:
+    -----------
+    value : str or int
+        A surah number, or its transliterated or Arabic name.
+
+    Returns:
+    --------
+    int or None:
+        The surah number, or None if it does not name a surah.
+    """
+    value = str(value).strip()
+    if value.isdigit():
+        return int(value) if 1 <= int(value) <= len(AYAH_COUNTS) else None
+    key = re.sub(r"[-'\s]", '', normalize(value))
+    if key in _SURAH_NAMES:
+        return _SURAH_NAMES[key]
+    key = re.sub(r'^(surah|surat|sura|سوره)', '', key)
+    return _SURAH_NAMES.get(key) or _SURAH_NAMES.get(f'al{key}') or _SURAH_NAMES.get(f'ال{key}')
+
+
+def _interval(surah, start, end):
+    # Clamp a parsed range to the surah; None when it cannot be a reference
+    if not 1 <= surah <= len(AYAH_COUNTS) or start < 1 or start > AYAH_COUNTS[surah - 1]:
+        return None
+    end = min(end, AYAH_COUNTS[surah - 1])
+    return (surah, start, end) if end >= start else None
+
+
+def _surah_names(text):
+    # Yields (start, end, surah, prefixed) for the surah names in a normalized text, found by
+    # looking up runs of up to _MAX_NAME_WORDS words, longest first, in one pass over its words
+    words = [(match.start(), match.end(), match.group().replace("'", '')) for match in _WORD.finditer(text)]
+    index = 0
+    while index < len(words):
+        if words[index][2] not in _NAME_STARTS:
+            index += 1
+            continue
+        for count in range(min(_MAX_NAME_WORDS, len(words) - index), 0, -1):
+            run = words[index:index + count]
+            if any(text[previous[1]:following[0]] not in (' ', '-', "'") for previous, following in zip(run, run[1:])):
+                continue
+            key = ''.join(word for _, _, word in run)
+            surah = _NAME_KEYS.get(key) or (key.startswith('و') and _NAME_KEYS.get(key[1:]))
+            if surah:
+                prefixed = index > 0 and words[index - 1][2] in _PREFIXES and \
+                    text[words[index - 1][1]:run[0][0]].isspace()
+                yield run[0][0], run[-1][1], surah, prefixed
+                index += count
+                break
+        else:
+            index += 1
+
+
+def _in_context(text, start, previous_end):
+    # Whether the numeric reference at `start` reads as a verse reference
+    if previous_end is not None and _LIST_GAP.fullmatch(text, previous_end, start):
+        return True
+    return _NUMERIC_CONTEXT.search(text, max(0, start - _CONTEXT_WINDOW), start) is not None
+
+
+def extract_references(text, require_context=True):
+    """
+    Extract the Qur'an verse ranges referenced in a text.
+
+    Recognized forms are numeric references ("Qur'an 2:255", "ayat
+    2:255-257", "Q 2:286-3:2"), transliterated surah names followed by
+    ayahs ("Al-Baqarah 255", "Surat al-Baqara 1-5"), Arabic names followed
+    by ayahs in either digit set ("البقرة ٢٥٥", "سورة البقرة الآية 255"), and
+    whole surahs introduced by "Surah" or "سورة". A numeric reference only
+    counts shortly after a word such as Qur'an, surah, ayah or verse in the
+    same sentence, or right after a surah name or another reference, so
+    that times like "10:30" are not read as verses. Ranges are clamped to
+    the length of the surah, and overlapping or adjacent ranges are merged.
+
+    The text is scanned in linear time: names are found by looking up its
+    words rather than by trying every name at every position.
+
+    Parameters:
+    -----------
+    text : str or None
+        The text to scan.
+    require_context : bool
+        False accepts bare numeric references, for text known to be a
+        reference such as a search query (default: True).
+
+    Returns:
+    --------
+    list of tuple:
+        (surah, ayah_start, ayah_end) ranges, sorted.
+    """
+    if not text:
+        return []
+    text = normalize(text)
+    intervals = []
+    name_ends = []
+    for start, end, surah, prefixed in _surah_names(text):
+        name_ends.append(end)
+        ayahs = _AYAHS.match(text, end)
+        if ayahs:
+            first = int(ayahs.group('start'))
+            intervals.append(_interval(surah, first, int(ayahs.group('end') or first)))
+            name_ends[-1] = ayahs.end()
+        elif prefixed:
+            intervals.append((surah, 1, AYAH_COUNTS[surah - 1]))
+
+    previous_end, names = None, iter(name_ends)
+    next_name = next(names, None)
+    for match in _NUMERIC_REFERENCE.finditer(text):
+        while next_name is not None and next_name <= match.start():
+            previous_end, next_name = max(previous_end or 0, next_name), next(names, None)
+        if require_context and not _in_context(text, match.start(), previous_end):
+            continue
+        previous_end = match.end()
+        surah, start = int(match.group('surah')), int(match.group('start'))
+        end_surah = int(match.group('end_surah') or surah)
+        end = int(match.group('end') or start)
+        if end_surah == surah:
+            intervals.append(_interval(surah, start, end))
+        elif surah < end_surah <= len(AYAH_COUNTS):
+            intervals.append(_interval(surah, start, AYAH_COUNTS[surah - 1]))
+            intervals.extend(_interval(number, 1, AYAH_COUNTS[number - 1]) for number in range(surah + 1, end_surah))
+            intervals.append(_interval(end_surah, 1, end))
+
+    merged = []
+    for surah, start, end in sorted(interval for interval in intervals if interval):
+        if merged and merged[-1][0] == surah and start <= merged[-1][2] + 1:
+            merged[-1] = (surah, merged[-1][1], max(end, merged[-1][2]))
+        else:
+            merged.append((surah, start, end))
+    return merged
+
+
+def _scanned_text(texts):
+    # The text of a row extracted on writes, capped so one huge body cannot stall the request
+    return '\n'.join(text for text in texts if text)[:MAX_SCANNED_CHARS]
+
+
+class IntervalTree:
+    """
+    Static interval tree answering overlap queries in O(log n + k).
+
+    Intervals are kept in arrays sorted by start, read as an implicit
+    balanced binary tree whose root is the middle element; every node also
+    stores the largest end in its subtree, so subtrees that end before the
+    query or start after it are skipped.
+    """
+
+    def __init__(self, intervals):
+        intervals = sorted(intervals, key=lambda interval: (interval[0], interval[1]))
+        self.starts = [interval[0] for interval in intervals]
+        self.ends = [interval[1] for interval in intervals]
+        self.values = [interval[2] for interval in intervals]
+        self.max_ends = [0] * len(intervals)
+        self._build(0, len(intervals))
+
+    def _build(self, low, high):
+        if low >= high:
+            return 0
+        middle = (low + high) // 2
+        self.max_ends[middle] = max(self.ends[middle], self._build(low, middle), self._build(middle + 1, high))
+        return self.max_ends[middle]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlapping(self, start, end):
+        """Return the (start, end, value) intervals overlapping [start, end], ordered by start and end."""
+        found = []
+        ranges = [(0, len(self.starts))]
+        while ranges:
+            low, high = ranges.pop()
+            if low >= high:
+                continue
+            middle = (low + high) // 2
+            if self.max_ends[middle] < start:
+                continue
+            if self.starts[middle] <= end:
+                if self.ends[middle] >= start:
+                    found.append(middle)
+                ranges.append((middle + 1, high))
+            ranges.append((low, middle))
+        return [(self.starts[index], self.ends[index], self.values[index]) for index in sorted(found)]
+
+
+class VerseIndex:
+    """
+    Per-worker cache of one interval tree per surah.
+
+    A surah's tree is loaded from verse_references with one indexed query
+    the first time it is needed and kept for ``ttl`` seconds. Commits that
+    change references in this worker clear the cache immediately; the TTL
+    bounds how long writes made by other workers stay invisible.
+    """
+
+    def __init__(self, ttl=60.0):
+        self.ttl = ttl
+        self._trees = {}
+        self._lock = threading.Lock()
+
+    def tree(self, surah):
+        """Return the interval tree of a surah, loading it if missing or expired."""
+        with self._lock:
+            cached = self._trees.get(surah)
+        if cached is None or time.monotonic() - cached[0] >= self.ttl:
+            rows = db.session.execute(
+                select(VerseReference.ayah_start, VerseReference.ayah_end,
+                       VerseReference.doc_type, VerseReference.doc_id)
+                .where(VerseReference.surah == surah)).all()
+            cached = (time.monotonic(), IntervalTree((row[0], row[1], (row[2], row[3])) for row in rows))
+            with self._lock:
+                self._trees[surah] = cached
+        return cached[1]
+
+    def overlapping(self, surah, start, end):
+        """
+        Find the lessons and assessments referencing verses of a surah.
+
+        Parameters:
+        -----------
+        surah : int
+            The surah number.
+        start : int
+            The first ayah of the queried range.
+        end : int
+            The last ayah of the queried range (inclusive).
+
+        Returns:
+        --------
+        list of tuple:
+            (ayah_start, ayah_end, (doc_type, doc_id)) for every referenced
+            range overlapping the query, ordered by ayah_start and ayah_end.
+        """
+        return self.tree(surah).overlapping(start, end)
+
+    def clear(self):
+        """Drop every cached tree."""
+        with self._lock:
+            self._trees.clear()
+
+
+def verse_index():
+    """Return the application's VerseIndex, creating it on first use."""
+    index = current_app.extensions.get('verse_index')
+    if index is None:
+        index = current_app.extensions.setdefault('verse_index', VerseIndex(current_app.config['VERSE_INDEX_TTL']))
+    return index
+
+
+def index_references(connection, doc_type, doc_id, texts):
+    """
+    Replace the verse references of a lesson or assessment.
+
+    Parameters:
+    -----------
+    connection : Connection
+        The connection to write with, so the references change in the same
+        transaction as the content.
+    doc_type : str
+        'lesson' or 'assessment'.
+    doc_id : int
+        The ID of the lesson or assessment.
+    texts : iterable of str
+        The texts to extract references from; only their first
+        MAX_SCANNED_CHARS characters are scanned.
+
+    Returns:
+    --------
+    list of tuple:
+        The stored (surah, ayah_start, ayah_end) ranges.
+    """
+    connection.execute(delete(VerseReference).where(VerseReference.doc_type == doc_type,
+                                                    VerseReference.doc_id == doc_id))
+    intervals = extract_references(_scanned_text(texts))
+    if intervals:
+        connection.execute(insert(VerseReference), [
+            {'surah': surah, 'ayah_start': start, 'ayah_end': end, 'doc_type': doc_type, 'doc_id': doc_id}
+            for surah, start, end in intervals])
+    return intervals
+
+
+def add_references(connection, doc_type, documents):
+    """
+    Store the verse references of lessons or assessments that have none yet.
+
+    Bulk imports use this instead of index_references, writing the
+    references of a whole batch with one multi-row INSERT.
+
+    Parameters:
+    -----------
+    connection : Connection
+        The connection to write with.
+    doc_type : str
+        'lesson' or 'assessment'.
+    documents : iterable of (int, iterable of str)
+        The IDs of the rows with the texts to extract references from.
+    """
+    rows = [{'surah': surah, 'ayah_start': start, 'ayah_end': end, 'doc_type': doc_type, 'doc_id': doc_id}
+            for doc_id, texts in documents
+            for surah, start, end in extract_references(_scanned_text(texts))]
+    if rows:
+        connection.execute(insert(VerseReference), rows)
+
+
+def remove_references(connection, doc_type, doc_ids):
+    """Delete the verse references of lessons or assessments with one DELETE."""
+    connection.execute(delete(VerseReference).where(VerseReference.doc_type == doc_type,
+                                                    VerseReference.doc_id.in_(doc_ids)))
+
+
+def _mark_stale(target):
+    session = object_session(target)
+    if session is not None:
+        session.info['verse_index_stale'] = True
+
+
+def _references_after_insert(mapper, connection, target):
+    doc_type, fields = REFERENCING_FIELDS[type(target)]
+    index_references(connection, doc_type, target.id, [getattr(target, name) for name in fields])
+    _mark_stale(target)
+
+
+def _references_after_update(mapper, connection, target):
+    doc_type, fields = REFERENCING_FIELDS[type(target)]
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in fields):
+        index_references(connection, doc_type, target.id, [getattr(target, name) for name in fields])
+        _mark_stale(target)
+
+
+def _references_after_delete(mapper, connection, target):
+    doc_type, _ = REFERENCING_FIELDS[type(target)]
+    connection.execute(delete(VerseReference).where(VerseReference.doc_type == doc_type,
+                                                    VerseReference.doc_id == target.id))
+    _mark_stale(target)
+
+
+for _model in REFERENCING_FIELDS:
+    event.listen(_model, 'after_insert', _references_after_insert)
+    event.listen(_model, 'after_update', _references_after_update)
+    event.listen(_model, 'after_delete', _references_after_delete)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _clear_after_commit(session):
+    if session.info.pop('verse_index_stale', False) and has_app_context():
+        index = current_app.extensions.get('verse_index')
+        if index is not None:
+            index.clear()
+
+
+@event.listens_for(RoutingSession, 'after_soft_rollback')
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop('verse_index_stale', None)
+
+
+def rebuild_references(batch_size=500, log=None):
+    """
+    Rebuild the verse-reference index from every lesson and assessment.
+
+    Used to backfill existing content and content written without the ORM.
+
+    Parameters:
+    -----------
+    batch_size : int
+        The number of rows read and indexed per transaction (default: 500).
+    log : callable or None
+        Called with progress messages.
+
+    Returns:
+    --------
+    int:
+        The number of stored verse ranges.
+    """
+    log = log or (lambda message: None)
+    db.session.execute(delete(VerseReference))
+    db.session.commit()
+
+    stored = 0
+    for model, (doc_type, fields) in REFERENCING_FIELDS.items():
+        columns = [model.id] + [getattr(model, name) for name in fields]
+        last_id, scanned = 0, 0
+        while True:
+            rows = db.session.execute(select(*columns).where(model.id > last_id)
+                                      .order_by(model.id).limit(batch_size)).all()
+            if not rows:
+                break
+            connection = db.session.connection()
+            for row in rows:
+                stored += len(index_references(connection, doc_type, row[0], row[1:]))
+            db.session.commit()
+            scanned += len(rows)
+            last_id = rows[-1][0]
+            log(f'{doc_type}s scanned: {scanned}, verse ranges: {stored}')
+    if has_app_context() and 'verse_index' in current_app.extensions:
+        current_app.extensions['verse_index'].clear()
+    return stored
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+API Scale Benchmark
+
+This script seeds a synthetic dataset (see `flask seed`) at one or more scales
+and measures the throughput and latency percentiles of every route under
+/api/v1 through the Flask test client, so the numbers reflect application and
+database time without network noise. Each scale produces a JSON report keyed
+by "<METHOD> <rule>", so reports from different commits can be compared.
+
+Routes with path parameters are filled with IDs from the seeded data, GET
+routes are called with the first role that is allowed to access them and with
+the query parameters they require (a search term and title prefix, a verse
+reference and batch IDs taken from the seeded rows), and write routes use
+generated payloads (JSON, or raw NDJSON and CSV for the import routes). Every
+response body is read and the response closed inside the timed call, so
+streamed responses are measured in full. Routes that cannot be exercised are
+listed in the report with the reason they were skipped, and routes whose
+responses are mostly errors are listed as failed and make the run exit with
+status 1, since their timings do not measure the route.
+
+Each scale drops and recreates every table of the configured database. The
+default configuration uses an in-memory SQLite database; any other database
+must be named explicitly and the run confirmed with --reset-db.
+
+Usage:
+    python benchmarks/bench_api.py --scales 10000,100000,1000000
+    python benchmarks/bench_api.py --database-url sqlite:////tmp/bench.db --reset-db --requests 20
+    python benchmarks/bench_api.py --compare reports/api-10000-old.json reports/api-10000-new.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.config import config  # noqa: E402
+from app.models.user import User, UserRole  # noqa: E402
+from app.models.content import Course, Lesson  # noqa: E402
+from app.models.assessment import Assessment  # noqa: E402
+from app.models.submission import Submission  # noqa: E402
+from app.models.verse import VerseReference  # noqa: E402
+from app.services.metrics import summarize  # noqa: E402
+from app.services.search import rebuild_index  # noqa: E402
+from app.services.seed import seed_database  # noqa: E402
+from app.services.verses import rebuild_references  # noqa: E402
+
+SKIPPED_METHODS = {'HEAD', 'OPTIONS'}
+IN_MEMORY_DATABASES = {'sqlite://', 'sqlite:///:memory:'}
+BATCH_IDS = 20
+QUESTIONS = [
+    {'question': 'What is 2+2?', 'type': 'multiple_choice', 'options': ['3', '4', '5'], 'correct_answer': '4'},
+    {'question': 'Is the sky blue?', 'type': 'true_false', 'options': ['true', 'false'], 'correct_answer': 'true'},
+]
+
+
+def dataset_for(submissions):
+    """Return `seed_database` arguments giving a realistic dataset around a submission count."""
+    assessments = max(50, submissions // 500)
+    lessons = max(25, assessments // 2)
+    courses = max(5, lessons // 10)
+    return {
+        'students': max(500, submissions // 25),
+        'teachers': max(5, courses // 5),
+        'admins': 2,
+        'courses': courses,
+        'lessons': lessons,
+        'assessments': assessments,
+        'submissions': submissions,
+    }
+
+
+class Context:
+    """Seeded IDs, user tokens and helpers shared by the route cases."""
+
+    def __init__(self, app, requests):
+        self.app = app
+        self.client = app.test_client()
+        self.counter = 0
+
+        # A busy course with lessons and assessments, and its author
+        course_id, lesson_id, assessment_id = db.session.execute(
+            select(Assessment.course_id, Assessment.lesson_id, Assessment.id)
+            .join(Submission, Submission.assessment_id == Assessment.id)
+            .group_by(Assessment.id, Assessment.course_id, Assessment.lesson_id)
+            .order_by(func.count(Submission.id).desc()).limit(1)).one()
+        course = db.session.get(Course, course_id)
+        self.teacher = course.author
+        self.student = db.session.execute(
+            select(User).join(Submission, Submission.student_id == User.id)
+            .where(Submission.assessment_id == assessment_id).limit(1)).scalar_one()
+        self.admin = User.query.filter_by(role=UserRole.ADMIN).first()
+        submission_id = db.session.execute(
+            select(Submission.id).where(Submission.assessment_id == assessment_id).limit(1)).scalar_one()
+
+        self.params = {
+            'course_id': course_id,
+            'lesson_id': lesson_id,
+            'assessment_id': assessment_id,
+            'submission_id': submission_id,
+            'user_id': self.student.id,
+            'author': self.teacher.username,
+            'username': self.student.username,
+            'role': UserRole.STUDENT,
+        }
+        self.tokens = {user.role: self.token(user) for user in (self.teacher, self.student, self.admin)}
+
+        # Query parameters of the GET routes that require them: endpoint -> parameters
+        lesson_title = db.session.get(Lesson, lesson_id).title
+        reference = db.session.execute(
+            select(VerseReference.surah, VerseReference.ayah_start).order_by(VerseReference.id).limit(1)).first()
+        self.query = {
+            'content.search': {'q': lesson_title},
+            'content.suggest': {'q': lesson_title[:len(lesson_title) // 2]},
+            'content.get_verse_references': {'ref': f'{reference.surah}:{reference.ayah_start}'} if reference else {},
+            'content.get_courses_batch': {'ids': self.seeded_ids(Course)},
+            'content.get_lessons_batch': {'ids': self.seeded_ids(Lesson)},
+            'assessment.get_assessments_batch': {'ids': self.seeded_ids(Assessment)},
+            'users.get_users_batch': {'ids': self.seeded_ids(User)},
+        }
+
+        # Students who have not submitted the benchmarked assessment yet
+        submitted = select(Submission.student_id).where(Submission.assessment_id == assessment_id)
+        self.fresh_students = User.query.filter(User.role == UserRole.STUDENT, User.id.not_in(submitted)) \
+            .limit(requests * 2).all()
+
+    def seeded_ids(self, model):
+        ids = db.session.execute(select(model.id).order_by(model.id).limit(BATCH_IDS)).scalars()
+        return ','.join(str(value) for value in ids)
+
+    def token(self, user):
+        return create_access_token(identity=user.username)
+
+    def headers(self, role):
+        return {'Authorization': f'Bearer {self.tokens[role]}'}
+
+    def unique(self, prefix):
+        self.counter += 1
+        return f'{prefix} bench {os.getpid()}-{time.time_ns()}-{self.counter}'
+
+
+def _new_course(ctx):
+    course = Course(title=ctx.unique('Course'), description='Benchmark course', author_id=ctx.teacher.id)
+    db.session.add(course)
+    db.session.commit()
+    return course
+
+
+def _new_lesson(ctx):
+    course = db.session.get(Course, ctx.params['course_id'])
+    lesson = Lesson(title=ctx.unique('Lesson'), body='Benchmark lesson', author_id=ctx.teacher.id, course_id=course.id)
+    db.session.add(lesson)
+    db.session.commit()
+    return lesson
+
+
+def _new_assessment(ctx):
+    assessment = Assessment(title=ctx.unique('Assessment'), author_id=ctx.teacher.id,
+                            lesson_id=ctx.params['lesson_id'], course_id=ctx.params['course_id'],
+                            questions=json.dumps(QUESTIONS), answers=json.dumps(['4', 'true']), type='quiz')
+    db.session.add(assessment)
+    db.session.commit()
+    return assessment
+
+
+def _fresh_student_token(ctx):
+    if not ctx.fresh_students:
+        raise LookupError('no student left without a submission')
+    return ctx.token(ctx.fresh_students.pop())
+
+
+def _import_lines(ctx):
+    records = [{'kind': 'course', 'ref': 'course', 'title': ctx.unique('Course'), 'description': 'Benchmark'},
+               {'kind': 'lesson', 'course': 'course', 'title': ctx.unique('Lesson'), 'body': 'Benchmark lesson'}]
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+def _provision_rows(ctx):
+    return f"username,email\n{ctx.unique('user')},{ctx.unique('u').replace(' ', '')}@example.com\n"
+
+
+# Write routes: endpoint -> callable(ctx) returning (path params, body, role or token); a str
+# body is sent as is, anything else as JSON
+WRITE_CASES = {
+    'auth.register': lambda ctx: ({}, {'username': ctx.unique('user'), 'email': f"{ctx.unique('u').replace(' ', '')}@example.com",
+                                       'password': 'password'}, None),
+    'auth.login': lambda ctx: ({}, {'username': ctx.student.username, 'password': 'password'}, None),
+    'users.create_user': lambda ctx: ({}, {'username': ctx.unique('user'), 'email': f"{ctx.unique('u').replace(' ', '')}@example.com",
+                                           'password': 'password'}, None),
+    'users.update_user': lambda ctx: ({'user_id': ctx.student.id}, {'country': 'Egypt'}, UserRole.ADMIN),
+    'users.delete_user': lambda ctx: ({'user_id': _new_user(ctx).id}, None, UserRole.ADMIN),
+    'content.create_course': lambda ctx: ({}, {'title': ctx.unique('Course'), 'description': 'Benchmark'}, UserRole.TEACHER),
+    'content.update_course': lambda ctx: ({'course_id': ctx.params['course_id']}, {'description': 'Updated'}, UserRole.TEACHER),
+    'content.delete_course': lambda ctx: ({'course_id': _new_course(ctx).id}, None, UserRole.TEACHER),
+    'content.create_lesson': lambda ctx: ({}, {'title': ctx.unique('Lesson'), 'body': 'Benchmark',
+                                               'course_id': ctx.params['course_id']}, UserRole.TEACHER),
+    'content.update_lesson': lambda ctx: ({'lesson_id': ctx.params['lesson_id']}, {'body': 'Updated'}, UserRole.TEACHER),
+    'content.delete_lesson': lambda ctx: ({'lesson_id': _new_lesson(ctx).id}, None, UserRole.TEACHER),
+    'assessment.create_assessment': lambda ctx: ({}, {'title': ctx.unique('Assessment'), 'type': 'quiz',
+                                                      'lesson_id': ctx.params['lesson_id'],
+                                                      'course_id': ctx.params['course_id'],
+                                                      'questions': QUESTIONS, 'answers': ['4', 'true']}, UserRole.TEACHER),
+    'assessment.update_assessment': lambda ctx: ({'assessment_id': ctx.params['assessment_id']},
+                                                 {'questions': json.loads(db.session.get(Assessment, ctx.params['assessment_id']).questions)},
+                                                 UserRole.TEACHER),
+    'assessment.delete_assessment': lambda ctx: ({'assessment_id': _new_assessment(ctx).id}, None, UserRole.TEACHER),
+    'assessment.submit_assessment': lambda ctx: ({'assessment_id': ctx.params['assessment_id']},
+                                                 {'answers': _answers_for(ctx)}, ('token', _fresh_student_token(ctx))),
+    'users.provision': lambda ctx: ({}, _provision_rows(ctx), UserRole.ADMIN),
+    'users.get_users_batch': lambda ctx: ({}, {'ids': [ctx.student.id, ctx.teacher.id]}, UserRole.ADMIN),
+    'content.get_courses_batch': lambda ctx: ({}, {'ids': [ctx.params['course_id']]}, None),
+    'content.get_lessons_batch': lambda ctx: ({}, {'ids': [ctx.params['lesson_id']]}, UserRole.TEACHER),
+    'content.patch_lesson': lambda ctx: _patch_case(_new_lesson(ctx)),
+    'content.move_lesson': lambda ctx: ({'lesson_id': ctx.params['lesson_id']}, {'after_id': None}, UserRole.TEACHER),
+    'content.clone_course_route': lambda ctx: ({'course_id': ctx.params['course_id']},
+                                               {'title': ctx.unique('Clone')}, UserRole.TEACHER),
+    'content.import_ndjson': lambda ctx: ({}, _import_lines(ctx), UserRole.TEACHER),
+    'assessment.get_assessments_batch': lambda ctx: ({}, {'ids': [ctx.params['assessment_id']]}, UserRole.TEACHER),
+    'assessment.move_assessment': lambda ctx: ({'assessment_id': ctx.params['assessment_id']}, {'after_id': None},
+                                               UserRole.TEACHER),
+    'assessment.grade_submission': lambda ctx: ({}, {'feedback': 'Benchmark feedback'}, UserRole.TEACHER),
+    'admin.update_profiler': lambda ctx: ({}, {'sample_rate': 0}, UserRole.ADMIN),
+    'admin.create_profiler_token': lambda ctx: ({}, None, UserRole.ADMIN),
+    'admin.reset_query_stats': lambda ctx: ({}, None, UserRole.ADMIN),
+}
+
+
+def _patch_case(lesson):
+    return {'lesson_id': lesson.id}, {'version': lesson.version, 'ops': [{'start': 0, 'text': 'Edited. '}]}, UserRole.TEACHER
+
+
+def _new_user(ctx):
+    user = User(username=ctx.unique('user'), email=f"{ctx.unique('u').replace(' ', '')}@example.com")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _answers_for(ctx):
+    questions = json.loads(db.session.get(Assessment, ctx.params['assessment_id']).questions)
+    return [question.get('correct_answer', 'text answer') for question in questions]
+
+
+def _build_url(rule, params):
+    missing = [name for name in rule.arguments if name not in params]
+    if missing:
+        raise LookupError(f'no value for <{missing[0]}>')
+    return rule.build({name: params[name] for name in rule.arguments}, append_unknown=False)[1]
+
+
+def _time_requests(ctx, send, requests):
+    durations, statuses = [], []
+    started = time.perf_counter()
+    for _ in range(requests):
+        request = send()
+        begin = time.perf_counter()
+        response = request()
+        # Streamed bodies are generated while they are read, and closing the response tears the request down
+        response.get_data()
+        response.close()
+        durations.append(time.perf_counter() - begin)
+        statuses.append(response.status_code)
+    elapsed = time.perf_counter() - started
+    summary = summarize(durations)
+    errors = sum(1 for status in statuses if status >= 400)
+    return {
+        'requests': requests,
+        'errors': errors,
+        'error_rate': errors / requests,
+        'statuses': {str(status): statuses.count(status) for status in sorted(set(statuses))},
+        'throughput_rps': requests / sum(durations) if sum(durations) else None,
+        'wall_seconds': elapsed,
+        **{f'{key}_ms': value * 1000 if value is not None else None
+           for key, value in summary.items() if key != 'count'},
+    }
+
+
+def _get_case(ctx, rule):
+    url = _build_url(rule, ctx.params)
+    query = ctx.query.get(rule.endpoint, {})
+    # Use the first role that is allowed to call the route
+    for role in (UserRole.TEACHER, UserRole.STUDENT, UserRole.ADMIN):
+        response = ctx.client.get(url, query_string=query, headers=ctx.headers(role))
+        response.close()
+        if response.status_code not in (401, 403):
+            break
+
+    def send():
+        return lambda: ctx.client.get(url, query_string=query, headers=ctx.headers(role))
+    return send, role
+
+
+def _write_case(ctx, rule, method, factory):
+    def send():
+        params, body, auth = factory(ctx)
+        url = _build_url(rule, {**ctx.params, **params})
+        if auth is None:
+            headers = {}
+        elif isinstance(auth, tuple):
+            headers = {'Authorization': f'Bearer {auth[1]}'}
+        else:
+            headers = ctx.headers(auth)
+        if isinstance(body, str):
+            return lambda: ctx.client.open(url, method=method, data=body, headers=headers)
+        return lambda: ctx.client.open(url, method=method, json=body, headers=headers)
+    return send, None
+
+
+def run_scale(app, submissions, requests, route_filter=None, log=print):
+    """
+    Seed a dataset for one scale and benchmark every /api/v1 route against it.
+
+    Every table of the app's database is dropped and recreated first.
+
+    Returns:
+    --------
+    dict:
+        The report for this scale.
+    """
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        log(f'Seeding {submissions} submissions...')
+        started = time.perf_counter()
+        counts = seed_database(batch_size=10000, tag='bench', **dataset_for(submissions))
+        # The seed writes without the ORM, so the search and verse indexes are built afterwards
+        rebuild_index(batch_size=5000)
+        rebuild_references(batch_size=5000)
+        seed_seconds = time.perf_counter() - started
+
+        ctx = Context(app, requests)
+        routes, skipped, failed = {}, {}, []
+        for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+            if not rule.rule.startswith('/api/v1') or (route_filter and route_filter not in rule.rule):
+                continue
+            for method in sorted(rule.methods - SKIPPED_METHODS):
+                key = f'{method} {rule.rule}'
+                try:
+                    if method == 'GET':
+                        send, role = _get_case(ctx, rule)
+                    elif rule.endpoint in WRITE_CASES:
+                        send, role = _write_case(ctx, rule, method, WRITE_CASES[rule.endpoint])
+                    else:
+                        skipped[key] = 'no payload generator for this write route'
+                        continue
+                    result = _time_requests(ctx, send, requests)
+                except LookupError as error:
+                    skipped[key] = str(error)
+                    continue
+                result.update({'endpoint': rule.endpoint, 'role': role})
+                routes[key] = result
+                log(f"{key:<70} p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+                    f"{result['throughput_rps']:8.1f} req/s  errors {result['errors']}")
+                if result['errors'] * 2 > requests:
+                    failed.append(key)
+                    log(f"{key:<70} FAILED: {result['errors']} of {requests} requests were errors {result['statuses']}")
+        db.session.remove()
+
+    return {
+        'scale': submissions,
+        'dataset': counts,
+        'seed_seconds': seed_seconds,
+        'requests_per_route': requests,
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+        'python': platform.python_version(),
+        'created_at': datetime.utcnow().isoformat(),
+        'routes': routes,
+        'skipped': skipped,
+        'failed': failed,
+    }
+
+
+def compare(old_path, new_path):
+    """Print p99 and throughput changes between two reports of the same scale."""
+    with open(old_path) as old_file, open(new_path) as new_file:
+        old, new = json.load(old_file), json.load(new_file)
+    print(f"{'route':<70} {'p99 old':>10} {'p99 new':>10} {'change':>8}")
+    for key in sorted(set(old['routes']) & set(new['routes'])):
+        before, after = old['routes'][key]['p99_ms'], new['routes'][key]['p99_ms']
+        change = (after - before) / before * 100 if before else 0
+        print(f'{key:<70} {before:>10.2f} {after:>10.2f} {change:>+7.1f}%')
+    for key in sorted(set(old['routes']) ^ set(new['routes'])):
+        print(f"{key:<70} only in {'old' if key in old['routes'] else 'new'} report")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='testing-sqlite', help='Configuration name passed to create_app.')
+    parser.add_argument('--database-url', help='Override the database URI of the configuration.')
+    parser.add_argument('--reset-db', action='store_true',
+                        help='Allow dropping and recreating every table of a database that is not in memory.')
+    parser.add_argument('--scales', default='10000,100000,1000000', help='Comma-separated submission counts.')
+    parser.add_argument('--requests', type=int, default=30, help='Timed requests per route.')
+    parser.add_argument('--routes', help='Only benchmark routes containing this text.')
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reports'),
+                        help='Directory for the JSON reports.')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two reports and exit.')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.database_url:
+        config[args.config].SQLALCHEMY_DATABASE_URI = args.database_url
+        if not args.database_url.startswith('mysql'):
+            # The pool profile and its connect arguments are MySQL-specific
+            config[args.config].SQLALCHEMY_ENGINE_OPTIONS = {}
+    app = create_app(args.config)
+    database_url = app.config['SQLALCHEMY_DATABASE_URI']
+    if database_url not in IN_MEMORY_DATABASES and not args.reset_db:
+        parser.error(f"every table of {database_url.split('@')[-1]} would be dropped; pass --reset-db to allow it")
+    app.config['PROFILER_SAMPLE_RATE'] = 0
+    # Tokens are minted locally, so a throwaway key is fine when none is configured
+    for key in ('SECRET_KEY', 'JWT_SECRET_KEY'):
+        app.config[key] = app.config[key] or os.urandom(32).hex()
+
+    os.makedirs(args.output, exist_ok=True)
+    failed = False
+    for scale in (int(value) for value in args.scales.split(',')):
+        report = run_scale(app, scale, args.requests, args.routes)
+        path = os.path.join(args.output, f'api-{scale}-{datetime.utcnow():%Y%m%dT%H%M%S}.json')
+        with open(path, 'w') as output:
+            json.dump(report, output, indent=2, default=str)
+        print(f'Wrote {path}')
+        if report['failed']:
+            failed = True
+            print(f"{len(report['failed'])} routes failed at scale {scale}: {', '.join(report['failed'])}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Text Compression Benchmark
+
+This script measures what the CompressedText columns save and cost. It
+seeds a synthetic dataset (see `flask seed`), or reads an existing database,
+and for every compressed column reports the text size, the stored size with
+each available codec (raw, zlib and zstd when the zstandard package is
+installed), and the per-value encode and decode times. It also times
+loading every lesson body through the ORM type against loading the stored
+bytes, which is the decode cost a request pays.
+
+Usage:
+    python benchmarks/bench_compression.py --submissions 20000
+    python benchmarks/bench_compression.py --database-url sqlite:////tmp/bench.db --no-seed
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import LargeBinary, select, type_coerce  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.config import config  # noqa: E402
+from app.models.content import Lesson  # noqa: E402
+from app.models.types import RAW, ZLIB, ZSTD, compress_text, decompress_text, zstandard  # noqa: E402
+from app.services.compression import COMPRESSED_COLUMNS  # noqa: E402
+from app.services.seed import seed_database  # noqa: E402
+from bench_api import dataset_for  # noqa: E402
+
+CODECS = {'raw': RAW, 'zlib': ZLIB, 'zstd': ZSTD}
+
+
+def _codecs():
+    return {name: marker for name, marker in CODECS.items() if marker != ZSTD or zstandard is not None}
+
+
+def measure_column(values):
+    """Return size and timing statistics of each codec over a column's values."""
+    text_bytes = sum(len(value.encode('utf-8')) for value in values)
+    result = {'rows': len(values), 'text_bytes': text_bytes, 'codecs': {}}
+    for name, marker in _codecs().items():
+        min_bytes = float('inf') if marker == RAW else 256
+        started = time.perf_counter()
+        encoded = [compress_text(value, codec=marker, min_bytes=min_bytes) for value in values]
+        encode_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        for value in encoded:
+            decompress_text(value)
+        decode_seconds = time.perf_counter() - started
+        stored = sum(len(value) for value in encoded)
+        result['codecs'][name] = {
+            'stored_bytes': stored,
+            'ratio': round(stored / text_bytes, 4) if text_bytes else 1.0,
+            'encode_us_per_value': round(encode_seconds / max(len(values), 1) * 1e6, 2),
+            'decode_us_per_value': round(decode_seconds / max(len(values), 1) * 1e6, 2),
+            'decode_mb_per_s': round(text_bytes / decode_seconds / 1e6, 1) if decode_seconds else None,
+        }
+    return result
+
+
+def time_lesson_loads(repeat=3):
+    """Time loading every lesson body decoded through CompressedText and as stored bytes."""
+    timings = {}
+    for label, column in (('decoded', Lesson.body), ('stored', type_coerce(Lesson.body, LargeBinary))):
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            db.session.execute(select(column)).all()
+            best = min(best, time.perf_counter() - started)
+        timings[f'{label}_ms'] = round(best * 1000, 2)
+    return timings
+
+
+def run(app, submissions, seed=True, log=print):
+    """Seed (optionally) and benchmark every compressed column."""
+    with app.app_context():
+        if seed:
+            db.create_all()
+            seed_database(**dataset_for(submissions), log=log)
+        report = {
+            'started_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'database': db.engine.url.render_as_string(hide_password=True),
+            'zstd_available': zstandard is not None,
+            'columns': {},
+        }
+        for model, name in COMPRESSED_COLUMNS:
+            values = [value for value in db.session.execute(select(getattr(model, name))).scalars()
+                      if value is not None]
+            report['columns'][f'{model.__tablename__}.{name}'] = measure_column(values)
+            log(f'measured {model.__tablename__}.{name} ({len(values)} rows)')
+        report['lesson_body_load'] = time_lesson_loads()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='testing-sqlite', help='Configuration name passed to create_app.')
+    parser.add_argument('--database-url', help='Override the database URI of the configuration.')
+    parser.add_argument('--submissions', type=int, default=20000, help='Scale of the seeded dataset.')
+    parser.add_argument('--no-seed', action='store_true', help='Measure the existing data without seeding.')
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reports'),
+                        help='Directory for the JSON report.')
+    args = parser.parse_args()
+
+    if args.database_url:
+        config[args.config].SQLALCHEMY_DATABASE_URI = args.database_url
+        if not args.database_url.startswith('mysql'):
+            # The pool profile and its connect arguments are MySQL-specific
+            config[args.config].SQLALCHEMY_ENGINE_OPTIONS = {}
+    app = create_app(args.config)
+
+    report = run(app, args.submissions, seed=not args.no_seed)
+    for column, stats in report['columns'].items():
+        codecs = ', '.join(f"{name} {codec['ratio']:.0%} ({codec['decode_us_per_value']} us)"
+                           for name, codec in stats['codecs'].items())
+        print(f"{column}: {stats['rows']} rows, {stats['text_bytes']} bytes -> {codecs}")
+    print(f"lesson bodies: {report['lesson_body_load']}")
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f'compression-{datetime.utcnow():%Y%m%dT%H%M%S}.json')
+    with open(path, 'w') as output:
+        json.dump(report, output, indent=2)
+    print(f'Wrote {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Postman Collection Load Test
+
+This script replays the requests described in Quran_Academy.postman_collection.json
+against the application with configurable concurrency and request mix, and
+reports throughput, latency percentiles and error rates per request.
+
+The application is served by a local threaded WSGI server on 127.0.0.1, so the
+load test works offline. Before the run the database is seeded (see
+`flask seed`), and every request from the collection is adapted to it:
+
+    - Bearer tokens are minted for seeded users of the right role.
+    - Numeric IDs in URLs and bodies (course_id, lesson_id, ...) are replaced
+      with seeded IDs; usernames in URLs with seeded usernames.
+    - Titles, usernames and emails in bodies are made unique per request so
+      create requests are not rejected as duplicates. The collection's
+      duplicate registration is sent as written, against a user with its
+      username and email created before the run, so it exercises the
+      duplicate rejection.
+    - Submissions use a fresh student each time, and DELETE requests target
+      rows created for them before the run.
+
+Errors are 5xx responses and transport failures; 4xx responses (which some
+collection requests expect, such as a login with a wrong password) are
+reported separately.
+
+Usage:
+    python benchmarks/loadtest.py --database-url sqlite:////tmp/load.db --concurrency 8 --requests 2000
+    python benchmarks/loadtest.py --duration 60 --mix "Get all courses=10,Create course=1"
+    python benchmarks/loadtest.py --include "courses|lessons" --output load-report.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+from werkzeug.serving import WSGIRequestHandler, make_server  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.config import config  # noqa: E402
+from app.models.user import User, UserRole  # noqa: E402
+from app.models.content import Course, Lesson  # noqa: E402
+from app.models.assessment import Assessment  # noqa: E402
+from app.models.submission import Submission  # noqa: E402
+from app.services.metrics import summarize  # noqa: E402
+from app.services.seed import SEED_PASSWORD, seed_database  # noqa: E402
+from bench_api import QUESTIONS, dataset_for  # noqa: E402
+
+COLLECTION = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'Quran_Academy.postman_collection.json')
+
+# Which seeded ID replaces a numeric path segment, keyed by the segment before it
+PATH_IDS = {
+    'courses': 'course_id', 'course': 'course_id',
+    'lessons': 'lesson_id', 'lesson': 'lesson_id',
+    'assessment': 'assessment_id', 'user': 'assessment_id',
+    'users': 'user_id',
+}
+UNIQUE_FIELDS = ('title', 'username', 'email')
+# Requests that must collide with an existing user, so their payload is sent as written
+DUPLICATE_REQUESTS = ('Register with same username or email',)
+_LINE_COMMENTS = re.compile(r'\s//[^\n"]*$', re.M)
+
+
+class RequestTemplate:
+    """One request of the collection, adapted to the seeded database."""
+
+    def __init__(self, name, method, path, body, token_variable):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.token_variable = token_variable
+
+    @property
+    def role(self):
+        """Guess the role whose token the request needs from its URL."""
+        if self.token_variable == 'student_token' or re.search(r'/submit$|/my-submission$|/portal/student', self.path):
+            return UserRole.STUDENT
+        if self.path.startswith('/api/v1/users') or '/portal/admin' in self.path:
+            return UserRole.ADMIN
+        return UserRole.TEACHER
+
+    @property
+    def duplicate(self):
+        """Whether the request is meant to collide with an existing user."""
+        return self.name.rsplit('/', 1)[-1] in DUPLICATE_REQUESTS
+
+
+def load_collection(path):
+    """
+    Read every request of a Postman collection, including nested folders.
+
+    Parameters:
+    -----------
+    path : str
+        The path of the collection file.
+
+    Returns:
+    --------
+    list of RequestTemplate:
+        One template per request, named '<folder>/<request>'.
+    """
+    with open(path) as collection_file:
+        collection = json.load(collection_file)
+
+    templates = []
+
+    def walk(items, prefix, auth):
+        for item in items:
+            item_auth = item.get('auth', auth)
+            if 'item' in item:
+                walk(item['item'], f"{prefix}{item['name']}/", item_auth)
+                continue
+            request = item['request']
+            request_auth = request.get('auth', item_auth)
+            url = request['url']
+            path = '/' + '/'.join(segment for segment in url['path'] if segment) if isinstance(url, dict) else url
+            body = None
+            if request.get('body', {}).get('mode') == 'raw' and request['body'].get('raw', '').strip():
+                # Postman tolerates // comments in raw JSON bodies
+                body = json.loads(_LINE_COMMENTS.sub('', request['body']['raw']))
+            token_variable = None
+            if request_auth and request_auth.get('type') == 'bearer':
+                value = next((entry['value'] for entry in request_auth['bearer'] if entry['key'] == 'token'), '')
+                token_variable = value.strip('{}') if value.startswith('{{') else 'token'
+            templates.append(RequestTemplate(f"{prefix}{item['name']}", request['method'], path, body, token_variable))
+
+    walk(collection['item'], '', None)
+    return templates
+
+
+class Fixtures:
+    """Seeded IDs, tokens and pre-created rows used to fill in the templates."""
+
+    def __init__(self, app, templates, planned):
+        self.app = app
+        self.lock = threading.Lock()
+        self.counter = 0
+
+        assessment = Assessment.query.order_by(Assessment.id).first()
+        course, lesson = assessment.course, assessment.lesson
+        teacher = assessment.author
+        student = User.query.filter_by(role=UserRole.STUDENT).first()
+        admin = User.query.filter_by(role=UserRole.ADMIN).first()
+        self.teacher_id, self.teacher_name, self.student_name = teacher.id, teacher.username, student.username
+        self.answers = json.loads(assessment.answers)
+        self.ids = {'course_id': course.id, 'lesson_id': lesson.id,
+                    'assessment_id': assessment.id, 'user_id': student.id}
+        self.tokens = {user.role: create_access_token(identity=user.username) for user in (teacher, student, admin)}
+
+        # Fresh students for submissions and fresh rows for deletes
+        submitted = select(Submission.student_id).where(Submission.assessment_id == assessment.id)
+        needed = sum(planned.get(template.name, 0) for template in templates if template.path.endswith('/submit'))
+        self.fresh_students = [create_access_token(identity=user.username) for user in User.query.filter(
+            User.role == UserRole.STUDENT, User.id.not_in(submitted)).limit(needed).all()]
+        self.victims = defaultdict(list)
+        for template in templates:
+            if template.method == 'DELETE':
+                kind = self._path_kind(template.path)
+                for _ in range(planned.get(template.name, 0)):
+                    self.victims[kind].append(self._create_victim(kind))
+        # The user the duplicate registrations collide with, as registered by the collection's Register request
+        for template in templates:
+            if template.duplicate and isinstance(template.body, dict):
+                username, email = template.body.get('username'), template.body.get('email')
+                if not User.query.filter((User.username == username) | (User.email == email)).first():
+                    db.session.add(User(username=username, email=email))
+        db.session.commit()
+
+    @staticmethod
+    def _path_kind(path):
+        segments = path.strip('/').split('/')
+        return PATH_IDS.get(segments[-2]) if len(segments) >= 2 else None
+
+    def _create_victim(self, kind):
+        name = self.unique('load')
+        if kind == 'course_id':
+            row = Course(title=name, description='Load test', author_id=self.teacher_id)
+        elif kind == 'lesson_id':
+            row = Lesson(title=name, body='Load test', author_id=self.teacher_id, course_id=self.ids['course_id'])
+        elif kind == 'assessment_id':
+            row = Assessment(title=name, author_id=self.teacher_id, lesson_id=self.ids['lesson_id'],
+                             course_id=self.ids['course_id'], questions=json.dumps(QUESTIONS),
+                             answers=json.dumps(['4', 'true']), type='quiz')
+        else:
+            row = User(username=name, email=f"{name.replace(' ', '')}@example.com")
+        db.session.add(row)
+        db.session.flush()
+        return row.id
+
+    def unique(self, prefix):
+        with self.lock:
+            self.counter += 1
+            return f'{prefix} {os.getpid()}-{self.counter}'
+
+    def prepare(self, template):
+        """Return the (method, path, body, headers) to send for one execution of a template."""
+        segments = template.path.strip('/').split('/')
+        for index, segment in enumerate(segments):
+            previous = segments[index - 1] if index else ''
+            if segment.isdigit():
+                key = PATH_IDS.get(previous)
+                if template.method == 'DELETE' and index == len(segments) - 1:
+                    with self.lock:
+                        if not self.victims[key]:
+                            raise LookupError('no row left to delete')
+                        segments[index] = str(self.victims[key].pop())
+                elif key:
+                    segments[index] = str(self.ids[key])
+            elif previous == 'by-author':
+                segments[index] = self.teacher_name
+            elif previous == 'users' and index == len(segments) - 1 and segment not in ('by-role',):
+                segments[index] = self.student_name
+        path = '/' + '/'.join(segments)
+
+        body = json.loads(json.dumps(template.body)) if template.body is not None else None
+        if isinstance(body, dict):
+            suffix = self.unique('').strip()
+            for field in UNIQUE_FIELDS:
+                if field in body and template.method in ('POST', 'PUT') and 'login' not in path \
+                        and not template.duplicate:
+                    body[field] = (f"{suffix}-{body[field]}" if field == 'email' else f"{body[field]} {suffix}")
+            for key in ('course_id', 'lesson_id'):
+                if key in body:
+                    body[key] = self.ids[key]
+            if path.endswith('/submit'):
+                body['answers'] = self.answers
+            if path.endswith('/auth/login') and 'incorrect' not in template.name:
+                body.update(username=self.student_name, password=SEED_PASSWORD)
+
+        headers = {'Content-Type': 'application/json'}
+        if template.token_variable or not path.startswith('/api/v1/auth'):
+            if path.endswith('/submit'):
+                with self.lock:
+                    if not self.fresh_students:
+                        raise LookupError('no student left without a submission')
+                    token = self.fresh_students.pop()
+            else:
+                token = self.tokens[template.role]
+            headers['Authorization'] = f'Bearer {token}'
+        return template.method, path, body, headers
+
+
+class _KeepAliveHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def serve(app):
+    """Start a threaded WSGI server for ``app`` on a free local port."""
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def parse_mix(text, templates):
+    """Turn 'name fragment=weight,...' into one weight per template (default weight 1)."""
+    weights = {template.name: 1.0 for template in templates}
+    for entry in filter(None, (text or '').split(',')):
+        fragment, _, weight = entry.rpartition('=')
+        for template in templates:
+            if fragment.lower() in template.name.lower():
+                weights[template.name] = float(weight)
+    return weights
+
+
+def run(templates, fixtures, port, concurrency, total, duration, weights):
+    """
+    Send requests from ``templates`` with ``concurrency`` client threads.
+
+    Returns:
+    --------
+    tuple:
+        A dict of per-template results and the wall-clock duration of the run.
+    """
+    names = [template.name for template in templates]
+    by_name = {template.name: template for template in templates}
+    cumulative = [weights[name] for name in names]
+    results = defaultdict(lambda: {'durations': [], 'statuses': defaultdict(int), 'failures': 0, 'skipped': 0})
+    lock = threading.Lock()
+    counter = iter(range(total) if total else iter(int, 1))
+    deadline = time.monotonic() + duration if duration else None
+    rng = random.Random(0)
+    plan = [rng.choices(names, weights=cumulative)[0] for _ in range(total)] if total else None
+
+    def worker():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None or (deadline and time.monotonic() >= deadline):
+                break
+            name = plan[index] if plan else rng.choices(names, weights=cumulative)[0]
+            result = results[name]
+            try:
+                method, path, body, headers = fixtures.prepare(by_name[name])
+            except LookupError:
+                with lock:
+                    result['skipped'] += 1
+                continue
+            payload = json.dumps(body) if body is not None else None
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                status = None
+            elapsed = time.perf_counter() - started
+            with lock:
+                result['durations'].append(elapsed)
+                if status is None:
+                    result['failures'] += 1
+                else:
+                    result['statuses'][status] += 1
+        connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    return results, time.perf_counter() - started
+
+
+def report(results, wall_seconds):
+    """Summarize raw results into per-request throughput, percentiles and error rates."""
+    rows = {}
+    for name, result in sorted(results.items()):
+        count = len(result['durations'])
+        summary = summarize(result['durations'])
+        server_errors = sum(n for status, n in result['statuses'].items() if status >= 500) + result['failures']
+        client_errors = sum(n for status, n in result['statuses'].items() if 400 <= status < 500)
+        rows[name] = {
+            'requests': count,
+            'throughput_rps': count / wall_seconds if wall_seconds else None,
+            'errors': server_errors,
+            'error_rate': server_errors / count if count else None,
+            'client_errors': client_errors,
+            'skipped': result['skipped'],
+            'statuses': {str(status): n for status, n in sorted(result['statuses'].items())},
+            **{f'{key}_ms': value * 1000 if value is not None else None
+               for key, value in summary.items() if key != 'count'},
+        }
+    total = sum(row['requests'] for row in rows.values())
+    return {
+        'wall_seconds': wall_seconds,
+        'requests': total,
+        'throughput_rps': total / wall_seconds if wall_seconds else None,
+        'errors': sum(row['errors'] for row in rows.values()),
+        'by_request': rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--collection', default=COLLECTION, help='Postman collection to replay.')
+    parser.add_argument('--config', default='testing', help='Configuration name passed to create_app.')
+    parser.add_argument('--database-url', help='Override the database URI of the configuration.')
+    parser.add_argument('--seed-submissions', type=int, default=10000,
+                        help='Seed a fresh dataset of this size; 0 reuses the existing data.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Number of concurrent clients.')
+    parser.add_argument('--requests', type=int, default=1000, help='Total number of requests to send.')
+    parser.add_argument('--duration', type=float, help='Run for this many seconds instead of a fixed count.')
+    parser.add_argument('--mix', help="Request weights, e.g. 'Get all courses=10,Create course=2'.")
+    parser.add_argument('--include', help='Only replay requests whose name matches this regular expression.')
+    parser.add_argument('--output', help='Write the JSON report to this file.')
+    args = parser.parse_args()
+
+    if args.database_url:
+        config[args.config].SQLALCHEMY_DATABASE_URI = args.database_url
+        if not args.database_url.startswith('mysql'):
+            # The pool profile and its connect arguments are MySQL-specific
+            config[args.config].SQLALCHEMY_ENGINE_OPTIONS = {}
+    app = create_app(args.config)
+    app.config['PROFILER_SAMPLE_RATE'] = 0
+    for key in ('SECRET_KEY', 'JWT_SECRET_KEY'):
+        app.config[key] = app.config[key] or os.urandom(32).hex()
+
+    templates = load_collection(args.collection)
+    if args.include:
+        templates = [template for template in templates if re.search(args.include, template.name, re.I)]
+    weights = parse_mix(args.mix, templates)
+    total = None if args.duration else args.requests
+
+    # Plan how many of each request will run, to pre-create rows for deletes and submissions
+    rng = random.Random(0)
+    names = [template.name for template in templates]
+    planned = defaultdict(int)
+    for _ in range(total or max(1000, int(args.duration * 200))):
+        planned[rng.choices(names, weights=[weights[name] for name in names])[0]] += 1
+
+    with app.app_context():
+        if args.seed_submissions:
+            db.drop_all()
+            db.create_all()
+            print(f'Seeding {args.seed_submissions} submissions...')
+            seed_database(batch_size=10000, tag='load', **dataset_for(args.seed_submissions))
+        fixtures = Fixtures(app, templates, planned)
+        db.session.remove()
+
+    server = serve(app)
+    try:
+        with app.app_context():
+            results, wall_seconds = run(templates, fixtures, server.server_port, args.concurrency,
+                                        total, args.duration, weights)
+    finally:
+        server.shutdown()
+
+    summary = report(results, wall_seconds)
+    print(f"{'request':<75} {'count':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'err%':>6} {'4xx':>5}")
+    for name, row in summary['by_request'].items():
+        print(f"{name[:75]:<75} {row['requests']:>6} {row['throughput_rps']:>8.1f} "
+              f"{row['p50_ms'] or 0:>8.2f} {row['p95_ms'] or 0:>8.2f} {row['p99_ms'] or 0:>8.2f} "
+              f"{(row['error_rate'] or 0) * 100:>5.1f}% {row['client_errors']:>5}")
+    print(f"Total: {summary['requests']} requests in {wall_seconds:.1f}s "
+          f"({summary['throughput_rps']:.1f} req/s), {summary['errors']} errors")
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(summary, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,9 @@ from app.models.user import User, UserRole
 from app.models.assessment import Assessment
 from app.models.submission import Submission
 from app.models.content import Course, Lesson
+from app.services import query_stats as query_stats_service
 import os
+import click
 
 # Create the Flask application using the specified configuration
 app = create_app(os.getenv('FLASK_CONFIG') or 'default')
@@ -47,3 +49,355 @@ def test():
     import unittest
     tests = unittest.TestLoader().discover('tests')
     unittest.TextTestRunner(verbosity=2).run(tests)
+
+
+@app.cli.command('query-stats')
+@click.option('--sort', default='total_ms', type=click.Choice(query_stats_service.SORT_KEYS),
+              help='Column to sort by, in descending order.')
+@click.option('--limit', default=20, help='Number of fingerprints to show.')
+@click.option('--reset', is_flag=True, help='Delete the collected snapshots after printing them.')
+def query_stats(sort, limit, reset):
+    """
+    Print SQL fingerprint statistics collected by the running workers.
+
+    Every worker periodically writes a snapshot to QUERY_STATS_DIR; this
+    command merges them and prints the most expensive fingerprints together
+    with the endpoint and role that issued them.
+
+    Usage:
+    ------
+    flask query-stats --sort p99_ms --limit 10
+    """
+    directory = query_stats_service.get_stats_dir(app)
+    rows = query_stats_service.report(query_stats_service.load_snapshots(directory), sort=sort, limit=limit)
+    if not rows:
+        click.echo(f'No query statistics found in {directory}')
+    for row in rows:
+        click.echo(f"{row['count']:>8} calls  {row['total_ms']:>10.1f} ms total  "
+                   f"p50 {row['p50_ms']:.2f}  p95 {row['p95_ms']:.2f}  p99 {row['p99_ms']:.2f} ms  "
+                   f"{row['rows']:>8} rows  {row['endpoint']} [{row['role']}]")
+        click.echo(f"    {row['fingerprint']}")
+    if reset:
+        for name in os.listdir(directory) if os.path.isdir(directory) else []:
+            if name.startswith('query_stats-'):
+                os.remove(os.path.join(directory, name))
+
+
+@app.cli.command()
+@click.option('--students', default=1000, help='Number of student accounts.')
+@click.option('--teachers', default=20, help='Number of teacher accounts.')
+@click.option('--admins', default=2, help='Number of admin accounts.')
+@click.option('--courses', default=50, help='Number of courses.')
+@click.option('--lessons', default=500, help='Number of lessons.')
+@click.option('--assessments', default=1000, help='Number of assessments.')
+@click.option('--submissions', default=10000, help='Number of submissions.')
+@click.option('--skew', default=0.9, help='Zipf exponent for popularity (0 is uniform).')
+@click.option('--batch-size', default=5000, help='Rows per multi-row INSERT.')
+@click.option('--seed', 'random_seed', default=42, help='Random seed for reproducible data.')
+@click.option('--tag', default=None, help='Prefix keeping usernames and titles unique across runs.')
+def seed(students, teachers, admins, courses, lessons, assessments, submissions, skew, batch_size, random_seed, tag):
+    """
+    Populate the database with a synthetic, realistically skewed dataset.
+
+    Rows are written with multi-row INSERTs in batches, so large datasets
+    load quickly. Every seeded user has the password 'password'.
+
+    Usage:
+    ------
+    flask seed --students 20000 --assessments 2000 --submissions 1000000
+    """
+    from app.services.seed import seed_database
+    counts = seed_database(students=students, teachers=teachers, admins=admins, courses=courses,
+                           lessons=lessons, assessments=assessments, submissions=submissions,
+                           skew=skew, batch_size=batch_size, seed=random_seed, tag=tag, log=click.echo)
+    click.echo(f"Seeded {counts}")
+    # Seeded rows bypass the ORM events that maintain the search index, gradebook and positions
+    from app.services.search import rebuild_index
+    from app.services.verses import rebuild_references
+    from app.services.gradebook import rebuild_gradebook
+    from app.services.ordering import rebalance_positions
+    rebuild_index(log=click.echo)
+    rebuild_references(log=click.echo)
+    rebuild_gradebook(log=click.echo)
+    rebalance_positions(log=click.echo)
+
+
+@app.cli.command('search-reindex')
+@click.option('--batch-size', default=500, help='Rows indexed per transaction.')
+def search_reindex(batch_size):
+    """
+    Rebuild the full-text search index over all courses and lessons.
+
+    The index is maintained automatically when content is written through
+    the ORM; run this after bulk loads or to backfill existing content.
+
+    Usage:
+    ------
+    flask search-reindex
+    """
+    from app.services.search import rebuild_index
+    indexed = rebuild_index(batch_size=batch_size, log=click.echo)
+    click.echo(f'Indexed {indexed} courses and lessons')
+
+
+@app.cli.command('verses-reindex')
+@click.option('--batch-size', default=500, help='Rows scanned per transaction.')
+def verses_reindex(batch_size):
+    """
+    Rebuild the verse-reference index over all lessons and assessments.
+
+    References are extracted automatically when content is written through
+    the ORM; run this to backfill existing content or after bulk loads.
+
+    Usage:
+    ------
+    flask verses-reindex
+    """
+    from app.services.verses import rebuild_references
+    stored = rebuild_references(batch_size=batch_size, log=click.echo)
+    click.echo(f'Indexed {stored} verse ranges')
+
+
+@app.cli.command('lessons-backfill')
+@click.option('--batch-size', default=500, help='Lessons updated per transaction.')
+def lessons_backfill(batch_size):
+    """
+    Store the excerpt and body length of lessons created before they were tracked.
+
+    Usage:
+    ------
+    flask lessons-backfill
+    """
+    from app.services.lessons import backfill_excerpts
+    updated = backfill_excerpts(batch_size=batch_size, log=click.echo)
+    click.echo(f'Updated {updated} lessons')
+
+
+@app.cli.command()
+@click.option('--batch-size', default=500, help='Rows rewritten per transaction.')
+@click.option('--codec', type=click.Choice(['zlib', 'zstd']), default=None,
+              help='Compression codec (default: TEXT_COMPRESSION_CODEC).')
+def recompress(batch_size, codec):
+    """
+    Rewrite lesson bodies, course descriptions, assessment questions and
+    submission answers and feedback in the compressed storage format.
+
+    Run it after converting the columns to binary (for MySQL,
+    `ALTER TABLE lessons MODIFY body MEDIUMBLOB NOT NULL` and likewise for
+    courses.description, assessments.questions, submissions.answers and
+    submissions.feedback): legacy text rows stay readable until they are
+    rewritten, so the application can keep running during the migration.
+
+    Usage:
+    ------
+    flask recompress --batch-size 1000
+    """
+    from app.models.types import codec_marker
+    from app.services.compression import recompress as recompress_columns
+    try:
+        codec_marker(codec or app.config['TEXT_COMPRESSION_CODEC'])
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    report = recompress_columns(batch_size=batch_size, codec=codec, log=click.echo)
+    for column, stats in report.items():
+        ratio = stats['stored_bytes'] / stats['text_bytes'] if stats['text_bytes'] else 1
+        click.echo(f"{column}: {stats['rewritten']}/{stats['rows']} rows rewritten, "
+                   f"{stats['text_bytes']} text bytes stored in {stats['stored_bytes']} ({ratio:.0%})")
+
+
+@app.cli.command('compact-feedback')
+@click.option('--batch-size', default=1000, help='Submissions converted per transaction.')
+def compact_feedback(batch_size):
+    """
+    Replace the feedback messages stored with older submissions by per-question
+    result codes and a score.
+
+    Usage:
+    ------
+    flask compact-feedback
+    """
+    from app.services.grading import compact_feedback as convert
+    from app.services.gradebook import rebuild_gradebook
+    converted = convert(batch_size=batch_size, log=click.echo)
+    click.echo(f'Converted {converted} submissions')
+    # The conversion writes scores without the ORM events that maintain the gradebook
+    rebuild_gradebook(log=click.echo)
+
+
+@app.cli.command('gradebook-rebuild')
+def gradebook_rebuild():
+    """
+    Rebuild the course gradebooks from the submissions.
+
+    Gradebook entries are maintained automatically when submissions are
+    written through the ORM; run this after bulk loads or to backfill.
+
+    Usage:
+    ------
+    flask gradebook-rebuild
+    """
+    from app.services.gradebook import rebuild_gradebook
+    count = rebuild_gradebook(log=click.echo)
+    click.echo(f'Wrote {count} gradebook entries')
+
+
+@app.cli.command('positions-rebalance')
+@click.option('--max-length', default=16, help='Rebalance lists with position keys longer than this.')
+def positions_rebalance(max_length):
+    """
+    Rewrite the position keys of lesson and assessment lists with short keys.
+
+    Reordering lengthens the keys of the moved rows; run this periodically
+    to shorten them. It also gives positions to rows created before lessons
+    and assessments were ordered.
+
+    Usage:
+    ------
+    flask positions-rebalance --max-length 16
+    """
+    from app.services.ordering import rebalance_positions
+    count = rebalance_positions(max_length=max_length, log=click.echo)
+    click.echo(f'Rebalanced {count} lists')
+
+
+@app.cli.command('purge-deleted')
+@click.option('--retention-days', type=int, default=None,
+              help='Keep tombstones younger than this (default: TOMBSTONE_RETENTION_DAYS).')
+@click.option('--batch-size', default=500, help='Rows deleted per transaction.')
+def purge_deleted_command(retention_days, batch_size):
+    """
+    Delete the courses, lessons, assessments and users whose tombstones outlived the retention period.
+
+    The rows are removed with set-based DELETE statements, one transaction
+    per batch, so an interrupted run resumes where it stopped.
+
+    Usage:
+    ------
+    flask purge-deleted --retention-days 30 --batch-size 500
+    """
+    from datetime import timedelta
+    from app.services.deletion import purge_deleted
+    retention = timedelta(days=retention_days) if retention_days is not None else None
+    counts = purge_deleted(retention=retention, batch_size=batch_size, log=click.echo)
+    click.echo(f'Purged {counts["courses"]} courses, {counts["lessons"]} lessons, '
+               f'{counts["assessments"]} assessments and {counts["users"]} users')
+
+
+@app.cli.command('changes-backfill')
+def changes_backfill():
+    """
+    Give courses, lessons and assessments never updated an updated_at, so the changes feed lists them.
+
+    Usage:
+    ------
+    flask changes-backfill
+    """
+    from app.services.changes import backfill_updated_at
+    updated = backfill_updated_at(log=click.echo)
+    click.echo(f'Updated {updated} rows')
+
+
+@app.cli.command('export')
+@click.option('--format', 'export_format', type=click.Choice(['csv', 'ndjson']), default='csv', help='Output format.')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), default='-', help='Output file (default: stdout).')
+@click.option('--gzip', 'compress', is_flag=True, help='Compress the output with gzip.')
+@click.option('--course-id', type=int, help='Only export submissions of this course.')
+@click.option('--lesson-id', type=int, help='Only export submissions of this lesson.')
+@click.option('--assessment-id', type=int, help='Only export submissions of this assessment.')
+@click.option('--since', type=click.DateTime(), help='Only export submissions made at or after this time.')
+@click.option('--until', type=click.DateTime(), help='Only export submissions made before this time.')
+@click.option('--batch-size', default=1000, help='Rows fetched per page.')
+def export(export_format, output, compress, course_id, lesson_id, assessment_id, since, until, batch_size):
+    """
+    Export submissions, scores and feedback as CSV or NDJSON.
+
+    Rows are read in keyset pages and written as they are read, so memory
+    use stays constant however large the export.
+
+    Usage:
+    ------
+    flask export --format ndjson --course-id 3 --gzip --output course-3.ndjson.gz
+    """
+    from app.services.export import export_stream, export_submissions
+    records = export_submissions(course_id=course_id, lesson_id=lesson_id, assessment_id=assessment_id,
+                                 since=since, until=until, batch_size=batch_size)
+    with click.open_file(output, 'wb' if compress else 'w') as destination:
+        for chunk in export_stream(export_format, records, compress=compress):
+            destination.write(chunk)
+
+
+@app.cli.command('import-content')
+@click.argument('source', type=click.File('rb'))
+@click.option('--author', required=True, help='Username recorded as the author of the imported content.')
+@click.option('--batch-size', default=500, help='Lines imported per transaction.')
+@click.option('--errors', type=click.File('w'), help='Write the per-line error report as NDJSON to this file.')
+def import_content(source, author, batch_size, errors):
+    """
+    Import courses, lessons and assessments from an NDJSON file.
+
+    Each line is a JSON object with a kind ('course', 'lesson' or
+    'assessment') and the fields of that kind; parents are named by a ref
+    from an earlier line or by the ID of an existing row. Use '-' to read
+    from stdin.
+
+    Usage:
+    ------
+    flask import-content curriculum.ndjson --author teacher --errors errors.ndjson
+    """
+    import json
+    from app.services.bulk_import import import_content as import_lines
+    user = User.query.filter_by(username=author).first()
+    if user is None:
+        raise click.UsageError(f'unknown user {author}')
+    report = import_lines(source, user.id, batch_size=batch_size, log=click.echo)
+    if errors:
+        for error in report['errors']:
+            errors.write(json.dumps(error, ensure_ascii=False) + '\n')
+    click.echo(f"Imported {report['imported']} from {report['lines']} lines, {len(report['errors'])} errors")
+
+
+@app.cli.command('provision-users')
+@click.argument('source', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--batch-size', default=500, help='Rows provisioned per transaction.')
+@click.option('--workers', type=int, help='Password hashing processes (default: PROVISION_HASH_WORKERS).')
+@click.option('--passwords', type=click.File('w'), help='Write the generated passwords as CSV to this file.')
+@click.option('--errors', type=click.File('w'), help='Write the per-row error report as CSV to this file.')
+def provision_users(source, batch_size, workers, passwords, errors):
+    """
+    Create users in bulk from a CSV file.
+
+    The header names the columns username and email, and optionally
+    password, role, firstName, lastName, age and country. Rows without a
+    password get a generated one. Welcome emails are queued in the outbox;
+    run `flask send-outbox` to deliver them. Use '-' to read from stdin.
+
+    Usage:
+    ------
+    flask provision-users students.csv --workers 8 --passwords passwords.csv
+    """
+    import csv
+    from app.services.provisioning import provision_users as provision
+    report = provision(csv.DictReader(source), batch_size=batch_size, workers=workers, log=click.echo)
+    for destination, fields, rows in ((passwords, ['username', 'password'], report['generated_passwords']),
+                                      (errors, ['row', 'error'], report['errors'])):
+        if destination:
+            writer = csv.DictWriter(destination, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    click.echo(f"Created {report['created']} users from {report['rows']} rows, {len(report['errors'])} errors, "
+               f"{len(report['generated_passwords'])} generated passwords")
+
+
+@app.cli.command('send-outbox')
+@click.option('--batch-size', default=100, help='Emails sent per connection to the mail server.')
+def send_outbox(batch_size):
+    """
+    Send the pending emails of the outbox.
+
+    Usage:
+    ------
+    flask send-outbox --batch-size 200
+    """
+    from app.services.outbox import send_outbox as send
+    stats = send(batch_size=batch_size, log=click.echo)
+    click.echo(f"Sent {stats['sent']} emails, {stats['failed']} failed")
@@ -0,0 +1,88 @@
+"""
+Shared test harness.
+
+The application and its schema are created once per test process, using the
+configuration named by the TEST_CONFIG environment variable ('testing-sqlite'
+by default, 'testing' for the MySQL test database). Every test then runs
+inside a transaction on a dedicated connection: the session joins it through
+SAVEPOINTs, so code under test may commit freely, and the outer transaction
+is rolled back when the test ends.
+
+Run the suite in parallel with pytest-xdist (``python -m pytest -n auto``);
+each worker process gets its own SQLite database file.
+"""
+import os
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from app.services.replicas import RoutingSession
+
+TEST_CONFIG = os.getenv('TEST_CONFIG', 'testing-sqlite')
+
+_app = None
+
+
+class _ConnectionSession(RoutingSession):
+    """Session that sends every statement to the connection it was bound to, with the application's session events."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        return bind or self.bind or super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+def _enable_sqlite_savepoints(engine):
+    # pysqlite opens transactions lazily and breaks SAVEPOINT; let SQLAlchemy emit BEGIN itself
+    @event.listens_for(engine, 'connect')
+    def disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def begin(connection):
+        connection.exec_driver_sql('BEGIN')
+
+
+def get_app():
+    """Return the application shared by the tests of this process, creating its schema once."""
+    global _app
+    if _app is None:
+        _app = create_app(TEST_CONFIG)
+        with _app.app_context():
+            if db.engine.dialect.name == 'sqlite':
+                _enable_sqlite_savepoints(db.engine)
+            db.drop_all()
+            db.create_all()
+    return _app
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """
+    Base class for tests that use the application and database.
+
+    Provides ``self.app`` (with an application context pushed), ``self.client``
+    and an isolated ``db.session``. Changes made to ``self.app.config`` are
+    undone after each test.
+    """
+
+    def setUp(self):
+        self.app = get_app()
+        self._config = dict(self.app.config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+        self._connection = db.engine.connect()
+        self._transaction = self._connection.begin()
+        self._session = db.session
+        db.session = db._make_scoped_session({
+            'class_': _ConnectionSession,
+            'bind': self._connection,
+            'join_transaction_mode': 'create_savepoint',
+        })
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.session = self._session
+        self._transaction.rollback()
+        self._connection.close()
+        self.app_context.pop()
+        self.app.config.clear()
+        self.app.config.update(self._config)
@@ -0,0 +1,90 @@
+import json
+from flask_jwt_extended import create_access_token
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.assessment import Assessment
+from app.models.submission import Submission
+from app.services.analytics import item_analysis
+from app.services.grading import render_feedback, score_answers
+from tests.base import DatabaseTestCase
+
+QUESTIONS = [
+    {'type': 'multiple_choice', 'question': 'Which letter?', 'options': ['A', 'B', 'C'], 'correct_answer': 'A'},
+    {'type': 'true_false', 'question': 'Is idgham a rule of noon?', 'options': ['true', 'false'],
+     'correct_answer': 'true'},
+    {'type': 'text', 'question': 'Explain ikhfa.'},
+]
+ANSWERS = [
+    ['A', 'true', 'text'],
+    ['A', 'true', 'text'],
+    ['A', 'false', 'text'],
+    ['B', 'true', 'text'],
+    ['C', 'false', 'text'],
+    ['B', 'false', 'text'],
+    ['Z', 'false', 'text'],
+]
+
+
+class AnalyticsTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.app.extensions.pop('item_analytics', None)
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.course = Course(title='Tajweed', description='Rules of recitation', author=self.teacher)
+        self.lesson = Lesson(title='Noon', body='Rules of noon sakinah.', author=self.teacher, course=self.course)
+        self.assessment = Assessment(title='Noon quiz', author=self.teacher, lesson=self.lesson, course=self.course,
+                                     questions=json.dumps(QUESTIONS), type='quiz', answers='[]')
+        db.session.add_all([self.teacher, self.course, self.lesson, self.assessment])
+        for index, answers in enumerate(ANSWERS):
+            self.add_submission(index, answers)
+        db.session.commit()
+        self.headers = {'Authorization': f"Bearer {create_access_token(identity='teacher')}"}
+
+    def add_submission(self, index, answers, legacy=False):
+        student = User(username=f'student{index}', email=f'student{index}@example.com', role=UserRole.STUDENT)
+        score, results, _ = score_answers(QUESTIONS, answers)
+        columns = {'feedback': json.dumps(render_feedback(results))} if legacy else {'score': score, 'results': results}
+        db.session.add_all([student, Submission(student=student, assessment=self.assessment,
+                                                answers=json.dumps(answers), **columns)])
+
+    def test_item_statistics(self):
+        report = item_analysis(QUESTIONS, Submission.query.order_by(Submission.id).all())
+        self.assertEqual(report['submissions'], 7)
+        first, second, text = report['questions']
+        self.assertEqual(first['difficulty'], round(3 / 7, 4))
+        self.assertEqual(second['difficulty'], round(3 / 7, 4))
+        self.assertIsNone(text['difficulty'])
+        self.assertIsNone(text['discrimination'])
+        self.assertNotIn('distractors', text)
+        # Two submissions in each group: the top ones answered both correctly, the bottom ones neither
+        self.assertEqual(first['discrimination'], 1.0)
+        self.assertEqual([(entry['option'], entry['count']) for entry in first['distractors']],
+                         [('A', 3), ('B', 2), ('C', 1), ('other', 1)])
+        self.assertEqual([entry['count'] for entry in report['scores']['histogram']], [3, 0, 2, 0, 2])
+        self.assertEqual(report['scores']['median'], 0.0)
+
+    def test_endpoint_is_cached_until_a_submission_lands(self):
+        url = f'/api/v1/content/assessment/{self.assessment.id}/analytics'
+        response = self.client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['submissions'], 7)
+        cached = self.app.extensions['item_analytics'][self.assessment.id]
+        self.client.get(url, headers=self.headers)
+        self.assertIs(self.app.extensions['item_analytics'][self.assessment.id], cached)
+
+        # Submissions stored before the result codes existed are scored from their answers
+        self.add_submission(7, ['A', 'true', 'text'], legacy=True)
+        db.session.commit()
+        report = self.client.get(url, headers=self.headers).get_json()
+        self.assertEqual(report['submissions'], 8)
+        self.assertEqual(report['questions'][0]['difficulty'], 0.5)
+        self.assertEqual(report['scores']['histogram'][-1]['count'], 3)
+
+    def test_missing_assessment_and_students(self):
+        response = self.client.get('/api/v1/content/assessment/999/analytics', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        token = create_access_token(identity='student0')
+        response = self.client.get(f'/api/v1/content/assessment/{self.assessment.id}/analytics',
+                                   headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 403)
@@ -1,19 +1,13 @@
-import unittest
 from flask import Flask, json
-from unittest import TestCase
-from app import create_app, db
+from app import db
+from tests.base import DatabaseTestCase
 from app.models.assessment import Assessment
 from app.models.user import User, UserRole
 from app.models.content import Course, Lesson
 
-class AssessmentAPITestCase(TestCase):
+class AssessmentAPITestCase(DatabaseTestCase):
     def setUp(self):
-        self.app = create_app('testing')
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        db.drop_all()
-        db.create_all()
-        self.client = self.app.test_client()
+        super().setUp()
 
         # Create a test user
         self.test_user = User(username='test_user', email='test@example.com', role=UserRole.TEACHER)
@@ -56,11 +50,6 @@ class AssessmentAPITestCase(TestCase):
             "answers": ["4", ""]
             }
 
-    def tearDown(self):
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
-
     def test_create_assessment(self):
 
         response = self.client.post('/api/v1/content/assessment',
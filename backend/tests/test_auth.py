@@ -1,20 +1,8 @@
-import unittest
-from app import create_app, db
+from app import db
+from tests.base import DatabaseTestCase
 from app.models.user import User, UserRole
 
-class TestAuth(unittest.TestCase):
-    def setUp(self):
-        self.app = create_app('testing')
-        self.client = self.app.test_client()
-        self.app_ctx = self.app.app_context()
-        self.app_ctx.push()
-        db.create_all()
-
-    def tearDown(self):
-        db.session.remove()
-        db.drop_all()
-        self.app_ctx.pop()
-
+class TestAuth(DatabaseTestCase):
     def test_register(self):
         response = self.client.post('/api/v1/auth/register', json={
             "username": "testregister",
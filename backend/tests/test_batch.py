@@ -0,0 +1,112 @@
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.assessment import Assessment
+from app.models.submission import Submission
+from app.services.batch import MAX_BATCH_IDS
+from tests.base import DatabaseTestCase
+
+
+class BatchTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.admin = User(username='admin', email='admin@example.com', role=UserRole.ADMIN)
+        self.student = User(username='student', email='student@example.com', role=UserRole.STUDENT)
+        self.courses = [Course(title=f'Course {number}', description='Tajweed', author=self.teacher)
+                        for number in range(3)]
+        self.lessons = [Lesson(title=f'Lesson {number}', body='Noon sakinah. ' * 20, author=self.teacher,
+                               course=self.courses[number % 3]) for number in range(6)]
+        self.assessments = [Assessment(title=f'Quiz {number}', author=self.teacher, lesson=lesson,
+                                       course=lesson.course, questions='[]', type='quiz', answers='[]')
+                            for number, lesson in enumerate(self.lessons)]
+        db.session.add_all([self.teacher, self.admin, self.student, *self.courses, *self.lessons,
+                            *self.assessments,
+                            Submission(student=self.student, assessment=self.assessments[0], answers='[]')])
+        db.session.commit()
+        self.course_ids = [course.id for course in self.courses]
+        self.lesson_ids = [lesson.id for lesson in self.lessons]
+        self.assessment_ids = [assessment.id for assessment in self.assessments]
+        self.teacher_id, self.admin_id, self.student_id = self.teacher.id, self.admin.id, self.student.id
+
+    def get(self, url, username='teacher'):
+        return self.client.get(url, headers={'Authorization': f'Bearer {create_access_token(identity=username)}'})
+
+    def count_statements(self, call):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        db.session.expunge_all()
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = call()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        return response, len(statements)
+
+    def test_batches_are_keyed_by_id_with_missing_markers(self):
+        ids = f'{self.course_ids[2]},999,{self.course_ids[0]}'
+        result = self.client.get(f'/api/v1/content/courses/batch?ids={ids}').get_json()
+        self.assertEqual(set(result['items']), {str(self.course_ids[2]), '999', str(self.course_ids[0])})
+        self.assertIsNone(result['items']['999'])
+        self.assertEqual(result['missing'], [999])
+        self.assertEqual(result['items'][str(self.course_ids[0])]['lessons'],
+                         [self.lesson_ids[0], self.lesson_ids[3]])
+
+        response = self.client.post('/api/v1/content/lessons/batch', json={'ids': [self.lesson_ids[1]]},
+                                    headers={'Authorization': f"Bearer {create_access_token(identity='teacher')}"})
+        lesson = response.get_json()['items'][str(self.lesson_ids[1])]
+        self.assertEqual((lesson['course'], lesson['author']), ('Course 1', 'teacher'))
+        self.assertNotIn('body', lesson)
+
+        result = self.get(f'/api/v1/content/assessment/batch?ids={self.assessment_ids[4]}', 'student').get_json()
+        self.assertEqual(result['items'][str(self.assessment_ids[4])]['lesson'], {'title': 'Lesson 4'})
+
+        result = self.get(f'/api/v1/users/batch?ids={self.student_id},{self.teacher_id}', 'admin').get_json()
+        self.assertEqual(result['items'][str(self.student_id)]['submissions'][0]['assessment_title'], 'Quiz 0')
+        self.assertEqual(len(result['items'][str(self.teacher_id)]['lessons']), 6)
+
+    def test_query_count_does_not_grow_with_ids(self):
+        for url, username, all_ids in (('/api/v1/content/courses/batch', 'teacher', self.course_ids),
+                                       ('/api/v1/content/lessons/batch', 'teacher', self.lesson_ids),
+                                       ('/api/v1/content/assessment/batch', 'teacher', self.assessment_ids),
+                                       ('/api/v1/users/batch', 'admin', [self.teacher_id, self.admin_id])):
+            counts = []
+            for size in (1, len(all_ids)):
+                ids = ','.join(str(id_) for id_ in all_ids[:size])
+                response, count = self.count_statements(lambda: self.get(f'{url}?ids={ids}', username))
+                self.assertEqual(response.status_code, 200)
+                counts.append(count)
+            self.assertEqual(counts[0], counts[1], url)
+
+    def test_lesson_lists_query_count_does_not_grow_with_lessons(self):
+        urls = ('/api/v1/content/lessons?per_page=20', f'/api/v1/content/courses/{self.course_ids[0]}/lessons',
+                '/api/v1/content/lessons/by-author/teacher')
+        # The first request after a commit also opens the test's SAVEPOINT
+        self.get(urls[0])
+        before = [self.count_statements(lambda: self.get(url))[1] for url in urls]
+        course = db.session.get(Course, self.course_ids[0])
+        for number in range(4):
+            lesson = Lesson(title=f'Extra lesson {number}', body='Idgham.', author_id=self.teacher_id, course=course)
+            db.session.add_all([lesson, Assessment(title=f'Extra quiz {number}', author_id=self.teacher_id,
+                                                   lesson=lesson, course=course, questions='[]', type='quiz',
+                                                   answers='[]')])
+        db.session.commit()
+        self.get(urls[0])
+        for url, count in zip(urls, before):
+            response, after = self.count_statements(lambda: self.get(url))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(after, count, url)
+
+    def test_invalid_ids(self):
+        url = '/api/v1/content/courses/batch'
+        self.assertEqual(self.client.get(url).status_code, 400)
+        self.assertEqual(self.client.get(f'{url}?ids=1,x').status_code, 400)
+        self.assertEqual(self.client.post(url, json={'ids': ['1']}).status_code, 400)
+        ids = ','.join(str(number) for number in range(MAX_BATCH_IDS + 1))
+        self.assertEqual(self.client.get(f'{url}?ids={ids}').status_code, 400)
+        self.assertEqual(self.get(f'/api/v1/users/batch?ids={self.student_id}', 'teacher').status_code, 403)
@@ -0,0 +1,67 @@
+import json
+from flask_jwt_extended import create_access_token
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.assessment import Assessment
+from app.services.bulk_import import import_content
+from app.services.search import search
+from tests.base import DatabaseTestCase
+
+
+def ndjson(*records):
+    return ''.join((record if isinstance(record, str) else json.dumps(record)) + '\n' for record in records)
+
+
+class BulkImportTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.existing = Course(title='Existing', description='Already here', author=self.teacher)
+        db.session.add_all([self.teacher, self.existing])
+        db.session.commit()
+
+    def test_import_resolves_references_across_batches(self):
+        lines = ndjson(
+            {'kind': 'course', 'ref': 'tajweed', 'title': 'Tajweed', 'description': 'Rules of recitation'},
+            {'kind': 'lesson', 'ref': 'noon', 'course': 'tajweed', 'title': 'Noon sakinah',
+             'body': 'Idhhar, idgham, iqlab and ikhfa, as recited in 2:255.'},
+            {'kind': 'lesson', 'course_id': self.existing.id, 'title': 'Meem sakinah', 'body': 'Three rules.'},
+            {'kind': 'assessment', 'lesson': 'noon', 'title': 'Noon quiz', 'type': 'quiz',
+             'questions': [{'type': 'true_false', 'question': 'Is iqlab a rule?', 'correct_answer': 'true'}],
+             'answers': ['true']},
+        ).splitlines(keepends=True)
+        report = import_content(lines, self.teacher.id, batch_size=1)
+        self.assertEqual(report['errors'], [])
+        self.assertEqual(report['imported'], {'course': 1, 'lesson': 2, 'assessment': 1})
+
+        lesson = Lesson.query.filter_by(title='Noon sakinah').one()
+        course = Course.query.filter_by(title='Tajweed').one()
+        self.assertEqual((lesson.course_id, lesson.author_id, lesson.version), (course.id, self.teacher.id, 1))
+        self.assertEqual(lesson.excerpt, lesson.body)
+        assessment = Assessment.query.filter_by(title='Noon quiz').one()
+        self.assertEqual((assessment.lesson_id, assessment.course_id), (lesson.id, course.id))
+        self.assertEqual(search('idgham')[0][:2], ('lesson', lesson.id))
+
+    def test_endpoint_reports_errors_per_line(self):
+        body = ndjson(
+            {'kind': 'course', 'ref': 'c', 'title': 'Seerah', 'description': 'Life of the Prophet'},
+            '{not json',
+            {'kind': 'course', 'title': 'Existing', 'description': 'Duplicate of a stored title'},
+            {'kind': 'lesson', 'course': 'missing', 'title': 'Orphan', 'body': 'No course.'},
+            {'kind': 'lesson', 'course': 'c', 'course_id': 1, 'title': 'Ambiguous', 'body': 'Both parents.'},
+            {'kind': 'lesson', 'course': 'c', 'title': 'Makkah', 'body': 'The early years.'},
+            {'kind': 'lesson', 'course': 'c', 'title': 'Makkah', 'body': 'Twice in the file.'},
+            {'kind': 'assessment', 'lesson_id': 999, 'title': 'Quiz', 'type': 'quiz', 'questions': []},
+            {'kind': 'video', 'title': 'Unsupported'},
+        )
+        response = self.client.post('/api/v1/content/import', data=body, content_type='application/x-ndjson',
+                                    headers={'Authorization': f"Bearer {create_access_token(identity='teacher')}"})
+        self.assertEqual(response.status_code, 200)
+        report = response.get_json()
+        self.assertEqual(report['lines'], 9)
+        self.assertEqual(report['imported'], {'course': 1, 'lesson': 1, 'assessment': 0})
+        self.assertEqual([error['line'] for error in report['errors']], [2, 3, 4, 5, 7, 8, 9])
+        self.assertIn('already exists', report['errors'][1]['error'])
+        self.assertIn("unknown course ref 'missing'", report['errors'][2]['error'])
+        self.assertEqual(Lesson.query.filter_by(title='Makkah').one().body, 'The early years.')
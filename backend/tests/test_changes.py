@@ -0,0 +1,115 @@
+import json
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+from sqlalchemy import update
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.assessment import Assessment
+from app.services.changes import backfill_updated_at, encode_cursor
+from tests.base import DatabaseTestCase
+
+QUESTIONS = [{'type': 'true_false', 'question': 'Is iqlab a rule?', 'correct_answer': 'true'}]
+
+
+class ChangesTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.course = Course(title='Tajweed', description='Rules of recitation', author=self.teacher)
+        self.lessons = [Lesson(title=f'Lesson {number}', body=f'Idgham rule {number}.',
+                               author=self.teacher, course=self.course) for number in range(3)]
+        self.assessment = Assessment(title='Quiz', author=self.teacher, lesson=self.lessons[0], course=self.course,
+                                     questions=json.dumps(QUESTIONS), type='quiz', answers='["true"]')
+        db.session.add_all([self.teacher, self.course, *self.lessons, self.assessment])
+        db.session.commit()
+        self.course_id = self.course.id
+        self.lesson_ids = [lesson.id for lesson in self.lessons]
+        self.assessment_id = self.assessment.id
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity="teacher")}'}
+
+    def changes(self, **params):
+        return self.client.get('/api/v1/content/changes', query_string=params, headers=self.headers)
+
+    def test_incremental_sync(self):
+        self.app.config['CHANGES_SAFETY_WINDOW_SECONDS'] = 0
+        body = self.changes().get_json()
+        self.assertEqual([course['id'] for course in body['courses']], [self.course_id])
+        self.assertEqual([lesson['id'] for lesson in body['lessons']], self.lesson_ids)
+        self.assertNotIn('body', body['lessons'][0])
+        self.assertEqual([assessment['id'] for assessment in body['assessments']], [self.assessment_id])
+        self.assertEqual(body['deleted'], {'courses': [], 'lessons': [], 'assessments': []})
+        self.assertFalse(body['has_more'])
+        cursor = body['cursor']
+
+        body = self.changes(since=cursor).get_json()
+        self.assertEqual((body['courses'], body['lessons'], body['assessments']), ([], [], []))
+        self.assertEqual(body['cursor'], cursor)
+
+        response = self.client.put(f'/api/v1/content/lessons/{self.lesson_ids[1]}', headers=self.headers,
+                                   json={'title': 'Lesson one'})
+        self.assertEqual(response.status_code, 200)
+        self.client.delete(f'/api/v1/content/lessons/{self.lesson_ids[0]}', headers=self.headers)
+
+        body = self.changes(since=cursor).get_json()
+        self.assertEqual([lesson['title'] for lesson in body['lessons']], ['Lesson one'])
+        self.assertEqual(body['deleted'], {'courses': [], 'lessons': [self.lesson_ids[0]],
+                                           'assessments': [self.assessment_id]})
+        self.assertEqual(body['courses'], [])
+        self.assertEqual(self.changes(since=body['cursor']).get_json()['lessons'], [])
+
+    def test_caught_up_cursor_reads_the_safety_window_again(self):
+        body = self.changes().get_json()
+        self.assertFalse(body['has_more'])
+        again = self.changes(since=body['cursor']).get_json()
+        self.assertEqual([lesson['id'] for lesson in again['lessons']], self.lesson_ids)
+
+        # A transaction that flushed before the sync's last row but committed after the sync
+        late = Lesson(title='Late lesson', body='Committed late.', author_id=self.teacher.id,
+                      course_id=self.course_id)
+        db.session.add(late)
+        db.session.commit()
+        db.session.execute(update(Lesson.__table__).where(Lesson.__table__.c.id == late.id)
+                           .values(updated_at=datetime.utcnow() - timedelta(seconds=30)))
+        db.session.commit()
+        body = self.changes(since=again['cursor']).get_json()
+        self.assertIn('Late lesson', [lesson['title'] for lesson in body['lessons']])
+
+        # Older changes are not sent again
+        for model in (Course, Lesson, Assessment):
+            db.session.execute(update(model.__table__).values(updated_at=datetime.utcnow() - timedelta(hours=1)))
+        db.session.commit()
+        cursor = self.changes().get_json()['cursor']
+        body = self.changes(since=cursor).get_json()
+        self.assertEqual((body['courses'], body['lessons'], body['assessments']), ([], [], []))
+        self.assertEqual(body['cursor'], cursor)
+
+    def test_pages_through_changes_made_at_the_same_time(self):
+        same_time = datetime(2026, 1, 1) + timedelta(days=365)
+        for model in (Course, Lesson, Assessment):
+            db.session.execute(update(model.__table__).values(updated_at=same_time))
+        db.session.commit()
+
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 2} if cursor is None else {'limit': 2, 'since': cursor}
+            body = self.changes(**params).get_json()
+            seen += [(kind, row['id']) for kind in ('courses', 'lessons', 'assessments') for row in body[kind]]
+            cursor = body['cursor']
+            if not body['has_more']:
+                break
+        self.assertEqual(seen, [('courses', self.course_id), *[('lessons', id_) for id_ in self.lesson_ids],
+                                ('assessments', self.assessment_id)])
+
+    def test_invalid_and_expired_cursors(self):
+        self.assertEqual(self.changes(since='yesterday').status_code, 400)
+        self.assertEqual(self.changes(since=encode_cursor(datetime.utcnow(), 'user', 1)).status_code, 400)
+        expired = encode_cursor(datetime.utcnow() - timedelta(days=31), 'lesson', 1)
+        self.assertEqual(self.changes(since=expired).status_code, 410)
+
+    def test_backfill_updated_at(self):
+        db.session.execute(update(Lesson.__table__).values(updated_at=None))
+        db.session.commit()
+        self.assertEqual(len(self.changes().get_json()['lessons']), 0)
+        self.assertEqual(backfill_updated_at(), 3)
+        self.assertEqual(len(self.changes().get_json()['lessons']), 3)
@@ -0,0 +1,101 @@
+import json
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.assessment import Assessment
+from app.services.cloning import MAX_CLONE_TITLE_LENGTH
+from app.services.ordering import move
+from app.services.search import search
+from tests.base import DatabaseTestCase
+
+QUESTIONS = [{'type': 'true_false', 'question': 'Is iqlab a rule?', 'correct_answer': 'true'}]
+
+
+class CloneTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.other = User(username='other', email='other@example.com', role=UserRole.TEACHER)
+        self.course = Course(title='Tajweed', description='Rules of recitation', author=self.teacher)
+        self.lessons = [Lesson(title=f'Lesson {number}', body=f'Idgham rule {number}, see 2:255.',
+                               author=self.teacher, course=self.course) for number in range(3)]
+        self.assessments = [Assessment(title=f'Quiz {number}', author=self.teacher, lesson=lesson,
+                                       course=self.course, questions=json.dumps(QUESTIONS), type='quiz',
+                                       answers='["true"]') for number, lesson in enumerate(self.lessons)]
+        db.session.add_all([self.teacher, self.other, self.course, *self.lessons, *self.assessments])
+        db.session.commit()
+        self.course_id = self.course.id
+
+    def clone(self, body=None, username='teacher'):
+        return self.client.post(f'/api/v1/content/courses/{self.course_id}/clone', json=body or {},
+                                headers={'Authorization': f'Bearer {create_access_token(identity=username)}'})
+
+    def test_clone_copies_lessons_and_assessments(self):
+        move(Lesson, db.session.get(Lesson, self.lessons[0].id), self.lessons[2].id)
+        db.session.commit()
+
+        response = self.clone({'title': 'Tajweed 2025'})
+        self.assertEqual(response.status_code, 201)
+        body = response.get_json()
+        self.assertEqual((body['lessons'], body['assessments']), (3, 3))
+        clone = db.session.get(Course, body['course']['id'])
+        self.assertEqual((clone.title, clone.description), ('Tajweed 2025', 'Rules of recitation'))
+        self.assertEqual([lesson.title for lesson in clone.lessons],
+                         ['Lesson 1 (Tajweed 2025)', 'Lesson 2 (Tajweed 2025)', 'Lesson 0 (Tajweed 2025)'])
+        copied = clone.lessons[2]
+        self.assertEqual((copied.body, copied.version, copied.author.username),
+                         ('Idgham rule 0, see 2:255.', 1, 'teacher'))
+        self.assertEqual([(assessment.title, json.loads(assessment.questions)) for assessment in copied.assessments],
+                         [('Quiz 0 (Tajweed 2025)', QUESTIONS)])
+        self.assertEqual(copied.assessments[0].course_id, clone.id)
+        self.assertIn(('lesson', copied.id), [result[:2] for result in search('idgham')])
+        self.assertEqual(db.session.get(Course, self.course_id).lessons[0].title, 'Lesson 1')
+
+    def test_statement_count_does_not_depend_on_course_size(self):
+        counts = []
+        for title in ('Small', 'Large'):
+            statements = []
+
+            def record(conn, cursor, statement, parameters, context, executemany):
+                if statement.startswith('INSERT INTO lessons') or statement.startswith('INSERT INTO assessments'):
+                    statements.append(statement)
+
+            event.listen(db.engine, 'before_cursor_execute', record)
+            try:
+                self.assertEqual(self.clone({'title': title}).status_code, 201)
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', record)
+            counts.append(len(statements))
+            db.session.add_all([Lesson(title=f'{title} extra {number}', body='More.', author_id=self.teacher.id,
+                                       course_id=self.course_id) for number in range(10)])
+            db.session.commit()
+        self.assertEqual(counts, [2, 2])
+
+    def test_default_titles_permissions_and_conflicts(self):
+        self.assertEqual(self.clone().get_json()['course']['title'], 'Tajweed (copy)')
+        self.assertEqual(self.clone().get_json()['course']['title'], 'Tajweed (copy 2)')
+        self.assertEqual(self.clone({'title': 'Tajweed'}).status_code, 409)
+        self.assertEqual(self.clone(username='other').status_code, 403)
+        self.assertEqual(self.clone({'title': ''}).status_code, 400)
+        db.session.add(Lesson(title='Lesson 1 (Taken)', body='Already here.', author_id=self.teacher.id,
+                              course_id=self.course_id))
+        db.session.commit()
+        self.assertEqual(self.clone({'title': 'Taken'}).status_code, 409)
+        self.assertIsNone(Course.query.filter_by(title='Taken').first())
+
+    def test_long_titles(self):
+        self.assertEqual(self.clone({'title': 'T' * (MAX_CLONE_TITLE_LENGTH + 1)}).status_code, 400)
+        title = 'T' * MAX_CLONE_TITLE_LENGTH
+        self.assertEqual(self.clone({'title': title}).status_code, 201)
+        lesson = Lesson.query.filter_by(title=f'Lesson 0 ({title})').one()
+        self.assertEqual(len(lesson.title), len('Lesson 0') + MAX_CLONE_TITLE_LENGTH + 3)
+
+        # The default title of a long course's copy fits the limit too
+        long_course = db.session.get(Course, self.course_id)
+        long_course.title = 'Tajweed ' * 30
+        db.session.commit()
+        copies = [self.clone().get_json()['course']['title'] for _ in range(2)]
+        self.assertTrue(all(len(copy) <= MAX_CLONE_TITLE_LENGTH for copy in copies))
+        self.assertEqual(copies[1], copies[0].replace('(copy)', '(copy 2)'))
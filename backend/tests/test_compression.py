@@ -0,0 +1,69 @@
+from unittest import mock
+from sqlalchemy import LargeBinary, select, text, type_coerce
+from app import db
+from app.models import types
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.types import RAW, ZLIB, ZSTD, codec_marker, compress_text, decompress_text, default_codec
+from app.services.compression import recompress
+from tests.base import DatabaseTestCase
+
+BODY = 'بسم الله الرحمن الرحيم. Tajweed rules for the letter noon. ' * 40
+
+
+class CompressedTextTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.course = Course(title='Tajweed', description='Short description', author=self.teacher)
+        self.lesson = Lesson(title='Noon', body=BODY, author=self.teacher, course=self.course)
+        db.session.add_all([self.teacher, self.course, self.lesson])
+        db.session.commit()
+
+    def stored(self, column, row_id):
+        return db.session.execute(select(type_coerce(column, LargeBinary))
+                                  .where(column.table.c.id == row_id)).scalar_one()
+
+    def test_encoding(self):
+        self.assertEqual(compress_text('short'), RAW + b'short')
+        encoded = compress_text(BODY, codec=ZLIB)
+        self.assertEqual(encoded[:1], ZLIB)
+        self.assertLess(len(encoded), len(BODY.encode('utf-8')) // 5)
+        self.assertEqual(decompress_text(encoded), BODY)
+        self.assertEqual(decompress_text('legacy text'), 'legacy text')
+        self.assertEqual(decompress_text('قديم'.encode('utf-8')), 'قديم')
+
+    def test_codec_is_configured(self):
+        self.assertEqual(self.app.config['TEXT_COMPRESSION_CODEC'], 'zlib')
+        self.assertEqual(default_codec(), ZLIB)
+        self.app.config['TEXT_COMPRESSION_CODEC'] = 'lz4'
+        self.assertRaises(ValueError, default_codec)
+        with mock.patch.object(types, 'zstandard', None):
+            self.assertRaises(ValueError, codec_marker, 'zstd')
+        with mock.patch.object(types, 'zstandard', object()):
+            self.assertEqual(codec_marker('zstd'), ZSTD)
+
+    def test_columns_are_stored_compressed_and_read_transparently(self):
+        stored = self.stored(Lesson.__table__.c.body, self.lesson.id)
+        self.assertNotEqual(stored[:1], RAW)
+        self.assertLess(len(stored), len(BODY.encode('utf-8')) // 5)
+        self.assertEqual(self.stored(Course.__table__.c.description, self.course.id), RAW + b'Short description')
+
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Lesson, self.lesson.id).body, BODY)
+        self.assertEqual(Course.query.filter_by(description='Short description').one().id, self.course.id)
+
+    def test_recompress_migrates_legacy_rows(self):
+        db.session.execute(text('UPDATE lessons SET body = :body WHERE id = :id'), {'body': BODY, 'id': self.lesson.id})
+        db.session.commit()
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Lesson, self.lesson.id).body, BODY)
+
+        report = recompress(batch_size=1, codec='zlib')
+        self.assertEqual(report['lessons.body']['rewritten'], 1)
+        self.assertEqual(report['courses.description']['rewritten'], 0)
+        self.assertEqual(self.stored(Lesson.__table__.c.body, self.lesson.id)[:1], ZLIB)
+        self.assertEqual(recompress(codec='zlib')['lessons.body']['rewritten'], 0)
+
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Lesson, self.lesson.id).body, BODY)
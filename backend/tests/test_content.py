@@ -1,18 +1,13 @@
-import unittest
 from unittest.mock import patch
 from flask import json
-from app import create_app, db
+from app import db
+from tests.base import DatabaseTestCase
 from app.models.user import User, UserRole
 from app.models.content import Course, Lesson
 
-class TestContentFunctions(unittest.TestCase):
-
+class TestContentFunctions(DatabaseTestCase):
     def setUp(self):
-        self.app = create_app('testing')
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        db.create_all()
-        self.client = self.app.test_client()
+        super().setUp()
 
         # Create a test user
         self.test_user = User(username='test_user', email='test@example.com', role=UserRole.TEACHER)
@@ -25,11 +20,6 @@ class TestContentFunctions(unittest.TestCase):
                                         content_type='application/json')
         self.mock_token = json.loads(self.response.get_data(as_text=True))['access_token']
 
-    def tearDown(self):
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
-
     def test_create_course(self):
         data = {'title': 'Test Course', 'description': 'This is a test course.'}
         response = self.client.post('/api/v1/content/courses',
@@ -1,22 +1,10 @@
-import unittest
-from app import create_app, db
+from app import db
+from tests.base import DatabaseTestCase
 from app.models.content import Course
 from app.models.user import User, UserRole
 from datetime import datetime
 
-class CourseModelTestCase(unittest.TestCase):
-
-    def setUp(self):
-        self.app = create_app('testing')
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        self.client = self.app.test_client()
-        db.create_all()
-
-    def tearDown(self):
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
+class CourseModelTestCase(DatabaseTestCase):
 
     def test_create_course(self):
         user = User(
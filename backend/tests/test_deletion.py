@@ -0,0 +1,181 @@
+import json
+from datetime import timedelta
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson, LessonRevision
+from app.models.assessment import Assessment
+from app.models.gradebook import GradebookEntry
+from app.models.outline import CourseOutline
+from app.models.search import SearchDocument
+from app.models.submission import Submission
+from app.models.verse import VerseReference
+from app.services.deletion import purge_course, purge_deleted
+from app.services.outlines import course_outline
+from app.services.search import search
+from tests.base import DatabaseTestCase
+
+QUESTIONS = [{'type': 'true_false', 'question': 'Is iqlab a rule?', 'correct_answer': 'true'}]
+
+
+class DeletionTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.other = User(username='other', email='other@example.com', role=UserRole.TEACHER)
+        self.student = User(username='student', email='student@example.com', role=UserRole.STUDENT)
+        self.admin = User(username='admin', email='admin@example.com', role=UserRole.ADMIN)
+        self.course = Course(title='Tajweed', description='Rules of recitation', author=self.teacher)
+        self.kept = Course(title='Hifz', description='Memorization', author=self.other)
+        db.session.add_all([self.teacher, self.other, self.student, self.admin, self.course, self.kept])
+        self.add_lessons(self.course, self.teacher, 'Lesson', 3)
+        # A lesson of the teacher in another author's course
+        self.add_lessons(self.kept, self.teacher, 'Guest lesson', 1)
+        self.add_lessons(self.kept, self.other, 'Kept lesson', 1)
+        db.session.commit()
+        self.course_id, self.kept_id = self.course.id, self.kept.id
+        self.teacher_id, self.student_id = self.teacher.id, self.student.id
+        course_outline(self.course_id)
+        db.session.commit()
+
+    def add_lessons(self, course, author, title, count):
+        for number in range(count):
+            lesson = Lesson(title=f'{title} {number}', body=f'Idgham rule {number}, see Quran 2:255.',
+                            author=author, course=course)
+            assessment = Assessment(title=f'{title} quiz {number}', author=author, lesson=lesson, course=course,
+                                    questions=json.dumps(QUESTIONS), type='quiz', answers='["true"]')
+            db.session.add_all([lesson, assessment, Submission(student=self.student, assessment=assessment,
+                                                               answers='["true"]', score=1, results='1')])
+
+    def delete(self, path, username):
+        return self.client.delete(f'/api/v1{path}',
+                                  headers={'Authorization': f'Bearer {create_access_token(identity=username)}'})
+
+    def count(self, model, **filters):
+        return model.query.filter_by(**filters).execution_options(include_deleted=True).count()
+
+    def assert_course_gone(self, course_id):
+        self.assertEqual(self.count(Course, id=course_id), 0)
+        self.assertEqual(self.count(Lesson, course_id=course_id), 0)
+        self.assertEqual(self.count(Assessment, course_id=course_id), 0)
+        self.assertEqual(GradebookEntry.query.filter_by(course_id=course_id).count(), 0)
+        self.assertIsNone(db.session.get(CourseOutline, course_id))
+
+    def test_delete_course_leaves_tombstones_until_purged(self):
+        db.session.get(Lesson, Lesson.query.filter_by(title='Lesson 0').one().id).body = 'Izhar, see Quran 2:255.'
+        db.session.commit()
+
+        response = self.delete(f'/content/courses/{self.course_id}', 'teacher')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.count(Lesson, course_id=self.course_id), 3)
+        self.assertEqual(Lesson.query.filter_by(course_id=self.course_id).count(), 0)
+        self.assertEqual(Assessment.query.filter_by(course_id=self.course_id).count(), 0)
+        headers = {'Authorization': f'Bearer {create_access_token(identity="teacher")}'}
+        self.assertEqual(self.client.get(f'/api/v1/content/courses/{self.course_id}').status_code, 404)
+        self.assertEqual([course['id'] for course in self.client.get('/api/v1/content/courses').get_json()],
+                         [self.kept_id])
+        self.assertEqual(self.client.get(f'/api/v1/content/courses/{self.course_id}/outline',
+                                         headers=headers).status_code, 404)
+        batch = self.client.get(f'/api/v1/content/courses/batch?ids={self.course_id}').get_json()
+        self.assertEqual(batch['missing'], [self.course_id])
+        self.assertEqual({result[1] for result in search('idgham')}, {lesson.id for lesson in Lesson.query})
+        self.assertEqual(SearchDocument.query.filter_by(doc_type='course').count(), 1)
+        self.assertEqual(VerseReference.query.count(), 2)
+        # The title stays taken until the course is purged
+        response = self.client.post('/api/v1/content/courses', headers=headers,
+                                    json={'title': 'Tajweed', 'description': 'Again'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.delete(f'/content/courses/{self.course_id}', 'teacher').status_code, 404)
+
+        self.assertEqual(purge_deleted()['courses'], 0)
+        self.assertEqual(purge_deleted(retention=timedelta(0)), {'courses': 1, 'lessons': 3, 'assessments': 3,
+                                                                   'users': 0})
+        self.assert_course_gone(self.course_id)
+        self.assertEqual(Submission.query.count(), 2)
+        self.assertEqual(LessonRevision.query.count(), 0)
+        self.assertEqual({reference.doc_type for reference in VerseReference.query}, {'lesson'})
+        self.assertEqual(Course.query.count(), 1)
+
+    def test_delete_lesson_and_assessment(self):
+        lesson_id = Lesson.query.filter_by(title='Lesson 0').one().id
+        assessment_id = Assessment.query.filter_by(title='Lesson quiz 1').one().id
+        self.assertEqual(self.delete(f'/content/lessons/{lesson_id}', 'teacher').status_code, 200)
+        self.assertEqual(self.delete(f'/content/assessment/{assessment_id}', 'teacher').status_code, 200)
+        self.assertEqual(self.delete(f'/content/assessment/{assessment_id}', 'teacher').status_code, 404)
+        course = db.session.get(Course, self.course_id)
+        self.assertEqual([lesson.title for lesson in course.lessons], ['Lesson 1', 'Lesson 2'])
+        self.assertEqual([assessment.title for assessment in course.assessments], ['Lesson quiz 2'])
+
+        self.assertEqual(purge_deleted(retention=timedelta(0)), {'courses': 0, 'lessons': 1, 'assessments': 2,
+                                                                   'users': 0})
+        self.assertEqual(self.count(Lesson, course_id=self.course_id), 2)
+        self.assertEqual(Submission.query.count(), 3)
+
+    def test_delete_course_of_another_author(self):
+        self.assertEqual(self.delete(f'/content/courses/{self.course_id}', 'other').status_code, 403)
+        self.assertEqual(self.delete('/content/courses/999', 'teacher').status_code, 404)
+        self.assertIsNotNone(db.session.get(Course, self.course_id))
+
+    def test_tombstones_are_only_hidden_from_application_sessions(self):
+        self.assertEqual(self.delete(f'/content/courses/{self.course_id}', 'teacher').status_code, 200)
+        self.assertEqual(Course.query.count(), 1)
+        with Session(db.session.connection()) as session:
+            self.assertEqual(session.query(Course).count(), 2)
+
+    def test_purge_runs_in_batches(self):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('DELETE FROM lessons'):
+                statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            counts = purge_course(self.course_id, batch_size=2)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(counts, {'assessments': 3, 'lessons': 3, 'courses': 1})
+        self.assertEqual(len(statements), 2)
+        self.assert_course_gone(self.course_id)
+
+    def test_delete_user(self):
+        db.session.get(User, self.teacher_id).password = 'secret'
+        db.session.commit()
+        credentials = {'username': 'teacher', 'password': 'secret'}
+        self.assertEqual(self.client.post('/api/v1/auth/login', json=credentials).status_code, 200)
+        response = self.delete(f'/users/{self.teacher_id}', 'admin')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(db.session.get(User, self.teacher_id).deleted_at)
+        self.assertEqual(self.delete(f'/users/{self.teacher_id}', 'admin').status_code, 404)
+        self.assertEqual(self.delete(f'/content/courses/{self.kept_id}', 'teacher').status_code, 404)
+        self.assertEqual(self.client.post('/api/v1/auth/login', json=credentials).status_code, 401)
+        headers = {'Authorization': f'Bearer {create_access_token(identity="admin")}'}
+        self.assertNotIn('teacher', [user['username'] for user in
+                                     self.client.get('/api/v1/users', headers=headers).get_json()])
+        self.assertEqual(self.client.get(f'/api/v1/users/{self.teacher_id}', headers=headers).status_code, 404)
+
+        # The content is left as tombstones, so synced clients learn of its deletion
+        self.assertEqual(self.count(Lesson, author_id=self.teacher_id), 4)
+        self.assertEqual([lesson.title for lesson in Lesson.query], ['Kept lesson 0'])
+        self.assertEqual(SearchDocument.query.filter_by(doc_type='course').count(), 1)
+        changes = self.client.get('/api/v1/content/changes', headers=headers).get_json()
+        self.assertEqual(changes['deleted']['courses'], [self.course_id])
+        self.assertEqual(len(changes['deleted']['lessons']), 4)
+        self.assertEqual(len(changes['deleted']['assessments']), 4)
+
+        self.assertEqual(purge_deleted()['users'], 0)
+        self.assertEqual(purge_deleted(retention=timedelta(0)), {'courses': 1, 'lessons': 4, 'assessments': 4,
+                                                                   'users': 1})
+        self.assertIsNone(db.session.get(User, self.teacher_id))
+        self.assert_course_gone(self.course_id)
+        self.assertEqual([lesson.title for lesson in Lesson.query], ['Kept lesson 0'])
+        self.assertEqual([assessment.title for assessment in Assessment.query], ['Kept lesson quiz 0'])
+        self.assertEqual(Submission.query.count(), 1)
+
+        self.assertEqual(self.delete(f'/users/{self.student_id}', 'admin').status_code, 200)
+        self.assertEqual(Submission.query.count(), 1)
+        purge_deleted(retention=timedelta(0))
+        self.assertEqual((Submission.query.count(), GradebookEntry.query.count()), (0, 0))
+        self.assertEqual(Assessment.query.count(), 1)
@@ -0,0 +1,80 @@
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.assessment import Assessment
+from app.models.submission import Submission
+from app.services.export import export_submissions
+from tests.base import DatabaseTestCase
+
+QUESTIONS = [{'type': 'multiple_choice', 'question': 'Which letter?', 'options': ['A', 'B'], 'correct_answer': 'A'}]
+
+
+class ExportTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        courses = [Course(title=f'Course {number}', description='Tajweed', author=self.teacher) for number in (1, 2)]
+        lessons = [Lesson(title=f'Lesson {number}', body='Noon sakinah.', author=self.teacher, course=course)
+                   for number, course in enumerate(courses)]
+        self.assessments = [Assessment(title=f'Quiz {number}', author=self.teacher, lesson=lesson,
+                                       course=lesson.course, questions=json.dumps(QUESTIONS), type='quiz',
+                                       answers='["A"]')
+                            for number, lesson in enumerate(lessons)]
+        db.session.add_all([self.teacher, *courses, *lessons, *self.assessments])
+        for number in range(6):
+            student = User(username=f'student{number}', email=f'student{number}@example.com',
+                           role=UserRole.STUDENT)
+            db.session.add_all([student, Submission(
+                student=student, assessment=self.assessments[number % 2], answers='["A"]', score=1, results='1',
+                submitted_at=datetime(2024, 1, 1 + number))])
+        db.session.commit()
+        self.courses = courses
+        self.url = '/api/v1/content/submissions/export'
+        self.headers = {'Authorization': f"Bearer {create_access_token(identity='teacher')}"}
+
+    def test_filters(self):
+        self.assertEqual(len(list(export_submissions(batch_size=2))), 6)
+        rows = list(export_submissions(course_id=self.courses[0].id))
+        self.assertEqual([row['student'] for row in rows], ['student0', 'student2', 'student4'])
+        self.assertEqual(rows[0]['feedback'], json.dumps(['Question 1: Correct (+1)']))
+        rows = list(export_submissions(since=datetime(2024, 1, 2), until=datetime(2024, 1, 4)))
+        self.assertEqual([row['submitted_at'][:10] for row in rows], ['2024-01-02', '2024-01-03'])
+
+    def test_reads_keyset_pages_with_the_export_timeout(self):
+        pages = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if 'FROM submissions' in statement:
+                pages.append(context.execution_options.get('statement_timeout_ms'))
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            rows = list(export_submissions(batch_size=4))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual([row['student'] for row in rows], [f'student{number}' for number in range(6)])
+        self.assertEqual(pages, [self.app.config['EXPORT_STATEMENT_TIMEOUT_MS']] * 2)
+
+    def test_csv_and_gzipped_ndjson(self):
+        response = self.client.get(f'{self.url}?assessment_id={self.assessments[1].id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual([row['student'] for row in rows], ['student1', 'student3', 'student5'])
+        self.assertEqual(rows[0]['assessment_title'], 'Quiz 1')
+
+        response = self.client.get(f'{self.url}?format=ndjson&gzip=1&since=2024-01-05', headers=self.headers)
+        self.assertEqual(response.mimetype, 'application/gzip')
+        lines = gzip.decompress(response.get_data()).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['student'] for line in lines], ['student4', 'student5'])
+
+    def test_invalid_parameters(self):
+        for query in ('format=xml', 'course_id=x', 'since=yesterday'):
+            self.assertEqual(self.client.get(f'{self.url}?{query}', headers=self.headers).status_code, 400)
@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, insert
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.assessment import Assessment
+from app.models.gradebook import GradebookEntry
+from app.models.submission import Submission
+from app.services.gradebook import rebuild_gradebook
+from tests.base import DatabaseTestCase
+
+QUESTIONS = [
+    {'type': 'multiple_choice', 'question': 'Which letter?', 'options': ['A', 'B'], 'correct_answer': 'A'},
+    {'type': 'text', 'question': 'Explain ikhfa.'},
+]
+
+
+class GradebookTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.students = [User(username=name, email=f'{name}@example.com', role=UserRole.STUDENT)
+                         for name in ('bilal', 'aisha')]
+        self.course = Course(title='Tajweed', description='Rules of recitation', author=self.teacher)
+        self.lesson = Lesson(title='Noon', body='Rules of noon sakinah.', author=self.teacher, course=self.course)
+        self.assessments = [Assessment(title=f'Quiz {number}', author=self.teacher, lesson=self.lesson,
+                                       course=self.course, questions=json.dumps(QUESTIONS), type='quiz', answers='[]')
+                            for number in (1, 2)]
+        db.session.add_all([self.teacher, self.course, self.lesson, *self.students, *self.assessments])
+        db.session.commit()
+
+    def headers(self, username):
+        return {'Authorization': f'Bearer {create_access_token(identity=username)}'}
+
+    def submit(self, username, assessment, answers):
+        return self.client.post(f'/api/v1/content/assessment/{assessment.id}/submit',
+                                json={'answers': answers}, headers=self.headers(username))
+
+    def test_gradebook_follows_submissions_and_grading(self):
+        self.submit('bilal', self.assessments[0], ['A', 'Hiding the noon.'])
+        self.submit('aisha', self.assessments[0], ['B', 'Hiding the noon.'])
+        submission_id = self.submit('aisha', self.assessments[1], ['A', 'Merging.']).get_json()['submission']['id']
+        self.assertEqual(GradebookEntry.query.count(), 3)
+
+        url = f'/api/v1/content/courses/{self.course.id}/gradebook'
+        gradebook = self.client.get(url, headers=self.headers('teacher')).get_json()
+        self.assertEqual([assessment['title'] for assessment in gradebook['assessments']], ['Quiz 1', 'Quiz 2'])
+        aisha, bilal = gradebook['students']
+        self.assertEqual((aisha['username'], aisha['scores'], aisha['total']), ('aisha', [-1, 1], 0))
+        self.assertEqual((bilal['scores'], bilal['pending']), ([1, None], [self.assessments[0].id]))
+
+        response = self.client.put(
+            f'/api/v1/content/assessment/{self.assessments[1].id}/submissions/{submission_id}/grade',
+            json={'results': '11', 'feedback': 'Good explanation.'}, headers=self.headers('teacher'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['submission']['feedback'], 'Good explanation.')
+        aisha = self.client.get(url, headers=self.headers('teacher')).get_json()['students'][0]
+        self.assertEqual((aisha['scores'], aisha['pending']), ([-1, 2], [self.assessments[0].id]))
+
+        response = self.client.get(f'{url}?format=csv', headers=self.headers('teacher'))
+        self.assertEqual(response.mimetype, 'text/csv')
+        rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(rows[0], ['student_id', 'username', 'Quiz 1', 'Quiz 2', 'total'])
+        self.assertEqual(rows[2][1:], ['bilal', '1', '', '1'])
+
+    def test_grid_is_read_with_one_query(self):
+        for student in self.students:
+            self.submit(student.username, self.assessments[0], ['A', 'Hiding the noon.'])
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if 'gradebook_entries' in statement:
+                statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            self.client.get(f'/api/v1/content/courses/{self.course.id}/gradebook', headers=self.headers('teacher'))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(len(statements), 1)
+
+    def test_invalid_grades_and_rebuild(self):
+        submission_id = self.submit('bilal', self.assessments[0], ['A', 'x']).get_json()['submission']['id']
+        url = f'/api/v1/content/assessment/{self.assessments[0].id}/submissions/{submission_id}/grade'
+        for body in ({}, {'results': '1'}, {'results': '19'}, {'score': 'ten'}):
+            self.assertEqual(self.client.put(url, json=body, headers=self.headers('teacher')).status_code, 400)
+        self.assertEqual(self.client.put(url, json={'score': 1}, headers=self.headers('bilal')).status_code, 403)
+
+        # Rows written without the ORM are picked up by a rebuild
+        db.session.execute(insert(Submission.__table__).values(
+            student_id=self.students[1].id, assessment_id=self.assessments[0].id, answers='["B", "x"]',
+            score=-1, results='02'))
+        db.session.commit()
+        self.assertEqual(rebuild_gradebook(), 2)
+        entry = db.session.get(GradebookEntry, (self.course.id, self.students[1].id, self.assessments[0].id))
+        self.assertEqual((entry.score, entry.pending), (-1, True))
@@ -0,0 +1,88 @@
+import json
+from flask_jwt_extended import create_access_token
+from sqlalchemy import text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.schema import CreateTable
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.assessment import Assessment
+from app.models.submission import Submission
+from app.services.grading import compact_feedback, parse_legacy_feedback, render_feedback, score_answers
+from tests.base import DatabaseTestCase
+
+QUESTIONS = [
+    {'type': 'multiple_choice', 'question': 'Which letter?', 'correct_answer': 'ن'},
+    {'type': 'true_false', 'question': 'Is idgham a rule of noon?', 'correct_answer': True},
+    {'type': 'text', 'question': 'Explain ikhfa.'},
+    {'type': 'matching', 'question': 'Match the rules.'},
+]
+
+
+class GradingTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.student = User(username='student', email='student@example.com', role=UserRole.STUDENT)
+        self.course = Course(title='Tajweed', description='Rules of recitation', author=self.teacher)
+        self.lesson = Lesson(title='Noon', body='Rules of noon sakinah.', author=self.teacher, course=self.course)
+        self.assessment = Assessment(title='Noon quiz', author=self.teacher, lesson=self.lesson, course=self.course,
+                                     questions=json.dumps(QUESTIONS), type='quiz', answers='[]')
+        db.session.add_all([self.teacher, self.student, self.course, self.lesson, self.assessment])
+        db.session.commit()
+        self.headers = {'Authorization': f"Bearer {create_access_token(identity='student')}"}
+
+    def test_score_and_render(self):
+        score, results, needs_review = score_answers(QUESTIONS, ['ن', False, 'Hiding the noon.', 'x'])
+        self.assertEqual((score, results, needs_review), (0, '1023', True))
+        self.assertEqual(render_feedback(results), [
+            'Question 1: Correct (+1)',
+            'Question 2: Incorrect (-1)',
+            'Question 3: Text answer submitted; will be graded by the teacher.',
+            'Question 4: Unknown question type',
+            '1 text question(s) need manual review.',
+        ])
+        self.assertEqual(parse_legacy_feedback(json.dumps(render_feedback(results))), (0, '1023'))
+        self.assertIsNone(parse_legacy_feedback('Well done, see me about question 3.'))
+
+    def test_submit_stores_result_codes(self):
+        response = self.client.post(f'/api/v1/content/assessment/{self.assessment.id}/submit',
+                                    json={'answers': ['ن', True, 'Hiding the noon.', 'x']}, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        submission = response.get_json()['submission']
+        self.assertEqual((submission['score'], submission['results']), (2, '1123'))
+        self.assertEqual(json.loads(submission['feedback'])[0], 'Question 1: Correct (+1)')
+
+        stored = db.session.get(Submission, submission['id'])
+        self.assertIsNone(stored.feedback)
+
+    def test_submit_stores_results_of_long_assessments(self):
+        self.assessment.questions = json.dumps(QUESTIONS[:1] * 1500)
+        db.session.commit()
+        response = self.client.post(f'/api/v1/content/assessment/{self.assessment.id}/submit',
+                                    json={'answers': ['ن'] * 1500}, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(db.session.get(Submission, response.get_json()['submission']['id']).results, '1' * 1500)
+        # MySQL would reject results longer than a VARCHAR column
+        ddl = str(CreateTable(Submission.__table__).compile(dialect=mysql.dialect()))
+        self.assertIn('results TEXT', ddl)
+
+    def test_submit_rejects_wrong_answer_count(self):
+        response = self.client.post(f'/api/v1/content/assessment/{self.assessment.id}/submit',
+                                    json={'answers': ['ن']}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_compact_legacy_feedback(self):
+        legacy = Submission(student=self.student, assessment=self.assessment, answers='["ن"]',
+                            feedback=json.dumps(render_feedback('102')))
+        comment = Submission(student=self.teacher, assessment=self.assessment, answers='["ن"]',
+                             feedback='Well done.')
+        db.session.add_all([legacy, comment])
+        db.session.commit()
+
+        self.assertEqual(compact_feedback(batch_size=1), 1)
+        db.session.expire_all()
+        self.assertEqual((legacy.score, legacy.results, legacy.feedback), (0, '102', None))
+        self.assertEqual(comment.feedback, 'Well done.')
+        self.assertIsNone(comment.results)
+        self.assertEqual(db.session.execute(text('SELECT COUNT(*) FROM submissions WHERE feedback IS NULL')).scalar(), 1)
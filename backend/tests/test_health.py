@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app.services.database import MeteredQueuePool, add_statement_timeout, pool_status
+from tests.base import DatabaseTestCase
+
+
+class MeteredPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.directory, 'pool.db')}",
+                                    poolclass=MeteredQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05)
+
+    def tearDown(self):
+        self.engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def test_checkouts_and_timeouts_are_measured(self):
+        connection = self.engine.connect()
+        status = pool_status(self.engine)
+        self.assertEqual(status['checked_out'], 1)
+        self.assertEqual(status['utilization'], 1.0)
+
+        with self.assertRaises(PoolTimeoutError):
+            self.engine.connect()
+        connection.close()
+
+        status = pool_status(self.engine)
+        self.assertEqual(status['checkouts'], 2)
+        self.assertEqual(status['timeouts'], 1)
+        self.assertEqual(status['checked_out'], 0)
+        self.assertGreaterEqual(status['recent_p99_wait_ms'], 50)
+
+    def test_statement_timeout_hint(self):
+        self.assertEqual(add_statement_timeout('SELECT id FROM users', 500),
+                         'SELECT /*+ MAX_EXECUTION_TIME(500) */ id FROM users')
+        self.assertEqual(add_statement_timeout('UPDATE users SET age = 1', 500), 'UPDATE users SET age = 1')
+
+
+class HealthAPITestCase(DatabaseTestCase):
+    def test_healthz(self):
+        response = self.client.get('/healthz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['status'], 'ok')
+
+    def test_readyz(self):
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['failures'], [])
+
+    def test_readyz_sheds_traffic_when_pool_is_saturated(self):
+        saturated = {'pool': 'MeteredQueuePool', 'utilization': 0.95, 'recent_p95_wait_ms': 300.0}
+        with patch('app.api.v1.health.pool_status', return_value=saturated):
+            response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.get_json()['failures'],
+                         ['connection pool saturated', 'connection pool wait too long'])
@@ -1,22 +1,10 @@
-import unittest
 from flask import json
-from app import create_app, db
+from app import db
+from tests.base import DatabaseTestCase
 from app.models.user import User
 from flask_jwt_extended import get_jwt_identity, decode_token
 
-class TestJWTValidation(unittest.TestCase):
-    def setUp(self):
-        self.app = create_app('testing')
-        self.client = self.app.test_client()
-        self.app_ctx = self.app.app_context()
-        self.app_ctx.push()
-        db.create_all()
-
-    def tearDown(self):
-        db.session.remove()
-        db.drop_all()
-        self.app_ctx.pop()
-
+class TestJWTValidation(DatabaseTestCase):
     def test_jwt_when_login(self):
         user = User(username="testlogin", email="testlogin@email.com")
         user.password = "mypass145"
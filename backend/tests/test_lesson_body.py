@@ -0,0 +1,94 @@
+import re
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson, EXCERPT_LENGTH, make_excerpt
+from app.services.lessons import backfill_excerpts
+from tests.base import DatabaseTestCase
+
+BODY = '\n\n'.join(f'الفقرة {index}: ' + 'تجويد القرآن الكريم ' * 20 for index in range(5))
+
+
+class LessonBodyTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.course = Course(title='Tajweed', description='x', author=self.teacher)
+        self.lesson = Lesson(title='Long lesson', body=BODY, author=self.teacher, course=self.course)
+        db.session.add_all([self.teacher, self.course, self.lesson])
+        db.session.commit()
+        self.headers = {'Authorization': f"Bearer {create_access_token(identity='teacher')}"}
+
+    def get(self, url):
+        response = self.client.get(url, headers=self.headers)
+        return response.status_code, response.get_json()
+
+    def test_excerpt_and_length_follow_body(self):
+        self.assertEqual(self.lesson.body_length, len(BODY.encode('utf-8')))
+        self.assertTrue(self.lesson.excerpt.endswith('…'))
+        self.assertLessEqual(len(self.lesson.excerpt), EXCERPT_LENGTH + 1)
+        self.assertTrue(BODY.replace('\n\n', ' ').startswith(self.lesson.excerpt[:-1]))
+
+        self.lesson.body = 'Short body.'
+        db.session.commit()
+        self.assertEqual((self.lesson.excerpt, self.lesson.body_length), ('Short body.', 11))
+
+    def test_lists_do_not_load_bodies(self):
+        course_id = self.course.id
+        db.session.expunge_all()
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            for url in ('/api/v1/content/lessons', f'/api/v1/content/courses/{course_id}/lessons',
+                        '/api/v1/content/lessons/by-author/teacher'):
+                status, data = self.get(url)
+                self.assertEqual(status, 200)
+                lesson = data['items'][0] if 'items' in data else data[0]
+                self.assertNotIn('body', lesson)
+                self.assertEqual(lesson['body_length'], len(BODY.encode('utf-8')))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertFalse([statement for statement in statements if re.search(r'lessons\.body\b', statement)])
+
+    def test_full_body(self):
+        status, data = self.get(f'/api/v1/content/lessons/{self.lesson.id}')
+        self.assertEqual(status, 200)
+        self.assertEqual(data['body'], BODY)
+
+    def test_byte_ranges_do_not_split_characters(self):
+        encoded = BODY.encode('utf-8')
+        chunks, start = [], 0
+        while start < len(encoded):
+            status, data = self.get(f'/api/v1/content/lessons/{self.lesson.id}?bytes={start}-{start + 99}')
+            self.assertEqual(status, 200)
+            self.assertLessEqual(data['range']['end'] - data['range']['start'], 99)
+            chunks.append(data['body'])
+            start = data['range']['end'] + 1
+        self.assertEqual(''.join(chunks), BODY)
+
+        status, data = self.get(f'/api/v1/content/lessons/{self.lesson.id}?bytes=1-')
+        self.assertEqual(data['range'], {'unit': 'bytes', 'start': 2, 'end': len(encoded) - 1})
+
+    def test_paragraph_ranges(self):
+        status, data = self.get(f'/api/v1/content/lessons/{self.lesson.id}?paragraphs=1-2')
+        self.assertEqual(status, 200)
+        self.assertEqual(data['body'], '\n\n'.join(paragraph.strip() for paragraph in BODY.split('\n\n')[1:3]))
+        self.assertEqual(data['range'], {'unit': 'paragraphs', 'start': 1, 'end': 2, 'total': 5})
+
+    def test_invalid_ranges(self):
+        url = f'/api/v1/content/lessons/{self.lesson.id}'
+        self.assertEqual(self.get(f'{url}?bytes=5-1')[0], 400)
+        self.assertEqual(self.get(f'{url}?paragraphs=a')[0], 400)
+        self.assertEqual(self.get(f'{url}?bytes=0-1&paragraphs=0-1')[0], 400)
+        self.assertEqual(self.get(f'{url}?bytes=100000-')[0], 416)
+        self.assertEqual(self.get(f'{url}?paragraphs=5-')[0], 416)
+
+    def test_backfill_excerpts(self):
+        db.session.execute(Lesson.__table__.update().values(excerpt=None, body_length=None))
+        db.session.commit()
+        self.assertEqual(backfill_excerpts(batch_size=1), 1)
+        db.session.expire_all()
+        self.assertEqual(self.lesson.excerpt, make_excerpt(BODY))
+        self.assertEqual(self.lesson.body_length, len(BODY.encode('utf-8')))
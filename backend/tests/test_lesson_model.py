@@ -1,22 +1,10 @@
-import unittest
-from app import create_app, db
+from app import db
+from tests.base import DatabaseTestCase
 from app.models.user import User, UserRole
 from app.models.content import Lesson, Course
 from datetime import datetime
 
-class LessonModelTestCase(unittest.TestCase):
-
-    def setUp(self):
-        self.app = create_app('testing')
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        self.client = self.app.test_client()
-        db.create_all()
-
-    def tearDown(self):
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
+class LessonModelTestCase(DatabaseTestCase):
 
     def test_create_lesson(self):
         user = User(
@@ -0,0 +1,91 @@
+from flask_jwt_extended import create_access_token
+from sqlalchemy.orm.exc import StaleDataError
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson, LessonRevision
+from app.services.lessons import apply_delta, apply_patch, diff_delta
+from tests.base import DatabaseTestCase
+
+BODY = 'بسم الله الرحمن الرحيم. The first lesson covers makharij.'
+
+
+class PatchTestCase(DatabaseTestCase):
+    def test_apply_patch_and_reverse(self):
+        body, reverse = apply_patch(BODY, [{'start': 24, 'end': 33, 'text': 'This'},
+                                           {'start': 0, 'text': '> '},
+                                           {'start': len(BODY) - 1, 'end': len(BODY)}])
+        self.assertEqual(body, '> بسم الله الرحمن الرحيم. This lesson covers makharij')
+        self.assertEqual(apply_delta(body, reverse), BODY)
+
+    def test_invalid_patches(self):
+        for operations in ([], [{'end': 3}], [{'start': 0, 'end': len(BODY) + 1}],
+                           [{'start': 0, 'end': 5}, {'start': 4, 'end': 6}], [{'start': 0, 'text': 3}]):
+            with self.assertRaises(ValueError):
+                apply_patch(BODY, operations)
+
+    def test_diff_delta(self):
+        new = BODY.replace('first', 'second')
+        delta = diff_delta(BODY, new)
+        self.assertEqual(delta, [[28, 34, 'first']])
+        self.assertEqual(apply_delta(new, delta), BODY)
+        self.assertEqual(diff_delta(BODY, BODY), [])
+
+
+class LessonRevisionAPITestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.course = Course(title='Tajweed', description='x', author=self.teacher)
+        self.lesson = Lesson(title='Makharij', body=BODY, author=self.teacher, course=self.course)
+        db.session.add_all([self.teacher, self.course, self.lesson])
+        db.session.commit()
+        self.url = f'/api/v1/content/lessons/{self.lesson.id}'
+        self.headers = {'Authorization': f"Bearer {create_access_token(identity='teacher')}"}
+
+    def patch(self, payload):
+        return self.client.patch(self.url, json=payload, headers=self.headers)
+
+    def test_patches_build_reverse_delta_history(self):
+        response = self.patch({'version': 1, 'ops': [{'start': 28, 'end': 33, 'text': 'second'}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['version'], 2)
+        self.assertNotIn('body', response.get_json())
+
+        response = self.client.put(self.url, json={'body': 'Rewritten.'}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.put(self.url, json={'title': 'Makharij al-Huruf'}, headers=self.headers)
+        self.assertEqual(response.get_json()['version'], 4)
+
+        history = self.client.get(f'{self.url}/revisions', headers=self.headers).get_json()
+        self.assertEqual(history['version'], 4)
+        self.assertEqual([revision['version'] for revision in history['revisions']], [2, 1])
+        self.assertEqual(LessonRevision.query.filter_by(version=1).one().delta, '[[28, 34, "first"]]')
+
+        bodies = {version: self.client.get(f'{self.url}/revisions/{version}', headers=self.headers).get_json()['body']
+                  for version in (1, 2, 3, 4)}
+        self.assertEqual(bodies, {1: BODY, 2: BODY.replace('first', 'second'), 3: 'Rewritten.', 4: 'Rewritten.'})
+        self.assertEqual(self.client.get(f'{self.url}/revisions/5', headers=self.headers).status_code, 404)
+
+    def test_stale_version_is_rejected(self):
+        self.assertEqual(self.patch({'version': 1, 'ops': [{'start': 0, 'text': 'A'}]}).status_code, 200)
+        response = self.patch({'version': 1, 'ops': [{'start': 0, 'text': 'B'}]})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()['version'], 2)
+        self.assertEqual(db.session.get(Lesson, self.lesson.id).body, 'A' + BODY)
+
+    def test_concurrent_update_raises_stale_data(self):
+        db.session.execute(Lesson.__table__.update().values(version=Lesson.__table__.c.version + 1))
+        self.lesson.title = 'Renamed'
+        with self.assertRaises(StaleDataError):
+            db.session.flush()
+
+    def test_invalid_patch_requests(self):
+        self.assertEqual(self.patch({'ops': []}).status_code, 400)
+        self.assertEqual(self.patch({'version': 1, 'ops': [{'start': 1000}]}).status_code, 400)
+        self.assertEqual(self.patch({'version': 1, 'ops': [{'start': 0, 'end': len(BODY)}]}).status_code, 400)
+        other = User(username='other', email='other@example.com', role=UserRole.TEACHER)
+        db.session.add(other)
+        db.session.commit()
+        response = self.client.patch(self.url, json={'version': 1, 'ops': [{'start': 0, 'text': 'x'}]},
+                                     headers={'Authorization': f"Bearer {create_access_token(identity='other')}"})
+        self.assertEqual(response.status_code, 403)
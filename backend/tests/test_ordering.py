@@ -0,0 +1,132 @@
+import random
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, update
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.assessment import Assessment
+from app.services.ordering import DIGITS, rank_between, ranks_between, rebalance_positions
+from tests.base import DatabaseTestCase
+
+
+class RankTestCase(DatabaseTestCase):
+    def test_keys_sort_between_their_neighbours(self):
+        rng = random.Random(7)
+        keys = [rank_between()]
+        for _ in range(500):
+            index = rng.randrange(len(keys) + 1)
+            before = keys[index - 1] if index else None
+            after = keys[index] if index < len(keys) else None
+            key = rank_between(before, after)
+            self.assertTrue((before is None or before < key) and (after is None or key < after))
+            self.assertNotEqual(key[-1], '0')
+            self.assertTrue(set(key) <= set(DIGITS))
+            keys.insert(index, key)
+        self.assertEqual(keys, sorted(keys))
+        with self.assertRaises(ValueError):
+            rank_between('b', 'a')
+
+    def test_appends_and_spread_keys_stay_short(self):
+        key = None
+        for _ in range(300):
+            key = rank_between(key, None)
+        self.assertLessEqual(len(key), 18)
+        keys = ranks_between(None, None, 1000)
+        self.assertEqual(keys, sorted(set(keys)))
+        self.assertLessEqual(max(map(len, keys)), 3)
+
+
+class OrderingTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.other = User(username='other', email='other@example.com', role=UserRole.TEACHER)
+        self.course = Course(title='Tajweed', description='Rules of recitation', author=self.teacher)
+        self.lessons = [Lesson(title=f'Lesson {number}', body='Rules.', author=self.teacher, course=self.course)
+                        for number in range(4)]
+        self.assessments = [Assessment(title=f'Quiz {number}', author=self.teacher, lesson=self.lessons[0],
+                                       course=self.course, questions='[]', type='quiz', answers='[]')
+                            for number in range(3)]
+        db.session.add_all([self.teacher, self.other, self.course, *self.lessons, *self.assessments])
+        db.session.commit()
+        self.course_id = self.course.id
+        self.lesson_ids = [lesson.id for lesson in self.lessons]
+        self.assessment_ids = [assessment.id for assessment in self.assessments]
+
+    def put(self, url, body, username='teacher'):
+        return self.client.put(url, json=body, headers={
+            'Authorization': f'Bearer {create_access_token(identity=username)}'})
+
+    def titles(self):
+        response = self.client.get(f'/api/v1/content/courses/{self.course_id}/lessons', headers={
+            'Authorization': f"Bearer {create_access_token(identity='teacher')}"})
+        return [lesson['title'] for lesson in response.get_json()]
+
+    def test_new_rows_are_appended(self):
+        self.assertEqual(self.titles(), ['Lesson 0', 'Lesson 1', 'Lesson 2', 'Lesson 3'])
+        positions = [db.session.get(Lesson, lesson_id).position for lesson_id in self.lesson_ids]
+        self.assertEqual(positions, sorted(set(positions)))
+        db.session.add(Lesson(title='Lesson 4', body='Rules.', author_id=self.teacher.id, course_id=self.course_id))
+        db.session.commit()
+        self.assertEqual(self.titles()[-1], 'Lesson 4')
+
+    def test_move_updates_one_row(self):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('UPDATE lessons'):
+                statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = self.put(f'/api/v1/content/lessons/{self.lesson_ids[3]}/position', {'after_id': None})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(self.titles(), ['Lesson 3', 'Lesson 0', 'Lesson 1', 'Lesson 2'])
+
+        response = self.put(f'/api/v1/content/lessons/{self.lesson_ids[3]}/position',
+                            {'after_id': self.lesson_ids[1]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(), ['Lesson 0', 'Lesson 1', 'Lesson 3', 'Lesson 2'])
+        outline = self.client.get(f'/api/v1/content/courses/{self.course_id}/outline', headers={
+            'Authorization': f"Bearer {create_access_token(identity='teacher')}"}).get_json()
+        self.assertEqual([lesson['title'] for lesson in outline['lessons']],
+                         ['Lesson 0', 'Lesson 1', 'Lesson 3', 'Lesson 2'])
+
+        url = f'/api/v1/content/assessment/{self.assessment_ids[0]}/position'
+        self.assertEqual(self.put(url, {'after_id': self.assessment_ids[2]}).status_code, 200)
+        self.assertEqual([assessment.title for assessment in db.session.get(Lesson, self.lesson_ids[0]).assessments],
+                         ['Quiz 1', 'Quiz 2', 'Quiz 0'])
+
+    def test_invalid_moves(self):
+        url = f'/api/v1/content/lessons/{self.lesson_ids[0]}/position'
+        self.assertEqual(self.put(url, {'after_id': self.lesson_ids[0]}).status_code, 400)
+        self.assertEqual(self.put(url, {}).status_code, 400)
+        self.assertEqual(self.put(url, {'after_id': None}, username='other').status_code, 403)
+        other_course = Course(title='Seerah', description='Life of the Prophet', author_id=self.teacher.id)
+        db.session.add(other_course)
+        db.session.flush()
+        lesson = Lesson(title='Makkah', body='Early years.', author_id=self.teacher.id, course_id=other_course.id)
+        db.session.add(lesson)
+        db.session.commit()
+        self.assertEqual(self.put(url, {'after_id': lesson.id}).status_code, 400)
+
+    def test_rebalance_shortens_keys_and_fills_missing_ones(self):
+        # Keep moving the last lesson into the same gap until its key is long
+        for _ in range(40):
+            self.put(f'/api/v1/content/lessons/{self.lesson_ids[3]}/position', {'after_id': self.lesson_ids[0]})
+            self.put(f'/api/v1/content/lessons/{self.lesson_ids[2]}/position', {'after_id': self.lesson_ids[0]})
+        order = self.titles()
+        db.session.execute(update(Assessment).values(position=None))
+        db.session.commit()
+        self.assertGreater(max(len(db.session.get(Lesson, lesson_id).position) for lesson_id in self.lesson_ids), 4)
+
+        self.assertEqual(rebalance_positions(max_length=4), 2)
+        db.session.expire_all()
+        self.assertEqual(self.titles(), order)
+        self.assertLessEqual(max(len(db.session.get(Lesson, lesson_id).position) for lesson_id in self.lesson_ids), 4)
+        self.assertEqual([assessment.title for assessment in db.session.get(Lesson, self.lesson_ids[0]).assessments],
+                         ['Quiz 0', 'Quiz 1', 'Quiz 2'])
+        self.assertEqual(rebalance_positions(max_length=4), 0)
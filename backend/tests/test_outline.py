@@ -0,0 +1,115 @@
+import json
+from unittest import mock
+from flask import g
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.assessment import Assessment
+from app.models.outline import CourseOutline
+from app.services import outlines
+from app.services.bulk_import import import_content
+from tests.base import DatabaseTestCase
+
+QUESTIONS = [{'type': 'true_false', 'question': 'Is iqlab a rule?', 'correct_answer': 'true'}]
+
+
+class OutlineTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.course = Course(title='Tajweed', description='Rules of recitation', author=self.teacher)
+        self.lessons = [Lesson(title=f'Lesson {number}', body=f'Rule {number}. ' * 10, author=self.teacher,
+                               course=self.course) for number in range(3)]
+        self.quiz = Assessment(title='Quiz', author=self.teacher, lesson=self.lessons[1], course=self.course,
+                               questions=json.dumps(QUESTIONS * 2), type='quiz', answers='[]')
+        db.session.add_all([self.teacher, self.course, *self.lessons, self.quiz])
+        db.session.commit()
+        self.course_id, self.teacher_id = self.course.id, self.teacher.id
+        self.url = f'/api/v1/content/courses/{self.course_id}/outline'
+
+    def outline(self):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if 'SAVEPOINT' not in statement:
+                statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = self.client.get(self.url, headers={
+                'Authorization': f"Bearer {create_access_token(identity='teacher')}"})
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json(), statements
+
+    def test_outline_is_built_once_and_served_from_cache(self):
+        outline, statements = self.outline()
+        self.assertEqual(outline['author'], {'id': self.teacher_id, 'username': 'teacher'})
+        self.assertEqual([lesson['title'] for lesson in outline['lessons']], ['Lesson 0', 'Lesson 1', 'Lesson 2'])
+        self.assertEqual(outline['lessons'][1]['assessments'],
+                         [{'id': self.quiz.id, 'title': 'Quiz', 'type': 'quiz', 'question_count': 2}])
+        self.assertTrue(outline['lessons'][0]['excerpt'].startswith('Rule 0.'))
+        built = len(statements)
+
+        # Adding lessons drops the cached outline; rebuilding it takes as many statements as before
+        db.session.add_all([Lesson(title=f'Extra {number}', body='More.', author_id=self.teacher_id,
+                                   course_id=self.course_id) for number in range(5)])
+        db.session.commit()
+        outline, statements = self.outline()
+        self.assertEqual((len(outline['lessons']), len(statements)), (8, built))
+
+        cached, statements = self.outline()
+        self.assertEqual(cached, outline)
+        self.assertEqual(sum('course_outlines' in statement for statement in statements), 1)
+        self.assertFalse(any('FROM lessons' in statement for statement in statements))
+
+    def test_child_changes_invalidate_the_outline(self):
+        self.outline()
+        lesson = db.session.get(Lesson, self.lessons[0].id)
+        lesson.title = 'Noon sakinah'
+        db.session.commit()
+        self.assertIsNone(db.session.get(CourseOutline, self.course_id))
+        self.assertEqual(self.outline()[0]['lessons'][0]['title'], 'Noon sakinah')
+
+        db.session.delete(db.session.get(Assessment, self.quiz.id))
+        db.session.commit()
+        self.assertEqual(self.outline()[0]['lessons'][1]['assessments'], [])
+
+        report = import_content([json.dumps({'kind': 'lesson', 'course_id': self.course_id, 'title': 'Imported',
+                                             'body': 'Added in bulk.'})], self.teacher_id)
+        self.assertEqual(report['errors'], [])
+        self.assertEqual(self.outline()[0]['lessons'][-1]['title'], 'Imported')
+
+    def test_outline_raced_by_a_write_is_not_served(self):
+        build = outlines.build_outline
+
+        def build_then_write(course_id):
+            outline = build(course_id)
+            # A write committed while the outline was being built
+            db.session.get(Lesson, self.lessons[0].id).title = 'Noon sakinah'
+            db.session.commit()
+            return outline
+
+        with mock.patch.object(outlines, 'build_outline', side_effect=build_then_write):
+            self.assertEqual(self.outline()[0]['lessons'][0]['title'], 'Lesson 0')
+        self.assertEqual(db.session.get(CourseOutline, self.course_id).version + 1,
+                         db.session.get(Course, self.course_id).outline_version)
+        self.assertEqual(self.outline()[0]['lessons'][0]['title'], 'Noon sakinah')
+        self.assertEqual(self.outline()[0]['lessons'][0]['title'], 'Noon sakinah')
+
+    def test_outline_is_built_on_the_primary(self):
+        with self.app.test_request_context(self.url):
+            outlines.course_outline(self.course_id)
+            self.assertTrue(g.pop('read_primary'))
+        with self.app.test_request_context(self.url):
+            outlines.course_outline(self.course_id)
+            self.assertIsNone(g.get('read_primary'))
+
+    def test_missing_course(self):
+        self.url = '/api/v1/content/courses/999/outline'
+        response = self.client.get(self.url, headers={
+            'Authorization': f"Bearer {create_access_token(identity='teacher')}"})
+        self.assertEqual(response.status_code, 404)
@@ -1,19 +1,8 @@
-import unittest
-from app import create_app, db
+from app import db
+from tests.base import DatabaseTestCase
 from app.models.user import User
 
-class TestPasswordHash(unittest.TestCase):
-    def setUp(self):
-        self.app = create_app('testing')
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        db.create_all()
-
-    def tearDown(self):
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
-
+class TestPasswordHash(DatabaseTestCase):
     def test_password_hash(self):
         user = User()
         user.username = "Abdo El-King"
@@ -0,0 +1,77 @@
+import sys
+import shutil
+import tempfile
+from flask import json
+from app import db
+from tests.base import DatabaseTestCase
+from app.models.user import User, UserRole
+from app.services import profiler
+
+
+class ProfilerTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.app.config['SECRET_KEY'] = 'profiler-test-secret'
+        self.profile_dir = tempfile.mkdtemp()
+        self.app.config['PROFILER_DIR'] = self.profile_dir
+        self.app.config['PROFILER_INTERVAL'] = 0.001
+        # A slow hash makes the profiled login run long enough to be sampled
+        self.app.config['PASSWORD_HASH_METHOD'] = 'scrypt'
+
+        self.admin_user = User(username='admin_user', email='admin@example.com', role=UserRole.ADMIN)
+        self.admin_user.password = 'admin123'
+        db.session.add(self.admin_user)
+        db.session.commit()
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.profile_dir)
+
+    def login(self, headers=None):
+        return self.client.post('/api/v1/auth/login',
+                                data=json.dumps({'username': 'admin_user', 'password': 'admin123'}),
+                                content_type='application/json',
+                                headers=headers or {})
+
+    def test_collapse_stack_orders_callers_first(self):
+        stack = profiler.collapse_stack(sys._getframe())
+        frames = stack.split(';')
+        self.assertTrue(frames[-1].startswith('test_collapse_stack_orders_callers_first ('))
+        self.assertGreater(len(frames), 1)
+
+    def test_signed_header_profiles_request(self):
+        token = profiler.generate_profile_token(self.app)
+        response = self.login(headers={'X-Profile-Token': token})
+        self.assertEqual(response.status_code, 200)
+
+        profiles = profiler.list_profiles(self.app)
+        self.assertEqual(len(profiles), 1)
+        self.assertEqual(profiles[0]['endpoint'], 'auth.login')
+
+    def test_invalid_header_is_ignored(self):
+        self.login(headers={'X-Profile-Token': 'forged'})
+        self.assertEqual(profiler.list_profiles(self.app), [])
+
+    def test_admin_lists_and_downloads_profiles(self):
+        token = self.login().get_json()['access_token']
+        auth = {'Authorization': f'Bearer {token}'}
+
+        response = self.client.put('/api/v1/portal/admin/profiler', json={'sample_rate': 1}, headers=auth)
+        self.assertEqual(response.status_code, 200)
+        self.login()
+        self.client.put('/api/v1/portal/admin/profiler', json={'sample_rate': 0}, headers=auth)
+
+        response = self.client.get('/api/v1/portal/admin/profiles', headers=auth)
+        self.assertEqual(response.status_code, 200)
+        names = [profile['name'] for profile in response.get_json()]
+        self.assertTrue(names)
+
+        response = self.client.get(f'/api/v1/portal/admin/profiles/{names[-1]}', headers=auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'login', response.data)
+
+    def test_invalid_sample_rate(self):
+        token = self.login().get_json()['access_token']
+        response = self.client.put('/api/v1/portal/admin/profiler', json={'sample_rate': 2},
+                                   headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,88 @@
+from flask_jwt_extended import create_access_token
+from app import db, mail
+from app.models.user import User, UserRole
+from app.models.outbox import OutboxEmail
+from app.services.outbox import send_outbox
+from app.services.provisioning import provision_users
+from tests.base import DatabaseTestCase
+
+HEADER = 'username,email,password,role,firstName,lastName,age,country\n'
+
+
+class ProvisioningTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        admin = User(username='admin', email='admin@example.com', role=UserRole.ADMIN)
+        admin.password = 'secret'
+        db.session.add(admin)
+        db.session.commit()
+
+    def provision(self, body, query=''):
+        return self.client.post(f'/api/v1/users/provision{query}', data=body, content_type='text/csv',
+                                headers={'Authorization': f"Bearer {create_access_token(identity='admin')}"})
+
+    def test_provision_reports_invalid_rows_and_collisions(self):
+        body = HEADER + '\n'.join([
+            'bilal,bilal@example.com,pass1,student,Bilal,Rabah,30,Ethiopia',
+            'aisha,aisha@example.com,,teacher,,,,',
+            'admin,other@example.com,pass,,,,,',
+            'zaid,admin@example.com,pass,,,,,',
+            'umar,not-an-email,pass,,,,,',
+            'hamza,hamza@example.com,pass,caliph,,,,',
+            'Bilal,bilal2@example.com,pass,,,,,',
+            'salman,salman@example.com,pass,,,,,',
+        ]) + '\n'
+        response = self.provision(body, '?batch_size=3')
+        self.assertEqual(response.status_code, 200)
+        report = response.get_json()
+        self.assertEqual((report['rows'], report['created'], report['emails_queued']), (8, 3, 3))
+        self.assertEqual([error['row'] for error in report['errors']], [3, 4, 5, 6, 7])
+        self.assertIn("username 'admin' already exists", report['errors'][0]['error'])
+        self.assertIn('already exists', report['errors'][1]['error'])
+        self.assertEqual([entry['username'] for entry in report['generated_passwords']], ['aisha'])
+
+        bilal = User.query.filter_by(username='bilal').one()
+        self.assertEqual((bilal.role, bilal.firstName, bilal.age, bilal.country),
+                         (UserRole.STUDENT, 'Bilal', 30, 'Ethiopia'))
+        self.assertTrue(bilal.verify_password('pass1'))
+        aisha = User.query.filter_by(username='aisha').one()
+        self.assertEqual(aisha.role, UserRole.TEACHER)
+        self.assertTrue(aisha.verify_password(report['generated_passwords'][0]['password']))
+        self.assertEqual(sorted(email.recipient for email in OutboxEmail.query),
+                         ['aisha@example.com', 'bilal@example.com', 'salman@example.com'])
+
+    def test_provision_requires_columns_and_admin(self):
+        self.assertEqual(self.provision('name,mail\nbilal,bilal@example.com\n').status_code, 400)
+        self.assertEqual(self.provision(HEADER, '?batch_size=0').status_code, 400)
+        student = User(username='student', email='student@example.com', role=UserRole.STUDENT)
+        db.session.add(student)
+        db.session.commit()
+        response = self.client.post('/api/v1/users/provision', data=HEADER, content_type='text/csv',
+                                    headers={'Authorization': f"Bearer {create_access_token(identity='student')}"})
+        self.assertEqual(response.status_code, 403)
+
+    def test_requests_share_one_bounded_hashing_pool(self):
+        self.app.config['PROVISION_HTTP_HASH_WORKERS'] = 2
+        try:
+            self.provision(HEADER + 'bilal,bilal@example.com,pass1,,,,,\n')
+            pool = self.app.extensions['provision_hash_pool']
+            response = self.provision(HEADER + 'aisha,aisha@example.com,pass2,,,,,\n')
+            self.assertIs(self.app.extensions['provision_hash_pool'], pool)
+            self.assertEqual(pool._max_workers, 2)
+        finally:
+            self.app.extensions.pop('provision_hash_pool').shutdown()
+        self.assertEqual(response.get_json()['created'], 1)
+        self.assertTrue(User.query.filter_by(username='aisha').one().verify_password('pass2'))
+
+    def test_send_outbox_delivers_pending_emails_once(self):
+        rows = [{'username': f'student{number}', 'email': f'student{number}@example.com', 'password': 'pass'}
+                for number in range(5)]
+        provision_users(rows, batch_size=2, workers=2)
+        self.assertTrue(User.query.filter_by(username='student4').one().verify_password('pass'))
+        with mail.record_messages() as outbox:
+            self.assertEqual(send_outbox(batch_size=2), {'sent': 5, 'failed': 0})
+            self.assertEqual(send_outbox(), {'sent': 0, 'failed': 0})
+        self.assertEqual([message.recipients for message in outbox],
+                         [[f'student{number}@example.com'] for number in range(5)])
+        self.assertEqual(outbox[0].subject, 'Account Created')
+        self.assertEqual(OutboxEmail.query.filter(OutboxEmail.sent_at.is_(None)).count(), 0)
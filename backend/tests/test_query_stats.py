@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+from flask import json
+from app import db
+from tests.base import DatabaseTestCase
+from app.models.user import User, UserRole
+from app.services.query_stats import QueryStats, fingerprint, load_snapshots, report
+
+
+class QueryFingerprintTestCase(unittest.TestCase):
+    def test_literals_and_parameters_are_normalized(self):
+        self.assertEqual(fingerprint("SELECT * FROM users WHERE id = 42 AND name = 'x'"),
+                         fingerprint('select *  from users where id = %s and name = %s'))
+
+    def test_lists_are_collapsed(self):
+        self.assertEqual(fingerprint('SELECT id FROM lessons WHERE id IN (?, ?, ?)'),
+                         'select id from lessons where id in (?+)')
+        self.assertEqual(fingerprint('INSERT INTO t (a, b) VALUES (?, ?), (?, ?), (?, ?)'),
+                         'insert into t (a, b) values (?+)')
+
+    def test_identifiers_with_digits_are_kept(self):
+        self.assertIn('users_1', fingerprint('SELECT users_1.id FROM users AS users_1 LIMIT 5'))
+
+    def test_report_merges_and_sorts(self):
+        stats = QueryStats(sample_size=10)
+        for duration in (0.001, 0.002, 0.003):
+            stats.record('SELECT id FROM users', 'users.get_users', 'admin', duration, 1)
+        stats.record('SELECT id FROM lessons', 'users.get_users', 'admin', 0.5, 0)
+
+        rows = report(stats.snapshot() + stats.snapshot(), sort='total_ms')
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['count'], 2)
+        self.assertEqual(rows[1]['count'], 6)
+        self.assertEqual(rows[1]['rows'], 6)
+        self.assertEqual(rows[1]['p50_ms'], 2.0)
+
+
+class QueryStatsAPITestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        # The application is shared by the whole test run
+        self.app.extensions['query_stats'].reset()
+        admin_user = User(username='admin_user', email='admin@example.com', role=UserRole.ADMIN)
+        admin_user.password = 'admin123'
+        db.session.add(admin_user)
+        db.session.commit()
+
+        response = self.client.post('/api/v1/auth/login',
+                                    data=json.dumps({'username': 'admin_user', 'password': 'admin123'}),
+                                    content_type='application/json')
+        self.headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    def test_queries_are_grouped_by_endpoint_and_role(self):
+        self.client.get('/api/v1/users/by-role/admin', headers=self.headers)
+        response = self.client.get('/api/v1/portal/admin/query-stats', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        queries = response.get_json()['queries']
+        by_role = [query for query in queries if query['endpoint'] == 'users.get_user_by_role']
+        self.assertTrue(by_role)
+        self.assertTrue(any(query['role'] == UserRole.ADMIN for query in by_role))
+        self.assertTrue(all(query['p99_ms'] is not None for query in by_role))
+
+    def test_rows_fetched_by_reads_are_counted(self):
+        db.session.add_all([User(username=f'student{number}', email=f'student{number}@example.com',
+                                 role=UserRole.STUDENT) for number in range(3)])
+        db.session.commit()
+        self.client.get('/api/v1/users/by-role/student', headers=self.headers)
+        response = self.client.get('/api/v1/portal/admin/query-stats', headers=self.headers)
+        by_role = [query for query in response.get_json()['queries']
+                   if query['endpoint'] == 'users.get_user_by_role' and 'users.role = ?' in query['fingerprint']]
+        self.assertEqual([query['rows'] for query in by_role], [3])
+
+    def test_reset_and_snapshot(self):
+        directory = tempfile.mkdtemp()
+        try:
+            self.app.extensions['query_stats'].flush(directory)
+            self.assertTrue(load_snapshots(directory))
+
+            response = self.client.delete('/api/v1/portal/admin/query-stats', headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(os.listdir(directory)), 1)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_invalid_sort(self):
+        response = self.client.get('/api/v1/portal/admin/query-stats?sort=bogus', headers=self.headers)
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app, db
+from app.config import SQLiteTestConfig, config
+from app.models.user import User, UserRole
+from app.models.content import Course
+
+
+class ReplicaTestConfig(SQLiteTestConfig):
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    REPLICA_LAG_CHECK_INTERVAL = 0
+
+
+class ReplicaRoutingTestCase(unittest.TestCase):
+    """Routes reads between a primary and a replica SQLite file holding different data."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        ReplicaTestConfig.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(self.directory, 'primary.db')}"
+        ReplicaTestConfig.SQLALCHEMY_REPLICA_URIS = [f"sqlite:///{os.path.join(self.directory, 'replica.db')}"]
+        config['testing-replicas'] = ReplicaTestConfig
+        self.app = create_app('testing-replicas')
+        self.client = self.app.test_client()
+        self.router = self.app.extensions['replicas']
+
+        # No application context stays pushed, so every request gets its own session
+        with self.app.app_context():
+            replica = db.engines['replica_0']
+            db.create_all()
+            db.metadata.create_all(replica)
+            for engine, title in ((db.engine, 'Primary course'), (replica, 'Replica course')):
+                with engine.begin() as connection:
+                    connection.execute(User.__table__.insert(), [
+                        {'id': 1, 'username': 'teacher', 'email': 'teacher@example.com', 'role': UserRole.TEACHER},
+                        {'id': 2, 'username': 'student', 'email': 'student@example.com', 'role': UserRole.STUDENT},
+                    ])
+                    connection.execute(Course.__table__.insert(), {'title': title, 'description': 'x', 'author_id': 1})
+            self.teacher = {'Authorization': f"Bearer {create_access_token(identity='teacher')}"}
+            self.student = {'Authorization': f"Bearer {create_access_token(identity='student')}"}
+
+    def tearDown(self):
+        with self.app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+        del config['testing-replicas']
+        shutil.rmtree(self.directory)
+
+    def course_titles(self, headers=None):
+        response = self.client.get('/api/v1/content/courses', headers=headers or {})
+        self.assertEqual(response.status_code, 200)
+        return {course['title'] for course in response.get_json()}
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.course_titles(), {'Replica course'})
+        self.assertEqual(self.course_titles(self.student), {'Replica course'})
+
+    def test_writes_go_to_primary_and_writer_reads_own_writes(self):
+        response = self.client.post('/api/v1/content/courses', headers=self.teacher,
+                                    json={'title': 'New course', 'description': 'x'})
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.course_titles(self.teacher), {'Primary course', 'New course'})
+        self.assertEqual(self.course_titles(self.student), {'Replica course'})
+
+    def test_stickiness_expires(self):
+        self.router.sticky_seconds = 0
+        self.client.post('/api/v1/content/courses', headers=self.teacher,
+                         json={'title': 'New course', 'description': 'x'})
+        self.assertEqual(self.course_titles(self.teacher), {'Replica course'})
+
+    def test_lagging_replica_is_skipped(self):
+        self.router.lag_probe = lambda engine: self.router.max_lag + 1
+        self.assertEqual(self.course_titles(), {'Primary course'})
+
+        self.router.lag_probe = lambda engine: None
+        self.assertEqual(self.course_titles(), {'Primary course'})
+
+    def test_one_replica_serves_a_request(self):
+        chosen = []
+        choose = self.router.choose
+        self.router.choose = lambda: chosen.append(choose()) or chosen[-1]
+
+        # The user lookup of the role check and the course query are separate statements
+        response = self.client.get('/api/v1/content/courses/1', headers=self.student)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['title'], 'Replica course')
+        self.assertEqual(len(chosen), 1)
+
+        self.course_titles(self.student)
+        self.assertEqual(len(chosen), 2)
+
+    def test_readiness_probes_the_primary_and_reports_replica_pools(self):
+        probed = []
+        with self.app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute',
+                             lambda conn, cursor, statement, *args: probed.append(conn.engine))
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.get_json()['replicas']), ['replica_0'])
+        with self.app.app_context():
+            self.assertEqual(probed, [db.engine])
@@ -1,21 +1,9 @@
-import unittest
-from app import create_app, db
+from app import db
+from tests.base import DatabaseTestCase
 from app.models.user import User, UserRole
 
 
-class RoleModelTestCase(unittest.TestCase):
-    def setUp(self):
-        self.app = create_app('testing')
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        db.create_all()
-        self.client = self.app.test_client()
-
-    def tearDown(self):
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
-
+class RoleModelTestCase(DatabaseTestCase):
     def test_user_roles(self):
         student = User(username="student", email="student1@email.com", role=UserRole.STUDENT, password="std123")
         teacher = User(username="teacher", email="teacher1@email.com", role=UserRole.TEACHER, password="teacher123")
@@ -1,16 +1,11 @@
-import unittest
 from flask_jwt_extended import create_access_token
-from app import create_app, db
+from app import db
+from tests.base import DatabaseTestCase
 from app.models.user import User, UserRole
 
-class RoleBasedAccessTestCase(unittest.TestCase):
+class RoleBasedAccessTestCase(DatabaseTestCase):
     def setUp(self):
-        self.app = create_app('testing')
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        self.client = self.app.test_client()
-        db.create_all()
-
+        super().setUp()
         self.admin_user = User(username='admin_user', email='admin@example.com', role=UserRole.ADMIN)
         self.admin_user.password='admin123'
         self.teacher_user = User(username='teacher_user', email='teacher@example.com', role=UserRole.TEACHER)
@@ -21,11 +16,6 @@ class RoleBasedAccessTestCase(unittest.TestCase):
         db.session.add_all([self.admin_user, self.teacher_user, self.student_user])
         db.session.commit()
 
-    def tearDown(self):
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
-
     def test_admin_access(self):
         admin_login = self.client.post('api/v1/auth/login', json={
             'username': 'admin_user',
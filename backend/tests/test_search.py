@@ -0,0 +1,91 @@
+from flask_jwt_extended import create_access_token
+from sqlalchemy.dialects import mysql
+from sqlalchemy.schema import CreateTable
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.search import SearchDocument, SearchPosting
+from app.services.search import normalize, rebuild_index, search, stem, tokenize
+from tests.base import DatabaseTestCase
+
+
+class TokenizerTestCase(DatabaseTestCase):
+    def test_normalize_strips_tashkeel_and_folds_letters(self):
+        self.assertEqual(normalize('بِسْمِ'), 'بسم')
+        self.assertEqual(normalize('أَحْكَامُ إِنَّ آمَنَ'), 'احكام ان امن')
+        self.assertEqual(normalize('مدرسة هدى'), 'مدرسه هدي')
+
+    def test_tokenize_stems_affixes(self):
+        self.assertEqual(tokenize('والكتاب'), tokenize('كتاب'))
+        self.assertEqual(tokenize('المسلمون'), tokenize('مسلم'))
+        self.assertEqual(tokenize('Lessons on Recitation'), ['lesson', 'on', 'recitation'])
+
+    def test_stem_removes_one_suffix(self):
+        # Both 'ها' and then 'ات' match, but only the first suffix is removed
+        self.assertEqual(stem('سماواتها'), 'سماوات')
+        self.assertEqual(stem('كتابيه'), 'كتاب')
+
+
+class SearchTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        db.session.add(self.teacher)
+        db.session.commit()
+        self.course = Course(title='أحكام التجويد', description='Rules of tajweed recitation', author=self.teacher)
+        self.lessons = [
+            Lesson(title='Madd', body='المدود في القرآن الكريم', author=self.teacher, course=self.course),
+            Lesson(title='Ghunnah', body='الغُنَّة في النون والميم المشددتين. التجويد', author=self.teacher,
+                   course=self.course),
+        ]
+        db.session.add_all([self.course] + self.lessons)
+        db.session.commit()
+        self.headers = {'Authorization': f"Bearer {create_access_token(identity='teacher')}"}
+
+    def test_index_is_updated_on_create_update_and_delete(self):
+        self.assertEqual(SearchDocument.query.count(), 3)
+        self.assertEqual(search('غنه'), [('lesson', self.lessons[1].id, search('غنه')[0][2])])
+
+        self.lessons[1].body = 'Nasalization'
+        db.session.commit()
+        self.assertEqual(search('غنه'), [])
+        self.assertEqual(search('nasalization')[0][:2], ('lesson', self.lessons[1].id))
+
+        db.session.delete(self.lessons[1])
+        db.session.commit()
+        self.assertEqual(search('nasalization'), [])
+
+    def test_title_matches_rank_first(self):
+        results = search('التَّجْوِيد')
+        self.assertEqual([(kind, doc_id) for kind, doc_id, _ in results],
+                         [('course', self.course.id), ('lesson', self.lessons[1].id)])
+        self.assertEqual(search('التجويد', doc_type='lesson')[0][:2], ('lesson', self.lessons[1].id))
+
+    def test_terms_differing_only_in_accents_are_distinct(self):
+        lesson = Lesson(title='Café', body='cafe Straße strasse', author=self.teacher, course=self.course)
+        db.session.add(lesson)
+        db.session.commit()
+        document = SearchDocument.query.filter_by(doc_type='lesson', doc_id=lesson.id).one()
+        self.assertEqual({posting.term for posting in document.postings}, {'café', 'cafe', 'straße', 'strasse'})
+        self.assertEqual([doc_id for _, doc_id, _ in search('straße')], [lesson.id])
+        # MySQL's default collation would fold the terms into one primary key
+        ddl = str(CreateTable(SearchPosting.__table__).compile(dialect=mysql.dialect()))
+        self.assertIn('term VARCHAR(64) COLLATE utf8mb4_bin', ddl)
+
+    def test_rebuild_index(self):
+        db.session.execute(SearchDocument.__table__.delete())
+        self.assertEqual(rebuild_index(batch_size=1), 3)
+        self.assertEqual(search('القران')[0][:2], ('lesson', self.lessons[0].id))
+
+    def test_search_endpoint(self):
+        response = self.client.get('/api/v1/content/search?q=أحكام', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()['results']
+        self.assertEqual(results[0]['type'], 'course')
+        self.assertEqual(results[0]['title'], 'أحكام التجويد')
+
+        response = self.client.get('/api/v1/content/search?q=madd&type=lesson', headers=self.headers)
+        self.assertEqual(response.get_json()['results'][0]['course_id'], self.course.id)
+
+        self.assertEqual(self.client.get('/api/v1/content/search', headers=self.headers).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/content/search?q=x&type=user', headers=self.headers).status_code, 400)
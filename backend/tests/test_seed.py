@@ -0,0 +1,41 @@
+from sqlalchemy import func, select
+from app import db
+from tests.base import DatabaseTestCase
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.assessment import Assessment
+from app.models.submission import Submission
+from app.services.seed import seed_database, zipf_weights
+
+
+class SeedTestCase(DatabaseTestCase):
+    def test_seed_creates_requested_populations(self):
+        counts = seed_database(students=40, teachers=4, admins=1, courses=5, lessons=20,
+                               assessments=10, submissions=200, batch_size=50, tag='t')
+        self.assertEqual(counts['users'], 45)
+        self.assertEqual(User.query.filter_by(role=UserRole.TEACHER).count(), 4)
+        self.assertEqual(Course.query.count(), 5)
+        self.assertEqual(Lesson.query.count(), 20)
+        self.assertEqual(Assessment.query.count(), 10)
+        self.assertEqual(Submission.query.count(), 200)
+
+    def test_submissions_are_unique_and_skewed(self):
+        seed_database(students=50, teachers=2, courses=2, lessons=5, assessments=10,
+                      submissions=300, tag='t')
+        pairs = db.session.execute(select(func.count()).select_from(
+            select(Submission.student_id, Submission.assessment_id).distinct().subquery())).scalar()
+        self.assertEqual(pairs, 300)
+
+        per_assessment = [count for count, in db.session.execute(
+            select(func.count(Submission.id)).group_by(Submission.assessment_id)
+            .order_by(func.count(Submission.id).desc()))]
+        self.assertGreater(per_assessment[0], per_assessment[-1])
+
+    def test_seeded_users_can_log_in(self):
+        seed_database(students=1, teachers=1, admins=0, courses=0, tag='t')
+        user = User.query.filter_by(role=UserRole.STUDENT).first()
+        self.assertTrue(user.verify_password('password'))
+
+    def test_zipf_weights_are_cumulative(self):
+        weights = zipf_weights(3, 1)
+        self.assertEqual(weights, [1, 1.5, 1.5 + 1 / 3])
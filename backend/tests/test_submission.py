@@ -1,22 +1,17 @@
-import unittest
 from unittest.mock import patch
 import json  # Use the standard library's json module
 from flask import json as flask_json
-from app import create_app, db
+from app import db
+from tests.base import DatabaseTestCase
 from app.models.user import User, UserRole
 from app.models.content import Course, Lesson
 from app.models.submission import Submission
 from app.models.assessment import Assessment
 from datetime import datetime
 
-class TestSubmission(unittest.TestCase):
+class TestSubmission(DatabaseTestCase):
     def setUp(self):
-        self.app = create_app('testing')
-        self.client = self.app.test_client()
-        self.app_context = self.app.app_context()
-        self.app_context.push()
-        db.drop_all()
-        db.create_all()
+        super().setUp()
 
         self.teacher = User(
             username='teacher',
@@ -54,8 +49,8 @@ class TestSubmission(unittest.TestCase):
 
         self.data = {
             "title": "Sample Assessment",
-            "lesson_id": 1,
-            "course_id": 1,
+            "lesson_id": self.lesson.id,
+            "course_id": self.course.id,
             "type": "quiz",
             "questions": [
                 {
@@ -82,11 +77,6 @@ class TestSubmission(unittest.TestCase):
                                          headers={'Authorization': f'Bearer {self.teacher_token}'})
         self.assessment = self.response.get_json().get('assessment')
 
-    def tearDown(self):
-        db.session.remove()
-        db.drop_all()
-        self.app_context.pop()
-
     def test_make_submission(self):
         response = self.client.post(f'/api/v1/content/assessment/{self.assessment["id"]}/submit',
                                     data=json.dumps(self.answers),
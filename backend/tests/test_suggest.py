@@ -0,0 +1,96 @@
+import time
+from unittest import mock
+from flask_jwt_extended import create_access_token
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.services import suggest as suggest_service
+from app.services.suggest import SuggestIndex, suggest_index
+from tests.base import DatabaseTestCase
+
+
+class SuggestIndexTestCase(DatabaseTestCase):
+    def test_prefix_lookup(self):
+        index = SuggestIndex([('course', 1, 'Tajweed Basics'), ('lesson', 1, 'Ayat al-Kursi'),
+                              ('lesson', 2, 'Tajweed: Madd'), ('lesson', 3, 'أحكام التَّجويد')])
+        self.assertEqual(index.suggest('taj'), [('course', 1, 'Tajweed Basics'), ('lesson', 2, 'Tajweed: Madd')])
+        self.assertEqual(index.suggest('tajweed m'), [('lesson', 2, 'Tajweed: Madd')])
+        self.assertEqual(index.suggest('KURSI'), [('lesson', 1, 'Ayat al-Kursi')])
+        self.assertEqual(index.suggest('التجو'), [('lesson', 3, 'أحكام التَّجويد')])
+        self.assertEqual(index.suggest('taj', doc_type='lesson', limit=1), [('lesson', 2, 'Tajweed: Madd')])
+        self.assertEqual(index.suggest('  '), [])
+
+    def test_add_and_remove(self):
+        index = SuggestIndex()
+        index.add('course', 1, 'Hifz Program')
+        index.add('course', 1, 'Memorization Program')
+        self.assertEqual(index.suggest('hifz'), [])
+        self.assertEqual(index.suggest('prog'), [('course', 1, 'Memorization Program')])
+        index.remove('course', 1)
+        self.assertEqual(index.suggest('mem'), [])
+        self.assertEqual(len(index), 0)
+
+
+class SuggestAPITestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.app.extensions.pop('suggest', None)
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.course = Course(title='Tajweed Basics', description='x', author=self.teacher)
+        self.lesson = Lesson(title='Tajweed: Madd', body='x', author=self.teacher, course=self.course)
+        db.session.add_all([self.teacher, self.course, self.lesson])
+        db.session.commit()
+        self.headers = {'Authorization': f"Bearer {create_access_token(identity='teacher')}"}
+
+    def suggest(self, query):
+        response = self.client.get(f'/api/v1/content/suggest?{query}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return [(suggestion['type'], suggestion['title']) for suggestion in response.get_json()['suggestions']]
+
+    def test_suggestions_follow_commits(self):
+        self.assertEqual(self.suggest('q=taj'), [('course', 'Tajweed Basics'), ('lesson', 'Tajweed: Madd')])
+
+        self.lesson.title = 'Madd Rules'
+        db.session.add(Lesson(title='Tajweed: Ghunnah', body='x', author=self.teacher, course=self.course))
+        db.session.commit()
+        self.assertEqual(self.suggest('q=taj&type=lesson'), [('lesson', 'Tajweed: Ghunnah')])
+        self.assertEqual(self.suggest('q=madd'), [('lesson', 'Madd Rules')])
+
+        db.session.delete(self.course)
+        db.session.commit()
+        self.assertEqual(self.suggest('q=taj'), [])
+
+    def test_rolled_back_writes_are_not_suggested(self):
+        suggest_index()
+        db.session.add(Course(title='Tafsir', description='x', author=self.teacher))
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(self.suggest('q=taf'), [])
+
+    def test_stale_index_is_rebuilt_by_one_request(self):
+        stale = suggest_index()
+        stale.built_at = time.monotonic() - self.app.config['SUGGEST_REFRESH_SECONDS']
+        rebuild = self.app.extensions['suggest_rebuild']
+        with rebuild:
+            # Another request is rebuilding: the stale index keeps being served
+            self.assertIs(suggest_index(), stale)
+
+        build = suggest_service.build_suggest_index
+
+        def build_while_committing():
+            fresh = build()
+            db.session.add(Course(title='Tafsir', description='x', author=self.teacher))
+            db.session.commit()
+            return fresh
+
+        with mock.patch.object(suggest_service, 'build_suggest_index', build_while_committing):
+            fresh = suggest_index()
+        self.assertIsNot(fresh, stale)
+        self.assertIs(suggest_index(), fresh)
+        # The commit made during the rebuild was replayed on the new index
+        self.assertEqual(self.suggest('q=taf'), [('course', 'Tafsir')])
+
+    def test_invalid_queries(self):
+        for query in ('', 'q=%20', 'q=taj&type=user'):
+            response = self.client.get(f'/api/v1/content/suggest?{query}', headers=self.headers)
+            self.assertEqual(response.status_code, 400, query)
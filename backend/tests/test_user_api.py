@@ -1,19 +1,14 @@
-import unittest
-from app import create_app, db
-from app.models.user import User
+from flask_jwt_extended import create_access_token
+from app import db
+from tests.base import DatabaseTestCase
+from app.models.user import User, UserRole
 
-class TestUserAPI(unittest.TestCase):
+class TestUserAPI(DatabaseTestCase):
     def setUp(self):
-        self.app = create_app('testing')
-        self.client = self.app.test_client()
-        self.app_ctx = self.app.app_context()
-        self.app_ctx.push()
-        db.create_all()
-
-    def tearDown(self):
-        db.session.remove()
-        db.drop_all()
-        self.app_ctx.pop()
+        super().setUp()
+        db.session.add(User(username='admin', email='admin@example.com', role=UserRole.ADMIN))
+        db.session.commit()
+        self.headers = {'Authorization': f"Bearer {create_access_token(identity='admin')}"}
 
     def test_create_user(self):
         response = self.client.post('api/v1/users', json={
@@ -42,10 +37,11 @@ class TestUserAPI(unittest.TestCase):
         db.session.add(user2)
         db.session.commit()
 
-        response = self.client.get('api/v1/users')
+        response = self.client.get('api/v1/users', headers=self.headers)
 
 
-        self.assertEqual(len(response.get_json()), 2) # type: ignore
+        # The two users and the admin making the request
+        self.assertEqual(len(response.get_json()), 3) # type: ignore
         self.assertEqual(response.status_code, 200)
 
 
@@ -63,11 +59,11 @@ class TestUserAPI(unittest.TestCase):
         db.session.add(user2)
         db.session.commit()
 
-        response = self.client.get(f'api/v1/users/{user1.id}')
+        response = self.client.get(f'api/v1/users/{user1.id}', headers=self.headers)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.get_json()['username'], "Abdo El-King")
 
-        response = self.client.get(f'api/v1/users/{user2.id}')
+        response = self.client.get(f'api/v1/users/{user2.id}', headers=self.headers)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.get_json()['username'], "Youssef El-Nemr")
 
@@ -84,14 +80,14 @@ class TestUserAPI(unittest.TestCase):
         db.session.add(user2)
         db.session.commit()
 
-        response = self.client.put(f'api/v1/users/{user1.id}', json={
+        response = self.client.put(f'api/v1/users/{user1.id}', headers=self.headers, json={
             "email": "new_email1@gmail.com",
             "username": "UniqueUsername1"
         })
         self.assertEqual(response.status_code, 200)
         self.assertIn('User updated successfully', response.get_json()['message'])
 
-        response = self.client.put(f'api/v1/users/{user2.id}', json={
+        response = self.client.put(f'api/v1/users/{user2.id}', headers=self.headers, json={
             "email": "new_email2@gmail.com",
             "username": "UniqueUsername2"
         })
@@ -111,10 +107,10 @@ class TestUserAPI(unittest.TestCase):
         db.session.add(user2)
         db.session.commit()
 
-        response = self.client.delete(f'api/v1/users/{user1.id}')
+        response = self.client.delete(f'api/v1/users/{user1.id}', headers=self.headers)
         self.assertEqual(response.status_code, 200)
         self.assertIn('User deleted successfully', response.get_json()['message'])
 
-        response = self.client.delete(f'api/v1/users/{user2.id}')
+        response = self.client.delete(f'api/v1/users/{user2.id}', headers=self.headers)
         self.assertEqual(response.status_code, 200)
         self.assertIn('User deleted successfully', response.get_json()['message'])
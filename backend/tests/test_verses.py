@@ -0,0 +1,107 @@
+import json
+import time
+from flask_jwt_extended import create_access_token
+from app import db
+from app.models.user import User, UserRole
+from app.models.content import Course, Lesson
+from app.models.assessment import Assessment
+from app.models.verse import VerseReference
+from app.services.verses import IntervalTree, extract_references, rebuild_references, surah_number, verse_index
+from tests.base import DatabaseTestCase
+
+
+class ExtractReferencesTestCase(DatabaseTestCase):
+    def test_numeric_references(self):
+        self.assertEqual(extract_references("See Qur'an 2:255, 2:256-257 and 1:1-99"), [(1, 1, 7), (2, 255, 257)])
+        self.assertEqual(extract_references('Q 2:285-3:2'), [(2, 285, 286), (3, 1, 2)])
+        self.assertEqual(extract_references('Verses 115:1 and 2:0'), [])
+
+    def test_numeric_references_need_context(self):
+        self.assertEqual(extract_references('Meeting at 10:30, then 9:15 in room 2:1'), [])
+        self.assertEqual(extract_references('Recite verse 10:30. Meeting at 9:15'), [(10, 30, 30)])
+        self.assertEqual(extract_references('Al-Baqarah (2:255)'), [(2, 255, 255)])
+        self.assertEqual(extract_references('آية الكرسي ٢:٢٥٥'), [(2, 255, 255)])
+        self.assertEqual(extract_references('10:30', require_context=False), [(10, 30, 30)])
+
+    def test_long_texts_are_scanned_in_linear_time(self):
+        numbers = ' '.join(str(number % 1000) for number in range(100000))
+        started = time.perf_counter()
+        self.assertEqual(extract_references(numbers), [])
+        self.assertLess(time.perf_counter() - started, 1)
+
+    def test_named_references(self):
+        self.assertEqual(extract_references('Al-Baqarah 255 and surat al-baqara ayat 1-5'), [(2, 1, 5), (2, 255, 255)])
+        self.assertEqual(extract_references('سُورَةُ البَقَرَةِ الآية ٢٥٥ والكهف ١٠'), [(2, 255, 255), (18, 10, 10)])
+        self.assertEqual(extract_references('Surah Ya-Sin'), [(36, 1, 83)])
+        self.assertEqual(extract_references('Maryam is a name'), [])
+
+    def test_surah_number(self):
+        self.assertEqual(surah_number('Baqarah'), 2)
+        self.assertEqual(surah_number('آل عمران'), 3)
+        self.assertEqual(surah_number('114'), 114)
+        self.assertIsNone(surah_number('115'))
+
+
+class IntervalTreeTestCase(DatabaseTestCase):
+    def test_overlapping_matches_brute_force(self):
+        intervals = [(start, start + length, index) for index, (start, length)
+                     in enumerate((start, (start * 7) % 13) for start in range(1, 200, 3))]
+        tree = IntervalTree(intervals)
+        for start, end in ((1, 1), (50, 60), (198, 300), (0, 400), (250, 260)):
+            expected = sorted(interval for interval in intervals if interval[0] <= end and interval[1] >= start)
+            self.assertEqual(sorted(tree.overlapping(start, end)), expected)
+
+
+class VerseIndexTestCase(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        verse_index().clear()
+        self.teacher = User(username='teacher', email='teacher@example.com', role=UserRole.TEACHER)
+        self.course = Course(title='Tafsir', description='Tafsir of Al-Baqarah', author=self.teacher)
+        self.kursi = Lesson(title='Ayat al-Kursi', body='Commentary on Al-Baqarah 255-257.',
+                            author=self.teacher, course=self.course)
+        self.ending = Lesson(title='The last ayahs', body='البقرة ٢٨٥-٢٨٦', author=self.teacher, course=self.course)
+        db.session.add_all([self.teacher, self.course, self.kursi, self.ending])
+        db.session.commit()
+        self.quiz = Assessment(title='Kursi quiz', type='quiz', author=self.teacher, lesson=self.kursi,
+                               course=self.course, questions=json.dumps([{'question': 'Recite ayah 2:255'}]),
+                               answers=json.dumps(['']))
+        db.session.add(self.quiz)
+        db.session.commit()
+        self.headers = {'Authorization': f"Bearer {create_access_token(identity='teacher')}"}
+
+    def lookup(self, query):
+        response = self.client.get(f'/api/v1/content/verses?{query}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return [(result['type'], result['id']) for result in response.get_json()['results']]
+
+    def test_references_follow_writes(self):
+        self.assertEqual(VerseReference.query.count(), 3)
+        self.assertEqual(self.lookup('ref=2:255'), [('assessment', self.quiz.id), ('lesson', self.kursi.id)])
+
+        self.kursi.body = 'Commentary on Al-Imran 18.'
+        db.session.commit()
+        self.assertEqual(self.lookup('ref=2:256'), [])
+        self.assertEqual(self.lookup('surah=3&from=1&to=20'), [('lesson', self.kursi.id)])
+
+        db.session.delete(self.ending)
+        db.session.commit()
+        self.assertEqual(self.lookup('ref=البقرة'), [('assessment', self.quiz.id)])
+
+    def test_range_queries(self):
+        self.assertEqual(self.lookup('surah=Al-Baqarah&from=250'), [])
+        self.assertEqual(self.lookup('surah=2&from=250&to=286'),
+                         [('assessment', self.quiz.id), ('lesson', self.kursi.id), ('lesson', self.ending.id)])
+        self.assertEqual(self.lookup('ref=Al-Baqarah 256-290&type=lesson'),
+                         [('lesson', self.kursi.id), ('lesson', self.ending.id)])
+
+    def test_invalid_queries(self):
+        for query in ('', 'surah=115', 'ref=nothing', 'surah=2&from=10&to=5', 'ref=2:255&type=course'):
+            response = self.client.get(f'/api/v1/content/verses?{query}', headers=self.headers)
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_rebuild_references(self):
+        db.session.execute(VerseReference.__table__.delete())
+        db.session.commit()
+        self.assertEqual(rebuild_references(batch_size=1), 3)
+        self.assertEqual(self.lookup('ref=2:286'), [('lesson', self.ending.id)])